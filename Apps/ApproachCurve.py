@@ -5,10 +5,13 @@ from tkinter.filedialog import asksaveasfilename
 from tkinter import ttk as ttk
 
 # Numerical analysis
-import numpy as np
-import pandas as pd
-import scipy.io # support for matlab workspaces
-import scipy.optimize # nonlinear curve fitting
+from Processing import PApproachCurve # processing stages and feedback theory
+from Processing import Timing # timing of imports, processing and rendering
+from Processing import Export # text files of Export Data
+from Readers import Datasets # data sets returned by the readers
+from Readers import Formats # detection of the file format and readers
+from Apps.DatasetList import DatasetList # import of several files, list of data sets
+from Apps.FollowFile import FollowFile # follow mode (file being written by the instrument software)
 
 # Plotting
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # figure handler for embeddable plots
@@ -120,6 +123,15 @@ class PACApp:
         #        # link function to change dropdown
         self.textVar.trace('w', self.change_dropdown)
 
+        # Import of several files at once and list of the imported data sets
+        self.datasetList = DatasetList(master, frameBase, 'approach_curve', self.textVar, self.select_dataset,
+                                       lambda text: self.labelImport.config(text=text))
+
+        # Follow mode: Import File follows the file while it is written and refreshes the plot
+        self.follow = FollowFile(master, frameBase, 'approach_curve', self.textVar, self.follow_update,
+                                 lambda text: self.labelImport.config(text=text),
+                                 lambda dataset: self.datasetList.select(self.datasetList.add(dataset)))
+
         # Label for number of points in data set (before processing)
         labelNpts = tk.Label(frameBase, text="# pts (original):")
         labelNpts.grid(row=1, column=3, padx=10, sticky="E")
@@ -399,7 +411,8 @@ class PACApp:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.frameBottom)
         self.canvas.get_tk_widget().grid(row=1, column=0, sticky="S")
         self.canvas.mpl_connect('button_press_event', DataCursor)
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         self.last_dir = ""
         # values that will hold the status of the checkboxes at the time the data was last plotted
@@ -409,6 +422,9 @@ class PACApp:
         self.statNormXP = 0
         self.statFRg = 0
 
+        # memoized processing stages, see Processing/PApproachCurve.py
+        self.pipeline = PApproachCurve.build_pipeline()
+
     def change_dropdown(*args):
         pass
 
@@ -423,414 +439,79 @@ class PACApp:
             self.labelFile.config(text=self.filename)
             self.buttonImport.config(state="normal")
 
-            # Set manufacturer
-            if self.filename[-3:] == 'asc':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:] == 'mat':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:] == 'dat':
-                self.textVar.set('Sensolytics')
-            elif self.filename[-3:] == 'csv':
-                self.textVar.set('PAR')
-            elif self.filename[-3:] == 'zsc' or self.filename[-3:] == 'ZSC':
-                self.textVar.set('SECMx')
+            # Set manufacturer from the file content (first few KB only)
+            fileformat = Formats.detect(self.filepath)
+            if fileformat is not None:
+                self.textVar.set(fileformat.manufacturer)
             else:
                 pass
             self.labelImport.config(text="Ready.")
         except:
             self.ResetWindow()
 
+    @Timing.timed('action')
     def ImportFile(self):
-        ## Check if manufacturer needed
-        if self.filename[-3:] == 'txt' and self.textVar.get() == 'None':
-            self.labelImport.config(text="Specify a manufacturer.")
-
-        ### ASC / HEKA import ###
-        elif self.filename[-3:] == 'asc':
-            self.import_heka_asc(self.filepath)
-        ### MAT / HEKA import ###
-        elif self.filename[-3:] == 'mat':
-            self.import_heka_mat(self.filepath)
-        ### ZSC / SECMx import ###
-        elif self.filename[-3:] == 'zsc' or self.filename[-3:] == 'ZSC':
-            self.import_2d_secmx(self.filepath)
-        ### TXT / Biologic import ###
-        elif self.filename[-3:] == 'txt' and self.textVar.get() == 'Biologic':
-            self.import_biologic(self.filepath)
-        ### TXT / CH Instruments import ###
-        elif self.filename[-3:] == 'txt' and self.textVar.get() == 'CH Instruments':
-            self.import_ch_instruments(self.filepath)
-        ### DAT / Sensolytics import ###
-        elif self.filename[-3:] == 'dat':
-            self.import_sensolytics(self.filepath)
-        ### CSV / PAR import ###
-        elif self.filename[-3:] == 'csv':
-            self.import_par(self.filepath)
-
-        else:
-            self.labelImport.config(text="File type not supported.")
-
-    """
-    Looking to extend the import file functionality to support a different file type?
-    The ReshapeData function assumes the following is present after the ImportFile function has run:
-        > self.distances = 1D numpy array containing distances (in µm)
-        >>> These are assumed to be positive values in order of increasing d.
-        > self.currents = 1D numpy array containing currents (in nA) 
-    """
-
-    def import_heka_asc(self, filepath):
-        # Import data file
-        self.data = []
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()  # split line into segments
-                        float(curline[0])  # check if line contains strings or numbers
-                        self.data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-                fh.close()
-
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-        ncols = len(self.data[0])
-
-        self.labelImport.config(text="File imported.")
-        self.buttonPlot.config(state="normal")
-        self.labelPlot.config(text="")
-
-        # Convert raw data to matrix
-        try:
-            if ncols == 5:
-                df = pd.DataFrame(self.data,
-                                  columns=["PtIndex", "Distance (m)", "Current (A)", "Distance (m)", "Current (A)"],
-                                  dtype=float)
-            elif ncols == 3:
-                df = pd.DataFrame(self.data, columns=["PtIndex", "Distance (m)", "Current (A)"], dtype=float)
-
-            df = df.values
-            try:
-                df[:, 1] = df[:, 1] * 1E6  # m --> um
-                df[:, 2] = df[:, 2] * 1E9  # A --> nA
-                df[:, 4] = df[:, 4] * 1E9  # A --> nA
-            except:
-                pass
-
-            # Determine number of pts
-            nptsorig = len(df)
-
-            # Create distance and current variables
-            self.distances0 = df[:, 1]
-            self.currents0 = df[:, 2]
-
-            self.labelNpts2.config(text=nptsorig)
-        except:
-            print("Error importing data.")
-
-    def import_heka_mat(self, filepath):
-        self.zerodVar.set('First point with data')
-
+        # Detect the file format and read it into an approach curve data set (see Readers/Formats.py); a manufacturer chosen
+        # in the dropdown takes precedence over the detected one
+        if self.follow.checked():
+            self.follow.start(self.filepath)
+            return
         try:
-            matdata = scipy.io.loadmat(filepath)
-
-            # Delete non-data containing variables
-            del matdata['__header__']
-            del matdata['__globals__']
-            del matdata['__version__']
-
-            for entry in matdata:
-                trace = matdata[entry]
-                self.distances0 = trace[:, 0]
-                self.currents0 = trace[:, 1]
-
-            self.distances0 = self.distances0 * 1E6  # m --> um
-            self.currents0 = self.currents0 * 1E9  # A --> nA
-
-            nptsorig = len(self.distances0)
-            self.labelNpts2.config(text=nptsorig)
-
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-
-        except:
-            self.labelImport.config(text="Error importing file.")
-
-    def import_2d_secmx(self, filepath):
-        """Imports data at the filepath address. Formats data to that required by the ReshapeData() method.
-        This method is designed to read 2D approach curve files of ASCII SECMx encoding (.zsc)
-        PLEASE NOTE THAT THIS METHOD CANNOT READ BINARY ENCODED FILES.
-        SECMx is an SECM control software by Gunther Wittstock. https://uol.de/pc2/forschung/secm-tools/secmx"""
-        data = []
-        use13 = False  # This variable determines which columns to read, the 2nd and 4th if True (for when an ADC column is in the datafile, or the 2nd and 3rd for when there is no ADC current column.
-        try:
-            with open(filepath, 'r') as fh:
-                position_conversion_factor = 1.0 # multiplicative conversion factor to convert units to µm
-                current_conversion_factor = 1.0 # multiplicative conversion factor to convert units to nA
-                for curline in fh:
-
-                    # Ignore lines that do not contain data when reading data into global memory
-                    if not (curline.startswith('|') or curline.startswith('[') or curline.startswith('p') or curline.startswith('\n') or len(curline) == 0):  # Read the line into memory if it is valid.
-                        curline = curline.split()  # split-up the line into an array of the floating point data
-                        if use13:
-                            data.append([float(curline[1])*position_conversion_factor, float(curline[3])*current_conversion_factor])
-                        else:
-                            data.append([float(curline[1])*position_conversion_factor, float(curline[2])*current_conversion_factor])
-                    else:
-                        # access the data table header to determine if an ADC column exists. If so, there will be 4 columns and use13 shall be true. otherwise, col1 and col2 should be used.
-                        if curline.startswith('p'):
-                            use13 = len(curline.split('\t')) == 4
-                        # check to see is the line contains information about the units
-                        if curline.rfind('Unit=') >= 0:
-                            unit = curline[curline.rfind('Unit=') + 5:]
-                            if unit.startswith('µm'):
-                                position_conversion_factor = 1.0
-                            elif unit.startswith('nm'):
-                                position_conversion_factor = 0.001
-                            elif unit.startswith('mm'):
-                                position_conversion_factor = 1E3
-                            elif unit.startswith('nA'):
-                                current_conversion_factor = 1.0
-                            elif unit.startswith('µA'):
-                                current_conversion_factor = 1E3
-                            elif unit.startswith('mA'):
-                                current_conversion_factor = 1E6
-                            elif unit.startswith('pA'):
-                                current_conversion_factor = 0.001
-                            elif unit.startswith('A'):
-                                current_conversion_factor = 1E9
-                            elif unit.startswith('cm'):
-                                position_conversion_factor = 1E4
-                            else:
-                                print('panic: ' + unit.strip())
-                fh.close()
-
-
+            dataset = Formats.read(self.filepath, 'approach_curve', self.textVar.get())
+        except Datasets.ReadError as e:
+            self.labelImport.config(text=str(e))
+            return
         except:
             self.labelImport.config(text="Could not import file.")
+            return
 
-        self.labelImport.config(text="File imported.")
-        self.buttonPlot.config(state="normal")
-        self.labelPlot.config(text="")
-
-        # Convert raw data to matrix
-        try:
-            df = pd.DataFrame(data, dtype=float)  # turn the data into a dataframe for sorting purposes
-            df = df.sort_values(0)  # ensure the distances are in ascending order
-            df = df.values  # cast the dataframe to a numpy array
-            nptsorig = len(df)  # determine the number of points
-
-            # Create distance and current variables
-            self.distances0 = df[:, 0]  # copy the distances over
-            self.currents0 = df[:, 1]  # copy the currents over
-
-            self.labelNpts2.config(text=nptsorig)
-        except Exception as e:
-            print("Error importing data: \n")
-
-    def import_biologic(self, filepath):
-        self.zerodVar.set('No calibration')
-
-        # Import file
-        self.data = []
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()
-                        float(curline[0])
-                        self.data.append(curline)
-                    except:
-                        pass
-                fh.close()
-        except:
-            self.labelImport.config(text="Could not import file.")
+        # Add to the list of imported data sets and show it
+        self.datasetList.select(self.datasetList.add(dataset))
 
-        # Process file into consistent format for ReshapeData
-        df = pd.DataFrame(self.data, columns=["Time (s)", "Current (A)"], dtype=float)
-        df = df.values
+    def follow_update(self, dataset):
+        """Shows the data read so far from the followed file (see Apps/FollowFile.py)"""
+        self.select_dataset(dataset)
+        self.ReshapeData()
 
-        df[:, 1] = df[:, 1] * 1E9  # A --> nA
+    def select_dataset(self, dataset):
+        """Makes one of the imported data sets (see Apps/DatasetList.py) the data of the window"""
+        self.filepath = dataset.filepath
+        self.filename = dataset.name
+        self.labelFile.config(text=self.filename)
 
-        # Update labels
+        self.load_dataset(dataset)
         self.labelImport.config(text="File imported.")
         self.buttonPlot.config(state="normal")
         self.labelPlot.config(text="")
 
-        # Convert raw data to matrix
-        try:
-            df = pd.DataFrame(self.data, columns=["Distance (µm)", "Current (A)"], dtype='float')
-            df = df.values
-            df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-            # Determine number of pts
-            nptsorig = len(df)
-
-            # Create distance and current variables
-            self.distances0 = df[:, 0]
-            self.distances0 = self.distances0 - np.amin(self.distances0)
-            self.currents0 = df[:, 1]
-
-            self.labelNpts2.config(text=nptsorig)
-        except:
-            print("Error importing data.")
-
-    def import_ch_instruments(self, filepath):
-        try:
-            self.data = []
-            datastart = 0  # toggle for determining if reading point cloud
-            index = 0
-
-            # First read to extract data
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split(',')
-                        if curline == ['Distance/um', ' Current/A\n']:
-                            datastart = 1
-                        if datastart == 1:
-                            float(curline[0])  # check if line contains strings or numbers
-                            self.data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-                fh.close()
-
-            # Second read to extract constant potential
-            with open(filepath, 'r') as fh2:
-                for curline2 in fh2:
-                    index = index + 1
-                    if index == 9:  # The scan rate info can be found in this line
-                        conpot = curline2.split('=')
-                        conpot = float(conpot[1].strip('\n'))
-                    else:
-                        pass
-
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-
-            # Convert raw data to matrix
-            try:
-                df = pd.DataFrame(self.data, columns=["Distance (µm)", "Current (A)"], dtype='float')
-                df = df.values
-                df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-                # Determine number of pts
-                nptsorig = len(df)
-
-                # Create distance and current variables
-                self.distances0 = df[:, 0]
-                self.distances0 = np.amax(self.distances0) - self.distances0
-                self.currents0 = df[:, 1]
-                self.currents0 = self.currents0 * (-1)  # polarographic --> IUPAC convention
-
-                self.labelNpts2.config(text=nptsorig)
-
-            except:
-                self.labelImport.config(text="Error importing file.")
-        except:
-            self.labelImport.config(text="Error importing file.")
-
-    def import_sensolytics(self, filepath):
-        try:
-            self.data = []
-            header = []
-            index = 0
-
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    index = index + 1
-                    if index <= 15:
-                        try:
-                            curline = curline.split(':')
-                            header.append(curline)
-                        except:
-                            pass
-                    if index > 15:
-                        try:
-                            curline = curline.split(',')
-                            float(curline[0])
-                            self.data.append(curline)
-                        except:
-                            pass
-                fh.close()
-
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-
-            df = pd.DataFrame(self.data, columns=['Distance (um)', 'Index', 'Current (nA)', 'NA'], dtype=float)
-            del df['NA']
-            df = df.values
-
-            nptsorig = len(df)
-
-            self.distances0 = df[:, 0]
-            self.currents0 = df[:, 2]
-
-            self.labelNpts2.config(text=nptsorig)
-
-        except:
-            self.labelImport.config(text="Error importing file.")
-
-    def import_par(self, filepath):
-        try:
-            with open(self.filepath) as fh:
-                data = pd.read_csv(fh, header=3)
-                fh.close()
-
-            data = data.values
-            self.distances0 = data[:, 1] * 1E3  # mm --> um
-            self.distances0 = np.amax(self.distances0) - self.distances0
-            self.currents0 = data[:, 2] * 1E3  # uA --> nA
-
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-
-            nptsorig = len(self.distances0)
-            self.labelNpts2.config(text=nptsorig)
-
-        except:
-            self.labelImport.config(text="Error importing file.")
-
-    def ReshapeData(self):
-        self.distances = self.distances0.copy()
-        self.currents = self.currents0.copy()
-
-        ## Calculate zero tip substrate distance
-        # Strip off any NaN points, make first point containing a current value the new zero
-        critrow = np.amin(np.where(np.isnan(self.currents) == False))
-        self.distances = self.distances[critrow:]
-        self.currents = self.currents[critrow:]
-
-        if self.zerodVar.get() != 'No calibration':
-            self.distances = self.distances - np.amin(self.distances)  # correct to min
-        else:
-            pass
+    def load_dataset(self, dataset):
+        """Makes an approach curve data set (Readers/Datasets.py) the data of the window. Readers of new file types
+        are added as plugins, see Readers/Formats.py; ReshapeData uses the following:
+            > self.distances0 = 1D numpy array containing distances (in µm)
+            >>> These are assumed to be positive values in order of increasing d.
+            > self.currents0 = 1D numpy array containing currents (in nA)
+        """
+        self.dataset = dataset
+        self.distances0 = dataset.distances
+        self.currents0 = dataset.currents
 
-        if self.zerodVar.get() == 'First point with data':
-            # Report how many points are left
-            self.labelNpts4.config(text=len(self.distances))
-        elif self.zerodVar.get() == "First derivative analysis":
-            # Perform a derivative analysis, take location of peak to be zero
-            currentsderiv = abs(np.gradient(self.currents))
-            maxderiv = np.where(currentsderiv == np.amax(currentsderiv))
-            maxderiv = int(maxderiv[0])
+        # Calibration suited to the file format
+        if 'zero_method' in dataset.metadata:
+            self.zerodVar.set(dataset.metadata['zero_method'])
 
-            # Strip off any points before the deriv peak (assume electrode bent)
-            self.distances = self.distances[maxderiv:]
-            self.currents = self.currents[maxderiv:]
+        self.labelNpts2.config(text=dataset.npts)
 
-            # Report how many points are left
-            self.labelNpts4.config(text=len(self.distances))
+    def processing_parameters(self):
+        """Collects the GUI settings that the processing stages depend on (see Processing/PApproachCurve.py).
+        radius/iss are None if normalization is requested but the corresponding entries are invalid."""
+        radius = None
+        iss = None
+        rg = None
 
         # Normalize distances
         try:
             if self.checkNormalize.var.get() == 1:
-                self.distancesnorm = self.distances / (float(self.entryRadius.get()))
+                radius = float(self.entryRadius.get())
                 self.labelRadiusErr.config(text="")
                 self.labelRgErr.config(text="")
                 self.labelConcErr.config(text="")
@@ -841,14 +522,6 @@ class PACApp:
             self.labelRadiusErr.config(text="Enter a value.")
             self.labelRgErr.config(text="Enter a value.")
 
-        # Convert distances if necessary
-        if self.distanceVar.get() == "µm":
-            pass
-        elif self.distanceVar.get() == "mm":
-            self.distances = self.distances / 1E3
-        elif self.distanceVar.get() == "nm":
-            self.distances = self.distances * 1E3
-
         # Calculate theoretical steady state value
         try:
             if self.checkNormalize.var.get() == 1 and self.checkNormalizeExp.var.get() == 0:
@@ -864,7 +537,7 @@ class PACApp:
             # Normalize currents
         if self.checkNormalize.var.get() == 1 and self.checkNormalizeExp.var.get() == 0:
             try:
-                self.currentsnorm = self.currents / self.issTheo
+                iss = float(self.issTheo)
                 self.labelRadiusErr.config(text="")
                 self.labelRgErr.config(text="")
                 self.labelConcErr.config(text="")
@@ -876,12 +549,51 @@ class PACApp:
                 self.labelDiffErr.config(text="Enter a value.")
         elif self.checkNormalize.var.get() == 1 and self.checkNormalizeExp.var.get() == 1:
             try:
-                self.currentsnorm = self.currents / (float(self.entryIssExp.get()))
+                iss = float(self.entryIssExp.get())
             except:
                 self.labelRadiusErr.config(text="Enter a value.")
         else:
             pass
 
+        try:
+            rg = float(self.entryRg.get())
+        except:
+            pass
+
+        return {'zero_method': self.zerodVar.get(),
+                'radius': radius,
+                'iss': iss,
+                'rg': rg,
+                'fit_rg': self.checkFitRg.var.get(),
+                'fit_kappa': self.checkFitKappa.var.get()}
+
+    @Timing.timed('action')
+    def ReshapeData(self):
+        # The imported data is the source of the processing pipeline; stages are only re-executed if the data or
+        # one of their parameters changed since the last plot
+        self.pipeline.set_source('raw', (self.distances0, self.currents0))
+        params = self.processing_parameters()
+
+        ## Calculate zero tip substrate distance
+        self.distances, self.currents = self.pipeline.run('calibrate', params)
+
+        if self.zerodVar.get() != 'No calibration':
+            # Report how many points are left
+            self.labelNpts4.config(text=len(self.distances))
+
+        # Normalized quantities are only available if the radius and steady state current are valid
+        normalized = self.checkNormalize.var.get() == 1 and params['radius'] is not None and params['iss'] is not None
+        if normalized:
+            self.distancesnorm, self.currentsnorm = self.pipeline.run('normalize', params)
+
+        # Convert distances if necessary
+        if self.distanceVar.get() == "µm":
+            pass
+        elif self.distanceVar.get() == "mm":
+            self.distances = self.distances / 1E3
+        elif self.distanceVar.get() == "nm":
+            self.distances = self.distances * 1E3
+
         # Update current units if needed
         if self.currentVar.get() == "nA":
             pass
@@ -909,59 +621,43 @@ class PACApp:
         except:
             print("Data imported, call 1 to update canvas PAC failed.")
 
-        # Fit Rg if requested
-        if self.checkFitRg.var.get() == 1:
-            critrow = np.amin(np.where(self.distancesnorm >= 0.1))
-            self.distancesnorm = self.distancesnorm[critrow:]
-            self.currentsnorm = self.currentsnorm[critrow:]
-
-            try:
-                # bounds prevent Rg<1 (insulating glass having smaller radius than the electrode it is meant to be
-                # surrounding)
-                self.estRg = scipy.optimize.curve_fit(self.negfbfit, self.distancesnorm,
-                                                      self.currentsnorm, bounds=(1, np.inf))
-                self.estRg = float(self.estRg[0])
-                self.labelEstRg2.config(text="{0:.3f}".format(self.estRg))
-            except:
-                self.labelEstRg2.config(text="Err")
-
-        # Fit kappa if requested
-        if self.checkFitKappa.var.get() == 1:
-            critrow = np.amin(np.where(self.distancesnorm >= 0.1))
-            self.distancesnorm = self.distancesnorm[critrow:]
-            self.currentsnorm = self.currentsnorm[critrow:]
+        if normalized:
+            # Fit Rg if requested
+            if self.checkFitRg.var.get() == 1:
+                try:
+                    self.distancesnorm, self.currentsnorm, self.estRg = self.pipeline.run('fit_rg', params)
+                    self.labelEstRg2.config(text="{0:.3f}".format(self.estRg))
+                except:
+                    self.labelEstRg2.config(text="Err")
 
-            try:
-                self.estKappa = scipy.optimize.curve_fit(self.kappafit, self.distancesnorm, self.currentsnorm, bounds=(0, np.inf))  # bounds prevent negative kappa
-                self.estKappa = float(self.estKappa[0])
-                self.labelEstKappa2.config(text="{0:.3E}".format(self.estKappa))
-            except:
-                self.labelEstKappa2.config(text="Err")
+            # Fit kappa if requested
+            if self.checkFitKappa.var.get() == 1:
+                try:
+                    self.distancesnorm, self.currentsnorm, self.estKappa = self.pipeline.run('fit_kappa', params)
+                    self.labelEstKappa2.config(text="{0:.3E}".format(self.estKappa))
+                except:
+                    self.labelEstKappa2.config(text="Err")
 
-            try:
-                self.estK = (1E8 * self.estKappa * float(self.entryDiff.get())) / (float(self.entryRadius.get()))
-                self.labelEstK2.config(text="{0:.3E}".format(self.estK))
-            except:
-                self.labelDiffErr.config(text="Enter a value.")
-                self.labelEstK2.config(text="Err.")
+                try:
+                    self.estK = (1E8 * self.estKappa * float(self.entryDiff.get())) / (float(self.entryRadius.get()))
+                    self.labelEstK2.config(text="{0:.3E}".format(self.estK))
+                except:
+                    self.labelDiffErr.config(text="Enter a value.")
+                    self.labelEstK2.config(text="Err.")
 
-        # Calculate pure feedback normalized currents for comparison
-        if self.checkNormalize.var.get() == 1:
+            # Calculate pure feedback normalized currents for comparison
             try:
                 # Note: The value of Rg used in these equations depends on the state of the 'fit Rg?' checkbox
-                self.theonegfb = self.negfb()
-                self.theoposfb = self.posfb()
+                self.theonegfb, self.theoposfb = self.pipeline.run('feedback', params)
             except:
                 print("Error calculating pure feedback currents.")
-        else:
-            pass
 
-        # Calculate theoretical kappa curve for comparison
-        if self.checkFitKappa.var.get() == 1:
-            try:
-                self.theokappatheo = self.kappa()
-            except:
-                print("Error calculating theoretical mixed kinetics curve.")
+            # Calculate theoretical kappa curve for comparison
+            if self.checkFitKappa.var.get() == 1:
+                try:
+                    self.theokappatheo = self.pipeline.run('kappa_curve', params)
+                except:
+                    print("Error calculating theoretical mixed kinetics curve.")
 
         # Update figure with PAC post-treatment
         try:
@@ -1012,7 +708,8 @@ class PACApp:
         except:
             print("Data imported, call 2 to update canvas PAC failed.")
 
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
         self.buttonSave.config(state="normal")
         self.buttonExport.config(state="normal")
         # save checkbox states
@@ -1023,39 +720,11 @@ class PACApp:
         self.statFRg = self.statusFitRg.get()
 
     def negfbfit(self, distancesnorm, Rg):
-        Lvalues = self.distancesnorm
-
-        # Build up the analytical approximation
-        currentsins_pt1 = ((2.08 / (Rg ** 0.358)) * (Lvalues - (0.145 / Rg))) + 1.585
-        currentsins_pt2 = (2.08 / (Rg ** 0.358) * (Lvalues + (0.0023 * Rg))) + 1.57
-        currentsins_pt3 = (np.log(Rg) / Lvalues) + (2 / (np.pi * Rg) * (np.log(1 + (np.pi * Rg) / (2 * Lvalues))))
-        currentsins = currentsins_pt1 / (currentsins_pt2 + currentsins_pt3)
-
-        return currentsins
+        return PApproachCurve.negfb(distancesnorm, Rg)
 
     def kappafit(self, distancesnorm, kappa):
-        Lvalues = self.distancesnorm
         Rg = float(self.entryRg.get())
-
-        # negfb
-        currentsins_pt1 = ((2.08 / (Rg ** 0.358)) * (Lvalues - (0.145 / Rg))) + 1.585
-        currentsins_pt2 = (2.08 / (Rg ** 0.358) * (Lvalues + (0.0023 * Rg))) + 1.57
-        currentsins_pt3 = (np.log(Rg) / Lvalues) + (2 / (np.pi * Rg) * (np.log(1 + (np.pi * Rg) / (2 * Lvalues))))
-        currentsins = currentsins_pt1 / (currentsins_pt2 + currentsins_pt3)
-
-        # positive fb
-        alpha = np.log(2) + np.log(2) * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - np.log(2) * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
-        beta = 1 + 0.639 * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - 0.186 * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
-        currentsmixed_pt0 = alpha + (1 / beta) * (np.pi / (4 * np.arctan(Lvalues + (1 / kappa)))) + (1 - alpha - (0.5 / beta)) * (2 / np.pi) * np.arctan(Lvalues + (1 / kappa))
-
-        # Merge neg/posfb expressions into analytical approx.
-        currentsmixed_pt1 = currentsins - 1
-        currentsmixed_pt2 = 1 + (2.47 * Lvalues * kappa) * (Rg ** 0.31)
-        currentsmixed_pt3 = 1 + (Lvalues ** ((0.006 * Rg + 0.113))) * (kappa ** ((-0.0236 * Rg + 0.91)))
-
-        currentsmixed = currentsmixed_pt0 + ((currentsmixed_pt1) / (currentsmixed_pt2 * currentsmixed_pt3))
-
-        return currentsmixed
+        return PApproachCurve.mixedfb(distancesnorm, Rg, kappa)
 
     def negfb(self):
         if self.checkFitRg.var.get() == 1:
@@ -1063,40 +732,11 @@ class PACApp:
         else:
             Rg = float(self.entryRg.get())
 
-        Lvalues = self.distancesnorm
-
-        # Build up the analytical approximation
-        currentsins_pt1 = ((2.08 / (Rg ** 0.358)) * (Lvalues - (0.145 / Rg))) + 1.585
-        currentsins_pt2 = (2.08 / (Rg ** 0.358) * (Lvalues + (0.0023 * Rg))) + 1.57
-        currentsins_pt3 = (np.log(Rg) / Lvalues) + (2 / (np.pi * Rg) * (np.log(1 + (np.pi * Rg) / (2 * Lvalues))))
-        currentsins = currentsins_pt1 / (currentsins_pt2 + currentsins_pt3)
-
-        return currentsins
+        return PApproachCurve.negfb(self.distancesnorm, Rg)
 
     def kappa(self):
-        Lvalues = self.distancesnorm
         Rg = float(self.entryRg.get())
-        kappa = self.estKappa
-
-        # negfb
-        currentsins_pt1 = ((2.08 / (Rg ** 0.358)) * (Lvalues - (0.145 / Rg))) + 1.585
-        currentsins_pt2 = (2.08 / (Rg ** 0.358) * (Lvalues + (0.0023 * Rg))) + 1.57
-        currentsins_pt3 = (np.log(Rg) / Lvalues) + (2 / (np.pi * Rg) * (np.log(1 + (np.pi * Rg) / (2 * Lvalues))))
-        currentsins = currentsins_pt1 / (currentsins_pt2 + currentsins_pt3)
-
-        # positive fb
-        alpha = np.log(2) + np.log(2) * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - np.log(2) * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
-        beta = 1 + 0.639 * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - 0.186 * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
-        currentsmixed_pt0 = alpha + (1 / beta) * (np.pi / (4 * np.arctan(Lvalues + (1 / kappa)))) + (1 - alpha - (0.5 / beta)) * (2 / np.pi) * np.arctan(Lvalues + (1 / kappa))
-
-        # Merge neg/posfb expressions into analytical approx.
-        currentsmixed_pt1 = currentsins - 1
-        currentsmixed_pt2 = 1 + (2.47 * Lvalues * kappa) * (Rg ** 0.31)
-        currentsmixed_pt3 = 1 + (Lvalues ** ((0.006 * Rg + 0.113))) * (kappa ** ((-0.0236 * Rg + 0.91)))
-
-        currentsmixed = currentsmixed_pt0 + ((currentsmixed_pt1) / (currentsmixed_pt2 * currentsmixed_pt3))
-
-        return currentsmixed
+        return PApproachCurve.mixedfb(self.distancesnorm, Rg, self.estKappa)
 
     def posfb(self):
         if self.checkFitRg.var.get() == 1:
@@ -1104,14 +744,7 @@ class PACApp:
         else:
             Rg = float(self.entryRg.get())
 
-        Lvalues = self.distancesnorm
-
-        # Build up the analytical approximation
-        alpha = np.log(2) + np.log(2) * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - np.log(2) * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
-        beta = 1 + 0.639 * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - 0.186 * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
-        currentscond = alpha + (1 / beta) * (np.pi / (4 * np.arctan(Lvalues))) + (1 - alpha - (0.5 / beta)) * (2 / np.pi) * np.arctan(Lvalues)
-
-        return currentscond
+        return PApproachCurve.posfb(self.distancesnorm, Rg)
 
     def BoxesSelected(self):
         # Enable/disable entry fields for calculating theoretical iss
@@ -1138,6 +771,7 @@ class PACApp:
             self.entryConc.config(state="normal")
             self.entryDiff.config(state="normal")
 
+    @Timing.timed('export')
     def save_figure(self):
         """Saves the figure that is currently being displayed by the app"""
         try:
@@ -1172,6 +806,7 @@ class PACApp:
         except:
             self.labelPlot.config(text="Error saving figure to file.")
 
+    @Timing.timed('export')
     def export_data_action(self):
         """Exports the data in an ASCII file that can be read by most 3rd-party plotting software.
         The data is formatted as follows (i.a. = if applicable):
@@ -1195,124 +830,68 @@ class PACApp:
             pass
         if not export == "":
             try:
-                with open(export, "w+") as fh:
-                    # Header lines: print details about the file and data treatment
-                    fh.write("#FLUX: APPROACH CURVE\n")
-                    fh.write("#Original file: {} \n".format(self.filename))
-                    fh.write("#Units of current: {} \n".format(self.currentVar.get()))
-                    fh.write("#Units of distance: {} \n".format(self.distanceVar.get()))
-
-                    # Report theoretical and experimental steady state currents
-                    if self.statNorm == 1:
-                        if self.statNormXP == 1:
-                            expiss = float(self.entryIssExp.get())
-                            fh.write("#Experimental steady state current (nA): {0:.3f} \n".format(expiss))
-                        else:
-                            theoiss = self.issTheo
-                            fh.write("#Theoretical steady state current (nA): {0:.3f} \n".format(theoiss))
-
-                            expiss = 'Not calculated'
-                            fh.write("#Experimental steady state current (nA): {} \n".format(expiss))
+                # Header lines: details about the file and data treatment
+                header = ["Units of current: {}".format(self.currentVar.get()),
+                          "Units of distance: {}".format(self.distanceVar.get())]
+
+                # Report theoretical and experimental steady state currents
+                if self.statNorm == 1:
+                    if self.statNormXP == 1:
+                        expiss = float(self.entryIssExp.get())
+                        header.append("Experimental steady state current (nA): {0:.3f}".format(expiss))
                     else:
-                        theoiss = 'Not calculated'
-                        fh.write("#Theoretical steady state current (nA): {} \n".format(theoiss))
+                        theoiss = self.issTheo
+                        header.append("Theoretical steady state current (nA): {0:.3f}".format(theoiss))
 
-                    # Report Rg
-                    if self.statFRg == 1:
-                        fh.write("#Rg (fit): {0:.1f} \n".format(self.estRg))
-                    else:
-                        try:
-                            inputRg = float(self.entryRg.get())
-                            fh.write("#Rg (input): {0:.3f} \n".format(inputRg))
-                        except:
-                            fh.write("#Rg: Not available \n")
-
-                    # Report kappa
-                    if self.statFK == 1:
-                        fh.write("#kappa (fit): {0:.3E} \n".format(self.estKappa))
-                        try:
-                            fh.write("#k (cm/s): {0:.3E} \n".format(self.estK))
-                        except:
-                            pass
-                    else:
-                        fh.write("#kappa (fit): Not calculated \n")
-                        fh.write("#k (cm/s): Not calculated \n")
-
-                        # Insert blank line between header and data
-                    fh.write("# \n")
-                    fh.write("#Distance, Current")
-                    if self.statNorm == 1:
-                        fh.write(", Normalized distance, Normalized current")
-                    if self.statFK == 1:
-                        fh.write(", Theoretical fit")
-                    if self.statFB == 1:
-                        fh.write(", Positive feedback, Negative feedback")
-
-                    for d in range(len(self.distances)):
-                        fh.write("\n{0:1.4E},{1:1.4E}".format(self.distances[d], self.currents[d]))
-                        if self.statNorm == 1:
-                            fh.write(",{0:1.4E},{1:1.4E}".format(self.distancesnorm[d], self.currentsnorm[d]))
-                        if self.statFK == 1:
-                            fh.write(",{0:1.4E}".format(self.theokappatheo[d]))
-                        if self.statFB == 1:
-                            fh.write(",{0:1.4E},{1:1.4E}".format(self.theoposfb[d], self.theonegfb[d]))
-
-                    # Print 1D array of distance
-                    # fh.write("Tip-substrate distance: \n")
-                    # np.savetxt(fh, self.distances, delimiter=',', fmt='%1.4e')
-                    # fh.write(" \n")
-
-                    # Print 1D array of current
-                    # fh.write("Current: \n")
-                    # np.savetxt(fh, self.currents, delimiter=',', fmt='%1.4e')
-                    # fh.write(" \n")
-
-                    # Print normalized quantities, if applicable
-                    # if self.statusNormalize.get() == 1:
-
-                        # Normalized distance
-                        # fh.write("Normalized tip-substrate distance: \n")
-                        # np.savetxt(fh, self.distancesnorm, delimiter=',', fmt='%1.4e')
-                        # fh.write(" \n")
-
-                        # Normalized current
-                        # fh.write("Normalized current: \n")
-                        # np.savetxt(fh, self.currentsnorm, delimiter=',', fmt='%1.4e')
-                        # fh.write(" \n")
-
-                        # else:
-                        # fh.write(" \n")
-
-                    # Print mixed feedback line for est kappa, if applicable
-                    # if self.statusFitKappa.get() == 1:
-                        # fh.write("Theoretical line for estimated kappa: \n")
-                        # np.savetxt(fh, self.theokappatheo, delimiter=',', fmt='%1.4e')
-                        # fh.write(" \n")
-                        # else:
-                        # fh.write(" \n")
-
-                    # Print pure feedback lines, if applicable
-                    # if self.statusFeedback.get() == 1:
-
-                        # Positive feedback
-                        # fh.write("Theoretical positive feedback: \n")
-                        # np.savetxt(fh, self.theoposfb, delimiter=',', fmt='%1.4e')
-                        # fh.write(" \n")
-
-                        # Negative feedback
-                        # fh.write("Theoretical negative feedback: \n")
-                        # np.savetxt(fh, self.theonegfb, delimiter=',', fmt='%1.4e')
-                        # fh.write(" \n")
-                        # else:
-                        # fh.write(" \n")
-
-                    fh.close()
-                    self.labelPlot.config(text="Data exported.")
+                        expiss = 'Not calculated'
+                        header.append("Experimental steady state current (nA): {}".format(expiss))
+                else:
+                    theoiss = 'Not calculated'
+                    header.append("Theoretical steady state current (nA): {}".format(theoiss))
+
+                # Report Rg
+                if self.statFRg == 1:
+                    header.append("Rg (fit): {0:.1f}".format(self.estRg))
+                else:
+                    try:
+                        inputRg = float(self.entryRg.get())
+                        header.append("Rg (input): {0:.3f}".format(inputRg))
+                    except:
+                        header.append("Rg: Not available")
+
+                # Report kappa
+                if self.statFK == 1:
+                    header.append("kappa (fit): {0:.3E}".format(self.estKappa))
+                    try:
+                        header.append("k (cm/s): {0:.3E}".format(self.estK))
+                    except:
+                        pass
+                else:
+                    header.append("kappa (fit): Not calculated")
+                    header.append("k (cm/s): Not calculated")
+
+                # Data block, see Processing/Export.py
+                names = "Distance, Current"
+                columns = [self.distances, self.currents]
+                if self.statNorm == 1:
+                    names = names + ", Normalized distance, Normalized current"
+                    columns = columns + [self.distancesnorm, self.currentsnorm]
+                if self.statFK == 1:
+                    names = names + ", Theoretical fit"
+                    columns = columns + [self.theokappatheo]
+                if self.statFB == 1:
+                    names = names + ", Positive feedback, Negative feedback"
+                    columns = columns + [self.theoposfb, self.theonegfb]
+                Export.write(export, 'approach_curve', self.filename, header, names, columns)
+                self.labelPlot.config(text="Data exported.")
             except:
                 self.labelPlot.config(text="Error whilst exporting data")
 
     def ResetWindow(self):
         print("Reset requested.")
+        self.follow.stop(keep=False)
+        self.pipeline.clear()
+        self.datasetList.clear()
 
         # Reset graph
         self.ax1.clear()
@@ -1321,7 +900,8 @@ class PACApp:
         self.ax2.clear()
         self.ax2.set_xlabel('Normalized distance')
         self.ax2.set_ylabel('Normalized current')
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         # Checkboxes
         self.checkNormalize.var.set(0)
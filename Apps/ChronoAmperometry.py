@@ -6,7 +6,14 @@ from tkinter import ttk as ttk
 
 # Numerical analysis
 import numpy as np
-import pandas as pd
+from Processing import Timing # timing of imports, processing and rendering
+from Processing import Export # text files of Export Data
+from Readers import Datasets # data sets returned by the readers
+from Readers import Formats # detection of the file format and readers
+from Apps.DatasetList import DatasetList # import of several files, list of data sets
+from Apps.FollowFile import FollowFile # follow mode (file being written by the instrument software)
+from Apps.StreamSource import StreamSource # live data stream of the acquisition software
+from Processing import PChronoAmperometry # processing stages (response time, unit conversion)
 
 # Plotting
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # figure handler for embeddable plots
@@ -120,6 +127,20 @@ class CAApp:
         #        # link function to change dropdown
         self.textVar.trace('w', self.change_dropdown)
 
+        # Import of several files at once and list of the imported data sets
+        self.datasetList = DatasetList(master, frameBase, 'chronoamperometry', self.textVar, self.select_dataset,
+                                       lambda text: self.labelImport.config(text=text))
+
+        # Follow mode: Import File follows the file while it is written and refreshes the plot
+        self.follow = FollowFile(master, frameBase, 'chronoamperometry', self.textVar, self.follow_update,
+                                 lambda text: self.labelImport.config(text=text),
+                                 lambda dataset: self.datasetList.select(self.datasetList.add(dataset)))
+
+        # Live data stream: the plot is refreshed with the samples received
+        self.stream = StreamSource(master, frameBase, 'chronoamperometry', self.follow_update,
+                                   lambda text: self.labelImport.config(text=text),
+                                   lambda dataset: self.datasetList.select(self.datasetList.add(dataset)))
+
         # Label for number of pts
         labelPts = tk.Label(frameBase, text="# pts:")
         labelPts.grid(row=1, column=3, padx=10, sticky="E")
@@ -301,7 +322,8 @@ class CAApp:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.frameBottom)
         self.canvas.get_tk_widget().grid(row=1, column=0, sticky="S")
         self.canvas.mpl_connect('button_press_event', DataCursor)
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         self.last_dir = ""
         # values that will hold the status of the checkboxes at the time the data was last plotted
@@ -309,6 +331,9 @@ class CAApp:
         self.statRT = 0
         self.statNormXP = 0
 
+        # memoized processing stages, see Processing/PChronoAmperometry.py
+        self.pipeline = PChronoAmperometry.build_pipeline()
+
     def change_dropdown(*args):
         pass
 
@@ -323,341 +348,100 @@ class CAApp:
             self.labelFile.config(text=self.filename)
             self.buttonImport.config(state="normal")
 
-            # Set manufacturer
-            if self.filename[-3:].lower() == 'asc':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:].lower() == 'mat':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:].lower() == 'dat':
-                self.textVar.set('Sensolytics')
+            # Set manufacturer from the file content (first few KB only)
+            fileformat = Formats.detect(self.filepath)
+            if fileformat is not None:
+                self.textVar.set(fileformat.manufacturer)
             else:
                 pass
         except:
             self.ResetWindow()
 
+    @Timing.timed('action')
     def ImportFile(self):
-        # Check if manufacturer needed
-        if self.filename[-3:].lower() == 'txt' and self.textVar.get() == 'None':
-            self.labelImport.config(text="Specify a manufacturer.")
-        ### ASC / HEKA import ###
-        if self.filename[-3:].lower() == 'asc':
-            self.import_heka(self.filepath)
-        ### Biologic import ###
-        elif self.filename[-3:].lower() == 'txt' and self.textVar.get() == "Biologic":
-            self.import_biologic(self.filepath)
-        ### CH Instruments import ###
-        elif self.filename[-3:].lower() == 'txt' and self.textVar.get() == "CH Instruments":
-            self.import_ch_instruments(self.filepath)
-        ### Sensolytics import ###
-        elif self.filename[-3:].lower() == 'dat':
-            self.import_sensolytics(self.filepath)
-        else:
-            self.labelImport.config(text="File type not supported.")
-
-    """
-    Looking to extend the import file functionality to support a different file type?
-    The ReshapeData function assumes the following is present after the ImportFile function has run:
-        > self.time = 1D numpy array containing sampling times
-        > self.currents = 1D numpy array containing currents
-        > self.expiss = Experimental steady state current
-
-    """
-
-    def import_heka(self, filepath):
-        # Import data file
-        data = []
+        # Detect the file format and read it into a chronoamperogram data set (see Readers/Formats.py); a manufacturer chosen
+        # in the dropdown takes precedence over the detected one
+        if self.follow.checked():
+            self.follow.start(self.filepath)
+            return
         try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()  # split line into segments
-                        float(curline[0])  # check if line contains strings or numbers
-                        data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-                fh.close()
-
+            dataset = Formats.read(self.filepath, 'chronoamperometry', self.textVar.get())
+        except Datasets.ReadError as e:
+            self.labelImport.config(text=str(e))
+            return
         except:
             self.labelImport.config(text="Could not import file.")
+            return
 
-        self.labelImport.config(text="File imported.")
-        self.buttonPlot.config(state="normal")
-        self.labelPlot.config(text="")
+        # Add to the list of imported data sets and show it
+        self.datasetList.select(self.datasetList.add(dataset))
 
-        # Convert raw data to matrix
-        try:
-            df = pd.DataFrame(data, columns=["PtIndex", "Time (s)", "Current (A)", "Time (s)", "Potential (V)"], dtype='float')
-            df = df.values
-            df[:, 2] = df[:, 2] * 1E9  # A --> nA
-
-            # Determine number of pts
-            npts = len(df)
-            conpot = np.mean(df[-20:-1, 4])
-
-            # Determine iss from last 5% of data points
-            npts_iss = int(np.floor(npts) * 0.05)
-            self.expiss = np.mean(df[-npts_iss:-1, 2])
-
-            # Create current and potential columns accordingly
-            self.time = df[:, 1]
-            self.currents = df[:, 2]
-
-            self.labelPts2.config(text=npts)
-            self.ConPot2.config(text="{0:.3f}".format(conpot))
-
-            if self.checkNormalizeExp.var.get() == 1:
-                self.ExpIss2.config(text="{0:.3f}".format(self.expiss))
-            else:
-                pass
+    def follow_update(self, dataset):
+        """Shows the data read so far from the followed file or the stream (see Apps/FollowFile.py and
+        Apps/StreamSource.py)"""
+        self.select_dataset(dataset)
+        self.ReshapeData()
 
-        except:
-            print("Error importing data.")
+    def select_dataset(self, dataset):
+        """Makes one of the imported data sets (see Apps/DatasetList.py) the data of the window"""
+        self.filepath = dataset.filepath
+        self.filename = dataset.name
+        self.labelFile.config(text=self.filename)
 
-    def import_biologic(self, filepath):
-        # Import file
-        data = []
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()
-                        float(curline[0])
-                        data.append(curline)
-                    except:
-                        pass
-                fh.close()
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-        # Process file into consistent format for ReshapeData
-        df = pd.DataFrame(data, columns=["Time (s)", "Current (A)"], dtype=float)
-        df = df.values
-
-        df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-        # Update labels
+        self.load_dataset(dataset)
         self.labelImport.config(text="File imported.")
         self.buttonPlot.config(state="normal")
         self.labelPlot.config(text="")
 
-        # Reshape data
-        try:
-            # Determine number of pts
-            npts = len(df)
-
-            # Determine iss from last 5% of data points
-            npts_iss = int(np.floor(npts) * 0.05)
-            self.expiss = np.mean(df[-npts_iss:-1, 1])
-            #                self.expiss = np.mean(df[-20:-1,1])
+    def load_dataset(self, dataset):
+        """Makes a chronoamperogram data set (Readers/Datasets.py) the data of the window. Readers of new file types
+        are added as plugins, see Readers/Formats.py; ReshapeData uses the following:
+            > self.time0 = 1D numpy array containing sampling times (s)
+            > self.currents0 = 1D numpy array containing currents (nA)
+            > self.expiss0 = Experimental steady state current (nA)
+        """
+        self.dataset = dataset
+        self.time0 = dataset.time
+        self.currents0 = dataset.currents
 
-            # Create time and current variables
-            self.time = df[:, 0]
-            self.currents = df[:, 1]
-            self.labelPts2.config(text=npts)
+        # Determine iss from last 5% of data points
+        npts_iss = int(np.floor(dataset.npts) * 0.05)
+        self.expiss0 = np.mean(dataset.currents[-npts_iss:-1])
 
+        self.labelPts2.config(text=dataset.npts)
+        if dataset.potential is None:
             # Potential not present in this file format, configure label.
             self.ConPot2.config(text="Not available.")
+        elif isinstance(dataset.potential, str):
+            self.ConPot2.config(text=dataset.potential)
+        else:
+            self.ConPot2.config(text="{0:.3f}".format(dataset.potential))
 
-        except:
-            self.labelImport.config(text="Error importing file.")
-
-    def import_ch_instruments(self, filepath):
-        # Import file
-        data = []
-        index = 0
-        try:
-            # First read to extract data
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split(',')
-                        if curline == ['Time/sec', ' Current/A\n']:
-                            datastart = 1
-                        if datastart == 1:
-                            float(curline[0])  # check if line contains strings or numbers
-                            data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-                fh.close()
-
-            # Second read to extract constant potential
-            with open(filepath, 'r') as fh2:
-                for curline2 in fh2:
-                    index = index + 1
-                    if index == 10:  # The scan rate info can be found in this line
-                        conpot = curline2.split('=')
-                        conpot = float(conpot[1].strip('\n'))
-                    else:
-                        pass
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-        # Process file into consistent format for ReshapeData
-        df = pd.DataFrame(data, columns=["Time (s)", "Current (A)"], dtype=float)
-        df = df.values
-
-        df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-        # Update labels
-        self.labelImport.config(text="File imported.")
-        self.buttonPlot.config(state="normal")
-        self.labelPlot.config(text="")
-
-        # Reshape data
-        try:
-            # Determine number of pts
-            npts = len(df)
-
-            # Determine iss from last 5% of data points
-            npts_iss = int(np.floor(npts) * 0.05)
-            self.expiss = np.mean(df[-npts_iss:-1, 1])
-            #                self.expiss = np.mean(df[-20:-1,1])
-
-            # Create time and current variables
-            self.time = df[:, 0]
-            self.currents = df[:, 1]
-            self.currents = self.currents * (-1)  # polarographic --> IUPAC convention
-            self.labelPts2.config(text=npts)
-
-            # Potential not present in this file format, configure label.
-            self.ConPot2.config(text="{0:.3f}".format(conpot))
-
-        except:
-            self.labelImport.config(text="Error importing file.")
-
-    def import_sensolytics(self, filepath):
-        data = []
-        header = []
-        index = 0
-
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    if curline[0] == '#':
-                        curline = curline.split('\t')
-                        header.append(curline)
-                    else:
-                        curline = curline.split(',')
-                        data.append(curline)
-            fh.close()
-
-            # Determine number of channels from header line 3, use to determine number of cols needed
-            nchannels = str(header[2]).split(':')
-            nchannels = int(nchannels[1].strip(" \]n'"))
-
-            # Determine experimental type from header line 2 (determines whether col 2 is a potential or a current)
-            method = str(header[1])
-            method = method.split(': ')
-
-            if nchannels == 2:
-                df = pd.DataFrame(data, columns=['Time (s)', 'Current (A)', 'NA'], dtype=float)
-                del df['NA']
-
-                # replace commas with periods so the values will be interpreted correctly
-                header[17][1] = header[17][1].replace(",", ".")
-                conpot = float(header[17][1].strip(' \n'))
-
-            elif nchannels == 3:
-                # Case 1 : Pulsed amperometry (1 WE)
-                if method[1][0:3] == 'Pul':
-                    df = pd.DataFrame(data, columns=['Time (s)', 'Potential (V)', 'Current (A)', 'NA'], dtype=float)
-                    # rearrange so current is in col index 1 as before
-                    df = df[['Time (s)', 'Current (A)', 'Potential (V)', 'NA']]
-                    del df['NA']
-
-                    conpot = 'Pulse sequence.'
-                # Case 2: Amperometry (2 WE)
-                else:
-                    df = pd.DataFrame(data, columns=['Time (s)', 'Current1 (A)', 'Current2 (A)', 'NA'], dtype=float)
-                    # rearrange so current is in col index 1 as before
-                    del df['NA']
-
-                    # replace commas with periods so the values will be interpreted correctly
-                    header[19][1] = header[19][1].replace(",", ".")
-                    conpot = float(header[19][1].strip(' \n'))
-
-            elif nchannels == 4:
-                df = pd.DataFrame(data, columns=['Time (s)', 'Potential (V)', 'Current1 (A)', 'Current2 (A)', 'NA'],
-                                  dtype=float)
-                df = df[['Time (s)', 'Current1 (A)', 'Potential (V)', 'Current2 (A)', 'NA']]
-                del df['NA']
-
-                conpot = 'Pulse sequence.'
-
-            df = df.values
-            df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-            # Update labels
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-
-            # Reshape data
-            try:
-                # Determine number of pts
-                npts = len(df)
-
-                # Determine iss from last 5% of data points
-                npts_iss = int(np.floor(npts) * 0.05)
-                self.expiss = np.mean(df[-npts_iss:-1, 1])
-                #                    self.expiss = np.mean(df[-20:-1,1])
-
-                # Create time and current variables
-                self.time = df[:, 0]
-                self.currents = df[:, 1]
-                self.labelPts2.config(text=npts)
-
-                if type(conpot) == float:
-                    self.ConPot2.config(text="{0:.3f}".format(conpot))
-                else:
-                    self.ConPot2.config(text=conpot)
-
-            except:
-                self.labelImport.config(text="Error importing file.")
-
-        except:
-            self.labelImport.config(text="Error importing file.")
+        if self.checkNormalizeExp.var.get() == 1:
+            self.ExpIss2.config(text="{0:.3f}".format(self.expiss0))
+        else:
+            pass
 
+    @Timing.timed('action')
     def ReshapeData(self):
+        # The imported data is the source of the processing pipeline; stages are only re-executed if the data or
+        # one of their parameters changed since the last plot
+        self.pipeline.set_source('raw', (self.time0, self.currents0, self.expiss0))
+        params = {'time_unit': self.timeVar.get(),
+                  'current_unit': self.currentVar.get()}
 
         # Report experimental iss if requested
         if self.checkNormalizeExp.var.get() == 1:
-            self.ExpIss2.config(text="{0:.3f}".format(self.expiss))
+            self.ExpIss2.config(text="{0:.3f}".format(self.expiss0))
         else:
             pass
 
         # Calculate response time
-        try:
-            critvalue = abs(1.1 * self.expiss)
-
-            # Procedure: Search trace from end to find the first point where the current is 110% iss
-            if self.expiss < 0:
-                rtcurrent = np.flip(np.absolute(self.currents))
-            elif self.expiss > 0:
-                rtcurrent = np.flip(self.currents)
-            else:
-                print('Error in detecting iss. Cannot calculate response time.')
-            modcol = rtcurrent > critvalue
-            critpt = np.amin(np.where(modcol == True))
-            self.crittime = self.time[-critpt]
-
-            if self.checkResponsetime.var.get() == 1:
-                self.labelResponsetime.config(text="{0:.3f}".format(self.crittime))
-            else:
-                pass
-
-            # Convert time variable + response time depending on user choice
-            if self.timeVar.get() == "s":
-                pass
-            elif self.timeVar.get() == "ms":
-                self.time = self.time * 1E3
-                self.crittime = self.crittime * 1E3
-            elif self.timeVar.get() == "min":
-                self.time = self.time / 60
-                self.crittime = self.crittime / 60
-
-        except:
-            print("Error calculating response time.")
+        crittime = self.pipeline.run('response_time', params)
+        if crittime is not None and self.checkResponsetime.var.get() == 1:
+            self.labelResponsetime.config(text="{0:.3f}".format(crittime))
+        else:
+            pass
 
         # Calculate theoretical iss
         try:
@@ -665,34 +449,19 @@ class CAApp:
                 beta = 1 + (0.23 / ((((float(self.entryRg.get())) ** 3) - 0.81) ** 0.36))
                 self.iss = 4 * 1E9 * 96485 * beta * (float(self.entryDiff.get())) * ((float(self.entryRadius.get())) / 1E6) * (float(self.entryConc.get()))
                 self.labelTheoIssValue.config(text="{0:.3f}".format(self.iss))
+
+                # Convert current units if requested
+                if self.currentVar.get() == "µA":
+                    self.iss = self.iss / 1E3
+                elif self.currentVar.get() == "pA":
+                    self.iss = self.iss * 1E3
             else:
                 pass
         except:
             print("Error calculating theoretical steady state current.")
 
-        # Convert current units if requested
-        if self.currentVar.get() == "nA":
-            pass
-        elif self.currentVar.get() == "µA":
-            self.currents = self.currents / 1E3
-            try:
-                self.iss = self.iss / 1E3
-            except:
-                pass
-            try:
-                self.expiss = self.expiss / 1E3
-            except:
-                pass
-        elif self.currentVar.get() == "pA":
-            self.currents = self.currents * 1E3
-            try:
-                self.iss = self.iss * 1E3
-            except:
-                pass
-            try:
-                self.expiss = self.expiss * 1E3
-            except:
-                pass
+        # Convert time, currents, response time and experimental iss depending on user choice
+        self.time, self.currents, self.crittime, self.expiss = self.pipeline.run('units', params)
 
         # Update figure with CA
         try:
@@ -721,7 +490,7 @@ class CAApp:
                 pass
 
             # If loop to add response time line
-            if self.checkResponsetime.var.get() == 1:
+            if self.checkResponsetime.var.get() == 1 and self.crittime is not None:
                 self.ax1.axvline(x=self.crittime, color='red', linewidth=1, label='Response time')
                 self.ax1.legend()
             else:
@@ -737,7 +506,8 @@ class CAApp:
             except:
                 pass
 
-            self.canvas.draw()
+            with Timing.span('canvas.draw', 'rendering'):
+                self.canvas.draw()
             self.buttonSave.config(state="normal")
             self.buttonExport.config(state="normal")
 
@@ -758,6 +528,7 @@ class CAApp:
         else:
             pass
 
+    @Timing.timed('export')
     def save_figure(self):
         """Saves the figure that is currently being displayed by the app"""
         try:
@@ -771,6 +542,7 @@ class CAApp:
         except:
             self.labelPlot.config(text="Error saving figure to file.")
 
+    @Timing.timed('export')
     def export_data_action(self):
         """Exports the data in an ASCII file that can be read by most 3rd-party plotting software.
         The data is formatted as follows:
@@ -794,62 +566,50 @@ class CAApp:
             pass
         if not export == "":
             try:
-                with open(export, "w+") as fh:
-                    # Header lines: print details about the file and data treatment
-                    fh.write("#FLUX: CA\n")
-                    fh.write("#Original file: {} \n".format(self.filename))
-                    fh.write("#Units of current: {} \n".format(self.currentVar.get()))
-                    fh.write("#Units of time: {} \n".format(self.timeVar.get()))
-
-                    if self.statNorm == 1:
-                        theoiss = self.iss
-                        fh.write("#Theoretical steady state current (nA): {0:.3f} \n".format(theoiss))
-                    else:
-                        theoiss = 'Not calculated'
-                        fh.write("#Theoretical steady state current (nA): {} \n".format(theoiss))
-
-                    if self.statNormXP == 1:
-                        expiss = self.expiss
-                    else:
-                        expiss = 'Not calculated'
-                    fh.write("#Experimental steady state current (nA): {} \n".format(expiss))
-
-                    if self.statRT == 1:
-                        rt = self.crittime
-                        fh.write("#Response time: {0:.3f} \n".format(rt))
-                    else:
-                        fh.write("#Response time: Not calculated \n")
-
-                    fh.write("# \n")
-                    # Data block
-                    fh.write("#Time, Current")
-                    for t in range(len(self.time)):
-                        fh.write("\n{0:1.4E},{1:1.4E}".format(self.time[t], self.currents[t]))
-                    # Below is the old data export code:
-                    # Print 1D array of time
-                    # fh.write("Time: \n")
-                    # np.savetxt(fh, self.time, delimiter=',', fmt='%1.4e')
-                    # fh.write(" \n")
-
-                    # Print 1D array of current
-                    # fh.write("Current: \n")
-                    # np.savetxt(fh, self.currents, delimiter=',', fmt='%1.4e')
-                    # fh.write(" \n")
-
-                    fh.close()
-                    self.labelPlot.config(text="Data exported.")
+                # Header lines: details about the file and data treatment
+                header = ["Units of current: {}".format(self.currentVar.get()),
+                          "Units of time: {}".format(self.timeVar.get())]
+
+                if self.statNorm == 1:
+                    theoiss = self.iss
+                    header.append("Theoretical steady state current (nA): {0:.3f}".format(theoiss))
+                else:
+                    theoiss = 'Not calculated'
+                    header.append("Theoretical steady state current (nA): {}".format(theoiss))
+
+                if self.statNormXP == 1:
+                    expiss = self.expiss
+                else:
+                    expiss = 'Not calculated'
+                header.append("Experimental steady state current (nA): {}".format(expiss))
+
+                if self.statRT == 1:
+                    rt = self.crittime
+                    header.append("Response time: {0:.3f}".format(rt))
+                else:
+                    header.append("Response time: Not calculated")
+
+                # Data block, see Processing/Export.py
+                Export.write(export, 'chronoamperometry', self.filename, header, "Time, Current",
+                             [self.time, self.currents])
+                self.labelPlot.config(text="Data exported.")
             except:
                 self.labelPlot.config(text="Error whilst exporting data.")
 
     def ResetWindow(self):
         print("Reset requested.")
+        self.follow.stop(keep=False)
+        self.stream.stop(keep=False)
+        self.pipeline.clear()
+        self.datasetList.clear()
 
         # Reset graph
         self.ax1.clear()
         #        self.img = self.ax1.plot(self.time,self.currents)
         self.ax1.set_xlabel('Time (s)')
         self.ax1.set_ylabel('Current (nA)')
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         # Checkboxes
         self.checkNormalize.var.set(0)
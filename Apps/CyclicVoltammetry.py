@@ -5,10 +5,15 @@ from tkinter.filedialog import asksaveasfilename
 from tkinter import ttk as ttk
 
 # Numerical analysis
-import numpy as np
-import pandas as pd
-import scipy.io # support for matlab workspaces
-import scipy.optimize # nonlinear curve fitting
+from Processing import Timing # timing of imports, processing and rendering
+from Processing import Export # text files of Export Data
+from Readers import Datasets # data sets returned by the readers
+from Readers import Formats # detection of the file format and readers
+from Apps.DatasetList import DatasetList # import of several files, list of data sets
+from Apps.FollowFile import FollowFile # follow mode (file being written by the instrument software)
+from Apps.StreamSource import StreamSource # live data stream of the acquisition software
+from Processing import PCyclicVoltammetry # processing stages (unit conversion, formal potential, iss)
+from Processing import OnlineCV # per-cycle metrics, updated as the samples of a stream arrive
 
 # Plotting
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # figure handler for embeddable plots
@@ -74,9 +79,11 @@ class CVApp:
         frameBase = tk.Frame(tabs)
         frameAnalytics = tk.Frame(tabs)
         frameFormatting = tk.Frame(tabs)
+        frameCycles = tk.Frame(tabs)
         tabs.add(frameBase, text="  Base  ")
         tabs.add(frameAnalytics, text="  Analytics  ")
         tabs.add(frameFormatting, text="  Formatting  ")
+        tabs.add(frameCycles, text="  Cycles  ")
         tabs.pack(expand=1, fill="both", side="top")
 
         framePlot = tk.Frame(master)
@@ -122,6 +129,20 @@ class CVApp:
         #        # link function to change dropdown
         self.textVar.trace('w', self.change_dropdown)
 
+        # Import of several files at once and list of the imported data sets
+        self.datasetList = DatasetList(master, frameBase, 'voltammogram', self.textVar, self.select_dataset,
+                                       lambda text: self.labelImport.config(text=text))
+
+        # Follow mode: Import File follows the file while it is written and refreshes the plot
+        self.follow = FollowFile(master, frameBase, 'voltammogram', self.textVar, self.follow_update,
+                                 lambda text: self.labelImport.config(text=text),
+                                 lambda dataset: self.datasetList.select(self.datasetList.add(dataset)))
+
+        # Live data stream: the plot is refreshed with the samples received
+        self.stream = StreamSource(master, frameBase, 'voltammogram', self.follow_update,
+                                   lambda text: self.labelImport.config(text=text),
+                                   lambda dataset: self.datasetList.select(self.datasetList.add(dataset)))
+
         # Label for number of cycles
         labelCycles = tk.Label(frameBase, text="# cycles:")
         labelCycles.grid(row=1, column=3, padx=10, sticky="E")
@@ -250,6 +271,16 @@ class CVApp:
         self.buttonReset = tk.Button(framePlot, text="Reset Window", command=self.ResetWindow)
         self.buttonReset.grid(row=0, column=5, padx=20, pady=10, sticky="W" + "E")
 
+        ######## Cycles frame ########
+        # Formal potential, iss and peaks of every cycle (see Processing/OnlineCV.py)
+        scrollbarCycles = tk.Scrollbar(frameCycles)
+        scrollbarCycles.pack(side="right", fill="y")
+        self.textCycles = tk.Text(frameCycles, height=6, font='Courier 9', wrap="none",
+                                  yscrollcommand=scrollbarCycles.set)
+        self.textCycles.pack(side="left", fill="both", expand=True)
+        scrollbarCycles.config(command=self.textCycles.yview)
+        self.show_cycles([])
+
         ######## Formatting menu ########
         # Intro
         labelFormatting = tk.Label(frameFormatting, text="Customize the formatting of the graph.")
@@ -339,7 +370,8 @@ class CVApp:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.frameBottom)
         self.canvas.get_tk_widget().grid(row=1, column=0, sticky="S")
         self.canvas.mpl_connect('button_press_event', DataCursor)
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         self.last_dir = ""
         # values that will hold the status of the checkboxes at the time the data was last plotted
@@ -347,6 +379,9 @@ class CVApp:
         self.statStPot = 0
         self.statNormXP = 0
 
+        # memoized processing stages, see Processing/PCyclicVoltammetry.py
+        self.pipeline = PCyclicVoltammetry.build_pipeline()
+
     def change_dropdown(self, *args):
         if self.multicycleVar.get() == 'Plot specific cycle':
             self.entrySpCycle.config(state="normal")
@@ -364,321 +399,91 @@ class CVApp:
             self.labelFile.config(text=self.filename)
             self.buttonImport.config(state="normal")
 
-            # Set manufacturer
-            if self.filename[-3:].lower() == 'asc':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:].lower() == 'mat':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:].lower() == 'dat':
-                self.textVar.set('Sensolytics')
+            # Set manufacturer from the file content (first few KB only)
+            fileformat = Formats.detect(self.filepath)
+            if fileformat is not None:
+                self.textVar.set(fileformat.manufacturer)
             else:
                 pass
         except:
             self.ResetWindow()
 
+    @Timing.timed('action')
     def ImportFile(self):
-        ## Check if manufacturer needed
-        if self.filename[-3:] == 'txt' and self.textVar.get() == 'None':
-            self.labelImport.config(text="Specify a manufacturer.")
-
-        ### ASC / Heka import ###
-        elif self.filename[-3:].lower() == 'asc':
-            self.import_heka_asc(self.filepath)
-        ### MAT / HEKA import ####
-        elif self.filename[-3:].lower() == 'mat':
-            self.import_heka_mat(self.filepath)
-        ### TXT / Biologic import ###
-        elif self.filename[-3:].lower() == 'txt' and self.textVar.get() == 'Biologic':
-            self.import_biologic(self.filepath)
-        ### TXT/CH instruments import ####
-        elif self.filename[-3:].lower() == 'txt' and self.textVar.get() == 'CH Instruments':
-            self.import_ch_instruments(self.filepath)
-        ### DAT / Sensolytics import ###
-        elif self.filename[-3:].lower() == 'dat':
-            self.import_sensolytics(self.filepath)
-        else:
-            self.labelImport.config(text="File type not supported.")
-
-    """
-    Looking to extend the import file functionality to support a different file type?
-    The ReshapeData function assumes the following is present after the ImportFile function has run:
-        > self.potential = 1D numpy array containing potential values in volts for one sweep
-        > self.currents_reshape = 2D numpy array containing current values in amps; each row is one cycle
-        > self.ncycles = Integer corresponding to the number of cycles
-
-    """
-
-    def import_heka_asc(self, filepath):
-        # Import data file
-        data = []
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()  # split line into segments
-                        float(curline[0])  # check if line contains strings or numbers
-                        data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-                fh.close()
-
-        except:
-            self.labelImport.config(text="Error importing file.")
-
-        # Convert raw data to matrix
-        try:
-            df = pd.DataFrame(data, columns=["PtIndex", "Time (s)", "Current (A)", "Time (s)", "Potential (V)"], dtype='float')
-            df = df.values
-
-            df[:, 2] = df[:, 2] * 1E9  # A --> nA
-
-            # Determine number of cycles
-            self.ncycles = df[df[:, 1] == 0]
-            self.ncycles = len(self.ncycles)
-            nptscycle = int(len(df) / self.ncycles)
-
-            self.potential0 = df[0:nptscycle, 4]
-            self.currents0 = df[:, 2]
-            self.currents_reshape0 = self.currents0.reshape(self.ncycles, nptscycle)
-
-            # Calculate scan rate in mV/s
-            critpt = int(np.floor(nptscycle / 4))
-            print(critpt)
-            scanrate = 1000 * ((df[critpt, 4] - df[0, 4]) / (df[critpt, 1] - df[0, 1]))
-            self.labelNu2.config(text="{0:.0f}".format(scanrate))
-
-            self.labelCycles2.config(text=self.ncycles)
-            self.labelNpts2.config(text=nptscycle)
-
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-    def import_heka_mat(self, filepath):
+        # Detect the file format and read it into a voltammogram data set (see Readers/Formats.py); a manufacturer chosen
+        # in the dropdown takes precedence over the detected one
+        if self.follow.checked():
+            self.follow.start(self.filepath)
+            return
         try:
-            matdata = scipy.io.loadmat(filepath)
-            # Delete non-data containing variables
-            del matdata['__header__']
-            del matdata['__globals__']
-            del matdata['__version__']
-
-            # Each cycle creates two traces: one for current, one for potential
-            self.ncycles = int(np.divide(len(matdata), 2))
-
-            data = []
-            # Read once to determine dimensions
-            for entry in matdata:
-                trace = matdata[entry]
-                self.potential0 = trace[:, 1]
-                self.nptscycle = len(self.potential0)
-
-            # Read a second time to construct the appropriate table
-            data = np.empty((self.ncycles, self.nptscycle), dtype=float)
-            count = 0
-            for entry in matdata:
-                try:
-                    # Trace A_B_C_1 = Current
-                    if np.remainder(count, 2) == 0:
-                        trace2 = matdata[entry]
-                        data[count, :] = trace2[:, 1]
-                    # Trace A_B_C_2 = Potential
-                    else:
-                        pass
-                except:
-                    pass
-                count = count + 1
-            self.currents_reshape0 = data * 1E9
-
-            self.labelImport.config(text="File imported.")
-
+            dataset = Formats.read(self.filepath, 'voltammogram', self.textVar.get())
+        except Datasets.ReadError as e:
+            self.labelImport.config(text=str(e))
+            return
         except:
             self.labelImport.config(text="Could not import file.")
+            return
 
-        try:
-            # Calculate scan rate in mV/s
-            critpt = int(np.floor(self.nptscycle / 4))
-            scanrate = 1000 * ((trace[critpt, 1] - trace[0, 1]) / (trace[critpt, 0] - trace[0, 0]))
-            self.labelNu2.config(text="{0:.0f}".format(scanrate))
-
-            self.labelCycles2.config(text=self.ncycles)
-            self.labelNpts2.config(text=self.nptscycle)
+        # Add to the list of imported data sets and show it
+        self.datasetList.select(self.datasetList.add(dataset))
 
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-        except:
-            self.labelImport.config(text="Error processing file.")
-
-    def import_biologic(self, filepath):
-        # Import file
-        data = []
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()
-                        float(curline[0])
-                        data.append(curline)
-                    except:
-                        pass
-                fh.close()
-        except:
-            self.labelImport.config(text="Could not import file.")
+    def follow_update(self, dataset):
+        """Shows the data read so far from the followed file or the stream (see Apps/FollowFile.py and
+        Apps/StreamSource.py)"""
+        self.select_dataset(dataset)
+        self.ReshapeData()
 
-        # Process file into consistent format for ReshapeData
-        df = pd.DataFrame(data, columns=["Potential (V)", "Current (A"], dtype=float)
-        df = df.values
-
-        df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-        # Determine number of cycles based on number of max peak potential is reached
-        self.ncycles = df[df[:, 0] == np.amax(df[:, 0])]
-        self.ncycles = len(self.ncycles)
-        self.nptscycle = int(len(df) / self.ncycles)
-
-        self.potential0 = df[0:self.nptscycle, 0]
-        self.currents0 = df[:, 1]
-        self.labelNu2.config(text="Not available.")
-
-        # Reshape into matrix where rows = cycles
-        # If there is an extra point at the end (start/end on same potential), omit this point
-        try:
-            self.currents_reshape0 = self.currents0.reshape(self.ncycles, self.nptscycle)
-        except:
-            extrapoint = np.remainder(len(df), self.nptscycle)
-            if extrapoint == 1:
-                self.currents_reshape0 = self.currents0[:-1].reshape(self.ncycles, self.nptscycle)
-            else:
-                self.labelImport.config(text="Error processing cycles.")
-
-        self.labelCycles2.config(text=self.ncycles)
-        self.labelNpts2.config(text=self.nptscycle)
+    def select_dataset(self, dataset):
+        """Makes one of the imported data sets (see Apps/DatasetList.py) the data of the window"""
+        self.filepath = dataset.filepath
+        self.filename = dataset.name
+        self.labelFile.config(text=self.filename)
 
+        self.load_dataset(dataset)
         self.labelImport.config(text="File imported.")
         self.buttonPlot.config(state="normal")
         self.labelPlot.config(text="")
 
-    def import_ch_instruments(self, filepath):
-        try:
-            data = []
-            datastart = 0  # toggle for determining if reading point cloud
-            index = 0
-
-            # First read to extract data
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split(',')
-                        if curline == ['Potential/V', ' Current/A\n']:
-                            datastart = 1
-                        if datastart == 1:
-                            float(curline[0])  # check if line contains strings or numbers
-                            data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-                fh.close()
-
-            # Second read to extract scan rate
-            with open(self.filepath, 'r') as fh2:
-                for curline2 in fh2:
-                    index = index + 1
-                    if index == 13:  # The scan rate info can be found in this line
-                        nu = curline2.split('=')
-                        nu = 1000 * (float(nu[1].strip('\n')))
-                    else:
-                        pass
-
-            df = pd.DataFrame(data, dtype='float')
-            df = df.values
-
-            df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-            # Determine number of cycles based on number of max peak potential is reached
-            self.ncycles = df[df[:, 0] == np.amax(df[:, 0])]
-            self.ncycles = len(self.ncycles)
-            self.nptscycle = int(len(df) / self.ncycles)
-
-            self.potential0 = df[0:self.nptscycle, 0]
-            self.currents0 = df[:, 1]
-            self.currents0 = self.currents0 * (-1)  # polarographic --> IUPAC convention
-            self.labelNu2.config(text="{0:.0f}".format(nu))
-
-            # Reshape into matrix where rows = cycles
-            # If there is an extra point at the end (start/end on same potential), omit this point
-            try:
-                self.currents_reshape0 = self.currents0.reshape(self.ncycles, self.nptscycle)
-            except:
-                extrapoint = np.remainder(len(df), self.nptscycle)
-                if extrapoint == 1:
-                    self.currents_reshape0 = self.currents0[:-1].reshape(self.ncycles, self.nptscycle)
-                else:
-                    self.labelImport.config(text="Error processing cycles.")
-
-            self.labelCycles2.config(text=self.ncycles)
-            self.labelNpts2.config(text=self.nptscycle)
-
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
-
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-    def import_sensolytics(self, filepath):
-        data = []
-        header = []
-        index = 0
-
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    index = index + 1
-                    if index <= 20:
-                        try:
-                            curline = curline.split('\t')
-                            header.append(curline)
-                        except:
-                            pass
-                    if index > 20:
-                        try:
-                            curline = curline.split(',')
-                            float(curline[0])
-                            data.append(curline)
-                        except:
-                            pass
-                fh.close()
-
-            scanrate = 1000 * (float(header[18][1].strip(' \n')))
-
-            df = pd.DataFrame(data, columns=['Potential (V)', 'Current (A)', 'NA'], dtype=float)
-            del df['NA']
-            df = df.values
-            df[:, 1] = df[:, 1] * 1E9  # A --> nA
-
-            self.ncycles = df[df[:, 0] == np.amax(df[:, 0])]
-            self.ncycles = len(self.ncycles)
-            nptscycle = int(len(df) / self.ncycles)
-
-            self.potential0 = df[0:nptscycle, 0]
-            self.currents0 = df[:, 1]
-            self.currents_reshape0 = self.currents0.reshape(self.ncycles, nptscycle)
+    def load_dataset(self, dataset):
+        """Makes a voltammogram data set (Readers/Datasets.py) the data of the window. Readers of new file types are
+        added as plugins, see Readers/Formats.py; ReshapeData uses the following:
+            > self.potential0 = 1D numpy array containing potential values in volts for one sweep
+            > self.currents_reshape0 = 2D numpy array containing current values in nA; each row is one cycle
+            > self.ncycles = Integer corresponding to the number of cycles
+        """
+        self.dataset = dataset
+        self.potential0 = dataset.potential
+        self.currents_reshape0 = dataset.currents
+        self.ncycles = dataset.ncycles
 
-            self.labelCycles2.config(text=self.ncycles)
-            self.labelNpts2.config(text=nptscycle)
-            self.labelNu2.config(text="{0:.0f}".format(scanrate))
+        if dataset.scan_rate is not None:
+            self.labelNu2.config(text="{0:.0f}".format(dataset.scan_rate))
+        else:
+            self.labelNu2.config(text="Not available.")
+        self.labelCycles2.config(text=self.ncycles)
+        self.labelNpts2.config(text=dataset.nptscycle)
 
-            self.labelImport.config(text="File imported.")
-            self.buttonPlot.config(state="normal")
-            self.labelPlot.config(text="")
+        # Table of the cycles; a stream passes the metrics of all the cycles received since its start
+        if 'cycles' in dataset.metadata:
+            self.show_cycles(dataset.metadata['cycles'])
+        else:
+            self.show_cycles(OnlineCV.analyze(dataset))
 
-        except:
-            self.labelImport.config(text="Error importing file.")
+    def show_cycles(self, rows):
+        self.textCycles.config(state="normal")
+        self.textCycles.delete("1.0", "end")
+        self.textCycles.insert("end", OnlineCV.format_table(rows))
+        self.textCycles.see("end")
+        self.textCycles.config(state="disabled")
 
+    @Timing.timed('action')
     def ReshapeData(self):
-        self.potential = self.potential0.copy()
-        self.currents_reshape = self.currents_reshape0.copy()
+        # The imported data is the source of the processing pipeline; stages are only re-executed if the data or
+        # one of their parameters changed since the last plot
+        self.pipeline.set_source('raw', (self.potential0, self.currents_reshape0))
+        params = {'potential_unit': self.potentialVar.get(),
+                  'current_unit': self.currentVar.get(),
+                  'exp_iss': self.statusNormalizeExp.get()}
 
         # Calculate theoretical iss value
         try:
@@ -693,71 +498,19 @@ class CVApp:
             print("Error calculating theoretical steady state current.")
 
         # Convert units if necessary
-        if self.potentialVar.get() == "V":
-            pass
-        else:  # mV case
-            self.potential = self.potential * 1E3
-
-        if self.currentVar.get() == "nA":
-            pass
-        elif self.currentVar.get() == "µA":
-            self.currents_reshape = self.currents_reshape / 1E3
-        else:  # pA
-            self.currents_reshape = self.currents_reshape * 1E3
-
-        # Calculate formal potential
-        try:
-            current_deriv = np.gradient(self.currents_reshape[0, :])
-
-            # Find max value of derivative
-            check_max = current_deriv == np.amax(current_deriv)
-            max_index = np.where(check_max == True)
-            max_index = int(max_index[0])
-            pot_max = self.potential[max_index]
-
-            # Find min value of derivative
-            check_min = current_deriv == np.amin(current_deriv)
-            min_index = np.where(check_min == True)
-            min_index = int(min_index[0])
-            pot_min = self.potential[min_index]
-
-            self.avg_pot = np.mean([pot_max, pot_min])
+        self.potential, self.currents_reshape = self.pipeline.run('units', params)
 
+        # Calculate formal potential and experimental iss
+        avg_pot, expiss, iss_index, iss_index2 = self.pipeline.run('analysis', params)
+        if avg_pot is not None:
+            self.avg_pot = avg_pot
             if self.checkStdPot.var.get() == 1:
                 self.StdPot2.config(text="{0:.3f}".format(self.avg_pot))
             else:
                 pass
-
-            # Calculate experimental iss
-            if self.statusNormalizeExp.get() == 1:
-                try:
-                    current_deriv = np.absolute(current_deriv)
-
-                    # Look for two plateaus based on the derivatives
-                    # Subtract them to calculate the expiss
-                    # First in the beginning of the scan (before first peak),
-                    # Second in the middle of the scan (between first and second peak)
-                    if min_index > max_index:
-                        check_iss = current_deriv[max_index:min_index] == np.amin(current_deriv[max_index:min_index])
-                        check_iss2 = current_deriv[0:max_index] == np.amin(current_deriv[0:max_index])
-                    else:
-                        check_iss = current_deriv[min_index:max_index] == np.amin(current_deriv[min_index:max_index])
-                        check_iss2 = current_deriv[0:min_index] == np.amin(current_deriv[0:min_index])
-
-                    # Convert the index of the plateau to its corresponding current
-                    iss_index = np.where(check_iss == True)
-                    iss_index = int(iss_index[0][-1]) + np.amin([max_index, min_index])
-                    iss_index2 = np.where(check_iss2 == True)
-                    self.expiss = (self.currents_reshape[0, iss_index] - self.currents_reshape[0, iss_index2])[0, 0]
-                    self.ExpIss2.config(text="{0:.3f}".format(self.expiss))
-
-                except:
-                    pass
-            else:
-                pass
-
-        except:
-            pass
+        if expiss is not None:
+            self.expiss = expiss
+            self.ExpIss2.config(text="{0:.3f}".format(self.expiss))
 
         # Update figure with CV
         try:
@@ -817,9 +570,7 @@ class CVApp:
                 pass
 
             # If loop to add experimental iss line
-            if self.checkNormalizeExp.var.get() == 1:
-
-                self.currents_reshape[0, iss_index]
+            if self.checkNormalizeExp.var.get() == 1 and iss_index is not None:
                 self.ax1.axhline(y=self.currents_reshape[0, iss_index], color='black', linewidth=1, linestyle=':',
                                  label='Experimental iss')
                 self.ax1.axhline(y=self.currents_reshape[0, iss_index2], color='black', linewidth=1, linestyle=':')
@@ -844,7 +595,8 @@ class CVApp:
             except:
                 pass
 
-            self.canvas.draw()
+            with Timing.span('canvas.draw', 'rendering'):
+                self.canvas.draw()
             self.buttonSave.config(state="normal")
 
         except:
@@ -866,6 +618,7 @@ class CVApp:
         else:
             pass
 
+    @Timing.timed('export')
     def save_figure(self):
         """Saves the figure that is currently being displayed by the app"""
         try:
@@ -879,6 +632,7 @@ class CVApp:
         except:
             self.labelPlot.config(text="Error saving figure to file.")
 
+    @Timing.timed('export')
     def export_data_action(self):
         """Saves the displayed data in an ASCII data file that  should be easily readable for most 3rd-party plotting
         software.
@@ -903,55 +657,35 @@ class CVApp:
             pass
         if not export == "":
             try:
-                with open(export, "w+") as fh:
-                    # Header lines: print details about the file and data treatment
-                    fh.write("#FLUX: CV\n")
-                    fh.write("Original file: {} \n".format(self.filename))
-                    fh.write("Units of current: {} \n".format(self.currentVar.get()))
-                    fh.write("Units of potential: {} \n".format(self.potentialVar.get()))
-
-                    # Report theoretical iss
-                    if self.statNorm == 1:
-                        iss = self.iss
-                    else:
-                        iss = 'N/A'
-                    fh.write("#Theoretical steady state current (nA): {} \n".format(iss))
+                # Header lines: details about the file and data treatment
+                header = ["Units of current: {}".format(self.currentVar.get()),
+                          "Units of potential: {}".format(self.potentialVar.get())]
 
-                    # Report experimental iss
-                    if self.statNormXP == 1:
-                        expiss = self.expiss
-                    else:
-                        expiss = 'N/A'
-                    fh.write("#Experimental steady state current: {} \n".format(expiss))
+                # Report theoretical iss
+                if self.statNorm == 1:
+                    iss = self.iss
+                else:
+                    iss = 'N/A'
+                header.append("Theoretical steady state current (nA): {}".format(iss))
 
-                    # Report formal potential
-                    if self.statStPot == 1:
-                        stdpot = self.avg_pot
-                    else:
-                        stdpot = 'Not calculated.'
-                    fh.write("#Standard potential (V vs. ref): {} \n".format(stdpot))
-                    fh.write("#\n")
-                    fh.write("#Potential")
-                    for c in range(self.ncycles):
-                        fh.write(", Cycle {0:1d}".format(c + 1))
-
-                    for v in range(len(self.potential)):
-                        fh.write("\n{0:1.4E}".format(self.potential[v]))
-                        for c in range(self.ncycles):
-                            fh.write(",{0:1.4E}".format(self.currents_reshape[c, v]))
-
-                    # Below is the old data block encoding:
-                    # Print 1D array of potentials
-                    # fh.write("Potential: \n")
-                    # np.savetxt(fh, self.potential, delimiter=',', fmt='%1.4e')
-                    # fh.write(" \n")
-
-                    # Print 2D array of currents
-                    # fh.write("Current ({} cycles): \n".format(self.ncycles))
-                    # np.savetxt(fh, self.currents_reshape.T, delimiter=',', fmt='%1.4e')
-                    # fh.write(" \n")
-
-                    fh.close()
+                # Report experimental iss
+                if self.statNormXP == 1:
+                    expiss = self.expiss
+                else:
+                    expiss = 'N/A'
+                header.append("Experimental steady state current: {}".format(expiss))
+
+                # Report formal potential
+                if self.statStPot == 1:
+                    stdpot = self.avg_pot
+                else:
+                    stdpot = 'Not calculated.'
+                header.append("Standard potential (V vs. ref): {}".format(stdpot))
+
+                # Data block: potential and one column per cycle, see Processing/Export.py
+                names = "Potential" + "".join(", Cycle {0:1d}".format(c + 1) for c in range(self.ncycles))
+                columns = [self.potential] + [self.currents_reshape[c, :] for c in range(self.ncycles)]
+                Export.write(export, 'voltammogram', self.filename, header, names, columns)
                 self.labelPlot.config(text="Data exported.")
             except:
                 self.labelPlot.config(text="Error whilst exporting data.")
@@ -960,16 +694,22 @@ class CVApp:
         print("Reset requested.")
 
         try:
-            del self.df
+            del self.dataset
         except:
             pass
+        self.follow.stop(keep=False)
+        self.stream.stop(keep=False)
+        self.pipeline.clear()
+        self.datasetList.clear()
+        self.show_cycles([])
 
         # Reset graph
         self.ax1.clear()
         #        self.img = self.ax1.plot(potential,currents)
         self.ax1.set_xlabel('Potential vs. Ag/AgCl (V)')
         self.ax1.set_ylabel('Current (nA)')
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         # Reset labels and buttons to default states
 
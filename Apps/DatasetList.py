@@ -0,0 +1,132 @@
+import tkinter as tk
+from tkinter.filedialog import askopenfilenames
+
+from Readers import Batch # concurrent import of several files
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the list of data sets shown on the Base tab of the apps.
+Several files can be selected at once; they are read in the background (see
+Readers/Batch.py) and added to the list as they complete, while the window
+stays responsive. Clicking an entry of the list makes it the data of the app.
+"""
+
+POLL_MS = 50  # interval at which finished imports are collected
+
+
+class DatasetList:
+    """'Import Files' button and list of the imported data sets.
+        kind is the kind of data set read by the app (e.g. 'image')
+        manufacturer is the StringVar of the manufacturer dropdown (None = detect)
+        on_select(dataset) is called when an entry is clicked
+        on_status(text) is called with the progress of the import
+    """
+    def __init__(self, master, frame, kind, manufacturer, on_select, on_status, row=0, column=7):
+        self.master = master
+        self.kind = kind
+        self.manufacturer = manufacturer
+        self.on_select = on_select
+        self.on_status = on_status
+        self.last_dir = "/"
+
+        self.datasets = []
+        self.pending = []  # (filepath, future) of the files being read
+        self.nfiles = 0
+        self.errors = []
+        self.polling = None
+
+        self.buttonFiles = tk.Button(frame, text="Import Files", command=self.SelectFiles)
+        self.buttonFiles.grid(row=row, column=column, sticky="W" + "E", padx=10, pady=5)
+        self.listDatasets = tk.Listbox(frame, height=4, exportselection=False)
+        self.listDatasets.grid(row=row + 1, column=column, rowspan=3, sticky="N" + "S" + "W" + "E", padx=10)
+        self.listDatasets.bind('<<ListboxSelect>>', self.selected)
+
+    def SelectFiles(self):
+        filepaths = askopenfilenames(initialdir=self.last_dir + "/", title="Choose files.")
+        if filepaths:
+            self.last_dir = filepaths[0][:filepaths[0].rindex('/')]
+            self.import_files(filepaths)
+
+    def import_files(self, filepaths):
+        """Starts reading the files in the background"""
+        manufacturer = None if self.manufacturer is None else self.manufacturer.get()
+        self.pending.extend(Batch.submit(filepaths, self.kind, manufacturer))
+        self.nfiles = self.nfiles + len(filepaths)
+        self.status()
+        if self.polling is None:
+            self.polling = self.master.after(POLL_MS, self.poll)
+
+    def poll(self):
+        """Adds the data sets read since the last call to the list"""
+        self.polling = None
+        pending = []
+        for filepath, future in self.pending:
+            if not future.done():
+                pending.append((filepath, future))
+                continue
+            try:
+                index = self.add(future.result())
+                # The first data set is shown right away if none is selected
+                if not self.listDatasets.curselection():
+                    self.select(index)
+            except Exception as e:
+                self.errors.append((filepath, Batch.message(e)))
+                print("Could not import {}: {}".format(filepath, e))
+        self.pending = pending
+        self.status()
+        if self.pending:
+            self.polling = self.master.after(POLL_MS, self.poll)
+
+    def add(self, dataset):
+        """Appends a data set to the list, returns its index"""
+        self.datasets.append(dataset)
+        self.listDatasets.insert(tk.END, dataset.name)
+        return len(self.datasets) - 1
+
+    def select(self, index):
+        self.listDatasets.selection_clear(0, tk.END)
+        self.listDatasets.selection_set(index)
+        self.on_select(self.datasets[index])
+
+    def selected(self, event=None):
+        selection = self.listDatasets.curselection()
+        if selection:
+            self.on_select(self.datasets[selection[0]])
+
+    def status(self):
+        if self.nfiles == 0:
+            return
+        text = "{} of {} files imported.".format(self.nfiles - len(self.pending) - len(self.errors), self.nfiles)
+        if self.errors:
+            text = text + " {} failed.".format(len(self.errors))
+        self.on_status(text)
+
+    def clear(self):
+        """Empties the list; files still being read are discarded"""
+        if self.polling is not None:
+            self.master.after_cancel(self.polling)
+            self.polling = None
+        for filepath, future in self.pending:
+            future.cancel()
+        self.pending = []
+        self.datasets = []
+        self.errors = []
+        self.nfiles = 0
+        self.listDatasets.delete(0, tk.END)
@@ -0,0 +1,148 @@
+import time
+import tkinter as tk
+
+from Readers import Follow # incremental reading of a file being written
+from Readers.Datasets import ReadError
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the follow mode of the apps. When "Follow file" is
+checked, Import File does not read the selected file once but follows it
+while the instrument software writes it: the lines appended to the file are
+read every FOLLOW_MS (see Readers/Follow.py) and, if there are new data, the
+plot is refreshed at most every REFRESH_S seconds. Following stops when the
+box is unchecked, another file is imported or the window is reset; the data
+read so far are then added to the list of imported data sets.
+"""
+
+FOLLOW_MS = 250  # interval at which the file is checked for new lines
+REFRESH_S = 1.0  # minimum time between two refreshes of the plot
+
+
+class FollowFile:
+    """'Follow file' check box and timer following the file of the app.
+        kind is the kind of data set read by the app (e.g. 'image')
+        manufacturer is the StringVar of the manufacturer dropdown (None = detect)
+        on_update(dataset) is called with the data read so far (throttled)
+        on_status(text) is called with the number of points read
+        on_stop(dataset) is called with the last data set when following stops (None = nothing)
+    """
+    def __init__(self, master, frame, kind, manufacturer, on_update, on_status, on_stop=None, row=4, column=1):
+        self.master = master
+        self.kind = kind
+        self.manufacturer = manufacturer
+        self.on_update = on_update
+        self.on_status = on_status
+        self.on_stop = on_stop
+
+        self.follower = None
+        self.polling = None
+        self.changed = False  # new data since the last refresh
+        self.last_refresh = 0
+
+        self.statusFollow = tk.IntVar()
+        self.checkFollow = tk.Checkbutton(frame, text="Follow file", variable=self.statusFollow,
+                                          command=self.toggled)
+        self.checkFollow.grid(row=row, column=column, sticky="W", padx=10)
+
+    def checked(self):
+        return self.statusFollow.get() == 1
+
+    @property
+    def active(self):
+        return self.follower is not None
+
+    def toggled(self):
+        if not self.checked():
+            self.stop()
+
+    def start(self, filepath):
+        """Starts following the file; returns False (and reports why) if it cannot be followed"""
+        self.stop()
+        manufacturer = None if self.manufacturer is None else self.manufacturer.get()
+        try:
+            self.follower = Follow.Follower(filepath, self.kind, manufacturer)
+        except ReadError as e:
+            self.on_status(str(e))
+            return False
+        except:
+            self.on_status("Could not follow file.")
+            return False
+        self.changed = False
+        self.last_refresh = 0
+        self.on_status("Following file...")
+        self.poll()
+        return True
+
+    def poll(self):
+        """Reads the lines appended since the last call; refreshes the plot if it is time to"""
+        self.polling = None
+        try:
+            if self.follower.poll() > 0:
+                self.changed = True
+        except OSError as e:
+            # The file may be briefly locked or replaced by the instrument software
+            print("Could not read {}: {}".format(self.follower.filepath, e))
+        except ReadError as e:
+            # The format of a new file is only known once its header is written
+            self.on_status(str(e))
+            self.stop(keep=False)
+            return
+        if self.changed and time.perf_counter() - self.last_refresh >= REFRESH_S:
+            self.refresh()
+        if self.follower is not None:
+            self.polling = self.master.after(FOLLOW_MS, self.poll)
+
+    def refresh(self):
+        try:
+            dataset = self.follower.dataset()
+        except ReadError as e:
+            # e.g. the points of an image are not on a grid
+            self.on_status(str(e))
+            self.stop(keep=False)
+            return
+        if dataset is None:
+            self.on_status("Following file: {} points, waiting for data.".format(self.follower.npts))
+            return
+        self.changed = False
+        self.last_refresh = time.perf_counter()
+        try:
+            self.on_update(dataset)
+        except Exception as e:
+            print("Could not refresh the plot: {}".format(e))
+        self.on_status("Following file: {} points.".format(self.follower.npts))
+
+    def stop(self, keep=True):
+        """Stops following; if keep, the data read so far are passed to on_stop"""
+        if self.polling is not None:
+            self.master.after_cancel(self.polling)
+            self.polling = None
+        if self.follower is None:
+            return
+        follower = self.follower
+        self.follower = None
+        if keep and self.on_stop is not None:
+            try:
+                follower.poll()
+                dataset = follower.dataset()
+            except:
+                dataset = None
+            if dataset is not None:
+                self.on_stop(dataset)
@@ -0,0 +1,94 @@
+import tkinter as tk
+
+from Processing import PGrid # fits of the approach curves of a grid
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the controls of approach curve grids in the image app
+(see Readers/ApproachGrid.py): the map shown (current at the closest
+distance, or kappa, Rg or residual of the fits of the approach curves, see
+Processing/PGrid.py) and the electrode parameters of the fits.
+"""
+
+
+class GridMaps:
+    """Map dropdown and fit parameters of approach curve grids.
+        on_change() is called when another map is selected
+    """
+    def __init__(self, master, frame, on_change, row=8, column=1):
+        self.on_change = on_change
+        self.grid = None
+
+        labelGrid = tk.Label(frame, text="Grid map")
+        labelGrid.grid(row=row, column=column, sticky="E", padx=10)
+        self.viewVar = tk.StringVar(master)
+        self.viewVar.set(PGrid.MAPS[0])
+        self.popupView = tk.OptionMenu(frame, self.viewVar, *PGrid.MAPS)
+        self.popupView.configure(width=15, state="disabled")
+        self.popupView.grid(row=row, column=column + 1, sticky="W")
+        self.viewVar.trace('w', self.changed)
+        self.statusFitRg = tk.IntVar()
+        self.checkFitRg = tk.Checkbutton(frame, text="Fit Rg?", variable=self.statusFitRg, state="disabled")
+        self.checkFitRg.var = self.statusFitRg
+        self.checkFitRg.grid(row=row, column=column + 2, sticky="W", padx=10)
+
+        # Electrode parameters of the fits
+        self.entries = []
+        for index, (text, value) in enumerate([("Radius (µm)", "5"), ("iss (nA)", "1"), ("Rg", "10")]):
+            label = tk.Label(frame, text=text)
+            label.grid(row=row + 1, column=column + 2 * index, sticky="E", padx=10)
+            entry = tk.Entry(frame, state="normal")
+            entry.insert(0, value)
+            entry.config(state="disabled")
+            entry.grid(row=row + 1, column=column + 2 * index + 1, sticky="W")
+            self.entries.append(entry)
+        self.entryRadius, self.entryIss, self.entryRg = self.entries
+
+    def set_grid(self, grid):
+        """Enables the controls for a grid (None disables them)"""
+        self.grid = grid
+        state = "disabled" if grid is None else "normal"
+        self.popupView.configure(state=state)
+        self.checkFitRg.config(state=state)
+        for entry in self.entries:
+            entry.config(state=state)
+
+    def view(self):
+        return self.viewVar.get()
+
+    def parameters(self):
+        """Parameters of the fits (see Processing/PGrid.py); None if an entry is not a positive number"""
+        try:
+            radius, iss, rg = [float(entry.get()) for entry in self.entries]
+        except ValueError:
+            return None
+        if min(radius, iss, rg) <= 0:
+            return None
+        return {'grid_view': self.viewVar.get(), 'grid_radius': radius, 'grid_iss': iss, 'grid_rg': rg,
+                'grid_fit_rg': int(self.checkFitRg.var.get() == 1 or self.viewVar.get() == 'Rg')}
+
+    def changed(self, *args):
+        if self.grid is not None:
+            self.on_change()
+
+    def clear(self):
+        self.set_grid(None)
+        self.viewVar.set(PGrid.MAPS[0])
+        self.checkFitRg.var.set(0)
@@ -6,12 +6,24 @@ from tkinter import ttk as ttk
 
 # Numerical analysis
 import numpy as np
-import pandas as pd
-from scipy.interpolate import griddata # Interpolation algorithm
-from skimage import feature # Canny algorithm
-import scipy.io # support for matlab workspaces
-import scipy.optimize # nonlinear curve fitting
-import numpy.matlib # contains repmat function
+from Processing import PImage # processing stages (slope correction, normalization, edge detection)
+from Processing import PStack # processing stages of time-lapse images
+from Processing import FeedbackMap # distance and kappa maps from the feedback approximations
+from Processing import PGrid # kappa and Rg maps of approach curve grids
+from Processing import PScatter # images sampled at scattered points, reconstructed on a grid
+from Processing import Rendering # imshow/pcolormesh drawing of maps
+from Processing import Pyramid # level of detail rendering of very large maps
+from Processing import Buffers # re-usable (memory-mapped) work buffers
+from Processing import Timing # timing of imports, processing and rendering
+from Processing import Export # text files of Export Data
+from Readers import Datasets # data sets returned by the readers
+from Readers import Formats # detection of the file format and readers
+from Apps.DatasetList import DatasetList # import of several files, list of data sets
+from Apps.FollowFile import FollowFile # follow mode (file being written by the instrument software)
+from Apps.StackFrames import StackFrames # time-lapse images: import of several frames, frame slider
+from Apps.MosaicImport import MosaicImport # stitching of image tiles into a mosaic
+from Apps.GridMaps import GridMaps # approach curve grids: map shown and parameters of the fits
+from Apps.ScatterPoints import ScatterPoints # scattered points: parameters of the reconstruction
 
 # Plotting
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # figure handler for embeddable plots
@@ -138,6 +150,35 @@ class ImageApp:
         #        # link function to change dropdown
         self.textVar.trace('w', self.change_dropdown)
 
+        # Import of several files at once and list of the imported data sets
+        self.datasetList = DatasetList(master, frameBase, 'image', self.textVar, self.select_dataset,
+                                       lambda text: self.labelImport.config(text=text))
+
+        # Follow mode: Import File follows the file while it is written and refreshes the plot
+        self.follow = FollowFile(master, frameBase, 'image', self.textVar, self.follow_update,
+                                 lambda text: self.labelImport.config(text=text),
+                                 lambda dataset: self.datasetList.select(self.datasetList.add(dataset)))
+
+        # Time-lapse images: Import Stack reads one frame per file, the slider selects the frame shown
+        self.stack = None
+        self.frame = 0
+        self.stackFrames = StackFrames(master, frameBase, self.textVar,
+                                       lambda dataset: self.datasetList.select(self.datasetList.add(dataset)),
+                                       self.show_frame, lambda text: self.labelImport.config(text=text))
+
+        # Mosaic: Import Mosaic stitches overlapping tiles, shown while they are placed
+        self.mosaicImport = MosaicImport(master, frameBase, self.textVar,
+                                         lambda dataset: self.datasetList.select(self.datasetList.add(dataset)),
+                                         self.follow_update, lambda text: self.labelImport.config(text=text))
+
+        # Approach curve grids: current at the closest distance, or kappa/Rg maps of the fits of the curves
+        self.grid = None
+        self.gridMaps = GridMaps(master, frameBase, self.show_grid_map)
+
+        # Scattered points (e.g. hopping mode): reconstructed on an evenly spaced grid before processing
+        self.scatter = None
+        self.scatterPoints = ScatterPoints(master, frameBase)
+
         # Specify sampling density of raw SECM image
         self.labelXdim = tk.Label(frameBase, text="Number of x points: ")
         self.labelXdim.grid(row=1, column=3, sticky="W", padx=10)
@@ -167,6 +208,12 @@ class ImageApp:
         self.checkEdges.var = self.statusEdges
         self.checkEdges.grid(row=0, column=0, sticky="E", padx=10, pady=5)
 
+        # Toggle for memory-mapped scratch files (large images)
+        self.statusScratch = tk.IntVar()
+        self.checkScratch = tk.Checkbutton(framePlot, text="Use disk scratch?", variable=self.statusScratch)
+        self.checkScratch.var = self.statusScratch
+        self.checkScratch.grid(row=1, column=0, sticky="E", padx=10)
+
         # Button for generating plot
         self.buttonPlot = tk.Button(framePlot, text="Plot Data", state="disabled", command=self.ReshapeData)
         self.buttonPlot.grid(row=0, column=1, rowspan=2, sticky="W" + "E")
@@ -233,6 +280,29 @@ class ImageApp:
         #        # link function to change dropdown
         self.slopeYVar.trace('w', self.change_dropdown)
 
+        # Feedback maps: distance or kappa of every point, from the normalized currents (see
+        # Processing/FeedbackMap.py)
+        labelFeedback = tk.Label(frameAnalytics, text="Feedback map")
+        labelFeedback.grid(row=3, column=3, sticky="W", padx=10)
+        self.feedbackVar = tk.StringVar(master)
+        self.feedbackVar.set(FeedbackMap.MAPS[0])
+        popupFeedback = tk.OptionMenu(frameAnalytics, self.feedbackVar, *FeedbackMap.MAPS)
+        popupFeedback.configure(width=25)
+        popupFeedback.grid(row=4, column=3, sticky="W", padx=10)
+        self.feedbackVar.trace('w', self.change_dropdown)
+
+        labelFeedbackRg = tk.Label(frameAnalytics, text="Rg (map)")
+        labelFeedbackRg.grid(row=3, column=4, padx=10, sticky="W")
+        self.entryFeedbackRg = tk.Entry(frameAnalytics)
+        self.entryFeedbackRg.insert(0, "10")
+        self.entryFeedbackRg.grid(row=4, column=4, padx=10, sticky="W")
+
+        labelFeedbackL = tk.Label(frameAnalytics, text="L = d/a (kappa map)")
+        labelFeedbackL.grid(row=3, column=5, padx=10, sticky="W")
+        self.entryFeedbackL = tk.Entry(frameAnalytics)
+        self.entryFeedbackL.insert(0, "1")
+        self.entryFeedbackL.grid(row=4, column=5, padx=10, sticky="W")
+
         # Input for accepting experimental iss
         labelIssExp = tk.Label(frameAnalytics, text="Expermental iss (nA)")
         labelIssExp.grid(row=1, column=6, padx=10, sticky="W")
@@ -392,13 +462,23 @@ class ImageApp:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.frameBottom)
         self.canvas.get_tk_widget().grid(row=1, column=0, sticky="S")
         self.canvas.mpl_connect('button_press_event', DataCursor)
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         self.last_dir = ""
         # values that will hold the status of the checkboxes at the time the data was last plotted
         self.statNorm = 0
         self.statEdge = 0
         self.statNormXP = 0
+        self.grid_map = PGrid.MAPS[0]  # map of the approach curve grid plotted (see Processing/PGrid.py)
+        self.feedback = FeedbackMap.MAPS[0]  # feedback map plotted (see Processing/FeedbackMap.py)
+
+        # memoized processing stages, see Processing/PImage.py; large intermediates are kept in re-usable work
+        # buffers, optionally memory-mapped to a scratch file (see Processing/Buffers.py)
+        self.buffers = Buffers.WorkBuffers()
+        self.pipeline = PStack.add_stages(PImage.build_pipeline(buffers=self.buffers), buffers=self.buffers)
+        PGrid.add_stages(self.pipeline)
+        PScatter.add_stages(self.pipeline)
 
     def change_dropdown(*args):
         pass
@@ -414,436 +494,134 @@ class ImageApp:
             self.labelFile.config(text=self.filename)
             self.buttonImport.config(state="normal")
 
-            # Set manufacturer
-            if self.filename[-3:].lower() == 'asc':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:].lower() == 'mat':
-                self.textVar.set('HEKA')
-            elif self.filename[-3:].lower() == 'dat':
-                self.textVar.set('Sensolytics')
-            elif self.filename[-3:].lower() == 'csv':
-                self.textVar.set('PAR')
-            elif self.filename[-3:].lower() == 'img':
-                self.textVar.set('SECMx')
+            # Set manufacturer from the file content (first few KB only)
+            fileformat = Formats.detect(self.filepath)
+            if fileformat is not None:
+                self.textVar.set(fileformat.manufacturer)
             else:
                 pass
             self.labelImport.config(text="Ready.")
         except:
             self.ResetWindow()
 
+    @Timing.timed('action')
     def ImportFile(self):
-        ## Check if manufacturer needed
-        if self.filename[-3:] == 'txt' and self.textVar.get() == 'None':
-            self.labelImport.config(text="Specify a manufacturer.")
-
-        ### ASC import ####
-        elif self.filename[-3:].lower() == 'asc':
-            self.import_heka_asc(self.filepath)
-        ### SECMx import ####
-        elif self.filename[-3:].lower() == 'img':
-            self.import_3d_secmx(self.filepath)
-            self.labelImport.config(text="File imported.")
-        ### MAT import ####
-        elif self.filename[-3:].lower() == 'mat':
-            self.import_heka_mat(self.filepath)
-        ### TXT/Biologic import ####
-        elif self.filename[-3:].lower() == 'txt' and self.textVar.get() == 'Biologic':
-            self.import_biologic(self.filepath)
-        ### TXT/CH instruments import ####
-        elif self.filename[-3:].lower() == 'txt' and self.textVar.get() == 'CH Instruments':
-            self.import_ch_instruments(self.filepath)
-        ### DAT / Sensolytics import ###
-        elif self.filename[-3:].lower() == 'dat':
-            self.import_sensolytics(self.filepath)
-        ### CSV / PAR import
-        elif self.filename[-3:].lower() == 'csv':
-            self.import_par(self.filepath)
-
-        # Message to display if one of the above imports does not apply
-        else:
-            self.labelImport.config(text="File type not supported.")
-
-        self.buttonPlot.config(state="normal")
-        self.labelPlot.config(text="")
-        self.checkEdges.config(state="normal")
-
-    def import_heka_asc(self, filepath):
-        data = []
+        # Detect the file format and read it into an image data set (see Readers/Formats.py); a manufacturer chosen
+        # in the dropdown takes precedence over the detected one
+        if self.follow.checked():
+            self.follow.start(self.filepath)
+            return
         try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()  # split line into segments
-                        float(curline[0])  # check if line contains strings or numbers
-                        data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-            self.labelImport.config(text="File imported.")
+            # Formats without images may hold approach curve grids (see Readers/ApproachGrid.py) or scattered points
+            # (see Readers/Scattered.py)
+            fileformat = Formats.detect(self.filepath, self.textVar.get())
+            kinds = ['image']
+            if fileformat is not None:
+                kinds = [kind for kind in ('image', 'approach_grid', 'scattered_image') if kind in fileformat.readers]
+            try:
+                dataset = Formats.read(self.filepath, kinds[0] if kinds else 'image', self.textVar.get())
+            except Datasets.ScatteredError:
+                # Images not scanned on a grid (e.g. hopping mode) are read as scattered points
+                if 'scattered_image' not in kinds[1:]:
+                    raise
+                dataset = Formats.read(self.filepath, 'scattered_image', self.textVar.get())
+        except Datasets.ReadError as e:
+            self.labelImport.config(text=str(e))
+            return
         except:
             self.labelImport.config(text="Could not import file.")
+            return
 
-        # Convert raw data to matrix
-        try:
-            self.df = pd.DataFrame(data, columns=["PtIndex", "xpos", "Current"], dtype='float')
-            self.df = self.df.values
-
-            self.df[:, 1] = self.df[:, 1] * 1E6  # m --> um
-            self.df[:, 2] = self.df[:, 2] * 1E9  # A --> nA
-
-            self.nptsy = self.df[self.df[:, 1] == 0]
-            self.nptsy = len(self.nptsy)
-            self.nptsx = int(len(self.df) / self.nptsy)
-
-            self.labelXdim2.config(text=self.nptsx)
-            self.labelYdim2.config(text=self.nptsy)
-
-            # Set up grids for plotting
-            self.xpos0 = np.unique(self.df[:, 1])
-            self.ypos0 = np.linspace(np.amin(self.xpos0), np.amax(self.xpos0), self.nptsy)
-            self.currents0 = self.df[:, 2]
-            self.currents0 = self.currents0.reshape(self.nptsy, self.nptsx)
-
-            del self.df
-
-        except:
-            print("Integer values for the number of points required.")
-
-    def import_3d_secmx(self, filepath):
-        """Imports data at the filepath address. Formats data to that required by the ReshapeData() method.
-        This method is designed to read 3D SECM image files of ASCII SECMx encoding (.img)
-        PLEASE NOTE THAT THIS METHOD CANNOT READ BINARY ENCODED FILES.
-        SECMx is an SECM control software by Gunther Wittstock. https://uol.de/pc2/forschung/secm-tools/secmx"""
-        data = []
-        try:
-            with open(filepath, 'r') as fh:
-                position_conversion_factor = 1.0  # multiplicative conversion factor to convert units to µm
-                current_conversion_factor = 1.0  # multiplicative conversion factor to convert units to nA
-                for curline in fh:
-                    # Ignore lines that do not contain data when reading data into global memory
-                    if not (curline.startswith('|') or curline.startswith('[') or curline.startswith('p') or curline.startswith('F') or curline.startswith('R') or curline.startswith('\n') or len(curline) == 0):  # Read the line into memory if it is valid.
-                        curline = curline.split()  # split-up the line into an array of the floating point data
-                        data.append([float(curline[1])*position_conversion_factor, float(curline[3])*position_conversion_factor, float(curline[-1])*current_conversion_factor])  # add [x/um, y/um, i/nA]
-                    else:
-                        # check to see is the line contains information about the units
-                        if curline.rfind('Unit=') >= 0:
-                            unit = curline[curline.rfind('Unit=') + 5:]
-                            if unit.startswith('µm'):
-                                position_conversion_factor = 1.0
-                            elif unit.startswith('nm'):
-                                position_conversion_factor = 0.001
-                            elif unit.startswith('mm'):
-                                position_conversion_factor = 1E3
-                            elif unit.startswith('nA'):
-                                current_conversion_factor = 1.0
-                            elif unit.startswith('µA'):
-                                current_conversion_factor = 1E3
-                            elif unit.startswith('mA'):
-                                current_conversion_factor = 1E6
-                            elif unit.startswith('pA'):
-                                current_conversion_factor = 0.001
-                            elif unit.startswith('A'):
-                                current_conversion_factor = 1E9
-                            elif unit.startswith('cm'):
-                                position_conversion_factor = 1E4
-                            else:
-                                print('panic: ' + unit.strip())
-                fh.close()
+        # Add to the list of imported data sets and show it
+        self.datasetList.select(self.datasetList.add(dataset))
 
+    def follow_update(self, dataset):
+        """Shows the data read so far from the followed file (see Apps/FollowFile.py) or the mosaic built so far (see
+        Apps/MosaicImport.py)"""
+        self.select_dataset(dataset)
+        self.ReshapeData()
 
-        except:
-            self.labelImport.config(text="Could not import file.")
+    def select_dataset(self, dataset):
+        """Makes one of the imported data sets (see Apps/DatasetList.py) the data of the window"""
+        self.filepath = dataset.filepath
+        self.filename = dataset.name
+        self.labelFile.config(text=self.filename)
 
+        self.load_dataset(dataset)
         self.labelImport.config(text="File imported.")
         self.buttonPlot.config(state="normal")
         self.labelPlot.config(text="")
+        self.checkEdges.config(state="normal")
 
-        # Convert raw data to matrix
-        try:
-            df = pd.DataFrame(data, dtype=float)  # turn the data into a dataframe for sorting purposes
-            df = df.sort_values(by=[1, 0])  # ensure the distances are in ascending order
-
-            df = df.values  # cast the dataframe to a numpy array
-
-            self.xpos0 = np.unique(df[:, 0])  # find the unique x values
-            self.ypos0 = np.unique(df[:, 1])  # find the unique y values
-            self.nptsx = len(self.xpos0)  # number of unique x points
-            self.nptsy = len(self.ypos0)  # number of unique y points
-
-            currents = df[:, 2]
-            self.currents0 = np.reshape(currents, (self.nptsx, self.nptsy))  # format the 2D current map.
-            # update the window
-            self.labelXdim2.config(text=self.nptsx)
-            self.labelYdim2.config(text=self.nptsy)
-
-        except Exception as e:
-            print("Error importing data: \n")
-            print(e)
-
-    def import_heka_mat(self, filepath):
-        try:
-            matdata = scipy.io.loadmat(filepath)
-            # Delete non-data containing variables
-            del matdata['__header__']
-            del matdata['__globals__']
-            del matdata['__version__']
-
-            self.nptsy = len(matdata)
-            data = []
-            # Read once to determine dimensions
-            for entry in matdata:
-                trace = matdata[entry]
-                self.xpos0 = trace[:, 0]
-                self.nptsx = len(self.xpos0)
-
-            # Read a second time to construct the appropriate table
-            data = np.empty((self.nptsy, self.nptsx), dtype=float)
-            count = 0
-            for entry in matdata:
-                trace = matdata[entry]
-                data[count, :] = trace[:, 1]
-                count = count + 1
-
-            self.xpos0 = self.xpos0 * 1E6
-            self.ypos0 = np.linspace(np.amin(self.xpos0), np.amax(self.xpos0), self.nptsy)
-            self.currents0 = data * 1E9
-
-            self.labelImport.config(text="File imported.")
-
-        except:
-            self.labelImport.config(text="Could not import file.")
+    def load_dataset(self, dataset):
+        """Makes an image data set (Readers/Datasets.py) the data of the window. Readers of new file types are added
+        as plugins, see Readers/Formats.py; ReshapeData uses the following:
+            > self.xpos0, self.ypos0 = 2 separate 1D numpy arrays containing unique x and y values respectively in µm
+            > self.nptsx, self.nptsy = 2 separate integers containing the number of x and y points respectively
+            > self.currents0 = 2D numpy array containing current values in nA.
+        For time-lapse images (Datasets.ImageStackDataset), self.currents0 is the frame shown and self.stack the
+        whole stack. For approach curve grids (Datasets.ApproachGridDataset), self.currents0 is the current at the
+        closest distance and self.grid the whole grid. Scattered points (Datasets.ScatteredImageDataset) are
+        reconstructed on a grid, see reconstruct_points.
+        """
+        self.dataset = dataset
+        self.frame = 0
+        self.stack = self.grid = self.scatter = None
+        if isinstance(dataset, Datasets.ScatteredImageDataset):
+            self.scatter = dataset
+            if not self.reconstruct_points():
+                self.scatterPoints.clear()  # invalid entries: default parameters
+                self.reconstruct_points()
+        else:
+            self.xpos0 = dataset.xpos
+            self.ypos0 = dataset.ypos
+            self.nptsx = dataset.nptsx
+            self.nptsy = dataset.nptsy
+            if isinstance(dataset, Datasets.ImageStackDataset):
+                self.stack = dataset
+                self.currents0 = dataset.currents[self.frame]
+            elif isinstance(dataset, Datasets.ApproachGridDataset):
+                self.grid = dataset
+                self.currents0 = dataset.currents[:, :, 0]
+            else:
+                self.currents0 = dataset.currents
+        self.stackFrames.set_stack(self.stack)
+        self.gridMaps.set_grid(self.grid)
+        self.scatterPoints.set_scatter(self.scatter)
 
         self.labelXdim2.config(text=self.nptsx)
         self.labelYdim2.config(text=self.nptsy)
 
-    def import_biologic(self, filepath):
-        try:
-            data = []
-            datastart = 0  # toggle for determining if reading point cloud
-
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split()
-                        if curline == ['X', 'Y', 'Z']:
-                            datastart = 1
-                        if datastart == 1:
-                            float(curline[0])  # check if line contains strings or numbers
-                            data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-
-            self.df = pd.DataFrame(data, dtype='float')
-            self.df = self.df.values
-
-            self.df[:, 2] = self.df[:, 2] * 1E9  # A --> nA
-            self.nptsx = self.df[self.df[:, 0] == 0]
-            self.nptsx = len(self.nptsx)
-            self.nptsy = int(len(self.df) / self.nptsx)
-
-            self.xpos0 = np.unique(self.df[:, 0])
-            self.xpos0 = self.xpos0 - np.amin(self.xpos0)
-            self.ypos0 = np.unique(self.df[:, 1])
-            self.ypos0 = self.ypos0 - np.amin(self.ypos0)
-            self.currents0 = self.df[:, 2]
-            self.currents0 = self.currents0.reshape(self.nptsy, self.nptsx)
-
-            self.labelImport.config(text="File imported.")
-            self.labelXdim2.config(text=self.nptsx)
-            self.labelYdim2.config(text=self.nptsy)
-
-
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-    def import_ch_instruments(self, filepath):
-        try:
-            data = []
-            datastart = 0  # toggle for determining if reading point cloud
-
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    try:
-                        curline = curline.split(',')
-                        if curline == ['X/um', ' Y/um', ' Current/A\n']:
-                            datastart = 1
-                        if datastart == 1:
-                            float(curline[0])  # check if line contains strings or numbers
-                            data.append(curline)  # if number, add to dataframe
-                    except:
-                        pass  # if string, skip to next line
-
-            self.df = pd.DataFrame(data, dtype='float')
-            self.df = self.df.values
-
-            self.df[:, 2] = self.df[:, 2] * 1E9  # A --> nA
-            self.nptsx = self.df[self.df[:, 0] == 0]
-            self.nptsx = len(self.nptsx)
-            self.nptsy = int(len(self.df) / self.nptsx)
-
-            self.xpos0 = np.unique(self.df[:, 0])
-            self.xpos0 = self.xpos0 - np.amin(self.xpos0)
-            self.ypos0 = np.unique(self.df[:, 1])
-            self.ypos0 = self.ypos0 - np.amin(self.ypos0)
-            self.currents0 = self.df[:, 2]
-            self.currents0 = self.currents0.reshape(self.nptsy, self.nptsx)
-            self.currents0 = self.currents0 * (-1)  # polarographic --> IUPAC convention
-
-            self.labelImport.config(text="File imported.")
-            self.labelXdim2.config(text=self.nptsx)
-            self.labelYdim2.config(text=self.nptsy)
-
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-    def import_sensolytics(self, filepath):
-        data = []
-        header = []
-        index = 0
-
-        try:
-            with open(filepath, 'r') as fh:
-                for curline in fh:
-                    index = index + 1
-                    if index <= 23:
-                        try:
-                            curline = curline.split(':')
-                            header.append(curline)
-                        except:
-                            pass
-                    if index > 23:
-                        try:
-                            curline = curline.split(',')
-                            float(curline[0])
-                            data.append(curline)
-                        except:
-                            pass
-                fh.close()
-
-            self.df = pd.DataFrame(data, columns=['X', 'Xrel', 'Y', 'Yrel', 'Z', 'Zrel', 'Ch1', 'Ch2'], dtype=float)
-            del self.df['Ch2']
-            self.df = self.df.values
-
-            self.nptsx = int(header[5][1].strip(' \n')) + 1
-            self.nptsy = int(header[6][1].strip(' \n')) + 1
-
-            self.xpos0 = np.unique(self.df[:, 1])
-            self.ypos0 = np.unique(self.df[:, 3])
-            self.currents0 = self.df[:, 6]
-            self.currents0 = self.currents0.reshape(self.nptsy, self.nptsx)
-
-            self.labelImport.config(text="File imported.")
-            self.labelXdim2.config(text=self.nptsx)
-            self.labelYdim2.config(text=self.nptsy)
-
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-    def import_par(self, filepath):
-        try:
-            data = []
-            header = []
-            index = 0
-            with open(filepath) as fh:
-                # Read the first time, pull header (x-dimensions)
-                for curline in fh:
-                    try:
-                        index += 1
-                        if index == 7:
-                            header.append(curline.split(','))
-                        else:
-                            pass
-                    except:
-                        pass
-                fh.close()
-
-                # Read the second time, pull last column (y-dimensions)
-                # Note: there is no header to this column, which confuses the third import
-            with open(filepath) as fh:
-                data = pd.read_csv(fh, header=6, dtype=float)
-                self.ypos0 = data.iloc[:, -1]
-                fh.close()
-
-            with open(self.filepath) as fh:
-                # Read the second time, import data to table
-                data = pd.read_csv(fh, header=6, index_col=False)
-                fh.close()
-
-        except:
-            self.labelImport.config(text="Could not import file.")
-
-        # Process data into consistent form needed for ReshapeData
-        try:
-            # conversion of all quantities to numpy arrays
-            self.xpos0 = np.transpose(np.array(header, dtype=float))
-            self.xpos0 = np.unique(self.xpos0)
-            self.xpos0 = self.xpos0 * 1E3  # mm --> um
-            self.ypos0 = self.ypos0.values
-            self.ypos0 = self.ypos0 * 1E3  # mm --> um
-            self.currents0 = data.values
-            self.currents0 = self.currents0 * 1E3  # uA --> nA
-
-            self.nptsx = len(self.xpos0)
-            self.nptsy = len(self.ypos0)
-
-            self.labelImport.config(text="File imported.")
-            self.labelXdim2.config(text=self.nptsx)
-            self.labelYdim2.config(text=self.nptsy)
-
-        except:
-            self.labelImport.config(text="Error processing file.")
-
-    """
-    Looking to extend the import file functionality to support a different file type?
-    The ReshapeData function assumes the following is present after the ImportFile function has run:
-        > self.xpos0, self.ypos0 = 2 separate 1D numpy arrays containing unique x and y values respectively in µm
-        > self.nptsx, self.nptsy = 2 separate integers containing the number of x and y points respectively
-        > self.currents0 = 2D numpy array containing current values in nA.
-        > self.nptsx, self.nptsy = Number of points in x and y directions
-
-    """
-
-    def ReshapeData(self):
-        # Reset all data to original import to prevent repeating math operations
-        self.xpos = self.xpos0.copy()
-        self.ypos = self.ypos0.copy()
-        self.currents = self.currents0.copy()
-
-        # Unit conversions; create xposG/yposG variables only to be used for graphs
-        # (if converting self.xpos variable directly, errors in edge detection)
-        if self.distanceVar.get() == "nm":
-            self.xposG = self.xpos.copy() * 1E3  # um --> nm
-            self.yposG = self.ypos.copy() * 1E3
-        elif self.distanceVar.get() == "mm":
-            self.xposG = self.xpos.copy() / 1E3  # um --> mm
-            self.yposG = self.ypos.copy() / 1E3  # um --> mm
-        else:
-            self.xposG = self.xpos.copy()
-            self.yposG = self.ypos.copy()
-
-        ### Slope correction
-        # X-Slope correction
-        if self.slopeXVar.get() == 'None':
-            pass
-        elif self.slopeXVar.get() == 'Y = 0':
-            xslope0 = np.polyfit(self.xpos, self.currents[0, :], 1)
-            for i in range(0, (self.currents.shape[1])):
-                self.currents[:, i] = self.currents0[:, i] - xslope0[0] * (self.xpos[i] - self.xpos[0])
-        elif self.slopeXVar.get() == 'Y = Max':
-            xslopemax = np.polyfit(self.xpos, self.currents0[-1, :], 1)
-            for i in range(0, (self.currents0.shape[1])):
-                self.currents[:, i] = self.currents0[:, i] - xslopemax[0] * (self.xpos[i] - self.xpos[0])
-        # Y-Slope correction
-        if self.slopeYVar.get() == 'None':
-            pass
-        elif self.slopeYVar.get() == 'X = 0':
-            yslope0 = np.polyfit(self.ypos, self.currents[:, 0], 1)
-            for i in range(0, (self.currents.shape[0])):
-                self.currents[i, :] = self.currents0[i, :] - yslope0[0] * (self.ypos[i] - self.ypos[0])
-        elif self.slopeYVar.get() == 'X = Max':
-            yslopemax = np.polyfit(self.ypos, self.currents[:, -1], 1)
-            for i in range(0, (self.currents.shape[0])):
-                self.currents[i, :] = self.currents0[i, :] - yslopemax[0] * (self.ypos[i] - self.ypos[0])
-
+    def reconstruct_points(self):
+        """Reconstructs the scattered points on a grid (see Processing/PScatter.py) as self.xpos0, self.ypos0 and
+        self.currents0; the k-d tree and the grid are cached, so this only runs again if a parameter changed. Returns
+        False if a parameter is invalid."""
+        params = self.scatterPoints.parameters()
+        if params is None:
+            return False
+        self.pipeline.set_source('scatter', (self.scatter.xpoints, self.scatter.ypoints, self.scatter.currents))
+        self.xpos0, self.ypos0, self.currents0 = self.pipeline.run('reconstruct', params)
+        self.nptsy, self.nptsx = self.currents0.shape
+        self.labelXdim2.config(text=self.nptsx)
+        self.labelYdim2.config(text=self.nptsy)
+        return True
+
+    def show_frame(self, index):
+        """Shows another frame of the stack; the processed stack is cached, so nothing is read or processed again"""
+        if self.stack is None:
+            return
+        self.frame = index
+        self.currents0 = self.stack.currents[index]
+        if self.buttonSave.cget('state') == "normal":
+            self.ReshapeData()
+
+    def show_grid_map(self):
+        """Shows another map of the grid; the fits are cached, so they only run again if a parameter changed"""
+        if self.buttonSave.cget('state') == "normal":
+            self.ReshapeData()
+
+    def processing_parameters(self):
+        """Collects the GUI settings that the processing stages depend on (see Processing/PImage.py)"""
         ## Normalization; if deselected, iss = 1 (no change)
         # No normalization
         if self.checkNormalize.var.get() == 0:
@@ -860,20 +638,88 @@ class ImageApp:
         else:
             pass
 
-        self.currents = np.divide(self.currents, self.iss)
-
-        # Convert current between nA/uA/pA if not normalized
-        if self.checkNormalize.var.get() == 0:
-            if self.currentVar.get() == "nA":
-                pass
-            elif self.currentVar.get() == "µA":
-                self.currents = self.currents / 1E3
-            elif self.currentVar.get() == "pA":
-                self.currents = self.currents * 1E3
+        ## Feedback map; only for normalized currents
+        feedback = self.feedbackVar.get() if self.checkNormalize.var.get() == 1 else FeedbackMap.MAPS[0]
+        feedback_rg = feedback_height = None
+        if feedback != FeedbackMap.MAPS[0]:
+            feedback_rg = float(self.entryFeedbackRg.get())
+            feedback_height = float(self.entryFeedbackL.get())
+
+        return {'slope_x': self.slopeXVar.get(),
+                'slope_y': self.slopeYVar.get(),
+                'iss': self.iss,
+                'normalized': self.checkNormalize.var.get(),
+                'current_unit': self.currentVar.get(),
+                'feedback_map': feedback,
+                'feedback_rg': feedback_rg,
+                'feedback_height': feedback_height}
+
+    @Timing.timed('action')
+    def ReshapeData(self):
+        # Scattered points are first reconstructed on a grid
+        if self.scatter is not None and not self.reconstruct_points():
+            self.labelPlot.config(text="Enter the grid points (or auto) and neighbours.")
+            return
+
+        # The imported data is the source of the processing pipeline; stages are only re-executed if the data or
+        # one of their parameters changed since the last plot
+        self.pipeline.set_source('raw', (self.xpos0, self.ypos0, self.currents0, self.nptsx, self.nptsy))
+        params = self.processing_parameters()
+        self.buffers.set_memmap(self.checkScratch.var.get() == 1)
+
+        self.xpos = self.xpos0
+        # Slope correction, normalization and unit conversion; every frame of a stack at once, see
+        # Processing/PStack.py
+        if self.stack is None:
+            self.currents = self.pipeline.run('units', params)
         else:
-            pass
+            # Drift correction, difference maps and averages of the aligned frames (see StackFrames)
+            params.update(self.stackFrames.parameters())
+            self.pipeline.set_source('stack', (self.xpos0, self.ypos0, self.stack.currents, self.nptsx, self.nptsy))
+            self.currents = PStack.frame_view(self.pipeline, params, self.frame)
+            shifts = self.pipeline.run('stack_shifts', params)
+            self.stackFrames.set_shifts(np.column_stack([shifts[:, 1] * (self.xpos0[1] - self.xpos0[0]),
+                                                         shifts[:, 0] * (self.ypos0[1] - self.ypos0[0])]))
+
+        # Kappa and Rg maps of approach curve grids (see Processing/PGrid.py)
+        self.grid_map = PGrid.MAPS[0]
+        if self.grid is not None and self.gridMaps.view() != PGrid.MAPS[0]:
+            grid_params = self.gridMaps.parameters()
+            if grid_params is None:
+                self.labelPlot.config(text="Enter the radius, iss and Rg of the grid.")
+            else:
+                params.update(grid_params)
+                self.pipeline.set_source('grid', (self.grid.distances, self.grid.currents))
+                self.labelPlot.config(text="Fitting {} curves...".format(self.nptsx * self.nptsy))
+                self.currents = PGrid.grid_view(self.pipeline, params)
+                self.grid_map = grid_params['grid_view']
+                self.labelPlot.config(text="")
+
+        # Feedback maps (not of difference maps, which are not currents, nor of grid maps)
+        self.feedback = params['feedback_map']
+        if self.feedbackVar.get() != FeedbackMap.MAPS[0] and self.checkNormalize.var.get() == 0:
+            self.labelPlot.config(text="Normalize the currents for feedback maps.")
+        if (self.stack is not None and params['view'].startswith('Difference')) or self.grid_map != PGrid.MAPS[0]:
+            self.feedback = FeedbackMap.MAPS[0]
+        if self.feedback != FeedbackMap.MAPS[0]:
+            self.labelPlot.config(text="")
+            if self.stack is None:
+                self.currents = self.pipeline.run('feedback', params)
+            else:
+                self.currents = FeedbackMap.feedback_map(self.currents, params['feedback_map'], params['feedback_rg'],
+                                                         params['feedback_height'])
 
-        self.currents = self.currents.reshape(self.nptsy, self.nptsx)
+        # Unit conversions; create xposG/yposG variables only to be used for graphs
+        # (if converting self.xpos variable directly, errors in edge detection)
+        if self.distanceVar.get() == "nm":
+            self.xposG = self.xpos0 * 1E3  # um --> nm
+            self.yposG = self.ypos0 * 1E3
+        elif self.distanceVar.get() == "mm":
+            self.xposG = self.xpos0 / 1E3  # um --> mm
+            self.yposG = self.ypos0 / 1E3  # um --> mm
+        else:
+            self.xposG = self.xpos0
+            self.yposG = self.ypos0
 
         # Update interpolated dimension labels
         if self.checkEdges.var.get() == 1:
@@ -881,10 +727,8 @@ class ImageApp:
             self.labelYinterp2.config(text="Processing...")
             self.labelPlot.config(text="Processing...")
 
-        # Set up grids for plotting
-        self.ypos_int = (np.amax(self.xpos) - np.amin(self.xpos)) / (self.nptsy - 1)
-        self.ypos = np.arange(np.amin(self.xpos), (np.amax(self.xpos) + self.ypos_int), self.ypos_int)
-        self.xpos_grid, self.ypos_grid = np.meshgrid(self.xpos, self.ypos)
+        # y positions for plotting and export, from the first y position of the scan
+        self.ypos = PImage.display_ypos(self.xpos, self.nptsy, np.amin(self.ypos0))
 
         # Update figure with SECM image
         try:
@@ -894,15 +738,26 @@ class ImageApp:
 
             # Colormap selection
             if self.colormapVar.get() == 'RdYlBu':
-                self.img = self.ax1.pcolormesh(self.xposG, self.yposG, self.currents, cmap=cm.get_cmap('RdYlBu_r'))
+                cmap = cm.get_cmap('RdYlBu_r')
             elif self.colormapVar.get() == 'jet':
-                self.img = self.ax1.pcolormesh(self.xposG, self.yposG, self.currents, cmap=cm.get_cmap('jet'))
+                cmap = cm.get_cmap('jet')
             elif self.colormapVar.get() == 'coolwarm':
-                self.img = self.ax1.pcolormesh(self.xposG, self.yposG, self.currents, cmap=cm.get_cmap('coolwarm'))
+                cmap = cm.get_cmap('coolwarm')
             elif self.colormapVar.get() == 'grayscale':
-                self.img = self.ax1.pcolormesh(self.xposG, self.yposG, self.currents, cmap=cm.get_cmap('Greys'))
+                cmap = cm.get_cmap('Greys')
+
+            # imshow for evenly spaced scans, pcolormesh for irregular grids; very large scans are drawn from a
+            # multi-resolution pyramid at the level of detail of the current zoom
+            if self.currents.size >= Pyramid.PYRAMID_MIN_POINTS and Rendering.is_uniform(self.xposG) \
+                    and Rendering.is_uniform(self.yposG):
+                if self.stack is None and self.feedback == FeedbackMap.MAPS[0] and self.grid_map == PGrid.MAPS[0]:
+                    pyramid = self.pipeline.run('pyramid', params)
+                else:
+                    pyramid = PImage.build_pyramid(self.currents, buffers=self.buffers)
+                self.pyramid_view = Pyramid.PyramidView(self.ax1, pyramid, self.xposG, self.yposG, cmap)
+                self.img = self.pyramid_view.image
             else:
-                pass
+                self.img = Rendering.draw_map(self.ax1, self.xposG, self.yposG, self.currents, cmap)
 
                 # X-Y axis limits; try/except loops, except loop will take place if entry field empty or invalid
             try:
@@ -928,10 +783,17 @@ class ImageApp:
                 self.cb.set_label('Normalized Current')
             else:
                 self.cb.set_label('Current ({})'.format(self.currentVar.get()))
+            if self.stack is not None and params['view'].startswith('Difference'):
+                self.cb.set_label(self.cb.ax.get_ylabel() + ' difference')
+            if self.feedback != FeedbackMap.MAPS[0]:
+                self.cb.set_label(FeedbackMap.LABELS[self.feedback])
+            if self.grid_map != PGrid.MAPS[0]:
+                self.cb.set_label(PGrid.LABELS[self.grid_map])
 
             self.ax1.set_xlabel('X ({})'.format(self.distanceVar.get()))
             self.ax1.set_ylabel('Y ({})'.format(self.distanceVar.get()))
-            self.canvas.draw()
+            with Timing.span('canvas.draw', 'rendering'):
+                self.canvas.draw()
 
             self.buttonSave.config(state="normal")
 
@@ -940,69 +802,33 @@ class ImageApp:
 
         # Detect edges
         if self.checkEdges.var.get() == 1:
-
-            # The Following interpolation does not play nice with negative x,y positions very much.
-            self.xposa = self.xpos - np.amin(self.xpos)  # Adjust the x-positions so that there are no negative values
-            self.yposa = self.ypos - np.amin(self.ypos)  # Adjust the y-positions so that there are no negative values
-            nano_adjust = 1.0
-            # check if the resolution is sub-micron. if so, use nm instead of um, additionally, ensure that this
-            # adjustment will not crash things
-            if self.xposa[1] - self.xposa[0] < 0.5 and np.amax(self.xposa) < 10:
-                nano_adjust = 1E3
-                self.xposa = self.xposa.copy() * nano_adjust
-                self.yposa = self.yposa.copy() * nano_adjust
-            self.xposa = np.around(self.xposa)
-            self.yposa = np.around(self.yposa)
-            # Create df to be compatible with edge detection algorithm
-            ypos_int = np.amax(self.xposa) / ((self.nptsy) - 1)
-            self.df = np.reshape(self.currents, (self.nptsx * self.nptsy))
-            self.dfycol = np.linspace(0, ((self.nptsx * self.nptsy) - 1), (self.nptsx * self.nptsy))
-
-            # duct tape hack so that point where the floor function below get assigned to the correct row
-            modcol = np.remainder(self.dfycol, self.nptsx)
-            for i in range(0, len(modcol)):
-                if modcol[i] == 0:
-                    self.dfycol[i] = self.dfycol[i] + 1
-            self.dfycol = ypos_int * (np.floor(np.divide(self.dfycol, self.nptsx)))
-
-            self.df = np.vstack((numpy.matlib.repmat(self.xposa, 1, self.nptsy), self.df))
-            self.df = np.vstack((self.dfycol, self.df))
-            self.df = self.df.T
-
             try:
                 # Set up evenly spaced interpolation grids for edge detection
-                try:
-
-                    # Check if already evenly spaced; if yes, do nothing; if no, create grid @ 1 pt/um level
-                    if self.nptsx > self.nptsy:
-                        self.xpos_interp = np.linspace(np.amin(self.xposa), np.amax(self.xposa), int(np.amax(self.xposa)) + 1)
-                        self.ypos_interp = self.xpos_interp
-                    elif self.nptsx < self.nptsy:
-                        self.xpos_interp = np.linspace(np.amin(self.yposa), np.amax(self.yposa), int(np.amax(self.yposa)) + 1)
-                        self.ypos_interp = self.xpos_interp
-                    else:
-                        self.xpos_interp = self.xposa
-                        self.ypos_interp = self.xpos_interp
-                    xpos_unigrid, ypos_unigrid = np.meshgrid(self.xpos_interp, self.ypos_interp)
-
-                    # Interpolate to prepare for edge detection
-                    self.currents_interp = griddata((self.df[:, 1], self.df[:, 0]), self.df[:, 2],(xpos_unigrid, ypos_unigrid), method='cubic')
-                except:
-                    print("Error interpolating data to uniform grid.")
+                if self.stack is None:
+                    try:
+                        self.xpos_interp, self.ypos_interp, self.currents_interp, nano_adjust = \
+                            self.pipeline.run('interpolate', params)
+                    except:
+                        print("Error interpolating data to uniform grid.")
 
-                currents_norm = (self.currents_interp - np.amin(self.currents_interp)) / (np.amax(self.currents_interp) - np.amin(self.currents_interp))
-                self.currents_edges = feature.canny(currents_norm)
+                    self.currents_edges = self.pipeline.run('edges', params)
+                else:
+                    # All frames of the stack, across the process pool
+                    self.xpos_interp, self.ypos_interp, currents_interp, currents_edges, nano_adjust = \
+                        self.pipeline.run('stack_edges', params)
+                    self.currents_interp = currents_interp[self.frame]
+                    self.currents_edges = currents_edges[self.frame]
 
                 # Unit conversions
                 if self.distanceVar.get() == "mm":
-                    self.xpos_interp = self.xpos_interp.copy() / nano_adjust / 1E3
-                    self.ypos_interp = self.ypos_interp.copy() / nano_adjust / 1E3
+                    self.xpos_interp = self.xpos_interp / nano_adjust / 1E3
+                    self.ypos_interp = self.ypos_interp / nano_adjust / 1E3
                 elif self.distanceVar.get() == "nm":
-                    self.xpos_interp = self.xpos_interp.copy() / nano_adjust * 1E3
-                    self.ypos_interp = self.ypos_interp.copy() / nano_adjust * 1E3
+                    self.xpos_interp = self.xpos_interp / nano_adjust * 1E3
+                    self.ypos_interp = self.ypos_interp / nano_adjust * 1E3
                 elif self.distanceVar.get() == "µm":
-                    self.xpos_interp = self.xpos_interp.copy() / nano_adjust
-                    self.ypos_interp = self.ypos_interp.copy() / nano_adjust
+                    self.xpos_interp = self.xpos_interp / nano_adjust
+                    self.ypos_interp = self.ypos_interp / nano_adjust
                 else:
                     pass
 
@@ -1020,8 +846,8 @@ class ImageApp:
 
                 self.ax2.clear()
 
-                self.edge = self.ax2.pcolormesh(self.xpos_interp, self.ypos_interp, self.currents_edges,
-                                                cmap=cm.get_cmap('binary'))
+                self.edge = Rendering.draw_map(self.ax2, self.xpos_interp, self.ypos_interp, self.currents_edges,
+                                               cm.get_cmap('binary'))
                 self.ax2.set_xlabel('X ({})'.format(self.distanceVar.get()))
 
                 # X-Y axis limits; try/except loops, except loop will take place if entry field empty or invalid
@@ -1034,7 +860,8 @@ class ImageApp:
                 except:
                     pass
 
-                self.canvas.draw()
+                with Timing.span('canvas.draw', 'rendering'):
+                    self.canvas.draw()
 
             else:
                 self.labelXinterp2.config(text="N/A")
@@ -1074,6 +901,7 @@ class ImageApp:
         else:
             self.entryIssExp.config(state="disabled")
 
+    @Timing.timed('export')
     def save_figures(self):
         """Saves the figures that are currently being displayed by the app"""
         try:
@@ -1096,6 +924,7 @@ class ImageApp:
         except:
             self.labelPlot.config(text="Error saving figure to file.")
 
+    @Timing.timed('export')
     def export_data_action(self):
         """Exports the data and a record of data manipulation to a specified text file.
         The data format is:
@@ -1118,54 +947,55 @@ class ImageApp:
             pass
         if not export == "":
             try:
-                with open(export, "w+") as fh:
-                    # Header lines: print details about the file and data treatment
-                    fh.write("#FLUX: IMAGE\n")
-                    fh.write("#Original file: {} \n".format(self.filename))
-                    fh.write("#Units of current: {} \n".format("nA"))
-                    fh.write("#Units of distance: {} \n".format("um"))
-
-                    if self.statNorm == 1:
-                        if self.statNormXP == 1:
-                            normalstatus = 'Experimental iss'
-                            iss = self.entryIssExp.get()
-                        else:
-                            normalstatus = 'Theoretical iss'
-                            iss = self.iss
-
+                # Header lines: details about the file and data treatment
+                if self.statNorm == 1:
+                    if self.statNormXP == 1:
+                        normalstatus = 'Experimental iss'
+                        iss = self.entryIssExp.get()
                     else:
-                        normalstatus = 'No'
-                        iss = 'N/A'
-                    fh.write("#Currents normalized: {} \n".format(normalstatus))
-                    fh.write("#Steady state current used (nA): {} \n".format(iss))
+                        normalstatus = 'Theoretical iss'
+                        iss = self.iss
 
-                    if self.slopeXVar.get() == 'None':
-                        xslope = 'No'
-                    else:
-                        xslope = 'Yes'
+                else:
+                    normalstatus = 'No'
+                    iss = 'N/A'
 
-                    if self.slopeYVar.get() == 'None':
-                        yslope = 'No'
-                    else:
-                        yslope = 'Yes'
-
-                    fh.write("#X-slope corrected: {} \n".format(xslope))
-                    fh.write("#Y-slope corrected: {} \n".format(yslope))
-                    fh.write("# \n")
-
-                    # Print data points in x,y,i,edge(if applicable)
-                    # Note: python matrix indexing is weird hence: [y, x] and not the more intuitive [x, y]
-                    if self.statEdge == 1:
-                        fh.write("#X,Y,I,Edge\n")
-                        for x in range(len(self.xpos_interp)):
-                            for y in range(len(self.ypos_interp)):
-                                fh.write("{0:1.4E},{1:1.4E},{2:1.4E},{3:1d}\n".format(self.xpos_interp[x], self.ypos_interp[y], self.currents_interp[y, x], self.currents_edges[y, x]))
-                    else:
-                        fh.write("#X,Y,I\n")
-                        for x in range(self.nptsx):
-                            for y in range(self.nptsy):
-                                fh.write("{0:1.4E},{1:1.4E},{2:1.4E}\n".format(self.xpos[x], self.ypos[y], self.currents[y, x]))
-                    fh.close()
+                if self.slopeXVar.get() == 'None':
+                    xslope = 'No'
+                else:
+                    xslope = 'Yes'
+
+                if self.slopeYVar.get() == 'None':
+                    yslope = 'No'
+                else:
+                    yslope = 'Yes'
+
+                header = ["Units of current: {}".format("nA"),
+                          "Units of distance: {}".format("um"),
+                          "Currents normalized: {}".format(normalstatus),
+                          "Steady state current used (nA): {}".format(iss),
+                          "X-slope corrected: {}".format(xslope),
+                          "Y-slope corrected: {}".format(yslope)]
+                if self.feedback != FeedbackMap.MAPS[0] and self.statEdge == 0:
+                    header.append("Values (I): {}, Rg = {}, L = {}".format(
+                        FeedbackMap.LABELS[self.feedback], self.entryFeedbackRg.get(), self.entryFeedbackL.get()))
+                if self.grid_map != PGrid.MAPS[0] and self.statEdge == 0:
+                    header.append("Values (I): {} of the approach curves, radius = {} um, iss = {} nA, Rg = {}".format(
+                        PGrid.LABELS[self.grid_map], self.gridMaps.entryRadius.get(), self.gridMaps.entryIss.get(),
+                        self.gridMaps.entryRg.get()))
+                if self.scatter is not None:
+                    header.append("Reconstructed from {} scattered points: {}, {} neighbours".format(
+                        self.scatter.npts, self.scatterPoints.methodVar.get(), self.scatterPoints.entryNeighbours.get()))
+
+                # Data points in x,y,i,edge(if applicable), see Processing/Export.py
+                if self.statEdge == 1:
+                    columns = Export.image_columns(self.xpos_interp, self.ypos_interp, self.currents_interp,
+                                                   self.currents_edges)
+                    Export.write(export, 'image', self.filename, header, "X,Y,I,Edge", columns,
+                                 fmt=[Export.FORMAT] * 3 + ['%1d'])
+                else:
+                    columns = Export.image_columns(self.xpos, self.ypos, self.currents)
+                    Export.write(export, 'image', self.filename, header, "X,Y,I", columns)
                 self.labelPlot.config(text="Data exported.")
             except:
                 self.labelPlot.config(text="Error whilst exporting data.")
@@ -1198,12 +1028,21 @@ class ImageApp:
         print("Reset requested.")
         # Get rid of old data:
         try:
-            del self.df
+            del self.dataset
             del self.xpos0
             del self.ypos0
             del self.currents0
         except:
             pass
+        self.stack = self.grid = self.scatter = None
+        self.gridMaps.clear()
+        self.scatterPoints.clear()
+        self.follow.stop(keep=False)
+        self.pipeline.clear()
+        self.datasetList.clear()
+        self.stackFrames.clear()
+        self.mosaicImport.clear()
+        self.buffers.clear()
 
         # Recreate dummy data
         xpos = np.array([0, 1])
@@ -1226,12 +1065,14 @@ class ImageApp:
         self.cb.set_label('Current (nA)')
         self.ax1.set_xlabel('X (µm)')
         self.ax1.set_ylabel('Y (µm)')
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
         self.ax2.clear()
         self.fig.subplots_adjust(left=0.07, right=1.0)
         self.edge = self.ax2.pcolormesh(self.xpos_interp, self.ypos_interp, currents_edges, cmap=cm.get_cmap('binary'))
         self.ax2.set_xlabel('X (µm)')
-        self.canvas.draw()
+        with Timing.span('canvas.draw', 'rendering'):
+            self.canvas.draw()
 
         # Reset labels and buttons to default states
 
@@ -1259,6 +1100,7 @@ class ImageApp:
         self.checkNormalize.var.set(0)
         self.checkNormalizeExp.var.set(0)
         self.checkEdges.var.set(0)
+        self.checkScratch.var.set(0)
 
         # Entries
         self.entryIssExp.delete(0, "end")
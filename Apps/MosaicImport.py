@@ -0,0 +1,142 @@
+import threading
+import time
+import tkinter as tk
+from tkinter.filedialog import askopenfilenames, askopenfilename
+
+from Readers import Batch # messages of failed imports
+from Readers import Mosaic # stitching of image tiles
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the mosaic input of the image app. Import Mosaic asks
+for the tiles, then for the stage offsets file (cancel to use the positions
+recorded in the tiles), and stitches the tiles in the background (see
+Readers/Mosaic.py). The mosaic built so far is shown every REFRESH_S seconds
+while the tiles are placed.
+"""
+
+POLL_MS = 100  # interval at which the progress of the import is checked
+REFRESH_S = 1.0  # interval at which the mosaic built so far is shown
+
+
+class MosaicImport:
+    """'Import Mosaic' button.
+        manufacturer is the StringVar of the manufacturer dropdown (None = detect)
+        on_load(dataset) is called with the mosaic once all tiles are placed
+        on_update(dataset) is called with the mosaic built so far
+        on_status(text) is called with the progress of the import
+    """
+    def __init__(self, master, frame, manufacturer, on_load, on_update, on_status, row=7, column=1):
+        self.master = master
+        self.manufacturer = manufacturer
+        self.on_load = on_load
+        self.on_update = on_update
+        self.on_status = on_status
+        self.last_dir = "/"
+
+        self.mosaics = []  # mosaics imported, removed by clear()
+        self.result = None  # [mosaic, error, tiles placed, done] of the import running in the background
+        self.polling = None
+        self.ntiles = 0  # tiles selected
+        self.shown = 0  # tiles placed in the mosaic last shown
+        self.refreshed = 0.0
+
+        self.buttonMosaic = tk.Button(frame, text="Import Mosaic", command=self.SelectFiles)
+        self.buttonMosaic.grid(row=row, column=column, sticky="W" + "E", padx=10)
+        self.labelMosaic = tk.Label(frame, text="")
+        self.labelMosaic.grid(row=row, column=column + 1, columnspan=3, sticky="W", padx=10)
+
+    def SelectFiles(self):
+        filepaths = askopenfilenames(initialdir=self.last_dir + "/", title="Choose the tiles.")
+        if not filepaths:
+            return
+        self.last_dir = filepaths[0][:filepaths[0].rindex('/')]
+        offsets_file = askopenfilename(initialdir=self.last_dir + "/",
+                                       title="Choose the stage offsets file (cancel: positions of the tiles).")
+        try:
+            offsets = Mosaic.read_offsets(offsets_file) if offsets_file else None
+        except Exception as e:
+            self.on_status(Batch.message(e))
+            return
+        self.import_mosaic(sorted(filepaths), offsets)
+
+    def import_mosaic(self, filepaths, offsets=None):
+        """Starts stitching the tiles in the background"""
+        if self.result is not None:
+            return
+        manufacturer = None if self.manufacturer is None else self.manufacturer.get()
+        result = self.result = [None, None, 0, False]
+
+        def placed(mosaic, name):
+            result[0] = mosaic
+            result[2] += 1
+
+        def build():
+            try:
+                result[0] = Mosaic.build_mosaic(filepaths, offsets, manufacturer, on_tile=placed)
+            except Exception as e:
+                result[0] = None
+                result[1] = e
+            result[3] = True
+            if self.result is not result and result[0] is not None:
+                Mosaic.remove(result[0].dataset())  # cleared while building
+
+        threading.Thread(target=build, daemon=True).start()
+        self.buttonMosaic.config(state="disabled")
+        self.shown = 0
+        self.refreshed = time.perf_counter()
+        self.ntiles = len(filepaths)
+        self.on_status("Importing {} tiles...".format(self.ntiles))
+        self.polling = self.master.after(POLL_MS, self.poll)
+
+    def poll(self):
+        self.polling = None
+        mosaic, error, count, done = self.result
+        if not done:
+            self.labelMosaic.config(text="Placed {} of {} tiles".format(count, self.ntiles))
+            if mosaic is not None and count > self.shown and time.perf_counter() - self.refreshed > REFRESH_S:
+                self.shown = count
+                self.on_update(mosaic.dataset())
+                self.refreshed = time.perf_counter()
+            self.polling = self.master.after(POLL_MS, self.poll)
+            return
+        self.result = None
+        self.buttonMosaic.config(state="normal")
+        if error is not None:
+            self.labelMosaic.config(text="")
+            self.on_status(Batch.message(error))
+            print("Could not import the mosaic: {}".format(error))
+            return
+        dataset = mosaic.dataset()
+        self.labelMosaic.config(text="{} tiles, {} x {} points".format(count, dataset.nptsx, dataset.nptsy))
+        self.mosaics.append(dataset)
+        self.on_load(dataset)
+
+    def clear(self):
+        """Forgets the mosaics imported and removes their files"""
+        if self.polling is not None:
+            self.master.after_cancel(self.polling)
+        self.polling = None
+        self.result = None
+        self.buttonMosaic.config(state="normal")
+        self.labelMosaic.config(text="")
+        for dataset in self.mosaics:
+            Mosaic.remove(dataset)
+        self.mosaics = []
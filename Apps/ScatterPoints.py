@@ -0,0 +1,83 @@
+import tkinter as tk
+
+from Processing import PScatter # reconstruction of images sampled at scattered points
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the controls of images sampled at scattered points in
+the image app (see Readers/Scattered.py): the method, the number of
+neighbours and the size of the grid the points are reconstructed on (see
+Processing/PScatter.py). The image is reconstructed again on the next plot.
+"""
+
+
+class ScatterPoints:
+    """Reconstruction parameters of scattered points"""
+    def __init__(self, master, frame, row=10, column=1):
+        self.scatter = None
+
+        labelMethod = tk.Label(frame, text="Scattered points")
+        labelMethod.grid(row=row, column=column, sticky="E", padx=10)
+        self.methodVar = tk.StringVar(master)
+        self.methodVar.set(PScatter.METHODS[0])
+        self.popupMethod = tk.OptionMenu(frame, self.methodVar, *PScatter.METHODS)
+        self.popupMethod.configure(width=15, state="disabled")
+        self.popupMethod.grid(row=row, column=column + 1, sticky="W")
+
+        # Grid points per side ('auto': about one per point) and neighbours of every grid point
+        self.entries = []
+        for index, text in enumerate(["Grid pts/side", "Neighbours"]):
+            label = tk.Label(frame, text=text)
+            label.grid(row=row, column=column + 2 + 2 * index, sticky="E", padx=10)
+            entry = tk.Entry(frame, state="disabled")
+            entry.grid(row=row, column=column + 3 + 2 * index, sticky="W")
+            self.entries.append(entry)
+        self.entryPixels, self.entryNeighbours = self.entries
+        self.clear()
+
+    def set_scatter(self, scatter):
+        """Enables the controls for scattered points (None disables them)"""
+        self.scatter = scatter
+        state = "disabled" if scatter is None else "normal"
+        self.popupMethod.configure(state=state)
+        for entry in self.entries:
+            entry.config(state=state)
+
+    def parameters(self):
+        """Parameters of the reconstruction (see Processing/PScatter.py); None if an entry is invalid"""
+        pixels = self.entryPixels.get().strip()
+        try:
+            pixels = None if pixels.lower() in ('', 'auto') else int(pixels)
+            neighbours = int(self.entryNeighbours.get())
+        except ValueError:
+            return None
+        if (pixels is not None and pixels < 2) or neighbours < 1:
+            return None
+        return {'scatter_pixels': pixels, 'scatter_neighbours': neighbours, 'scatter_method': self.methodVar.get()}
+
+    def clear(self):
+        """Disables the controls and restores the default parameters"""
+        self.set_scatter(None)
+        self.methodVar.set(PScatter.METHODS[0])
+        for entry, value in zip(self.entries, ["auto", str(PScatter.NEIGHBOURS)]):
+            entry.config(state="normal")
+            entry.delete(0, tk.END)
+            entry.insert(0, value)
+            entry.config(state="disabled")
@@ -0,0 +1,193 @@
+import threading
+import tkinter as tk
+from tkinter.filedialog import askopenfilenames
+
+from Processing import PStack # maps shown for a frame (frame, difference maps, average)
+from Readers import Batch # messages of failed imports
+from Readers import Stack # import of time-lapse images
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the time-lapse input of the image app. Import Stack reads
+the selected files (one frame per file, in the order of their names) into a
+stack in the background (see Readers/Stack.py); the slider then selects the
+frame shown, without reading the files again. Moving the slider quickly only
+shows the frame it stops on.
+
+Align frames corrects the drift between the frames (see
+Processing/Registration.py); the map shown is the frame, its difference to
+the first or to the previous frame, or the average of all frames.
+"""
+
+POLL_MS = 100  # interval at which the end of the import is checked
+SCRUB_MS = 30  # delay before the frame under the slider is shown
+
+
+class StackFrames:
+    """'Import Stack' button and frame slider.
+        manufacturer is the StringVar of the manufacturer dropdown (None = detect)
+        on_load(dataset) is called with the stack once all its files are read
+        on_frame(index) is called when another frame, the alignment or the map shown is selected
+        on_status(text) is called with the progress of the import
+    """
+    def __init__(self, master, frame, manufacturer, on_load, on_frame, on_status, row=5, column=1):
+        self.master = master
+        self.manufacturer = manufacturer
+        self.on_load = on_load
+        self.on_frame = on_frame
+        self.on_status = on_status
+        self.last_dir = "/"
+
+        self.stack = None  # stack shown
+        self.index = 0  # frame shown
+        self.stacks = []  # stacks imported, removed by clear()
+        self.result = None  # [stack, error] of the import running in the background
+        self.polling = None
+        self.scrubbing = None
+
+        self.buttonStack = tk.Button(frame, text="Import Stack", command=self.SelectFiles)
+        self.buttonStack.grid(row=row, column=column, sticky="W" + "E", padx=10)
+        self.scaleFrame = tk.Scale(frame, from_=0, to=0, orient="horizontal", showvalue=0, state="disabled",
+                                   command=self.moved)
+        self.scaleFrame.grid(row=row, column=column + 1, sticky="W" + "E")
+        self.labelFrame = tk.Label(frame, text="")
+        self.labelFrame.grid(row=row, column=column + 2, columnspan=3, sticky="W", padx=10)
+
+        # Drift correction and map shown
+        self.statusAlign = tk.IntVar()
+        self.checkAlign = tk.Checkbutton(frame, text="Align frames?", variable=self.statusAlign, state="disabled",
+                                         command=self.changed)
+        self.checkAlign.var = self.statusAlign
+        self.checkAlign.grid(row=row + 1, column=column, sticky="W", padx=10)
+        self.viewVar = tk.StringVar(master)
+        self.viewVar.set(PStack.VIEWS[0])
+        self.popupView = tk.OptionMenu(frame, self.viewVar, *PStack.VIEWS)
+        self.popupView.configure(width=18, state="disabled")
+        self.popupView.grid(row=row + 1, column=column + 1, sticky="W")
+        self.viewVar.trace('w', self.changed)
+        self.shifts = None  # drift of every frame (µm), shown with the frame
+
+    def SelectFiles(self):
+        filepaths = askopenfilenames(initialdir=self.last_dir + "/", title="Choose the frames.")
+        if filepaths:
+            self.last_dir = filepaths[0][:filepaths[0].rindex('/')]
+            self.import_stack(sorted(filepaths))
+
+    def import_stack(self, filepaths):
+        """Starts reading the files into a stack in the background"""
+        if self.result is not None:
+            return
+        manufacturer = None if self.manufacturer is None else self.manufacturer.get()
+        result = self.result = [None, None]
+
+        def read():
+            try:
+                result[0] = Stack.read_stack(filepaths, manufacturer)
+            except Exception as e:
+                result[1] = e
+            if self.result is not result and result[0] is not None:
+                Stack.remove(result[0])  # cleared while reading
+
+        threading.Thread(target=read, daemon=True).start()
+        self.buttonStack.config(state="disabled")
+        self.on_status("Importing {} frames...".format(len(filepaths)))
+        self.polling = self.master.after(POLL_MS, self.poll)
+
+    def poll(self):
+        self.polling = None
+        stack, error = self.result
+        if stack is None and error is None:
+            self.polling = self.master.after(POLL_MS, self.poll)
+            return
+        self.result = None
+        self.buttonStack.config(state="normal")
+        if error is not None:
+            self.on_status(Batch.message(error))
+            print("Could not import the stack: {}".format(error))
+            return
+        self.stacks.append(stack)
+        self.on_load(stack)
+
+    def set_stack(self, stack):
+        """Shows the frames of a stack (None disables the slider)"""
+        self.stack = stack
+        self.index = 0
+        self.shifts = None
+        if stack is None:
+            self.scaleFrame.config(from_=0, to=0, state="disabled")
+            self.checkAlign.config(state="disabled")
+            self.popupView.configure(state="disabled")
+            self.labelFrame.config(text="")
+            return
+        self.scaleFrame.config(from_=0, to=stack.nframes - 1, state="normal")
+        self.checkAlign.config(state="normal")
+        self.popupView.configure(state="normal")
+        self.scaleFrame.set(0)
+        self.label()
+
+    def parameters(self):
+        """Parameters of the stages of the stack (see Processing/PStack.py)"""
+        return {'align': self.checkAlign.var.get(), 'view': self.viewVar.get()}
+
+    def set_shifts(self, shifts):
+        """Drift (dx, dy in µm) of every frame, shown with the frame; None hides it"""
+        self.shifts = shifts
+        if self.stack is not None:
+            self.label()
+
+    def label(self):
+        text = "Frame {} of {}: {}".format(self.index + 1, self.stack.nframes,
+                                           self.stack.metadata['frames'][self.index])
+        if self.shifts is not None and self.checkAlign.var.get() == 1:
+            text = text + ", drift x {:.2f}, y {:.2f} µm".format(*self.shifts[self.index])
+        self.labelFrame.config(text=text)
+
+    def changed(self, *args):
+        if self.stack is not None:
+            self.label()
+            self.on_frame(self.index)
+
+    def moved(self, value):
+        index = int(float(value))
+        if self.stack is None or index == self.index:
+            return
+        self.index = index
+        self.label()
+        if self.scrubbing is None:
+            self.scrubbing = self.master.after(SCRUB_MS, self.show)
+
+    def show(self):
+        self.scrubbing = None
+        self.on_frame(self.index)
+
+    def clear(self):
+        """Forgets the stacks imported and removes their files"""
+        for pending in (self.polling, self.scrubbing):
+            if pending is not None:
+                self.master.after_cancel(pending)
+        self.polling = self.scrubbing = None
+        self.result = None
+        self.buttonStack.config(state="normal")
+        self.set_stack(None)
+        self.checkAlign.var.set(0)
+        self.viewVar.set(PStack.VIEWS[0])
+        for stack in self.stacks:
+            Stack.remove(stack)
+        self.stacks = []
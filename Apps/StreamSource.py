@@ -0,0 +1,121 @@
+import tkinter as tk
+
+from Readers import Stream # client of live data streams
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the live stream input of the chronoamperometry and
+cyclic voltammetry apps. Connect Stream connects to the address of the entry
+(see Readers/Stream.py); the samples are received in the background and the
+plot is refreshed every REFRESH_MS with the samples held by the ring buffer.
+Disconnecting adds the data received last to the list of imported data sets.
+"""
+
+REFRESH_MS = 1000  # interval between two refreshes of the plot
+ADDRESS = 'tcp://127.0.0.1:5555'
+
+
+class StreamSource:
+    """'Connect Stream' button and address entry.
+        kind is the kind of data set of the app ('chronoamperometry' or 'voltammogram')
+        on_update(dataset) is called with the data received so far
+        on_status(text) is called with the number of samples and the rate
+        on_stop(dataset) is called with the last data set when disconnecting (None = nothing)
+    """
+    def __init__(self, master, frame, kind, on_update, on_status, on_stop=None, row=5, column=1):
+        self.master = master
+        self.kind = kind
+        self.on_update = on_update
+        self.on_status = on_status
+        self.on_stop = on_stop
+
+        self.client = None
+        self.polling = None
+        self.last_total = 0
+
+        self.buttonStream = tk.Button(frame, text="Connect Stream", command=self.toggle)
+        self.buttonStream.grid(row=row, column=column, sticky="W" + "E", padx=10)
+        self.entryAddress = tk.Entry(frame)
+        self.entryAddress.insert(0, ADDRESS)
+        self.entryAddress.grid(row=row, column=column + 1, sticky="W")
+
+    @property
+    def active(self):
+        return self.client is not None
+
+    def toggle(self):
+        if self.active:
+            self.stop()
+        else:
+            self.start(self.entryAddress.get())
+
+    def start(self, address):
+        """Connects to the stream; returns False (and reports why) if there is none at the address"""
+        self.stop()
+        client = Stream.StreamClient(address, self.kind)
+        try:
+            client.start()
+        except (OSError, ValueError) as e:
+            self.on_status("Could not connect: {}".format(e))
+            return False
+        self.client = client
+        self.last_total = 0
+        self.buttonStream.config(text="Disconnect")
+        self.on_status("Connected, waiting for data...")
+        self.polling = self.master.after(REFRESH_MS, self.poll)
+        return True
+
+    def poll(self):
+        """Refreshes the plot if samples were received since the last call"""
+        self.polling = None
+        client = self.client
+        if client.total > self.last_total:
+            self.last_total = client.total
+            dataset = client.dataset()
+            if dataset is not None:
+                try:
+                    self.on_update(dataset)
+                except Exception as e:
+                    print("Could not refresh the plot: {}".format(e))
+            self.on_status("Stream: {} samples, {:.0f} samples/s.".format(client.total, client.rate()))
+        if not client.running:
+            self.on_status("Stream stopped: {}".format(client.error or "closed."))
+            self.stop()
+            return
+        self.polling = self.master.after(REFRESH_MS, self.poll)
+
+    def stop(self, keep=True):
+        """Disconnects; if keep, the data received last are passed to on_stop"""
+        if self.polling is not None:
+            self.master.after_cancel(self.polling)
+            self.polling = None
+        if self.client is None:
+            return
+        client = self.client
+        self.client = None
+        client.stop()
+        self.buttonStream.config(text="Connect Stream")
+        if keep and self.on_stop is not None:
+            try:
+                dataset = client.dataset()
+            except:
+                dataset = None
+            if dataset is not None:
+                self.on_stop(dataset)
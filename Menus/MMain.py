@@ -1,5 +1,8 @@
 import tkinter as tk
 import webbrowser
+from tkinter.filedialog import asksaveasfilename
+
+from Processing import Timing
 
 # -*- coding: utf-8 -*-
 """  
@@ -147,3 +150,63 @@ class MenuPagesTop:
         add_button.pack(side=tk.TOP)
 
         window_github.mainloop()
+
+    @staticmethod
+    def performance_table():
+        """Summary of the timed spans (see Processing/Timing.py) as a text table"""
+        lines = ["{:<40}{:<12}{:>7}{:>12}{:>12}{:>12}{:>12}".format('Span', 'Category', 'Count', 'Total (ms)',
+                                                                    'Mean (ms)', 'Max (ms)', 'Last (ms)')]
+        for stat in Timing.RECORDER.summary():
+            lines.append("{:<40}{:<12}{:>7}{:>12.1f}{:>12.2f}{:>12.2f}{:>12.2f}".format(
+                stat['name'][:39], stat['category'], stat['count'], 1E3 * stat['total'], 1E3 * stat['mean'],
+                1E3 * stat['max'], 1E3 * stat['last']))
+        if len(lines) == 1:
+            lines.append("No spans recorded yet.")
+        return "\n".join(lines)
+
+    @staticmethod
+    def performance_page(main):
+        """This method displays the time spent importing, processing, rendering and exporting data sets. The spans can
+        be saved as JSON or as a Chrome trace (chrome://tracing, https://ui.perfetto.dev)."""
+        window_performance = tk.Toplevel(main)
+        window_performance.title('Flux - Performance')  # window title
+        window_performance.wm_iconbitmap('supporting/flux_logo.ico')  # window icon
+
+        frame_table = tk.Frame(window_performance)
+        frame_table.pack(side="top", fill="both", expand=True)
+        scrollbar_table = tk.Scrollbar(frame_table)
+        scrollbar_table.pack(side="right", fill="y")
+        text_table = tk.Text(frame_table, height=25, width=110, font='Courier 9', wrap="none",
+                             yscrollcommand=scrollbar_table.set)
+        text_table.pack(side="left", fill="both", expand=True)
+        scrollbar_table.config(command=text_table.yview)
+
+        def refresh():
+            text_table.config(state="normal")
+            text_table.delete("1.0", "end")
+            text_table.insert("end", MenuPagesTop.performance_table())
+            text_table.config(state="disabled")
+
+        def clear():
+            Timing.RECORDER.clear()
+            refresh()
+
+        def save(extension, function):
+            filepath = asksaveasfilename(defaultextension=extension, filetypes=[(extension, '*' + extension)],
+                                         title="Save timing")
+            if filepath:
+                try:
+                    function(filepath)
+                except:
+                    print("Could not save timing to {}.".format(filepath))
+
+        frame_buttons = tk.Frame(window_performance)
+        frame_buttons.pack(side="bottom")
+        tk.Button(frame_buttons, text="Refresh", command=refresh).grid(row=0, column=0, padx=10, pady=5)
+        tk.Button(frame_buttons, text="Clear", command=clear).grid(row=0, column=1, padx=10, pady=5)
+        tk.Button(frame_buttons, text="Save JSON...",
+                  command=lambda: save('.json', Timing.RECORDER.save_json)).grid(row=0, column=2, padx=10, pady=5)
+        tk.Button(frame_buttons, text="Save Chrome trace...",
+                  command=lambda: save('.json', Timing.RECORDER.save_chrome_trace)).grid(row=0, column=3, padx=10,
+                                                                                        pady=5)
+        refresh()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the work buffers used by the processing stages for their
+large intermediate arrays. A buffer is allocated once per name and re-used on
+every following call with the same shape, instead of allocating new full size
+arrays on every plot. With memmap enabled, buffers above min_bytes are backed
+by a scratch file on disk, so that maps larger than the available RAM can be
+processed. The coarse levels of the pyramid of such maps (see
+Processing/Pyramid.py) are stored in the same scratch directory.
+
+A stage that writes into a buffer overwrites its previous output; such stages
+are registered with reuse_output=True so the pipeline only keeps their latest
+output.
+"""
+
+
+class WorkBuffers:
+    """Named, preallocated arrays.
+        memmap enables the memory-mapped scratch files
+        directory is where the scratch directory is created (default: system temp directory)
+        min_bytes is the size above which a buffer is memory-mapped
+    """
+    def __init__(self, memmap=False, directory=None, min_bytes=16 * 2 ** 20):
+        self.memmap = memmap
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self.scratch = None  # scratch directory, created on first use
+        self.arrays = {}
+
+    def get(self, name, shape, dtype=float):
+        """Returns the buffer 'name', (re-)allocating it if its shape or dtype changed. The content is undefined."""
+        shape = tuple(shape)
+        array = self.arrays.get(name)
+        if array is not None and array.shape == shape and array.dtype == np.dtype(dtype):
+            return array
+        array = self._allocate(name, shape, dtype)
+        self.arrays[name] = array
+        return array
+
+    def _allocate(self, name, shape, dtype):
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if not self.use_memmap(nbytes):
+            return np.empty(shape, dtype=dtype)
+        # a new file per allocation; arrays handed out earlier may still be referenced (e.g. by the pipeline cache)
+        fh, filepath = tempfile.mkstemp(prefix=name + '_', suffix='.dat', dir=self.scratch_directory())
+        os.close(fh)
+        return np.memmap(filepath, dtype=dtype, mode='w+', shape=shape)
+
+    def use_memmap(self, nbytes):
+        """True if an array of nbytes is to be memory-mapped"""
+        return self.memmap and nbytes >= self.min_bytes
+
+    def scratch_directory(self):
+        """Scratch directory of the memory-mapped files, created on first use; removed by clear()"""
+        if self.scratch is None:
+            self.scratch = tempfile.mkdtemp(prefix='flux_scratch_', dir=self.directory)
+        return self.scratch
+
+    def set_memmap(self, memmap):
+        """Switches the memory-mapped scratch files on/off; existing buffers are dropped if the mode changes"""
+        if bool(memmap) != self.memmap:
+            self.memmap = bool(memmap)
+            self.arrays = {}
+
+    def clear(self):
+        """Drops all buffers and removes the scratch directory"""
+        self.arrays = {}
+        if self.scratch is not None:
+            shutil.rmtree(self.scratch, ignore_errors=True)
+            self.scratch = None
+
+
+def buffer(buffers, name, shape, dtype=float):
+    """Buffer 'name' if buffers are used, else None (numpy then allocates a new array when passed as out=)"""
+    if buffers is None:
+        return None
+    return buffers.get(name, shape, dtype)
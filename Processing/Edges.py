@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+from scipy import ndimage as ndi
+from skimage import feature # Canny algorithm
+from skimage.util import img_as_float, dtype_limits
+
+try:
+    # Steps of skimage.feature.canny (scikit-image >= 0.19), so that a tile is smoothed and suppressed only once;
+    # without them each tile is run through feature.canny twice
+    from skimage.feature._canny import _preprocess
+    from skimage.feature._canny_cy import _nonmaximum_suppression_bilinear
+except ImportError:
+    _preprocess = None
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains a tiled version of the Canny edge detector that gives the
+same output as a single call to skimage.feature.canny on the whole image.
+
+Canny consists of local steps (Gaussian smoothing, Sobel gradients, non-maximum
+suppression) followed by a global one (hysteresis: keep the weak edge pixels
+that are connected to a strong edge pixel). The local steps are run on
+overlapping tiles across a thread or process pool; the halo around each tile
+is wide enough that the core of the tile is not affected by the tile border.
+The suppressed gradient magnitude of a tile is thresholded at the low and the
+high threshold, and the hysteresis is then done once on the stitched edge
+candidates.
+"""
+
+
+def halo_size(sigma):
+    """Width of the overlap between tiles: Gaussian kernel radius (truncated at 4 sigma) + Sobel + non-maximum
+    suppression + border erosion, with one pixel to spare"""
+    return int(4.0 * sigma + 0.5) + 4
+
+
+def _canny_tile(args):
+    # Returns the weak (>= low) and strong (>= high) edge candidates of a tile
+    tile, sigma, low_threshold, high_threshold = args
+    if _preprocess is None:
+        weak = feature.canny(tile, sigma=sigma, low_threshold=low_threshold, high_threshold=low_threshold)
+        strong = feature.canny(tile, sigma=sigma, low_threshold=high_threshold, high_threshold=high_threshold)
+        return weak, strong
+    # Same steps as feature.canny (mode='constant', no mask); the suppressed magnitude is thresholded twice
+    smoothed, eroded_mask = _preprocess(tile, None, sigma, 'constant', 0.0)
+    jsobel = ndi.sobel(smoothed, axis=1)
+    isobel = ndi.sobel(smoothed, axis=0)
+    magnitude = isobel * isobel
+    magnitude += jsobel * jsobel
+    np.sqrt(magnitude, out=magnitude)
+    suppressed = _nonmaximum_suppression_bilinear(isobel, jsobel, magnitude, eroded_mask, low_threshold)
+    weak = suppressed > 0
+    return weak, weak & (suppressed >= high_threshold)
+
+
+def hysteresis(weak, strong):
+    """Keeps the weak edge pixels 8-connected to at least one strong edge pixel"""
+    labels, count = ndi.label(weak, np.ones((3, 3), bool))
+    if count == 0:
+        return weak
+    good_label = np.zeros((count + 1,), bool)
+    good_label[np.unique(labels[strong])] = True
+    good_label[0] = False
+    return good_label[labels]
+
+
+def tiled_canny(image, sigma=1.0, low_threshold=None, high_threshold=None, tile_size=512, workers=None,
+                executor='thread'):
+    """Canny edge detection on overlapping tiles. Same arguments and output as skimage.feature.canny (without mask
+    and quantile thresholds); workers is the size of the pool (default: number of cores), executor is 'thread' or
+    'process'."""
+    # Resolve the thresholds the way feature.canny does for the whole image
+    dtype_max = dtype_limits(image, clip_negative=False)[1]
+    if low_threshold is None:
+        low_threshold = 0.1
+    else:
+        low_threshold = low_threshold / dtype_max
+    if high_threshold is None:
+        high_threshold = 0.2
+    else:
+        high_threshold = high_threshold / dtype_max
+    image = img_as_float(image)
+
+    # Small images are processed in one go
+    if max(image.shape) <= tile_size:
+        return feature.canny(image, sigma=sigma, low_threshold=low_threshold, high_threshold=high_threshold)
+
+    # Split the image into tiles with a halo
+    halo = halo_size(sigma)
+    nrows, ncols = image.shape
+    cores = []
+    jobs = []
+    for row in range(0, nrows, tile_size):
+        for col in range(0, ncols, tile_size):
+            r0, r1 = max(row - halo, 0), min(row + tile_size + halo, nrows)
+            c0, c1 = max(col - halo, 0), min(col + tile_size + halo, ncols)
+            cores.append((row, min(row + tile_size, nrows), col, min(col + tile_size, ncols), r0, c0))
+            jobs.append((image[r0:r1, c0:c1], sigma, low_threshold, high_threshold))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        results = map(_canny_tile, jobs)
+    else:
+        if executor == 'process':
+            pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+        with pool:
+            results = list(pool.map(_canny_tile, jobs))
+
+    # Stitch the cores of the tiles
+    weak = np.zeros(image.shape, bool)
+    strong = np.zeros(image.shape, bool)
+    for (row0, row1, col0, col1, r0, c0), (tile_weak, tile_strong) in zip(cores, results):
+        weak[row0:row1, col0:col1] = tile_weak[row0 - r0:row1 - r0, col0 - c0:col1 - c0]
+        strong[row0:row1, col0:col1] = tile_strong[row0 - r0:row1 - r0, col0 - c0:col1 - c0]
+
+    return hysteresis(weak, strong)
@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+
+from Processing import PApproachCurve
+from Processing import PChronoAmperometry
+from Processing import PCyclicVoltammetry
+from Processing import PImage
+from Processing import Timing
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script writes the text files of Export Data of the apps (write(): a
+'#FLUX' title, '#' header lines and comma separated columns). The apps pass
+the header lines describing their settings and the displayed columns.
+
+export() processes a data set (Readers/Datasets.py) without the GUI, with
+the processing stages of the apps and their default settings, and writes it
+in the same format:
+1. Images : currents in nA, no slope correction or normalization
+   (#X,Y,I)
+2. Approach curves : calibrated as suited to the file format (first point
+   with data otherwise) (#Distance, Current)
+3. Voltammograms : formal potential and experimental iss of the first cycle
+   (#Potential, then the current of every cycle)
+4. Chronoamperograms : experimental iss (last 5% of the points) and response
+   time (#Time, Current)
+The columns are written with np.savetxt rather than line by line.
+"""
+
+FORMAT = '%1.4E'
+TITLES = {'image': 'IMAGE', 'approach_curve': 'APPROACH CURVE', 'voltammogram': 'CV', 'chronoamperometry': 'CA'}
+
+
+def write(filepath, kind, original, header, names, columns, fmt=FORMAT):
+    """Writes an export of Export Data.
+        kind is the kind of data set (see TITLES), original the name of the file the data were read from
+        header are the lines describing the data and their processing, names the names of the columns
+        columns are 1D arrays of the same length; fmt is the format of every column, or a list of formats
+    """
+    with open(filepath, 'w') as fh:
+        fh.write("#FLUX: {}\n".format(TITLES[kind]))
+        fh.write("#Original file: {} \n".format(original))
+        for line in header:
+            fh.write("#{} \n".format(line))
+        fh.write("# \n")
+        fh.write("#{}\n".format(names))
+        np.savetxt(fh, np.column_stack(columns), delimiter=',', fmt=fmt)
+    return filepath
+
+
+def image_columns(xpos, ypos, currents, edges=None):
+    """Columns X, Y, I (and Edge, 0 or 1) of an image: x in the outer loop, y in the inner loop"""
+    nptsy, nptsx = currents.shape
+    columns = [np.repeat(xpos[:nptsx], nptsy), np.tile(ypos[:nptsy], nptsx), currents.T.ravel()]
+    if edges is not None:
+        columns.append(edges.T.ravel())
+    return columns
+
+
+def process_image(dataset):
+    raw = (dataset.xpos, dataset.ypos, dataset.currents, dataset.nptsx, dataset.nptsy)
+    params = {'slope_x': 'None', 'slope_y': 'None', 'iss': 1, 'normalized': 0, 'current_unit': 'nA'}
+    pipeline = PImage.build_pipeline()
+    pipeline.set_source('raw', raw)
+    currents = pipeline.run('units', params)
+    xpos = dataset.xpos
+    ypos = PImage.display_ypos(xpos, dataset.nptsy, np.amin(dataset.ypos))
+
+    header = ["Units of current: nA",
+              "Units of distance: um",
+              "Currents normalized: No",
+              "Steady state current used (nA): N/A",
+              "X-slope corrected: No",
+              "Y-slope corrected: No"]
+    return header, "X,Y,I", image_columns(xpos, ypos, currents)
+
+
+def process_approach_curve(dataset):
+    params = {'zero_method': dataset.metadata.get('zero_method', 'First point with data')}
+    pipeline = PApproachCurve.build_pipeline()
+    pipeline.set_source('raw', (dataset.distances, dataset.currents))
+    distances, currents = pipeline.run('calibrate', params)
+
+    header = ["Units of current: nA",
+              "Units of distance: um",
+              "Method of determining d = 0: {}".format(params['zero_method'])]
+    return header, "Distance, Current", [distances, currents]
+
+
+def process_voltammogram(dataset):
+    params = {'potential_unit': 'V', 'current_unit': 'nA', 'exp_iss': 1}
+    pipeline = PCyclicVoltammetry.build_pipeline()
+    pipeline.set_source('raw', (dataset.potential, dataset.currents))
+    potential, currents = pipeline.run('units', params)
+    avg_pot, expiss, iss_index, iss_index2 = pipeline.run('analysis', params)
+
+    header = ["Units of current: nA",
+              "Units of potential: V",
+              "Number of cycles: {}".format(dataset.ncycles),
+              "Scan rate (mV/s): {}".format(dataset.scan_rate if dataset.scan_rate is not None else 'Not available'),
+              "Formal potential (V): {}".format(avg_pot if avg_pot is not None else 'Not calculated'),
+              "Experimental steady state current (nA): {}".format(expiss if expiss is not None else 'Not calculated')]
+    names = "Potential" + "".join(", Current (cycle {})".format(cycle + 1) for cycle in range(dataset.ncycles))
+    return header, names, [potential] + [currents[cycle, :] for cycle in range(dataset.ncycles)]
+
+
+def process_chronoamperometry(dataset):
+    # Experimental iss from the last 5% of the points, as the chronoamperometry app
+    npts_iss = int(np.floor(dataset.npts) * 0.05)
+    expiss0 = np.mean(dataset.currents[-npts_iss:-1])
+    params = {'time_unit': 's', 'current_unit': 'nA'}
+    pipeline = PChronoAmperometry.build_pipeline()
+    pipeline.set_source('raw', (dataset.time, dataset.currents, expiss0))
+    time, currents, crittime, expiss = pipeline.run('units', params)
+
+    header = ["Units of current: nA",
+              "Units of time: s",
+              "Experimental steady state current (nA): {}".format(expiss),
+              "Response time (s): {}".format(crittime if crittime is not None else 'Not calculated')]
+    return header, "Time, Current", [time, currents]
+
+
+PROCESSORS = {'image': process_image,
+              'approach_curve': process_approach_curve,
+              'voltammogram': process_voltammogram,
+              'chronoamperometry': process_chronoamperometry}
+
+
+def export(dataset, filepath):
+    """Processes the data set with the default settings of its app and writes it to filepath"""
+    with Timing.span('process ' + dataset.kind, 'processing', file=dataset.name):
+        header, names, columns = PROCESSORS[dataset.kind](dataset)
+    with Timing.span('export ' + dataset.kind, 'export', file=dataset.name):
+        return write(filepath, dataset.kind, dataset.name, header, names, columns)
+
+
+def output_path(directory, filepath):
+    """Name of the export of filepath in directory: the file name with the extension replaced by _flux.txt"""
+    name = os.path.basename(filepath)
+    return os.path.join(directory, os.path.splitext(name)[0] + '_flux.txt')
@@ -0,0 +1,82 @@
+from functools import lru_cache
+
+import numpy as np
+
+from Processing.PApproachCurve import negfb, posfb, mixedfb
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Feedback maps of the image app: the normalized current of every point is
+converted to the tip-substrate distance L = d/a (topography) or to the local
+rate constant kappa, by inverting the feedback approximations of
+Processing/PApproachCurve.py:
+1. Distance (negative feedback) : negfb(L, Rg), insulating substrate.
+2. Distance (positive feedback) : posfb(L, Rg), conducting substrate.
+3. log10 kappa : mixedfb(L, Rg, kappa) at the distance L of the scan.
+
+Instead of solving for every point, the model is tabulated once on
+TABLE_POINTS distances (or rates) evenly spaced in log scale, and the currents
+are interpolated in the table (np.interp, a binary search per point). The
+models are monotonic in L and in kappa over the ranges of the tables; points
+whose current lies outside the range of the table are NaN. Tables are cached
+by model, Rg and L.
+"""
+
+MAPS = ['Current', 'Distance (negative feedback)', 'Distance (positive feedback)', 'log10 kappa']
+LABELS = {'Distance (negative feedback)': 'Distance (L = d/a)',
+          'Distance (positive feedback)': 'Distance (L = d/a)',
+          'log10 kappa': 'log10 kappa'}
+L_RANGE = (1E-2, 1E2)  # distances of the tables (L = d/a)
+KAPPA_RANGE = (1E-4, 1E4)  # rate constants of the tables
+TABLE_POINTS = 4096
+
+
+@lru_cache(maxsize=16)
+def lookup_table(feedback_map, rg, height=None):
+    """Normalized currents (increasing) and the log of L, or log10 of kappa, of the model of feedback_map (see
+    MAPS); height is the distance L of the scan for kappa maps"""
+    if feedback_map == 'log10 kappa':
+        values = np.linspace(np.log10(KAPPA_RANGE[0]), np.log10(KAPPA_RANGE[1]), TABLE_POINTS)
+        currents = mixedfb(height, rg, 10 ** values)
+    else:
+        values = np.linspace(np.log(L_RANGE[0]), np.log(L_RANGE[1]), TABLE_POINTS)
+        model = negfb if feedback_map == 'Distance (negative feedback)' else posfb
+        currents = model(np.exp(values), rg)
+    if currents[-1] < currents[0]:
+        currents, values = currents[::-1], values[::-1]
+    # Only strictly increasing currents can be inverted
+    keep = np.concatenate([[True], currents[1:] > np.maximum.accumulate(currents)[:-1]])
+    return currents[keep], values[keep]
+
+
+def invert(currents, table):
+    """Values of the table at the currents; NaN outside the range of the table"""
+    table_currents, table_values = table
+    return np.interp(currents, table_currents, table_values, left=np.nan, right=np.nan)
+
+
+def feedback_map(currents, feedback_map, feedback_rg, feedback_height):
+    """Map of the normalized currents selected by feedback_map (see MAPS); 'Current' returns the currents"""
+    if feedback_map not in LABELS:
+        return currents
+    if feedback_map == 'log10 kappa':
+        return invert(currents, lookup_table(feedback_map, float(feedback_rg), float(feedback_height)))
+    distances = invert(currents, lookup_table(feedback_map, float(feedback_rg)))
+    return np.exp(distances, out=distances)
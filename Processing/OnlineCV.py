@@ -0,0 +1,237 @@
+import threading
+
+import numpy as np
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the online analysis of cyclic voltammograms: samples
+(potential, current) are fed as they arrive (e.g. from a live stream, see
+Readers/Stream.py). Only block means of the cycle being recorded are kept;
+the metrics of a cycle are calculated once when it ends, so the work per
+sample and the memory do not depend on the length of the experiment.
+
+Cycle boundaries: a cycle starts at the potential of the first sample and in
+the direction in which the potential first moves away from it by more than
+`hysteresis`. It ends at the last sample at which the potential is back at (or
+beyond) the starting potential before moving away again in the starting
+direction, so noise around the starting potential does not split cycles.
+
+Metrics of every cycle (as the Analytics tab, from block means of `block`
+samples to reduce noise):
+1. Formal potential: mean of the potentials of the extrema of the derivative
+   of the current, within the sweeps (the pairs of blocks next to a vertex
+   are excluded, where the current may step when the sweep reverses)
+2. Experimental iss: difference of the currents at the two vertex potentials
+3. Peaks: potential and current of the highest (anodic) and lowest
+   (cathodic) current, and their separation
+"""
+
+HYSTERESIS = 0.005  # V
+BLOCK = 16  # samples per block mean
+
+# States of the cycle boundary detection
+LEAVING, AWAY, ARMED = 0, 1, 2
+
+
+class CycleStats:
+    """Block means of one cycle; the metrics are calculated from them when the row of the cycle is requested (once
+    for a finished cycle), so the work per sample is constant"""
+    def __init__(self, number, block):
+        self.number = number
+        self.block = block
+        self.npts = 0
+        self.means_p = []  # arrays of block means
+        self.means_i = []
+        self.carry_p = np.empty(0)  # samples of the incomplete block
+        self.carry_i = np.empty(0)
+        self.cached = None  # (number of arrays of block means, row)
+
+    def add(self, potential, currents):
+        if len(potential) == 0:
+            return
+        self.npts = self.npts + len(potential)
+        # The samples of an incomplete block are kept for the next call
+        if len(self.carry_p):
+            potential = np.concatenate([self.carry_p, potential])
+            currents = np.concatenate([self.carry_i, currents])
+        nblocks = len(potential) // self.block
+        end = nblocks * self.block
+        self.carry_p = potential[end:].copy()
+        self.carry_i = currents[end:].copy()
+        if nblocks > 0:
+            self.means_p.append(potential[:end].reshape(nblocks, self.block).mean(axis=1))
+            self.means_i.append(currents[:end].reshape(nblocks, self.block).mean(axis=1))
+
+    def row(self, complete):
+        if self.cached is None or self.cached[0] != len(self.means_p):
+            if len(self.means_p) > 1:
+                self.means_p = [np.concatenate(self.means_p)]
+                self.means_i = [np.concatenate(self.means_i)]
+            self.cached = (len(self.means_p), metrics(self.means_p[0] if self.means_p else np.empty(0),
+                                                      self.means_i[0] if self.means_i else np.empty(0)))
+        row = dict(self.cached[1])
+        row.update({'cycle': self.number, 'complete': complete, 'npts': self.npts})
+        return row
+
+
+def metrics(potential, currents):
+    """Metrics of a cycle from its block means; values that cannot be calculated yet are None"""
+    row = dict((key, None) for key in ('formal_potential', 'iss', 'Epa', 'ipa', 'Epc', 'ipc', 'dEp'))
+    if len(potential) < 2:
+        return row
+    j, k = np.argmax(currents), np.argmin(currents)
+    row.update({'Epa': potential[j], 'ipa': currents[j], 'Epc': potential[k], 'ipc': currents[k],
+                'dEp': potential[j] - potential[k]})
+    j, k = np.argmax(potential), np.argmin(potential)
+    if potential[j] > potential[k]:
+        row['iss'] = currents[j] - currents[k]
+
+    # Derivative within the sweeps: pairs of blocks next to a change of the sweep direction (vertex) are excluded
+    sweep = np.sign(np.diff(potential))
+    valid = sweep != 0
+    valid[1:] = valid[1:] & (sweep[1:] == sweep[:-1])
+    valid[:-1] = valid[:-1] & (sweep[:-1] == sweep[1:])
+    if np.any(valid):
+        deriv = np.diff(currents)[valid]
+        midpoints = ((potential[1:] + potential[:-1]) / 2)[valid]
+        row['formal_potential'] = (midpoints[np.argmax(deriv)] + midpoints[np.argmin(deriv)]) / 2
+    return row
+
+
+class CycleAnalyzer:
+    """Per-cycle metrics of a voltammogram fed sample by sample or in chunks of any size.
+        feed(potential, currents) adds samples (may be called from another thread than table())
+        table() returns one row (dict) per cycle, the cycle being recorded last
+        finish() ends the last cycle (e.g. at the end of a file)
+    """
+    def __init__(self, hysteresis=HYSTERESIS, block=BLOCK):
+        self.hysteresis = hysteresis
+        self.block = block
+        self.lock = threading.Lock()
+        self.start = None  # starting potential
+        self.direction = 0  # +1 or -1 once the potential moved away from the start
+        self.state = LEAVING
+        self.pending_p = np.empty(0)  # samples that may belong to the next cycle (potential back at the start)
+        self.pending_i = np.empty(0)
+        self.cycles = []  # rows of the finished cycles
+        self.cycle = CycleStats(1, block)
+        self.nsamples = 0
+
+    def feed(self, potential, currents):
+        potential = np.asarray(potential, dtype=float)
+        currents = np.asarray(currents, dtype=float)
+        with self.lock:
+            self.nsamples = self.nsamples + len(potential)
+            if len(self.pending_p):
+                potential = np.concatenate([self.pending_p, potential])
+                currents = np.concatenate([self.pending_i, currents])
+                self.pending_p, self.pending_i = np.empty(0), np.empty(0)
+            if len(potential) == 0:
+                return
+            if self.start is None:
+                self.start = potential[0]
+            if self.direction == 0:
+                away = np.flatnonzero(np.abs(potential - self.start) > self.hysteresis)
+                if len(away) == 0:
+                    self.cycle.add(potential, currents)
+                    return
+                self.direction = 1 if potential[away[0]] > self.start else -1
+
+            boundaries, end = self._boundaries((potential - self.start) * self.direction)
+            begin = 0
+            for boundary in boundaries:
+                self.cycle.add(potential[begin:boundary], currents[begin:boundary])
+                self.cycles.append(self.cycle.row(True))
+                self.cycle = CycleStats(self.cycle.number + 1, self.block)
+                begin = boundary
+            self.cycle.add(potential[begin:end], currents[begin:end])
+            # Copied: the arrays fed may be re-used by the caller (e.g. the receive buffer of a stream)
+            self.pending_p, self.pending_i = potential[end:].copy(), currents[end:].copy()
+
+    def _boundaries(self, progress):
+        """Indices at which new cycles start, and the index from which the samples are kept pending. Only the
+        indices of the state changes are visited, so the loop runs a few times per cycle."""
+        back = np.flatnonzero(progress <= 0)
+        away = np.flatnonzero(progress > self.hysteresis)
+        boundaries = []
+        position = 0
+        while True:
+            if self.state == ARMED:
+                k = np.searchsorted(away, position)
+                if k == len(away):
+                    # The next cycle may start at the last sample back at the start
+                    return boundaries, back[-1]
+                position = away[k]
+                boundaries.append(back[np.searchsorted(back, position) - 1])
+                self.state = AWAY
+            elif self.state == AWAY:
+                k = np.searchsorted(back, position)
+                if k == len(back):
+                    return boundaries, len(progress)
+                position = back[k]
+                self.state = ARMED
+            else:
+                k = np.searchsorted(away, position)
+                if k == len(away):
+                    return boundaries, len(progress)
+                position = away[k]
+                self.state = AWAY
+
+    def finish(self):
+        with self.lock:
+            self.cycle.add(self.pending_p, self.pending_i)
+            self.pending_p, self.pending_i = np.empty(0), np.empty(0)
+            if self.cycle.npts:
+                self.cycles.append(self.cycle.row(True))
+                self.cycle = CycleStats(self.cycle.number + 1, self.block)
+
+    def table(self):
+        with self.lock:
+            rows = list(self.cycles)
+            if self.cycle.npts:
+                rows.append(self.cycle.row(False))
+            return rows
+
+
+def analyze(dataset, hysteresis=HYSTERESIS, block=BLOCK):
+    """Per-cycle table of a voltammogram data set (Readers/Datasets.py)"""
+    analyzer = CycleAnalyzer(hysteresis, block)
+    for cycle in range(dataset.ncycles):
+        valid = ~np.isnan(dataset.currents[cycle, :])
+        analyzer.feed(dataset.potential[valid], dataset.currents[cycle, valid])
+    analyzer.finish()
+    return analyzer.table()
+
+
+def format_table(rows):
+    """Per-cycle table as text; incomplete cycles are marked with *"""
+    def value(number, fmt):
+        return fmt.format(number) if number is not None else "-"
+    lines = ["{:<8}{:>10}{:>14}{:>12}{:>12}{:>12}{:>12}{:>12}{:>12}".format(
+        'Cycle', 'Points', 'E0\' (V)', 'iss (nA)', 'Epa (V)', 'ipa (nA)', 'Epc (V)', 'ipc (nA)', 'dEp (V)')]
+    for row in rows:
+        lines.append("{:<8}{:>10}{:>14}{:>12}{:>12}{:>12}{:>12}{:>12}{:>12}".format(
+            str(row['cycle']) + ('' if row['complete'] else '*'), row['npts'],
+            value(row['formal_potential'], "{:.4f}"), value(row['iss'], "{:.4g}"), value(row['Epa'], "{:.4f}"),
+            value(row['ipa'], "{:.4g}"), value(row['Epc'], "{:.4f}"), value(row['ipc'], "{:.4g}"),
+            value(row['dEp'], "{:.4f}")))
+    if len(rows) == 0:
+        lines.append("No cycles yet.")
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+import numpy as np
+import scipy.optimize # nonlinear curve fitting
+
+from Processing.Pipeline import Pipeline
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Processing stages and feedback theory of the approach curve app. The source
+'raw' is the tuple (distances0, currents0) produced by PACApp.ImportFile.
+
+raw --> calibrate --> normalize --> fit_rg --> fit_kappa --> feedback, kappa_curve
+"""
+
+
+def negfb(Lvalues, Rg):
+    """Analytical approximation of the normalized current for pure negative feedback (insulating substrate)"""
+    currentsins_pt1 = ((2.08 / (Rg ** 0.358)) * (Lvalues - (0.145 / Rg))) + 1.585
+    currentsins_pt2 = (2.08 / (Rg ** 0.358) * (Lvalues + (0.0023 * Rg))) + 1.57
+    currentsins_pt3 = (np.log(Rg) / Lvalues) + (2 / (np.pi * Rg) * (np.log(1 + (np.pi * Rg) / (2 * Lvalues))))
+    currentsins = currentsins_pt1 / (currentsins_pt2 + currentsins_pt3)
+
+    return currentsins
+
+
+def posfb(Lvalues, Rg):
+    """Analytical approximation of the normalized current for pure positive feedback (conducting substrate)"""
+    alpha = np.log(2) + np.log(2) * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - np.log(2) * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
+    beta = 1 + 0.639 * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - 0.186 * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
+    currentscond = alpha + (1 / beta) * (np.pi / (4 * np.arctan(Lvalues))) + (1 - alpha - (0.5 / beta)) * (2 / np.pi) * np.arctan(Lvalues)
+
+    return currentscond
+
+
+def mixedfb(Lvalues, Rg, kappa):
+    """Analytical approximation of the normalized current for finite substrate kinetics (dimensionless rate kappa)"""
+    # negfb
+    currentsins = negfb(Lvalues, Rg)
+
+    # positive fb
+    alpha = np.log(2) + np.log(2) * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - np.log(2) * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
+    beta = 1 + 0.639 * (1 - (2 / np.pi) * np.arccos(1 / Rg)) - 0.186 * (1 - ((2 / np.pi) * np.arccos(1 / Rg)) ** 2)
+    currentsmixed_pt0 = alpha + (1 / beta) * (np.pi / (4 * np.arctan(Lvalues + (1 / kappa)))) + (1 - alpha - (0.5 / beta)) * (2 / np.pi) * np.arctan(Lvalues + (1 / kappa))
+
+    # Merge neg/posfb expressions into analytical approx.
+    currentsmixed_pt1 = currentsins - 1
+    currentsmixed_pt2 = 1 + (2.47 * Lvalues * kappa) * (Rg ** 0.31)
+    currentsmixed_pt3 = 1 + (Lvalues ** ((0.006 * Rg + 0.113))) * (kappa ** ((-0.0236 * Rg + 0.91)))
+
+    currentsmixed = currentsmixed_pt0 + ((currentsmixed_pt1) / (currentsmixed_pt2 * currentsmixed_pt3))
+
+    return currentsmixed
+
+
+def calibrate(raw, zero_method):
+    """Strips NaN points and determines the zero tip-substrate distance"""
+    distances, currents = raw
+
+    # Strip off any NaN points, make first point containing a current value the new zero
+    critrow = np.amin(np.where(np.isnan(currents) == False))
+    distances = distances[critrow:]
+    currents = currents[critrow:]
+
+    if zero_method != 'No calibration':
+        distances = distances - np.amin(distances)  # correct to min
+
+    if zero_method == "First derivative analysis":
+        # Perform a derivative analysis, take location of peak to be zero
+        currentsderiv = abs(np.gradient(currents))
+        maxderiv = np.where(currentsderiv == np.amax(currentsderiv))
+        maxderiv = int(maxderiv[0][0])
+
+        # Strip off any points before the deriv peak (assume electrode bent)
+        distances = distances[maxderiv:]
+        currents = currents[maxderiv:]
+
+    return distances, currents
+
+
+def normalize(calibrated, radius, iss):
+    """Normalizes distances by the electrode radius and currents by the steady state current"""
+    distances, currents = calibrated
+    return distances / radius, currents / iss
+
+
+def estimate_rg(normalized, fit_rg):
+    """Fits Rg to the negative feedback approximation if requested. Returns the (truncated) normalized curve and
+    the estimated Rg, which is None if the fit failed or was not requested."""
+    distancesnorm, currentsnorm = normalized
+    if not fit_rg:
+        return distancesnorm, currentsnorm, None
+
+    critrow = np.amin(np.where(distancesnorm >= 0.1))
+    distancesnorm = distancesnorm[critrow:]
+    currentsnorm = currentsnorm[critrow:]
+
+    try:
+        # bounds prevent Rg<1 (insulating glass having smaller radius than the electrode it is meant to be
+        # surrounding)
+        estRg = scipy.optimize.curve_fit(negfb, distancesnorm, currentsnorm, bounds=(1, np.inf))
+        estRg = float(estRg[0][0])
+    except:
+        estRg = None
+    return distancesnorm, currentsnorm, estRg
+
+
+def estimate_kappa(rgfit, fit_kappa, rg):
+    """Fits kappa to the mixed feedback approximation at fixed Rg if requested. Returns the (truncated) normalized
+    curve and the estimated kappa, which is None if the fit failed or was not requested."""
+    distancesnorm, currentsnorm, estRg = rgfit
+    if not fit_kappa:
+        return distancesnorm, currentsnorm, None
+
+    critrow = np.amin(np.where(distancesnorm >= 0.1))
+    distancesnorm = distancesnorm[critrow:]
+    currentsnorm = currentsnorm[critrow:]
+
+    try:
+        estKappa = scipy.optimize.curve_fit(lambda L, kappa: mixedfb(L, rg, kappa), distancesnorm, currentsnorm,
+                                            bounds=(0, np.inf))  # bounds prevent negative kappa
+        estKappa = float(estKappa[0][0])
+    except:
+        estKappa = None
+    return distancesnorm, currentsnorm, estKappa
+
+
+def feedback(kappafit, rgfit, rg, fit_rg):
+    """Pure negative and positive feedback curves, using the fit Rg if requested"""
+    distancesnorm = kappafit[0]
+    if fit_rg:
+        Rg = rgfit[2]
+    else:
+        Rg = rg
+
+    return negfb(distancesnorm, Rg), posfb(distancesnorm, Rg)
+
+
+def kappa_curve(kappafit, rg):
+    """Mixed feedback curve for the estimated kappa"""
+    distancesnorm, currentsnorm, estKappa = kappafit
+    return mixedfb(distancesnorm, rg, estKappa)
+
+
+def build_pipeline(maxsize=32):
+    pipeline = Pipeline(maxsize)
+    pipeline.set_source('raw', None)
+    pipeline.add_stage('calibrate', calibrate, inputs=['raw'], params=['zero_method'])
+    pipeline.add_stage('normalize', normalize, inputs=['calibrate'], params=['radius', 'iss'])
+    pipeline.add_stage('fit_rg', estimate_rg, inputs=['normalize'], params=['fit_rg'])
+    pipeline.add_stage('fit_kappa', estimate_kappa, inputs=['fit_rg'], params=['fit_kappa', 'rg'])
+    pipeline.add_stage('feedback', feedback, inputs=['fit_kappa', 'fit_rg'], params=['rg', 'fit_rg'])
+    pipeline.add_stage('kappa_curve', kappa_curve, inputs=['fit_kappa'], params=['rg'])
+    return pipeline
@@ -0,0 +1,81 @@
+import numpy as np
+
+from Processing.Pipeline import Pipeline
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Processing stages of the chronoamperometry app. The source 'raw' is the tuple
+(time0, currents0, expiss0) produced by CAApp.ImportFile.
+
+raw --> response_time --> units
+"""
+
+
+def response_time(raw):
+    """Searches the trace from the end for the first point where the current is 110% of the experimental iss.
+    Returns the response time in s, or None if it could not be determined."""
+    time, currents, expiss = raw
+    try:
+        critvalue = abs(1.1 * expiss)
+
+        if expiss < 0:
+            rtcurrent = np.flip(np.absolute(currents))
+        elif expiss > 0:
+            rtcurrent = np.flip(currents)
+        else:
+            print('Error in detecting iss. Cannot calculate response time.')
+        modcol = rtcurrent > critvalue
+        critpt = np.amin(np.where(modcol == True))
+        return time[-critpt]
+    except:
+        print("Error calculating response time.")
+        return None
+
+
+def convert_units(raw, crittime, time_unit, current_unit):
+    """Converts time (and the response time) to s/ms/min and currents (and the experimental iss) to nA/uA/pA.
+    Returns time, currents, crittime and expiss."""
+    time, currents, expiss = raw
+
+    if time_unit == "ms":
+        time = time * 1E3
+        if crittime is not None:
+            crittime = crittime * 1E3
+    elif time_unit == "min":
+        time = time / 60
+        if crittime is not None:
+            crittime = crittime / 60
+
+    if current_unit == "µA":
+        currents = currents / 1E3
+        expiss = expiss / 1E3
+    elif current_unit == "pA":
+        currents = currents * 1E3
+        expiss = expiss * 1E3
+
+    return time, currents, crittime, expiss
+
+
+def build_pipeline(maxsize=32):
+    pipeline = Pipeline(maxsize)
+    pipeline.set_source('raw', None)
+    pipeline.add_stage('response_time', response_time, inputs=['raw'])
+    pipeline.add_stage('units', convert_units, inputs=['raw', 'response_time'], params=['time_unit', 'current_unit'])
+    return pipeline
@@ -0,0 +1,110 @@
+import numpy as np
+
+from Processing.Pipeline import Pipeline
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Processing stages of the cyclic voltammetry app. The source 'raw' is the tuple
+(potential0, currents_reshape0) produced by CVApp.ImportFile.
+
+raw --> units --> analysis
+"""
+
+
+def convert_units(raw, potential_unit, current_unit):
+    """Converts potentials to V/mV and currents to nA/uA/pA"""
+    potential, currents_reshape = raw
+
+    if potential_unit == "mV":
+        potential = potential * 1E3
+
+    if current_unit == "µA":
+        currents_reshape = currents_reshape / 1E3
+    elif current_unit == "pA":
+        currents_reshape = currents_reshape * 1E3
+
+    return potential, currents_reshape
+
+
+def analyze(converted, exp_iss):
+    """Calculates the formal potential from the extrema of the derivative of the first cycle and, if requested, the
+    experimental iss from the two plateaus of the first cycle. Returns avg_pot, expiss, iss_index and iss_index2;
+    values that could not be calculated are None."""
+    potential, currents_reshape = converted
+    avg_pot = None
+    expiss = None
+    iss_index = None
+    iss_index2 = None
+
+    try:
+        current_deriv = np.gradient(currents_reshape[0, :])
+
+        # Find max value of derivative
+        check_max = current_deriv == np.amax(current_deriv)
+        max_index = np.where(check_max == True)
+        max_index = int(max_index[0][0])
+        pot_max = potential[max_index]
+
+        # Find min value of derivative
+        check_min = current_deriv == np.amin(current_deriv)
+        min_index = np.where(check_min == True)
+        min_index = int(min_index[0][0])
+        pot_min = potential[min_index]
+
+        avg_pot = np.mean([pot_max, pot_min])
+
+        # Calculate experimental iss
+        if exp_iss:
+            try:
+                current_deriv = np.absolute(current_deriv)
+
+                # Look for two plateaus based on the derivatives
+                # Subtract them to calculate the expiss
+                # First in the beginning of the scan (before first peak),
+                # Second in the middle of the scan (between first and second peak)
+                if min_index > max_index:
+                    check_iss = current_deriv[max_index:min_index] == np.amin(current_deriv[max_index:min_index])
+                    check_iss2 = current_deriv[0:max_index] == np.amin(current_deriv[0:max_index])
+                else:
+                    check_iss = current_deriv[min_index:max_index] == np.amin(current_deriv[min_index:max_index])
+                    check_iss2 = current_deriv[0:min_index] == np.amin(current_deriv[0:min_index])
+
+                # Convert the index of the plateau to its corresponding current
+                iss_index = np.where(check_iss == True)
+                iss_index = int(iss_index[0][-1]) + np.amin([max_index, min_index])
+                iss_index2 = np.where(check_iss2 == True)
+                expiss = (currents_reshape[0, iss_index] - currents_reshape[0, iss_index2])[0, 0]
+
+            except:
+                iss_index = None
+                iss_index2 = None
+
+    except:
+        pass
+
+    return avg_pot, expiss, iss_index, iss_index2
+
+
+def build_pipeline(maxsize=32):
+    pipeline = Pipeline(maxsize)
+    pipeline.set_source('raw', None)
+    pipeline.add_stage('units', convert_units, inputs=['raw'], params=['potential_unit', 'current_unit'])
+    pipeline.add_stage('analysis', analyze, inputs=['units'], params=['exp_iss'])
+    return pipeline
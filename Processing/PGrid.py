@@ -0,0 +1,154 @@
+import numpy as np
+
+from Processing.PApproachCurve import negfb, mixedfb
+from Readers import Batch
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Processing stages of approach curve grids (ApproachGridDataset, see
+Readers/ApproachGrid.py) in the image app: the approach curve of every point
+is fitted as in the approach curve app (Processing/PApproachCurve.py) and the
+fitted kappa and Rg are shown as maps. The source 'grid' is the tuple
+(distances, currents), currents being the 3D array of the grid.
+
+grid --> grid_fit
+
+The distances are normalized by the radius and the currents by iss; points
+closer than L = 0.1 are left out of the fits. Rg is fitted to the negative
+feedback approximation if requested, and kappa to the mixed feedback
+approximation at the Rg entered.
+
+Instead of one curve_fit per point, the curves of a chunk of points are
+fitted together, one parameter per curve (log10 kappa or log Rg):
+1. the sum of squares of every curve is evaluated on a coarse grid of the
+   parameter, the best value of every curve starts the iterations;
+2. Gauss-Newton steps, with a finite difference derivative, are computed for
+   all curves at once by array operations; a step that does not reduce the
+   sum of squares of a curve is halved for that curve only.
+Chunks of points are fitted in parallel on the shared process pool of
+Readers/Batch.py.
+"""
+
+CHUNK_BYTES = 4 * 2 ** 20  # size of the chunks of curves fitted at once
+MAPS = ['Current', 'log10 kappa', 'Rg', 'Fit residual']
+LABELS = {'log10 kappa': 'log10 kappa', 'Rg': 'Rg', 'Fit residual': 'RMS fit residual (normalized)'}
+LMIN = 0.1  # closest normalized distance used in the fits
+KAPPA_GRID = np.linspace(-4, 4, 33)  # log10 kappa
+RG_GRID = np.log(np.logspace(0, 2, 25))  # log Rg, Rg >= 1
+ITERATIONS = 12
+STEP = 1E-4  # finite difference of the parameter
+
+
+def sum_squares(model, currents, valid):
+    residuals = np.where(valid, model - currents, 0.0)
+    return np.einsum('ij,ij->i', residuals, residuals), residuals
+
+
+def fit_curves(model, currents, valid, grid, bounds):
+    """Least squares fit of one parameter p to every curve (row) of currents; model(p) returns the model curves of
+    the parameters p (one per row). Returns the parameters and the RMS residuals."""
+    # Coarse grid: best value of every curve
+    best = np.full(len(currents), grid[0])
+    best_ss = np.full(len(currents), np.inf)
+    for value in grid:
+        ss = sum_squares(model(np.full(len(currents), value)), currents, valid)[0]
+        better = ss < best_ss
+        best[better] = value
+        best_ss[better] = ss[better]
+
+    # Gauss-Newton steps, halved where they do not improve the fit
+    p = best
+    scale = np.ones(len(currents))
+    for iteration in range(ITERATIONS):
+        curves = model(p)
+        ss, residuals = sum_squares(curves, currents, valid)
+        jacobian = np.where(valid, (model(p + STEP) - curves) / STEP, 0.0)
+        jj = np.einsum('ij,ij->i', jacobian, jacobian)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(jj > 0, -np.einsum('ij,ij->i', jacobian, residuals) / jj, 0.0)
+        trial = np.clip(p + scale * np.clip(step, -1, 1), bounds[0], bounds[1])
+        trial_ss = sum_squares(model(trial), currents, valid)[0]
+        improved = trial_ss < ss
+        p = np.where(improved, trial, p)
+        ss = np.where(improved, trial_ss, ss)
+        scale = np.where(improved, 1.0, scale / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return p, np.sqrt(ss / valid.sum(axis=1))
+
+
+def _fit_chunk(args):
+    # Runs in a worker process: fits of one chunk of curves
+    lvalues, currents, rg, fit_rg = args
+    valid = np.isfinite(currents) & (lvalues >= LMIN)[np.newaxis, :]
+    currents = np.where(valid, currents, 0.0)
+    lvalues = np.maximum(lvalues, LMIN)[np.newaxis, :]
+    empty = valid.sum(axis=1) < 2
+
+    log_rg = np.full(len(currents), np.nan)
+    if fit_rg:
+        log_rg = fit_curves(lambda p: negfb(lvalues, np.exp(p)[:, np.newaxis]), currents, valid, RG_GRID,
+                            (0.0, np.log(1E3)))[0]
+    log_kappa, residual = fit_curves(lambda p: mixedfb(lvalues, rg, 10 ** p[:, np.newaxis]), currents, valid,
+                                     KAPPA_GRID, (-6.0, 6.0))
+    for values in (log_rg, log_kappa, residual):
+        values[empty] = np.nan
+    return log_kappa, np.exp(log_rg), residual
+
+
+def chunks(npoints, curve_bytes, parts=1):
+    """(start, end) of the chunks of curves of at most CHUNK_BYTES (at least one curve), and at least parts chunks"""
+    step = max(1, min(CHUNK_BYTES // max(curve_bytes, 1), -(-npoints // parts)))
+    for start in range(0, npoints, step):
+        yield start, min(start + step, npoints)
+
+
+def fit_grid(grid, grid_radius, grid_iss, grid_rg, grid_fit_rg, workers=None):
+    """Fits every curve of the grid. Returns the maps (nptsy, nptsx) of MAPS[1:] by name; Rg is NaN unless
+    grid_fit_rg."""
+    distances, currents = grid
+    nptsy, nptsx, nptsz = currents.shape
+    lvalues = np.asarray(distances, dtype=float) / grid_radius
+    curves = np.asarray(currents, dtype=float).reshape(-1, nptsz)
+    if workers is None:
+        workers = Batch.cores()
+    jobs = [(lvalues, curves[start:end] / grid_iss, grid_rg, grid_fit_rg)
+            for start, end in chunks(len(curves), curves[0].nbytes, workers)]
+    if workers == 1 or len(jobs) == 1:
+        results = list(map(_fit_chunk, jobs))
+    else:
+        results = list(Batch.process_pool().map(_fit_chunk, jobs))
+
+    maps = {}
+    for index, name in enumerate(MAPS[1:]):
+        maps[name] = np.concatenate([result[index] for result in results]).reshape(nptsy, nptsx)
+    return maps
+
+
+def grid_view(pipeline, params):
+    """Map of the fits selected by params['grid_view'] (see MAPS)"""
+    return pipeline.run('grid_fit', params)[params['grid_view']]
+
+
+def add_stages(pipeline):
+    """Adds the stages of approach curve grids to the pipeline of the image app (PImage.build_pipeline)"""
+    pipeline.set_source('grid', None)
+    pipeline.add_stage('grid_fit', fit_grid, inputs=['grid'],
+                       params=['grid_radius', 'grid_iss', 'grid_rg', 'grid_fit_rg'])
+    return pipeline
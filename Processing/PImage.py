@@ -0,0 +1,196 @@
+from functools import partial
+
+import numpy as np
+from scipy.interpolate import griddata # Interpolation algorithm
+
+from Processing.Pipeline import Pipeline
+from Processing.FeedbackMap import feedback_map
+from Processing.Buffers import buffer
+from Processing.Edges import tiled_canny
+from Processing.Pyramid import ImagePyramid
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Processing stages of the image app. The source 'raw' is the tuple
+(xpos0, ypos0, currents0, nptsx, nptsy) produced by ImageApp.ImportFile.
+
+raw --> slope --> normalize --> units --> interpolate --> edges
+                                        \--> pyramid
+                                        \--> feedback
+
+feedback converts the normalized currents to distances or rate constants
+(see Processing/FeedbackMap.py).
+"""
+
+
+def slope_correction(raw, slope_x, slope_y, buffers=None):
+    """Removes a linear background along x and/or y. Note that the y-slope correction is applied to the original
+    currents, as was always the case in Flux. Without correction the original currents are returned."""
+    xpos, ypos, currents0, nptsx, nptsy = raw
+    if slope_x not in ('Y = 0', 'Y = Max') and slope_y not in ('X = 0', 'X = Max'):
+        return currents0
+    currents = buffer(buffers, 'slope', currents0.shape)
+    if currents is None:
+        currents = currents0.copy()
+    else:
+        currents[...] = currents0
+
+    # X-Slope correction
+    if slope_x == 'Y = 0':
+        xslope0 = np.polyfit(xpos, currents0[0, :], 1)
+        np.subtract(currents0, xslope0[0] * (xpos - xpos[0])[np.newaxis, :], out=currents)
+    elif slope_x == 'Y = Max':
+        xslopemax = np.polyfit(xpos, currents0[-1, :], 1)
+        np.subtract(currents0, xslopemax[0] * (xpos - xpos[0])[np.newaxis, :], out=currents)
+
+    # Y-Slope correction
+    if slope_y == 'X = 0':
+        yslope0 = np.polyfit(ypos, currents[:, 0], 1)
+        np.subtract(currents0, yslope0[0] * (ypos - ypos[0])[:, np.newaxis], out=currents)
+    elif slope_y == 'X = Max':
+        yslopemax = np.polyfit(ypos, currents[:, -1], 1)
+        np.subtract(currents0, yslopemax[0] * (ypos - ypos[0])[:, np.newaxis], out=currents)
+
+    return currents
+
+
+def normalize(currents, iss, buffers=None):
+    """Divides the currents by the steady state current; iss = 1 if normalization is deselected"""
+    if iss == 1:
+        return currents
+    return np.divide(currents, iss, out=buffer(buffers, 'normalize', np.shape(currents)))
+
+
+def convert_units(currents, raw, normalized, current_unit, buffers=None):
+    """Converts the currents between nA/uA/pA if they are not normalized, reshapes to (nptsy, nptsx)"""
+    xpos, ypos, currents0, nptsx, nptsy = raw
+    if not normalized:
+        if current_unit == "µA":
+            currents = np.divide(currents, 1E3, out=buffer(buffers, 'units', np.shape(currents)))
+        elif current_unit == "pA":
+            currents = np.multiply(currents, 1E3, out=buffer(buffers, 'units', np.shape(currents)))
+    return currents.reshape(nptsy, nptsx)
+
+
+def display_ypos(xpos, nptsy, ystart=None):
+    """y positions used for plotting and export; the image is assumed to be square. They start at ystart (default:
+    the first x position)."""
+    ypos_int = (np.amax(xpos) - np.amin(xpos)) / (nptsy - 1)
+    ypos = np.arange(np.amin(xpos), (np.amax(xpos) + ypos_int), ypos_int)
+    if ystart is None:
+        return ypos
+    return ypos - np.amin(xpos) + ystart
+
+
+def interpolate(currents, raw, buffers=None):
+    """Interpolates the image onto an evenly spaced grid (1 pt/um, or 1 pt/nm for nanoscale images) to prepare for
+    edge detection. Returns xpos_interp, ypos_interp, currents_interp and the nano_adjust factor."""
+    xpos, ypos0, currents0, nptsx, nptsy = raw
+    ypos = display_ypos(xpos, nptsy)
+
+    # The Following interpolation does not play nice with negative x,y positions very much.
+    xposa = xpos - np.amin(xpos)  # Adjust the x-positions so that there are no negative values
+    yposa = ypos - np.amin(ypos)  # Adjust the y-positions so that there are no negative values
+    nano_adjust = 1.0
+    # check if the resolution is sub-micron. if so, use nm instead of um, additionally, ensure that this
+    # adjustment will not crash things
+    if xposa[1] - xposa[0] < 0.5 and np.amax(xposa) < 10:
+        nano_adjust = 1E3
+        xposa = xposa * nano_adjust
+        yposa = yposa * nano_adjust
+    xposa = np.around(xposa)
+    yposa = np.around(yposa)
+
+    # Point cloud (y, x, i) compatible with the interpolation algorithm
+    ypos_int = np.amax(xposa) / ((nptsy) - 1)
+    npts = nptsx * nptsy
+    dfycol = buffer(buffers, 'interpolate_y', (npts,))
+    if dfycol is None:
+        dfycol = np.arange(npts, dtype=float)
+    else:
+        dfycol[:] = np.arange(npts)
+    # duct tape hack so that point where the floor function below get assigned to the correct row
+    dfycol[np.remainder(dfycol, nptsx) == 0] += 1
+    np.divide(dfycol, nptsx, out=dfycol)
+    np.floor(dfycol, out=dfycol)
+    np.multiply(dfycol, ypos_int, out=dfycol)
+    dfxcol = buffer(buffers, 'interpolate_x', (nptsy, nptsx))
+    if dfxcol is None:
+        dfxcol = np.tile(xposa, nptsy)
+    else:
+        dfxcol[:] = xposa[np.newaxis, :]
+        dfxcol = dfxcol.reshape(npts)
+    dficol = np.reshape(currents, npts)
+
+    # Check if already evenly spaced; if yes, do nothing; if no, create grid @ 1 pt/um level
+    if nptsx > nptsy:
+        xpos_interp = np.linspace(np.amin(xposa), np.amax(xposa), int(np.amax(xposa)) + 1)
+        ypos_interp = xpos_interp
+    elif nptsx < nptsy:
+        xpos_interp = np.linspace(np.amin(yposa), np.amax(yposa), int(np.amax(yposa)) + 1)
+        ypos_interp = xpos_interp
+    else:
+        xpos_interp = xposa
+        ypos_interp = xpos_interp
+    xpos_unigrid, ypos_unigrid = np.meshgrid(xpos_interp, ypos_interp)
+
+    # Interpolate to prepare for edge detection
+    currents_interp = griddata((dfxcol, dfycol), dficol, (xpos_unigrid, ypos_unigrid), method='cubic')
+
+    return xpos_interp, ypos_interp, currents_interp, nano_adjust
+
+
+def detect_edges(interpolated, buffers=None, workers=None):
+    """Canny edge detection on the interpolated image, rescaled to [0, 1]; large images are processed in tiles
+    across workers threads (default: all cores)"""
+    xpos_interp, ypos_interp, currents_interp, nano_adjust = interpolated
+    cmin = np.amin(currents_interp)
+    cmax = np.amax(currents_interp)
+    currents_norm = np.subtract(currents_interp, cmin, out=buffer(buffers, 'edges_norm', currents_interp.shape))
+    np.divide(currents_norm, cmax - cmin, out=currents_norm)
+    return tiled_canny(currents_norm, workers=workers)
+
+
+def build_pyramid(currents, buffers=None):
+    """Multi-resolution pyramid used to draw very large images. With disk scratch enabled in the buffers and an image
+    above their memmap threshold, the coarse levels are memory-mapped to the scratch directory."""
+    directory = None
+    if buffers is not None and buffers.use_memmap(currents.nbytes):
+        directory = buffers.scratch_directory()
+    return ImagePyramid(currents, directory=directory)
+
+
+def build_pipeline(maxsize=32, buffers=None):
+    """buffers (Processing.Buffers.WorkBuffers) are used for the large intermediate arrays if given"""
+    reuse = buffers is not None
+    pipeline = Pipeline(maxsize)
+    pipeline.set_source('raw', None)
+    pipeline.add_stage('slope', partial(slope_correction, buffers=buffers), inputs=['raw'],
+                       params=['slope_x', 'slope_y'], reuse_output=reuse)
+    pipeline.add_stage('normalize', partial(normalize, buffers=buffers), inputs=['slope'], params=['iss'],
+                       reuse_output=reuse)
+    pipeline.add_stage('units', partial(convert_units, buffers=buffers), inputs=['normalize', 'raw'],
+                       params=['normalized', 'current_unit'], reuse_output=reuse)
+    pipeline.add_stage('interpolate', partial(interpolate, buffers=buffers), inputs=['units', 'raw'])
+    pipeline.add_stage('edges', partial(detect_edges, buffers=buffers), inputs=['interpolate'])
+    pipeline.add_stage('pyramid', partial(build_pyramid, buffers=buffers), inputs=['units'])
+    pipeline.add_stage('feedback', feedback_map, inputs=['units'],
+                       params=['feedback_map', 'feedback_rg', 'feedback_height'])
+    return pipeline
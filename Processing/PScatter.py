@@ -0,0 +1,169 @@
+import numpy as np
+from scipy.spatial import cKDTree # nearest neighbour search
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Processing stages of images sampled at scattered points (ScatteredImageDataset,
+see Readers/Scattered.py) in the image app: the currents are reconstructed on
+an evenly spaced grid, which is then processed like any other image (see
+Processing/PImage.py). The source 'scatter' is the tuple (xpoints, ypoints,
+currents).
+
+scatter --> scatter_tree --> reconstruct
+
+Instead of a global triangulation (griddata), the value at every grid point
+is computed from its nearest points only:
+1. scatter_tree : k-d tree of the points, built once per data set;
+2. reconstruct : the scatter_neighbours nearest points of every grid point
+   are looked up in the tree, in chunks of grid rows, and weighted by
+   1/distance^POWER. scatter_method (see METHODS) is either
+   - 'Local plane' : weighted least squares plane through the neighbours,
+     solved for all grid points at once; where the neighbours are (nearly)
+     on a line, the weighted mean is used instead;
+   - 'Inverse distance' : weighted mean of the neighbours (Shepard), which
+     never overshoots but flattens the image around every point.
+   A grid point on top of a point takes its current.
+The search is bounded to MAX_GAP times the mean spacing of the points, so
+grid points far from every point (holes in the scan) are NaN instead of
+being extrapolated. The image app assumes square images; as for mosaics (see
+Readers/Mosaic.py), the shorter side of the grid is extended with NaN to the
+length of the longer one. Time and memory grow with the number of grid points
+times scatter_neighbours, which allows millions of points.
+"""
+
+METHODS = ['Local plane', 'Inverse distance']
+NEIGHBOURS = 8  # default number of neighbours of a grid point
+POWER = 2  # exponent of the inverse distance weights
+MAX_GAP = 3.0  # largest distance to a point, in mean point spacings
+CHUNK_POINTS = 2 ** 18  # grid points looked up at once
+MIN_DETERMINANT = 1E-6  # smallest determinant of the plane fits, relative to the product of the diagonal
+
+
+def point_spacing(xpoints, ypoints):
+    """Mean spacing of the points: side of the area of the bounding box per point (length per point for lines)"""
+    width = np.ptp(xpoints)
+    height = np.ptp(ypoints)
+    if width > 0 and height > 0:
+        return np.sqrt(width * height / len(xpoints))
+    return max(width, height) / max(len(xpoints) - 1, 1)
+
+
+def grid_axes(xpoints, ypoints, scatter_pixels=None):
+    """x and y positions of the reconstructed grid: square, with the same step along x and y, the longer side
+    covering the points. scatter_pixels is the number of grid points per side; by default the step is the mean
+    spacing of the points."""
+    side = max(np.ptp(xpoints), np.ptp(ypoints))
+    if scatter_pixels:
+        step = side / (scatter_pixels - 1)
+    else:
+        step = point_spacing(xpoints, ypoints)
+    if step <= 0:
+        raise ValueError("All points are at the same position.")
+    npts = int(round(side / step)) + 1
+    return np.amin(xpoints) + step * np.arange(npts), np.amin(ypoints) + step * np.arange(npts)
+
+
+def build_tree(scatter):
+    """k-d tree of the positions of the points"""
+    xpoints, ypoints, currents = scatter
+    return cKDTree(np.column_stack([xpoints, ypoints]), balanced_tree=False)
+
+
+def weights(distances):
+    """Inverse distance weights of the neighbours (0 for missing ones) and the neighbours at distance 0"""
+    with np.errstate(divide='ignore'):
+        weights = 1.0 / distances ** POWER
+    exact = np.isinf(weights)
+    weights[exact] = 0.0
+    return weights, exact
+
+
+def local_planes(weights, dx, dy, values):
+    """Weighted least squares planes through the neighbours (dx, dy: positions relative to the grid points); value of
+    every plane at its grid point, the weighted mean where the fit is ill-conditioned"""
+    columns = (np.ones_like(dx), dx, dy)
+    normal = np.empty((len(values), 3, 3))
+    rhs = np.empty((len(values), 3))
+    for i in range(3):
+        rhs[:, i] = np.einsum('ij,ij,ij->i', weights, columns[i], values)
+        for j in range(i, 3):
+            normal[:, i, j] = normal[:, j, i] = np.einsum('ij,ij,ij->i', weights, columns[i], columns[j])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        planes = rhs[:, 0] / normal[:, 0, 0]
+        solvable = np.linalg.det(normal) > MIN_DETERMINANT * normal[:, 0, 0] * normal[:, 1, 1] * normal[:, 2, 2]
+    planes[solvable] = np.linalg.solve(normal[solvable], rhs[solvable, :, np.newaxis])[:, 0, 0]
+    return planes
+
+
+def interpolate(distances, indices, xgrid, ygrid, scatter, method=METHODS[0]):
+    """Values at the grid points (xgrid, ygrid) from their neighbours (distances, indices: (npts, k), inf and the
+    number of points for missing neighbours); NaN without neighbours"""
+    xpoints, ypoints, currents = scatter
+    values = np.append(currents, 0.0)[indices]
+    weight, exact = weights(distances)
+    if method == 'Inverse distance':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.einsum('ij,ij->i', weight, values) / weight.sum(axis=1)
+    else:
+        dx = np.append(xpoints, 0.0)[indices] - xgrid[:, np.newaxis]
+        dy = np.append(ypoints, 0.0)[indices] - ygrid[:, np.newaxis]
+        result = local_planes(weight, dx, dy, values)
+    # Grid points on top of a point take its current
+    hits = exact.any(axis=1)
+    result[hits] = values[hits, exact[hits].argmax(axis=1)]
+    return result
+
+
+def reconstruct(tree, scatter, scatter_pixels=None, scatter_neighbours=NEIGHBOURS, scatter_method=METHODS[0],
+                workers=-1):
+    """Currents of the points on an evenly spaced square grid. Returns xpos, ypos and the currents (nptsy, nptsx);
+    grid points beyond the extent of the points are NaN. workers is the number of threads of the tree search (-1: all
+    cores)."""
+    xpoints, ypoints, currents = scatter
+    xpos, ypos = grid_axes(xpoints, ypoints, scatter_pixels)
+    neighbours = max(1, min(int(scatter_neighbours), len(currents)))
+    bound = MAX_GAP * point_spacing(xpoints, ypoints)
+    image = np.full((len(ypos), len(xpos)), np.nan)
+
+    # Only the grid points within the extent of the points are looked up
+    step = xpos[1] - xpos[0]
+    nptsx = min(len(xpos), int(round(np.ptp(xpoints) / step)) + 1)
+    nptsy = min(len(ypos), int(round(np.ptp(ypoints) / step)) + 1)
+    rows = max(1, CHUNK_POINTS // nptsx)
+    for start in range(0, nptsy, rows):
+        end = min(start + rows, nptsy)
+        xgrid, ygrid = np.meshgrid(xpos[:nptsx], ypos[start:end])
+        xgrid, ygrid = xgrid.ravel(), ygrid.ravel()
+        distances, indices = tree.query(np.column_stack([xgrid, ygrid]), k=neighbours, distance_upper_bound=bound,
+                                        workers=workers)
+        if neighbours == 1:
+            distances, indices = distances[:, np.newaxis], indices[:, np.newaxis]
+        image[start:end, :nptsx] = interpolate(distances, indices, xgrid, ygrid, scatter,
+                                               scatter_method).reshape(-1, nptsx)
+    return xpos, ypos, image
+
+
+def add_stages(pipeline):
+    """Adds the stages of scattered points to the pipeline of the image app (PImage.build_pipeline)"""
+    pipeline.set_source('scatter', None)
+    pipeline.add_stage('scatter_tree', build_tree, inputs=['scatter'])
+    pipeline.add_stage('reconstruct', reconstruct, inputs=['scatter_tree', 'scatter'],
+                       params=['scatter_pixels', 'scatter_neighbours', 'scatter_method'])
+    return pipeline
@@ -0,0 +1,210 @@
+from functools import partial
+
+import numpy as np
+
+from Processing import PImage
+from Processing import Registration
+from Processing.Buffers import buffer
+from Readers import Batch
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Processing stages of time-lapse images (ImageStackDataset, see
+Readers/Stack.py) in the image app. The source 'stack' is the tuple
+(xpos0, ypos0, frames, nptsx, nptsy), frames being the 3D array of the stack.
+
+stack --> stack_units --> stack_shifts --> stack_aligned --> stack_edges
+                                                         \--> stack_average
+
+1. stack_units : slope correction, normalization and unit conversion of
+   every frame, as PImage does for one image. The stack is processed in
+   chunks of frames; within a chunk the slopes of all frames are fitted by a
+   single least squares solve and subtracted by broadcasting.
+2. stack_shifts, stack_aligned : drift correction, every frame registered to
+   the first one (see Processing/Registration.py), then the output of
+   stack_units shifted back; without 'align' the shifts are zero and the
+   frames are passed on unchanged.
+3. stack_edges : interpolation and edge detection of every frame, one frame
+   per task of the shared process pool of Readers/Batch.py. Frames stored in
+   memory-mapped files are passed to the workers by file name and offset.
+4. stack_average : mean of the aligned frames.
+
+Selecting another frame in the app only indexes the outputs, which are cached
+by the pipeline until a parameter changes; see frame_view() for the maps
+shown (frame, difference maps, average).
+"""
+
+CHUNK_BYTES = 4 * 2 ** 20  # size of the chunks of frames processed at once (fits in the cache)
+VIEWS = ['Frame', 'Difference to first', 'Difference to previous', 'Average']
+
+
+def chunks(nframes, frame_bytes):
+    """(start, end) of the chunks of frames of at most CHUNK_BYTES (at least one frame)"""
+    step = max(1, CHUNK_BYTES // max(frame_bytes, 1))
+    for start in range(0, nframes, step):
+        yield start, min(start + step, nframes)
+
+
+def fitted_slopes(positions, profiles):
+    """Slopes of the straight lines fitted to every row of profiles (nframes, npts), as np.polyfit"""
+    return np.polyfit(positions, profiles.T, 1)[0]
+
+
+def slope_correction(currents0, xpos, ypos, slope_x, slope_y, out):
+    """PImage.slope_correction of every frame of currents0 (nframes, nptsy, nptsx), written into out"""
+    # X-Slope correction
+    corrected = currents0
+    if slope_x in ('Y = 0', 'Y = Max'):
+        row = 0 if slope_x == 'Y = 0' else -1
+        xslopes = fitted_slopes(xpos, currents0[:, row, :])
+        corrected = np.subtract(currents0, xslopes[:, np.newaxis, np.newaxis] * (xpos - xpos[0]), out=out)
+
+    # Y-Slope correction (fitted to the x-corrected currents, applied to the original ones as in PImage)
+    if slope_y in ('X = 0', 'X = Max'):
+        column = 0 if slope_y == 'X = 0' else -1
+        yslopes = fitted_slopes(ypos, corrected[:, :, column])
+        corrected = np.subtract(currents0, yslopes[:, np.newaxis, np.newaxis] * (ypos - ypos[0])[:, np.newaxis],
+                                out=out)
+
+    if corrected is currents0:
+        out[...] = currents0
+    return out
+
+
+def process_stack(stack, slope_x, slope_y, iss, normalized, current_unit, buffers=None):
+    """Slope correction, normalization and unit conversion of every frame. Without any change the frames of the
+    stack are returned."""
+    xpos, ypos, frames, nptsx, nptsy = stack
+    slope = slope_x in ('Y = 0', 'Y = Max') or slope_y in ('X = 0', 'X = Max')
+    # Normalization and unit conversion in a single multiplication
+    scale = 1.0 / iss
+    if not normalized and current_unit == "µA":
+        scale = scale / 1E3
+    elif not normalized and current_unit == "pA":
+        scale = scale * 1E3
+    if not slope and scale == 1:
+        return frames
+
+    out = buffer(buffers, 'stack_units', frames.shape)
+    if out is None:
+        out = np.empty(frames.shape)
+    for start, end in chunks(len(frames), frames[0].nbytes):
+        chunk = out[start:end]
+        slope_correction(np.asarray(frames[start:end], dtype=float), xpos, ypos, slope_x, slope_y, chunk)
+        if scale != 1:
+            np.multiply(chunk, scale, out=chunk)
+    return out
+
+
+def register(frames, align, cache=None):
+    """Shifts (nframes, 2) of the frames relative to the first one (points), zero if align is deselected"""
+    if not align:
+        return np.zeros((len(frames), 2))
+    return Registration.register(frames, 0, cache)
+
+
+def align_frames(frames, shifts, buffers=None):
+    if not np.any(shifts):
+        return frames
+    return Registration.align(frames, shifts, out=buffer(buffers, 'stack_aligned', frames.shape))
+
+
+def average(frames, shifts):
+    return Registration.average(frames, shifts)
+
+
+def frame_view(pipeline, params, index):
+    """Map shown for frame index of the stack, as selected by params['view'] (see VIEWS)"""
+    aligned = pipeline.run('stack_aligned', params)
+    view = params['view']
+    if view == 'Average':
+        return pipeline.run('stack_average', params)
+    elif view in ('Difference to first', 'Difference to previous'):
+        reference = 0 if view == 'Difference to first' else max(index - 1, 0)
+        return Registration.difference(aligned, pipeline.run('stack_shifts', params), index, reference)
+    return aligned[index]
+
+
+def frame_reference(frames, index):
+    """Frame of a stack as passed to a worker process: (file name, dtype, shape, offset) for memory-mapped files,
+    else a copy of the frame"""
+    if isinstance(frames, np.memmap) and frames.filename is not None and frames.flags['C_CONTIGUOUS']:
+        return frames.filename, frames.dtype.str, frames.shape[1:], frames.offset + index * frames[0].nbytes
+    return np.array(frames[index])
+
+
+def load_frame(reference):
+    if isinstance(reference, tuple):
+        filename, dtype, shape, offset = reference
+        return np.array(np.memmap(filename, dtype=dtype, mode='r', shape=shape, offset=offset))
+    return reference
+
+
+def _frame_edges(args):
+    # Runs in a worker process: interpolation and edge detection of one frame (tiles not split further)
+    reference, raw = args
+    interpolated = PImage.interpolate(load_frame(reference), raw)
+    return interpolated, PImage.detect_edges(interpolated, workers=1)
+
+
+def detect_edges(frames, stack, buffers=None, workers=None):
+    """Interpolation and edge detection of every frame across workers processes (default: number of cores).
+    Returns xpos_interp, ypos_interp, the interpolated currents and the edges (3D arrays, one frame per row) and the
+    nano_adjust factor."""
+    xpos, ypos, frames0, nptsx, nptsy = stack
+    raw = (xpos, ypos, None, nptsx, nptsy)
+    jobs = [(frame_reference(frames, index), raw) for index in range(len(frames))]
+    if workers is None:
+        workers = Batch.cores()
+    if workers == 1 or len(jobs) == 1:
+        results = map(_frame_edges, jobs)
+    else:
+        results = Batch.process_pool().map(_frame_edges, jobs)
+
+    # The interpolation grid only depends on the positions, so it is the same for every frame
+    currents_interp = edges = None
+    for index, ((xpos_interp, ypos_interp, frame_interp, nano_adjust), frame_edges) in enumerate(results):
+        if currents_interp is None:
+            shape = (len(frames),) + frame_interp.shape
+            currents_interp = buffer(buffers, 'stack_interp', shape)
+            if currents_interp is None:
+                currents_interp = np.empty(shape)
+            edges = buffer(buffers, 'stack_edges', shape, bool)
+            if edges is None:
+                edges = np.empty(shape, bool)
+        currents_interp[index] = frame_interp
+        edges[index] = frame_edges
+    return xpos_interp, ypos_interp, currents_interp, edges, nano_adjust
+
+
+def add_stages(pipeline, buffers=None):
+    """Adds the stages of time-lapse images to the pipeline of the image app (PImage.build_pipeline)"""
+    reuse = buffers is not None
+    pipeline.set_source('stack', None)
+    pipeline.add_stage('stack_units', partial(process_stack, buffers=buffers), inputs=['stack'],
+                       params=['slope_x', 'slope_y', 'iss', 'normalized', 'current_unit'], reuse_output=reuse)
+    pipeline.add_stage('stack_shifts', partial(register, cache=Registration.ShiftCache()), inputs=['stack_units'],
+                       params=['align'])
+    pipeline.add_stage('stack_aligned', partial(align_frames, buffers=buffers), inputs=['stack_units', 'stack_shifts'],
+                       reuse_output=reuse)
+    pipeline.add_stage('stack_edges', partial(detect_edges, buffers=buffers), inputs=['stack_aligned', 'stack'],
+                       reuse_output=reuse)
+    pipeline.add_stage('stack_average', average, inputs=['stack_aligned', 'stack_shifts'])
+    return pipeline
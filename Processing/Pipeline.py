@@ -0,0 +1,143 @@
+from collections import OrderedDict
+
+from Processing import Timing
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the dependency-tracked processing pipeline shared by the
+apps. The data treatment performed by ReshapeData is described as a directed
+acyclic graph of stages:
+1. Sources : The imported data set (e.g. xpos0, ypos0, currents0). A source
+   only changes when a new file is imported.
+2. Stages : A function of the outputs of other stages/sources and of a set of
+   named parameters taken from the GUI (e.g. 'slope_x', 'current_unit').
+
+The output of every stage is memoized in a bounded LRU cache, keyed on the
+stage name, the values of its parameters and the keys of its inputs. When the
+user clicks Plot Data, only the stages downstream of a changed parameter are
+executed again; changing e.g. the colormap or the axis limits re-uses every
+cached array.
+
+Stage outputs are shared between calls and must be treated as read-only.
+Stages writing into work buffers (see Processing/Buffers.py) only keep their
+latest output in the cache.
+"""
+
+
+class Stage:
+    """A single step of the processing pipeline.
+        function is called as function(*outputs of inputs, **parameters)
+        inputs are the names of the stages/sources the function depends on
+        params are the names of the parameters the function depends on
+        reuse_output is True if the function writes into a work buffer, i.e. overwrites its previous output
+    """
+    def __init__(self, name, function, inputs=(), params=(), reuse_output=False):
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        self.reuse_output = reuse_output
+
+
+class Pipeline:
+    """Directed acyclic graph of processing stages with per-stage memoization.
+        set_source stores imported data; the cache is invalidated only if the data actually changed
+        add_stage registers a processing step
+        run returns the output of a stage, re-executing only the stages whose key changed
+    """
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize  # maximum number of stage outputs kept in memory
+        self.stages = {}
+        self.sources = {}
+        self.versions = {}  # incremented every time a source is replaced
+        self.cache = OrderedDict()
+        self.executed = []  # names of the stages executed during the last call to run()
+
+    def set_source(self, name, value):
+        """Sets the data of a source. value may be a tuple of arrays; the version of the source is only incremented
+        if one of the objects differs (by identity) from the stored one, so this can be called on every plot."""
+        if name in self.sources and self._same(self.sources[name], value):
+            return
+        self.sources[name] = value
+        self.versions[name] = self.versions.get(name, 0) + 1
+
+    def add_stage(self, name, function, inputs=(), params=(), reuse_output=False):
+        for entry in inputs:
+            if entry not in self.stages and entry not in self.versions:
+                raise KeyError("Unknown input '{}' for stage '{}'".format(entry, name))
+        self.stages[name] = Stage(name, function, inputs, params, reuse_output)
+
+    def run(self, name, params):
+        """Returns the output of the stage 'name' for the given parameter dictionary."""
+        self.executed = []
+        key, value = self._evaluate(name, params)
+        return value
+
+    def key(self, name, params):
+        """Returns the cache key of a stage without executing anything."""
+        if name in self.versions:
+            return (name, self.versions[name])
+        stage = self.stages[name]
+        return (name, tuple(params[p] for p in stage.params), tuple(self.key(entry, params) for entry in stage.inputs))
+
+    def is_cached(self, name, params):
+        return self.key(name, params) in self.cache
+
+    def clear(self):
+        self.cache.clear()
+        self.sources.clear()
+        self.executed = []
+
+    def _evaluate(self, name, params):
+        # Sources are returned directly
+        if name in self.versions:
+            return (name, self.versions[name]), self.sources[name]
+
+        stage = self.stages[name]
+        inputs = [self._evaluate(entry, params) for entry in stage.inputs]
+        key = (name, tuple(params[p] for p in stage.params), tuple(k for k, v in inputs))
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return key, self.cache[key]
+
+        # The previous output of a stage writing into a work buffer is about to be overwritten
+        if stage.reuse_output:
+            for old in [k for k in self.cache if k[0] == name]:
+                del self.cache[old]
+
+        with Timing.span(name, 'processing'):
+            value = stage.function(*[v for k, v in inputs], **{p: params[p] for p in stage.params})
+        self.executed.append(name)
+
+        self.cache[key] = value
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)  # drop the least recently used output
+        return key, value
+
+    @staticmethod
+    def _same(old, new):
+        def same(a, b):
+            # arrays are compared by identity, plain numbers/strings (e.g. nptsx) by value
+            return a is b or (isinstance(a, (int, float, str)) and type(a) == type(b) and a == b)
+
+        if isinstance(old, tuple) and isinstance(new, tuple):
+            return len(old) == len(new) and all(same(a, b) for a, b in zip(old, new))
+        return same(old, new)
@@ -0,0 +1,209 @@
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from Processing import Timing
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the profiling mode of Flux (python flux_v1.py --profile,
+python flux_batch.py --profile). While it is on, every call timed with
+@Timing.timed('action') or @Timing.timed('export') (ImportFile, ReshapeData,
+save_figure(s), export_data_action) runs under cProfile, and the profile
+bundle directory receives:
+1. NNN_<action>.prof : the cProfile statistics of every call (open with
+   pstats, snakeviz, ...)
+2. summary.txt : for every call the duration, the dimensions of the data set
+   of the app and the functions with the highest cumulative time
+3. profile.json : the same information and the environment (versions of
+   Python and the main packages, platform, process id)
+When profiling stops the directory is also packed into a .zip file that can
+be attached to a bug report.
+
+Only the thread calling an action is profiled (the GUI thread); files read in
+the background by the Import Files list are not. For sampling profilers such
+as py-spy, the process id is printed when profiling starts.
+"""
+
+CATEGORIES = ('action', 'export')  # categories of Timing spans that are profiled
+TOP_FUNCTIONS = 25  # functions listed per call in summary.txt
+PACKAGES = ['numpy', 'pandas', 'scipy', 'skimage', 'matplotlib']
+
+
+def dataset_dimensions(dataset):
+    """Kind, file, format and dimensions of a data set (Readers/Datasets.py); None if there is no data set"""
+    if dataset is None:
+        return None
+    info = {'kind': dataset.kind, 'file': dataset.name, 'format': dataset.fileformat}
+    for attribute in ('nptsx', 'nptsy', 'ncycles', 'nptscycle', 'npts'):
+        if hasattr(type(dataset), attribute):
+            info[attribute] = getattr(dataset, attribute)
+    try:
+        info['bytes'] = os.path.getsize(dataset.filepath)
+    except:
+        pass
+    return info
+
+
+def environment():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = __import__(package).__version__
+        except:
+            versions[package] = None
+    return {'python': sys.version, 'platform': platform.platform(), 'processor': platform.processor(),
+            'cores': os.cpu_count(), 'pid': os.getpid(), 'packages': versions}
+
+
+class Profiler:
+    """Writes a profile bundle to directory.
+        profile(name, dataset) is a context manager profiling its block; dataset may be a function returning the
+        data set, evaluated once the block has run (e.g. after ImportFile)
+        stop() packs the directory into directory.zip and returns its path
+    """
+    def __init__(self, directory, top=TOP_FUNCTIONS, categories=CATEGORIES):
+        self.directory = directory
+        self.top = top
+        self.categories = tuple(categories)
+        self.calls = []
+        self.lock = threading.Lock()
+        self.active = False  # actions calling other actions (e.g. ImportFile --> ReshapeData) are profiled once
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.environment = environment()
+        self._write()
+
+    @contextmanager
+    def profile(self, name, dataset=None):
+        with self.lock:
+            nested = self.active
+            self.active = True
+        if nested:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.active = False
+            if callable(dataset):
+                try:
+                    dataset = dataset()
+                except:
+                    dataset = None
+            self._record(name, duration, profile, dataset_dimensions(dataset))
+
+    def _record(self, name, duration, profile, dimensions):
+        with self.lock:
+            index = len(self.calls) + 1
+            filename = "{0:03d}_{1}.prof".format(index, name.replace('/', '_'))
+            try:
+                profile.dump_stats(os.path.join(self.directory, filename))
+                text = io.StringIO()
+                pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(self.top)
+                top = text.getvalue()
+            except Exception as e:
+                filename = None
+                top = "Could not save the profile: {}\n".format(e)
+            self.calls.append({'index': index, 'action': name, 'duration': duration, 'dataset': dimensions,
+                               'prof': filename, 'top': top})
+            self._write()
+
+    def _write(self):
+        # Rewritten after every call so that the bundle is complete even if Flux is closed abruptly
+        try:
+            with open(os.path.join(self.directory, 'profile.json'), 'w') as fh:
+                json.dump({'environment': self.environment,
+                           'calls': [dict((key, call[key]) for key in call if key != 'top') for call in self.calls]},
+                          fh, indent=1, default=str)
+            with open(os.path.join(self.directory, 'summary.txt'), 'w') as fh:
+                fh.write("Flux profile\n")
+                fh.write("Python {}\n".format(self.environment['python'].split()[0]))
+                fh.write("Platform: {}, {} cores\n".format(self.environment['platform'], self.environment['cores']))
+                fh.write("Packages: {}\n\n".format(", ".join("{} {}".format(package, version) for package, version
+                                                             in self.environment['packages'].items())))
+                for call in self.calls:
+                    fh.write("=" * 100 + "\n")
+                    fh.write("{0:03d} {1}: {2:.3f} s\n".format(call['index'], call['action'], call['duration']))
+                    fh.write("Data set: {}\n".format(call['dataset']))
+                    fh.write("Profile: {}\n".format(call['prof']))
+                    fh.write(call['top'] + "\n")
+        except Exception as e:
+            print("Could not write the profile summary: {}".format(e))
+
+    def stop(self):
+        self._write()
+        return shutil.make_archive(self.directory, 'zip', self.directory)
+
+
+PROFILER = {'profiler': None}  # profiler of the running process, if profiling is on
+
+
+def default_directory():
+    return os.path.abspath("flux_profile_" + time.strftime("%Y%m%d_%H%M%S"))
+
+
+def start(directory=None):
+    """Turns profiling of the timed actions on; returns the profiler"""
+    profiler = Profiler(directory or default_directory())
+    PROFILER['profiler'] = profiler
+    Timing.RECORDER.hooks.append(hook)
+    print("Profiling Flux (process id {}) to {}".format(os.getpid(), profiler.directory))
+    return profiler
+
+
+def stop():
+    """Turns profiling off; returns the path of the zipped bundle, None if profiling was off"""
+    profiler = PROFILER['profiler']
+    if profiler is None:
+        return None
+    PROFILER['profiler'] = None
+    if hook in Timing.RECORDER.hooks:
+        Timing.RECORDER.hooks.remove(hook)
+    path = profiler.stop()
+    print("Profile bundle written to {}".format(path))
+    return path
+
+
+def hook(name, category, args):
+    """Context manager wrapping the calls timed with Timing.timed (see Timing.Recorder.hooks). args are the
+    arguments of the call; the data set of an app method is taken from the app (args[0]) after the call."""
+    profiler = PROFILER['profiler']
+    if profiler is None or category not in profiler.categories:
+        return None
+    owner = args[0] if args else None
+    return profiler.profile(name, lambda: getattr(owner, 'dataset', None))
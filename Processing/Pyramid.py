@@ -0,0 +1,188 @@
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+from Processing import Timing
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains a multi-resolution image pyramid for very large SECM maps
+(e.g. several scans stitched to 10k x 10k points):
+1. ImagePyramid : level 0 is the full resolution image, every following level
+   is the 2x2 block average of the previous one, down to a single tile. The
+   coarse levels can be stored in memory-mapped files instead of in memory.
+   Analytics (min/max, means, ...) are computed per tile, on request, and
+   cached.
+2. PyramidView : draws the level of detail matching the current zoom of a
+   matplotlib axes and swaps levels when the axis limits change.
+
+The pyramid only works in index space; positions are given to PyramidView and
+must be evenly spaced.
+"""
+
+PYRAMID_MIN_POINTS = 4000000  # images smaller than this (~2000 x 2000) are drawn directly
+
+
+def downsample(values):
+    """2x2 block average, ignoring NaN. Odd dimensions are padded with NaN."""
+    nrows, ncols = values.shape
+    padded = np.full((nrows + nrows % 2, ncols + ncols % 2), np.nan)
+    padded[:nrows, :ncols] = values
+    blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # all-NaN blocks
+        return np.nanmean(blocks, axis=(1, 3))
+
+
+class ImagePyramid:
+    """Multi-resolution representation of a 2D image (shape nptsy x nptsx).
+        values is the full resolution image; it is not copied
+        tile_size is the edge length of the tiles used for analytics; the pyramid stops once a level fits in one tile
+        directory, if given, is where the coarse levels are stored as memory-mapped .npy files
+    """
+    def __init__(self, values, tile_size=512, directory=None):
+        self.tile_size = tile_size
+        self.directory = directory
+        self.levels = [values]
+        self.analytics = {}  # (name, level, i, j) --> cached result
+
+        level = values
+        while max(level.shape) > tile_size:
+            level = downsample(level)
+            if directory is not None:
+                level = self._store(level, len(self.levels))
+            self.levels.append(level)
+
+    def _store(self, level, index):
+        # a new file per pyramid; the levels of an earlier pyramid may still be drawn or cached
+        fh, filepath = tempfile.mkstemp(prefix='pyramid_level{}_'.format(index), suffix='.npy', dir=self.directory)
+        os.close(fh)
+        mapped = np.lib.format.open_memmap(filepath, mode='w+', dtype=level.dtype, shape=level.shape)
+        mapped[:] = level
+        mapped.flush()
+        return mapped
+
+    def scale(self, level):
+        """Number of full resolution points along each axis covered by one point of a level"""
+        return 2 ** level
+
+    def level_for(self, npts_x, npts_y, width, height):
+        """Coarsest level that still shows at least one point per screen pixel, for a visible region of
+        npts_x x npts_y full resolution points drawn on width x height screen pixels."""
+        best = 0
+        for level in range(len(self.levels)):
+            if npts_x / self.scale(level) >= width and npts_y / self.scale(level) >= height:
+                best = level
+            else:
+                break
+        return best
+
+    def ntiles(self, level):
+        nrows, ncols = self.levels[level].shape
+        return int(np.ceil(nrows / self.tile_size)), int(np.ceil(ncols / self.tile_size))
+
+    def tile(self, level, i, j):
+        """Tile (row i, column j) of a level"""
+        return self.levels[level][i * self.tile_size:(i + 1) * self.tile_size,
+                                  j * self.tile_size:(j + 1) * self.tile_size]
+
+    def tile_statistic(self, name, function, level, i, j):
+        """Result of function(tile), computed on first request and cached under name"""
+        key = (name, level, i, j)
+        if key not in self.analytics:
+            self.analytics[key] = function(self.tile(level, i, j))
+        return self.analytics[key]
+
+    def statistic(self, name, function, combine, level=0):
+        """Combines the (lazily computed) per-tile results of function over a whole level"""
+        nrows, ncols = self.ntiles(level)
+        return combine([self.tile_statistic(name, function, level, i, j)
+                        for i in range(nrows) for j in range(ncols)])
+
+    def value_range(self):
+        """(min, max) of the full resolution image, ignoring NaN"""
+        return (self.statistic('min', np.nanmin, np.nanmin), self.statistic('max', np.nanmax, np.nanmax))
+
+
+class PyramidView:
+    """Draws an ImagePyramid on ax with imshow, re-selecting the level of detail when the axis limits change.
+        xpos, ypos are the (evenly spaced) full resolution positions
+        image is the AxesImage, to be used for colorbars and set_clim
+    """
+    def __init__(self, ax, pyramid, xpos, ypos, cmap):
+        self.ax = ax
+        self.pyramid = pyramid
+        self.x0 = xpos[0]
+        self.y0 = ypos[0]
+        self.dx = (xpos[-1] - xpos[0]) / (len(xpos) - 1)
+        self.dy = (ypos[-1] - ypos[0]) / (len(ypos) - 1)
+        self.nptsx = len(xpos)
+        self.nptsy = len(ypos)
+        self.level = None
+
+        full_extent = (self.x0 - self.dx / 2, self.x0 + (self.nptsx - 0.5) * self.dx,
+                       self.y0 - self.dy / 2, self.y0 + (self.nptsy - 0.5) * self.dy)
+        coarsest = len(pyramid.levels) - 1
+        self.image = ax.imshow(pyramid.levels[coarsest], cmap=cmap, origin='lower', extent=full_extent,
+                               aspect=ax.get_aspect(), interpolation='nearest')
+        self.image.set_clim(pyramid.value_range())
+        ax.set_xlim(full_extent[0], full_extent[1])
+        ax.set_ylim(full_extent[2], full_extent[3])
+        self.update()
+
+        self.cids = [ax.callbacks.connect('xlim_changed', self.update),
+                     ax.callbacks.connect('ylim_changed', self.update)]
+
+    def _index_range(self, lim, start, step, npts):
+        # full resolution index range covered by the axis limits
+        low, high = sorted([(lim[0] - start) / step, (lim[1] - start) / step])
+        return max(int(np.floor(low + 0.5)), 0), min(int(np.ceil(high + 0.5)), npts)
+
+    def update(self, ax=None):
+        """Draws the level of detail matching the current axis limits"""
+        ix0, ix1 = self._index_range(self.ax.get_xlim(), self.x0, self.dx, self.nptsx)
+        iy0, iy1 = self._index_range(self.ax.get_ylim(), self.y0, self.dy, self.nptsy)
+        if ix1 <= ix0 or iy1 <= iy0:
+            return
+        bbox = self.ax.get_window_extent()
+        level = self.pyramid.level_for(ix1 - ix0, iy1 - iy0, bbox.width, bbox.height)
+
+        # crop the level to the visible region (+1 point margin)
+        scale = self.pyramid.scale(level)
+        nrows, ncols = self.pyramid.levels[level].shape
+        jx0, jx1 = max(ix0 // scale - 1, 0), min(-(-ix1 // scale) + 1, ncols)
+        jy0, jy1 = max(iy0 // scale - 1, 0), min(-(-iy1 // scale) + 1, nrows)
+        view = (level, jx0, jx1, jy0, jy1)
+        if view == self.level:
+            return
+        self.level = view
+
+        extent = (self.x0 + (jx0 * scale - 0.5) * self.dx, self.x0 + (min(jx1 * scale, self.nptsx) - 0.5) * self.dx,
+                  self.y0 + (jy0 * scale - 0.5) * self.dy, self.y0 + (min(jy1 * scale, self.nptsy) - 0.5) * self.dy)
+        with Timing.span('pyramid view', 'rendering', level=level):
+            self.image.set_data(self.pyramid.levels[level][jy0:jy1, jx0:jx1])
+            self.image.set_extent(extent)
+            self.ax.figure.canvas.draw_idle()
+
+    def disconnect(self):
+        for cid in self.cids:
+            self.ax.callbacks.disconnect(cid)
@@ -0,0 +1,240 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from scipy import fft
+from scipy import ndimage
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the drift correction of time-lapse images (see
+Processing/PStack.py): every frame of a stack is registered to a reference
+frame and shifted back onto it.
+
+1. register : the gradients of the frames (smoothed over SIGMA points) are
+   Fourier transformed in chunks, all frames of a chunk in one call. The
+   peak of the inverse transform of their cross-power spectrum with the
+   reference gives the shift to the nearest point; the cross-correlation is
+   then evaluated on a grid UPSAMPLE times finer around the peak, by matrix
+   products with the spectrum (all frames at once), to refine the shift to
+   1/UPSAMPLE of a point. Shifts are cached by the hash of the frame and of
+   the reference, so frames registered before are not transformed again.
+2. align : the frames are resampled at their position plus the shift, by
+   linear interpolation along y then x. Points moved in from outside the
+   scan repeat the border of the frame and are masked (NaN) in the
+   difference maps and averages.
+
+The gradients are correlated rather than the currents: a tilt of the
+substrate, or a change of the mean current between frames, has a constant
+gradient, removed with the mean. The cross-power spectrum is not normalized
+to unit magnitude (as in phase correlation), which would amplify the noise
+of smooth feedback maps.
+
+Shifts are (dy, dx) in points: the content of a frame is displaced by
+(dy, dx) from the reference.
+"""
+
+CHUNK_BYTES = 16 * 2 ** 20  # size of the chunks of frames transformed at once
+CACHE_SIZE = 65536  # number of shifts kept by a ShiftCache
+SIGMA = 1.0  # smoothing of the gradients (points)
+UPSAMPLE = 20  # the shifts are refined to 1/UPSAMPLE of a point
+
+
+class ShiftCache:
+    """Shifts of registered frames, keyed on the hashes of the reference and of the frame (least recently used
+    shifts are dropped above maxsize)"""
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.shifts = OrderedDict()
+
+    @staticmethod
+    def key(frame):
+        frame = np.ascontiguousarray(frame)
+        digest = hashlib.blake2b(frame.view(np.uint8), digest_size=16)
+        digest.update(str(frame.shape).encode())
+        return digest.digest()
+
+    def get(self, reference, frame):
+        shift = self.shifts.get((reference, frame))
+        if shift is not None:
+            self.shifts.move_to_end((reference, frame))
+        return shift
+
+    def put(self, reference, frame, shift):
+        self.shifts[(reference, frame)] = shift
+        while len(self.shifts) > self.maxsize:
+            self.shifts.popitem(last=False)
+
+    def clear(self):
+        self.shifts.clear()
+
+
+def chunks(nframes, frame_bytes):
+    """(start, end) of the chunks of frames of at most CHUNK_BYTES (at least one frame)"""
+    step = max(1, CHUNK_BYTES // max(frame_bytes, 1))
+    for start in range(0, nframes, step):
+        yield start, min(start + step, nframes)
+
+
+def gradient_spectra(frames):
+    """Real FFT of the y and x gradients of the frames (nframes, nptsy, nptsx), smoothed and minus their mean"""
+    frames = np.nan_to_num(np.asarray(frames, dtype=float))
+    smoothed = ndimage.gaussian_filter(frames, (0, SIGMA, SIGMA))
+    spectra = []
+    for axis in (1, 2):
+        gradient = np.gradient(smoothed, axis=axis)
+        gradient -= gradient.mean(axis=(1, 2))[:, np.newaxis, np.newaxis]
+        spectra.append(fft.rfft2(gradient, axes=(1, 2), workers=-1))
+    return spectra
+
+
+def cross_power(reference_spectra, spectra):
+    return sum(spectrum * np.conj(reference) for reference, spectrum in zip(reference_spectra, spectra))
+
+
+def upsampled_peaks(cross, dy, dx, shape, factor=UPSAMPLE, region=1.5):
+    """Refines the peaks (dy, dx) of the cross-correlations to 1/factor of a point: the correlation is evaluated on a
+    factor times finer grid over region points around every peak, by a matrix DFT of the cross-power spectrum (half
+    spectrum of a real FFT)"""
+    nptsy, nptsx = shape
+    nframes = len(cross)
+    npts = int(np.ceil(region * factor))
+    offsets = (np.arange(npts) - npts // 2) / factor
+    ypos = dy[:, np.newaxis] + offsets[np.newaxis, :]
+    xpos = dx[:, np.newaxis] + offsets[np.newaxis, :]
+    ky = np.fft.fftfreq(nptsy) * nptsy
+    kx = np.arange(cross.shape[2])
+    # Columns of the half spectrum count twice, except the first and the Nyquist column
+    weights = np.full(len(kx), 2.0)
+    weights[0] = 1.0
+    if nptsx % 2 == 0:
+        weights[-1] = 1.0
+    dft_y = np.exp(2j * np.pi * ypos[:, :, np.newaxis] * ky[np.newaxis, np.newaxis, :] / nptsy)
+    dft_x = weights[np.newaxis, :, np.newaxis] * np.exp(2j * np.pi * kx[np.newaxis, :, np.newaxis]
+                                                        * xpos[:, np.newaxis, :] / nptsx)
+    correlation = np.matmul(np.matmul(dft_y, cross), dft_x).real
+    iy, ix = np.unravel_index(np.argmax(correlation.reshape(nframes, -1), axis=1), (npts, npts))
+    frame = np.arange(nframes)
+    return ypos[frame, iy], xpos[frame, ix]
+
+
+def cross_correlation_shifts(cross, shape):
+    """Shifts (nframes, 2) of the frames from their cross-power spectra with the reference"""
+    nptsy, nptsx = shape
+    correlation = fft.irfft2(cross, s=shape, axes=(1, 2), workers=-1)
+    peaks = np.argmax(correlation.reshape(len(correlation), -1), axis=1)
+    iy, ix = np.unravel_index(peaks, shape)
+    # Peaks beyond half the scan are negative shifts (the correlation is periodic)
+    dy = np.where(iy > nptsy // 2, iy - nptsy, iy).astype(float)
+    dx = np.where(ix > nptsx // 2, ix - nptsx, ix).astype(float)
+    return np.column_stack(upsampled_peaks(cross, dy, dx, shape))
+
+
+def register(frames, reference=0, cache=None):
+    """Shifts (nframes, 2) of every frame of frames (nframes, nptsy, nptsx) relative to the frame of index reference.
+    cache is an optional ShiftCache."""
+    nframes, nptsy, nptsx = frames.shape
+    shifts = np.zeros((nframes, 2))
+    reference_key = ShiftCache.key(frames[reference]) if cache is not None else None
+    reference_spectra = None
+
+    for start, end in chunks(nframes, frames[0].nbytes):
+        chunk = np.asarray(frames[start:end], dtype=float)
+        todo = np.arange(end - start)
+        if cache is not None:
+            keys = [ShiftCache.key(frame) for frame in chunk]
+            cached = [cache.get(reference_key, key) for key in keys]
+            for index, shift in enumerate(cached):
+                if shift is not None:
+                    shifts[start + index] = shift
+            todo = np.array([index for index, shift in enumerate(cached) if shift is None], dtype=int)
+            if len(todo) == 0:
+                continue
+
+        if reference_spectra is None:
+            reference_spectra = gradient_spectra(frames[reference:reference + 1])
+        cross = cross_power(reference_spectra, gradient_spectra(chunk[todo]))
+        shifts[start + todo] = cross_correlation_shifts(cross, (nptsy, nptsx))
+        if cache is not None:
+            for index in todo:
+                cache.put(reference_key, keys[index], tuple(shifts[start + index]))
+    return shifts
+
+
+def sample_positions(npts, shifts):
+    """Positions (nframes, npts) sampled along one axis, the lower index and weight of the linear interpolation and
+    the points that lie inside the scan"""
+    positions = np.arange(npts)[np.newaxis, :] + shifts[:, np.newaxis]
+    inside = (positions > -1E-6) & (positions < npts - 1 + 1E-6)
+    positions = np.clip(positions, 0, npts - 1)
+    lower = np.minimum(np.floor(positions).astype(int), max(npts - 2, 0))
+    return lower, positions - lower, inside
+
+
+def align(frames, shifts, out=None):
+    """Frames shifted back onto the reference (linear interpolation, borders repeated). Without any shift the frames
+    are returned."""
+    if not np.any(shifts):
+        return frames
+    nframes, nptsy, nptsx = frames.shape
+    if out is None:
+        out = np.empty(frames.shape)
+    for start, end in chunks(nframes, frames[0].nbytes):
+        chunk = np.asarray(frames[start:end], dtype=float)
+        # Along y (rows of every frame), then along x (columns)
+        lower, weight, inside = sample_positions(nptsy, shifts[start:end, 0])
+        lower, weight = lower[:, :, np.newaxis], weight[:, :, np.newaxis]
+        upper = np.minimum(lower + 1, nptsy - 1)
+        rows = np.take_along_axis(chunk, lower, axis=1) * (1 - weight) + \
+            np.take_along_axis(chunk, upper, axis=1) * weight
+        lower, weight, inside = sample_positions(nptsx, shifts[start:end, 1])
+        lower, weight = lower[:, np.newaxis, :], weight[:, np.newaxis, :]
+        upper = np.minimum(lower + 1, nptsx - 1)
+        np.add(np.take_along_axis(rows, lower, axis=2) * (1 - weight), np.take_along_axis(rows, upper, axis=2) * weight,
+               out=out[start:end])
+    return out
+
+
+def valid_points(shifts, nptsy, nptsx):
+    """Masks (nframes, nptsy, nptsx) of the aligned points that were inside the scan"""
+    inside_y = sample_positions(nptsy, shifts[:, 0])[2]
+    inside_x = sample_positions(nptsx, shifts[:, 1])[2]
+    return inside_y[:, :, np.newaxis] & inside_x[:, np.newaxis, :]
+
+
+def difference(aligned, shifts, index, reference):
+    """Difference map of the aligned frame index minus the aligned frame reference; NaN outside either scan"""
+    valid = valid_points(shifts[[index, reference]], aligned.shape[1], aligned.shape[2])
+    result = np.subtract(aligned[index], aligned[reference])
+    result[~(valid[0] & valid[1])] = np.nan
+    return result
+
+
+def average(aligned, shifts):
+    """Mean of the aligned frames, over the frames in which every point was inside the scan"""
+    nframes, nptsy, nptsx = aligned.shape
+    total = np.zeros((nptsy, nptsx))
+    count = np.zeros((nptsy, nptsx))
+    for start, end in chunks(nframes, aligned[0].nbytes):
+        valid = valid_points(shifts[start:end], nptsy, nptsx)
+        total += np.where(valid, aligned[start:end], 0).sum(axis=0)
+        count += valid.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count, np.nan)
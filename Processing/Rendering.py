@@ -0,0 +1,62 @@
+import numpy as np
+
+from Processing import Timing
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the rendering of 2D maps (SECM images, detected edges).
+pcolormesh builds one quad per pixel, which is slow to draw and to resize for
+large images. Most scans are recorded on an evenly spaced grid, in which case
+the map is drawn as a single AxesImage with imshow; the extent is set so that
+every pixel is centered on its x,y position, as pcolormesh does. Irregular
+grids fall back to pcolormesh.
+"""
+
+
+def is_uniform(pos, rtol=1E-3):
+    """True if the 1D positions are evenly spaced (increasing or decreasing)"""
+    pos = np.asarray(pos, dtype=float)
+    if pos.ndim != 1 or len(pos) < 2:
+        return False
+    steps = np.diff(pos)
+    if steps[0] == 0 or not np.all(np.isfinite(steps)):
+        return False
+    return bool(np.all(np.abs(steps - steps[0]) <= rtol * abs(steps[0])))
+
+
+def pixel_extent(xpos, ypos):
+    """Extent (left, right, bottom, top) placing each pixel centre on its position"""
+    dx = (xpos[-1] - xpos[0]) / (len(xpos) - 1)
+    dy = (ypos[-1] - ypos[0]) / (len(ypos) - 1)
+    return (xpos[0] - dx / 2, xpos[-1] + dx / 2, ypos[0] - dy / 2, ypos[-1] + dy / 2)
+
+
+def draw_map(ax, xpos, ypos, values, cmap):
+    """Draws values (shape len(ypos) x len(xpos)) on ax and returns the mappable (for colorbars and set_clim).
+    The aspect currently set on ax is kept."""
+    values = np.asarray(values)
+    if (is_uniform(xpos) and is_uniform(ypos) and values.ndim == 2
+            and values.shape == (len(ypos), len(xpos))):
+        with Timing.span('imshow', 'rendering', points=values.size):
+            return ax.imshow(values, cmap=cmap, origin='lower', extent=pixel_extent(xpos, ypos),
+                             aspect=ax.get_aspect(), interpolation='nearest')
+    else:
+        with Timing.span('pcolormesh', 'rendering', points=values.size):
+            return ax.pcolormesh(xpos, ypos, values, cmap=cmap)
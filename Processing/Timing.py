@@ -0,0 +1,158 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, ExitStack
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the timing instrumentation of Flux. Code is timed with
+spans:
+
+    with Timing.span('canvas.draw', 'rendering'):
+        self.canvas.draw()
+
+or, for whole methods, with the @Timing.timed('action') decorator. Spans are
+kept in an in-memory ring buffer (the oldest spans are dropped), summarized
+in the Performance page of the Help menu and can be saved as JSON or in the
+Chrome trace format (open in chrome://tracing or https://ui.perfetto.dev).
+
+Categories used by Flux:
+1. action : ImportFile and ReshapeData (one span per button click)
+2. import : reading of files (Readers/Formats.py, Readers/Batch.py)
+3. processing : stages of the processing pipeline (Processing/Pipeline.py)
+4. rendering : drawing of maps and of the canvas
+5. export : figures and text files
+"""
+
+CAPACITY = 10000  # number of spans kept in memory
+
+
+class Span:
+    """A timed section of code.
+        start = time (s) since the recorder was created, duration in s
+        thread = identifier of the thread, args = additional information (e.g. the number of points)
+    """
+    __slots__ = ('name', 'category', 'start', 'duration', 'thread', 'args')
+
+    def __init__(self, name, category, start, duration, thread, args):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = duration
+        self.thread = thread
+        self.args = args
+
+    def to_dict(self):
+        return {'name': self.name, 'category': self.category, 'start': self.start, 'duration': self.duration,
+                'thread': self.thread, 'args': self.args}
+
+
+class Recorder:
+    """Ring buffer of spans.
+        span(name, category, **args) is a context manager timing its block
+        summary() returns the statistics per span name
+        save_json / save_chrome_trace write the spans to a file
+        hooks are functions hook(name, category, args) called for every call timed with timed(); a hook returns a
+        context manager wrapping the call (e.g. a profiler, see Processing/Profiling.py) or None
+    """
+    def __init__(self, capacity=CAPACITY):
+        self.spans = deque(maxlen=capacity)
+        self.enabled = True
+        self.origin = time.perf_counter()
+        self.hooks = []
+
+    @contextmanager
+    def span(self, name, category='', **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.append(Span(name, category, start - self.origin, end - start, threading.get_ident(), args))
+
+    def clear(self):
+        self.spans.clear()
+
+    def summary(self):
+        """Statistics per span name, slowest total first: list of dictionaries with name, category, count and total,
+        mean, max and last duration (s)"""
+        stats = {}
+        for entry in list(self.spans):
+            if entry.name not in stats:
+                stats[entry.name] = {'name': entry.name, 'category': entry.category, 'count': 0, 'total': 0.0,
+                                     'max': 0.0, 'last': 0.0}
+            stat = stats[entry.name]
+            stat['count'] += 1
+            stat['total'] += entry.duration
+            stat['max'] = max(stat['max'], entry.duration)
+            stat['last'] = entry.duration
+        for stat in stats.values():
+            stat['mean'] = stat['total'] / stat['count']
+        return sorted(stats.values(), key=lambda stat: stat['total'], reverse=True)
+
+    def save_json(self, filepath):
+        with open(filepath, 'w') as fh:
+            json.dump({'spans': [entry.to_dict() for entry in list(self.spans)], 'summary': self.summary()}, fh,
+                      indent=1, default=str)
+
+    def chrome_trace(self):
+        """Spans as complete ('X') events of the Chrome trace event format, times in µs"""
+        pid = os.getpid()
+        events = []
+        for entry in list(self.spans):
+            events.append({'name': entry.name, 'cat': entry.category, 'ph': 'X', 'ts': entry.start * 1E6,
+                           'dur': entry.duration * 1E6, 'pid': pid, 'tid': entry.thread,
+                           'args': dict((key, str(value)) for key, value in entry.args.items())})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, filepath):
+        with open(filepath, 'w') as fh:
+            json.dump(self.chrome_trace(), fh)
+
+
+RECORDER = Recorder()  # recorder shared by the apps
+
+
+def span(name, category='', **args):
+    return RECORDER.span(name, category, **args)
+
+
+def timed(category=''):
+    """Decorator timing every call of a function or method; the span is named after the function (e.g.
+    'ImageApp.ReshapeData')"""
+    def decorator(function):
+        name = function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with RECORDER.span(name, category), ExitStack() as stack:
+                for hook in list(RECORDER.hooks):
+                    context = hook(name, category, args)
+                    if context is not None:
+                        stack.enter_context(context)
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
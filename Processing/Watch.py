@@ -0,0 +1,333 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from Processing import Export
+from Readers import Formats
+from Readers.Datasets import ReadError
+
+try:
+    # Optional: file system notifications (inotify, FSEvents, ReadDirectoryChangesW); without it the directory is
+    # polled
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the watch folder service (python flux_watch.py): the
+files that the instruments drop into a directory are imported, processed and
+exported (see Processing/Export.py) without the GUI.
+
+1. Discovery : the directory is scanned every POLL_S seconds. If the optional
+   watchdog package is installed, file system notifications trigger a scan
+   right away; the scan remains the reference, so missed events are harmless.
+2. Debounce : a file is processed once its size and modification time have not
+   changed for SETTLE_S seconds, so that files still being copied or written
+   are not read.
+3. Processing : at most `workers` files are processed at a time, in a pool of
+   worker processes (threads with workers=0); the other files wait in the
+   backlog, in the order they were found. If a worker process dies (e.g.
+   killed when out of memory), the pool is replaced and the files that were
+   being processed are put back on the backlog; each of them is then
+   processed alone, and a file during which a worker dies again is recorded
+   as failed.
+4. Index : every processed file is recorded, with its size and modification
+   time, in an SQLite database. Files recorded with the same size and time are
+   not processed again after a restart; a file that changes is.
+5. Metrics : the number of files found, waiting, being processed, exported and
+   failed, the throughput over the last METRICS_WINDOW_S seconds and the mean
+   processing time are written to metrics.json in the output directory after
+   every scan.
+"""
+
+POLL_S = 2.0  # interval between two scans of the directory
+SETTLE_S = 5.0  # time during which a file must not change before it is processed
+METRICS_WINDOW_S = 300.0  # window over which the throughput is calculated
+INDEX_NAME = 'flux_watch.sqlite'
+METRICS_NAME = 'metrics.json'
+
+
+def process_file(filepath, kind, manufacturer, directory):
+    """Imports, processes and exports one file (runs in a worker). Returns (status, output, error, seconds); status
+    is 'exported', 'unsupported' (not a format that Flux reads for this kind) or 'failed'."""
+    start = time.perf_counter()
+    try:
+        fileformat = Formats.detect(filepath, manufacturer)
+        if fileformat is None or kind not in fileformat.readers:
+            return 'unsupported', None, None, time.perf_counter() - start
+        dataset = Formats.read(filepath, kind, fileformat=fileformat)
+        output = Export.export(dataset, Export.output_path(directory, filepath))
+        return 'exported', output, None, time.perf_counter() - start
+    except ReadError as e:
+        return 'failed', None, str(e), time.perf_counter() - start
+    except Exception as e:
+        return 'failed', None, "{}: {}".format(type(e).__name__, e), time.perf_counter() - start
+
+
+class Index:
+    """SQLite record of the processed files. Only used by one thread at a time (the one running the watcher); the
+    size and modification time of the recorded files are also kept in memory, so that a scan does not query the
+    database."""
+    def __init__(self, filepath):
+        self.connection = sqlite3.connect(filepath, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                                "status TEXT, output TEXT, error TEXT, seconds REAL, processed REAL)")
+        self.connection.commit()
+        self.done = dict((path, (size, mtime)) for path, size, mtime
+                         in self.connection.execute("SELECT path, size, mtime FROM files"))
+
+    def is_done(self, path, size, mtime):
+        return self.done.get(path) == (size, mtime)
+
+    def record(self, path, size, mtime, status, output, error, seconds):
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (path, size, mtime, status, output, error, seconds, time.time()))
+        self.connection.commit()
+        self.done[path] = (size, mtime)
+
+    def counts(self):
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+    def close(self):
+        self.connection.close()
+
+
+class _Wakeup(FileSystemEventHandler):
+    # Sets the event of the watcher on every file system event
+    def __init__(self, event):
+        self.event = event
+
+    def on_any_event(self, event):
+        self.event.set()
+
+
+class Watcher:
+    """Watches a directory and exports the files of the given kind (e.g. 'image') to the output directory.
+        manufacturer overrides the detected format as in Formats.detect
+        workers is the maximum number of files processed at a time (0 = one thread)
+        run() scans the directory until stop() is called, scan() does a single scan
+    """
+    def __init__(self, directory, kind, output=None, manufacturer=None, workers=None, poll=POLL_S, settle=SETTLE_S,
+                 index=None):
+        self.directory = os.path.abspath(directory)
+        self.kind = kind
+        self.output = os.path.abspath(output or os.path.join(self.directory, 'flux_output'))
+        self.manufacturer = manufacturer
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.poll = poll
+        self.settle = settle
+        if not os.path.isdir(self.output):
+            os.makedirs(self.output)
+        self.index = Index(index or os.path.join(self.output, INDEX_NAME))
+
+        self.seen = {}  # path --> (size, mtime, time since which they have not changed) of the files settling
+        self.backlog = deque()  # (path, size, mtime) of the files ready to be processed
+        self.running = {}  # future --> (path, size, mtime)
+        self.suspects = set()  # paths of the files being processed when a worker process died
+        self.completed = deque()  # (time, seconds) of the files processed in the last METRICS_WINDOW_S
+        self.totals = {'found': 0, 'exported': 0, 'unsupported': 0, 'failed': 0}
+        self.started = time.time()
+
+        self.pool = self.new_pool()
+        self.event = threading.Event()
+        self.observer = None
+        self.stopping = False
+
+    def new_pool(self):
+        if self.workers > 0:
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return ThreadPoolExecutor(max_workers=1)
+
+    def run(self):
+        """Scans the directory until stop() is called (or Ctrl+C)"""
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(_Wakeup(self.event), self.directory, recursive=False)
+            self.observer.start()
+        try:
+            while not self.stopping:
+                self.scan()
+                # Wake up early on a file system event or when a file finishes processing
+                self.event.wait(self.poll if not self.seen else min(self.poll, self.settle))
+                self.event.clear()
+        finally:
+            self.close()
+
+    def stop(self):
+        self.stopping = True
+        self.event.set()
+
+    def scan(self):
+        self.collect()
+        self.discover()
+        self.submit()
+        self.write_metrics()
+
+    def discover(self):
+        """Adds the files that have not changed for settle seconds to the backlog"""
+        now = time.time()
+        queued = set(path for path, size, mtime in self.backlog) | \
+            set(path for path, size, mtime in self.running.values())
+        present = set()
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as e:
+            print("Could not scan {}: {}".format(self.directory, e))
+            return
+        for entry in entries:
+            try:
+                if not entry.is_file() or entry.name.startswith('.'):
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue  # removed in the meantime
+            path = entry.path
+            present.add(path)
+            if path in queued or self.index.is_done(path, stat.st_size, stat.st_mtime):
+                continue
+            previous = self.seen.get(path)
+            if previous is None:
+                self.totals['found'] = self.totals['found'] + 1
+            if previous is None or previous[:2] != (stat.st_size, stat.st_mtime):
+                self.seen[path] = (stat.st_size, stat.st_mtime, now)
+            elif now - previous[2] >= self.settle:
+                del self.seen[path]
+                self.backlog.append((path, stat.st_size, stat.st_mtime))
+        for path in list(self.seen):
+            if path not in present:
+                del self.seen[path]
+
+    def submit(self):
+        """Starts processing files of the backlog, up to the number of workers. A suspect file is processed alone."""
+        while self.backlog and len(self.running) < max(self.workers, 1):
+            path, size, mtime = self.backlog[0]
+            if any(entry[0] in self.suspects for entry in self.running.values()) or \
+                    (path in self.suspects and self.running):
+                break
+            try:
+                future = self.pool.submit(process_file, path, self.kind, self.manufacturer, self.output)
+            except BrokenProcessPool:
+                # A worker process died since the last scan
+                self.restart()
+                continue
+            self.backlog.popleft()
+            future.add_done_callback(lambda future: self.event.set())
+            self.running[future] = (path, size, mtime)
+
+    def collect(self):
+        """Records the files processed since the last call"""
+        broken = False
+        for future in [future for future in self.running if future.done()]:
+            path, size, mtime = self.running.pop(future)
+            try:
+                status, output, error, seconds = future.result()
+            except BrokenProcessPool:
+                broken = True
+                self.retry(path, size, mtime)
+                continue
+            except Exception as e:
+                # The file is not recorded and is processed again after a restart
+                self.totals['failed'] = self.totals['failed'] + 1
+                print("{}: {}: {}".format(path, type(e).__name__, e))
+                continue
+            self.suspects.discard(path)
+            self.index.record(path, size, mtime, status, output, error, seconds)
+            self.totals[status] = self.totals[status] + 1
+            if seconds is not None:
+                self.completed.append((time.time(), seconds))
+            if status == 'failed':
+                print("{}: {}".format(path, error))
+            elif status == 'exported':
+                print("{} --> {} ({:.2f} s)".format(path, output, seconds))
+        if broken:
+            self.restart()
+
+    def restart(self):
+        """Replaces the pool after a worker process died; the files that were being processed are put back on the
+        backlog"""
+        print("A worker process died, restarting the workers.")
+        self.pool.shutdown(wait=False)
+        self.pool = self.new_pool()
+        for future in list(self.running):
+            # The files that were not processed before the pool broke fail with BrokenProcessPool
+            if not future.done() or isinstance(future.exception(), BrokenProcessPool):
+                self.retry(*self.running.pop(future))
+
+    def retry(self, path, size, mtime):
+        """Puts back on the backlog a file that was being processed when a worker process died. A suspect file
+        is processed alone, so the worker died while processing it: it is recorded as failed."""
+        if path not in self.suspects:
+            self.suspects.add(path)
+            self.backlog.appendleft((path, size, mtime))
+            return
+        self.suspects.discard(path)
+        error = "A worker process died while processing the file."
+        self.index.record(path, size, mtime, 'failed', None, error, None)
+        self.totals['failed'] = self.totals['failed'] + 1
+        print("{}: {}".format(path, error))
+
+    def metrics(self):
+        now = time.time()
+        while self.completed and now - self.completed[0][0] > METRICS_WINDOW_S:
+            self.completed.popleft()
+        window = min(METRICS_WINDOW_S, now - self.started)
+        seconds = [entry[1] for entry in self.completed]
+        return {'directory': self.directory,
+                'kind': self.kind,
+                'uptime_s': now - self.started,
+                'settling': len(self.seen),
+                'backlog': len(self.backlog),
+                'running': len(self.running),
+                'workers': self.workers,
+                'totals': dict(self.totals),
+                'index': self.index.counts(),
+                'throughput_per_min': 60 * len(seconds) / window if window > 0 else 0.0,
+                'mean_seconds': sum(seconds) / len(seconds) if seconds else None,
+                'notifications': self.observer is not None}
+
+    def write_metrics(self):
+        # Written to a temporary file and renamed, so that readers never see a partial file
+        filepath = os.path.join(self.output, METRICS_NAME)
+        try:
+            with open(filepath + '.tmp', 'w') as fh:
+                json.dump(self.metrics(), fh, indent=1)
+            os.replace(filepath + '.tmp', filepath)
+        except OSError as e:
+            print("Could not write the metrics: {}".format(e))
+
+    def close(self):
+        """Waits for the files being processed, records them and stops the workers"""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        self.pool.shutdown(wait=True)
+        self.collect()
+        self.write_metrics()
+        self.index.close()
@@ -0,0 +1,111 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from Readers.Datasets import ReadError, ApproachGridDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the reader of approach curve grids: an approach curve
+recorded at every point of an image (3D scans), exported as a text table
+with one row per point and the columns X, Y, Z (tip-substrate distance) and
+I, e.g.
+
+    # comment lines
+    X (µm)	Y (µm)	Z (µm)	I (nA)
+    0	0	0.5	0.1234
+    ...
+
+The units are given in brackets in the header (m, mm, µm/um, nm and A, mA,
+µA/uA, nA, pA; default µm and nA). Columns are separated by tabs, spaces,
+commas or semicolons. Rows may come in any order, but every point of the
+image must have a current at every distance.
+"""
+
+HEADER = re.compile(r'^\s*X\b.*\bY\b.*\bZ\b.*\bI\b', re.IGNORECASE)
+COLUMN = re.compile(r'\b([XYZI])\b\s*(?:[\(\[]\s*([^\)\]]*?)\s*[\)\]])?', re.IGNORECASE)
+UNITS = {'m': 1E6, 'mm': 1E3, 'µm': 1.0, 'um': 1.0, 'nm': 1E-3,
+         'A': 1E9, 'mA': 1E6, 'µA': 1E3, 'uA': 1E3, 'nA': 1.0, 'pA': 1E-3}
+
+
+def header_line(lines, header=HEADER):
+    """Index of the column header in lines (after comment lines), None if there is none"""
+    for index, line in enumerate(lines):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        return index if header.match(line) else None
+    return None
+
+
+def sniff(lines):
+    """True if the first line that is not a comment is the X, Y, Z, I column header; see Readers/Formats.py"""
+    return header_line(lines) is not None
+
+
+def column_factors(header):
+    """Factors converting the columns of the header to µm/nA, from the units in brackets"""
+    factors = []
+    for label, unit in COLUMN.findall(header):
+        if not unit:
+            factors.append(1.0)
+        elif unit in UNITS:
+            factors.append(UNITS[unit])
+        else:
+            raise ReadError("Unknown unit '{}'.".format(unit))
+    return np.array(factors)
+
+
+def read_table(filepath, header=HEADER, columns='XYZI'):
+    """Reads the table. Returns the columns (e.g. the x, y and z positions (µm) and the currents (nA) of every
+    point). Also used for the tables of scattered points (see Readers/Scattered.py)."""
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as fh:
+        lines = []
+        for line in fh:
+            lines.append(line)
+            if line.strip() and not line.lstrip().startswith('#'):
+                break
+    start = header_line(lines, header)
+    if start is None:
+        raise ReadError("No {} column header.".format(', '.join(columns)))
+    factors = column_factors(lines[start])
+    if len(factors) != len(columns):
+        raise ReadError("Expected the columns {} and {}.".format(', '.join(columns[:-1]), columns[-1]))
+    sep = ',' if ',' in lines[start] else ';' if ';' in lines[start] else r'\s+'
+    data = pd.read_csv(filepath, sep=sep, header=None, skiprows=start + 1, comment='#', usecols=range(len(columns)),
+                       dtype=float).values
+    return tuple(data[:, index] * factor for index, factor in enumerate(factors))
+
+
+def load_approach_grid(filepath):
+    xpos, ypos, zpos, currents = read_table(filepath)
+    xunique, ix = np.unique(xpos, return_inverse=True)
+    yunique, iy = np.unique(ypos, return_inverse=True)
+    zunique, iz = np.unique(zpos, return_inverse=True)
+    shape = (len(yunique), len(xunique), len(zunique))
+    if len(currents) != shape[0] * shape[1] * shape[2]:
+        raise ReadError("Incomplete grid: {} points for {} x {} x {}.".format(len(currents), shape[1], shape[0],
+                                                                             shape[2]))
+    index = np.ravel_multi_index((iy, ix, iz), shape)
+    if np.bincount(index, minlength=len(index)).max() > 1:
+        raise ReadError("Incomplete grid: points are repeated.")
+    grid = np.empty(shape)
+    grid.ravel()[index] = currents
+    return ApproachGridDataset(xunique, yunique, zunique, grid)
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from Processing import Timing
+from Readers import Formats
+from Readers.Datasets import ReadError
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the concurrent import of several files (e.g. an image
+and the approach curves recorded in the same session).
+
+Every file is handled by a task of a shared thread pool, which detects the
+format (I/O bound, see Readers/Formats.py). Binary formats are then read in
+the thread itself; text formats, whose parsing is CPU bound, are handed to a
+shared process pool so that several files are parsed on different cores. The
+worker processes look up the reader by the name of the format, so plugin
+formats are available there as well.
+
+The pools are created on first use and kept for the following imports. The
+process pool uses the 'spawn' start method (as on Windows), which re-imports
+the main script in every worker: the script starting the GUI must create the
+windows under if __name__ == '__main__'.
+"""
+
+_pools = {'thread': None, 'process': None}
+_lock = threading.Lock()
+
+
+def cores():
+    return os.cpu_count() or 1
+
+
+def thread_pool():
+    """Shared pool for the I/O bound part of the imports"""
+    with _lock:
+        if _pools['thread'] is None:
+            _pools['thread'] = ThreadPoolExecutor(max_workers=min(32, cores() + 4))
+        return _pools['thread']
+
+
+def process_pool():
+    """Shared pool (one process per core) for parsing text files"""
+    with _lock:
+        if _pools['process'] is None:
+            _pools['process'] = ProcessPoolExecutor(max_workers=cores(),
+                                                    mp_context=multiprocessing.get_context('spawn'))
+        return _pools['process']
+
+
+def shutdown():
+    """Stops the shared pools, e.g. when the main window is closed"""
+    with _lock:
+        for name in _pools:
+            if _pools[name] is not None:
+                _pools[name].shutdown(wait=False)
+                _pools[name] = None
+
+
+def _read(filepath, kind, name):
+    # Runs in a worker process: the format is passed by name
+    return Formats.read(filepath, kind, fileformat=Formats.get(name))
+
+
+def _import(filepath, kind, manufacturer, processes):
+    with Timing.span('batch import', 'import', file=os.path.basename(filepath)):
+        return _detect_and_read(filepath, kind, manufacturer, processes)
+
+
+def _detect_and_read(filepath, kind, manufacturer, processes):
+    fileformat = Formats.detect(filepath, manufacturer)
+    if fileformat is None or kind not in fileformat.readers:
+        return Formats.read(filepath, kind, manufacturer)  # raises the ReadError of a single import
+
+    if processes and fileformat.text:
+        return process_pool().submit(_read, filepath, kind, fileformat.name).result()
+    return Formats.read(filepath, kind, fileformat=fileformat)
+
+
+def submit(filepaths, kind, manufacturer=None, processes=None):
+    """Starts the import of the files into data sets of the given kind (e.g. 'image'). manufacturer overrides the
+    detected format as in Formats.detect. processes selects whether text files are parsed in worker processes
+    (default: if there is more than one core). Returns a list of (filepath, future); the result of a future is the
+    data set, or the exception raised by the reader."""
+    if processes is None:
+        processes = cores() > 1
+    pool = thread_pool()
+    return [(filepath, pool.submit(_import, filepath, kind, manufacturer, processes)) for filepath in filepaths]
+
+
+def read_files(filepaths, kind, manufacturer=None, processes=None):
+    """Imports the files concurrently; yields (filepath, dataset, error) as the files are read, in the order they
+    complete. Either dataset or error (the exception) is None."""
+    futures = dict((future, filepath) for filepath, future in submit(filepaths, kind, manufacturer, processes))
+    for future in as_completed(futures):
+        try:
+            yield futures[future], future.result(), None
+        except Exception as e:
+            yield futures[future], None, e
+
+
+def message(error):
+    """Text shown for a file that could not be imported"""
+    if isinstance(error, ReadError):
+        return str(error)
+    return "Could not import file."
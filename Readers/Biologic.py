@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from Readers.Datasets import ImageDataset, ApproachCurveDataset, VoltammogramDataset, ChronoamperometryDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the readers for Biologic (EC-Lab) text exports. The files
+consist of whitespace separated columns, possibly preceded by header lines:
+1. Images : a point cloud (x (µm), y (µm), current (A)) following a 'X Y Z'
+   line.
+2. Approach curves : distance (µm), current (A).
+3. Cyclic voltammograms : potential (V), current (A).
+4. Chronoamperograms : time (s), current (A).
+"""
+
+IMAGE_START = ['X', 'Y', 'Z']  # the point cloud of an image follows this line
+
+
+def sniff(lines, raw):
+    """True for EC-Lab exports or the 'X Y Z' header of Biologic SECM images; see Readers/Formats.py"""
+    if raw.startswith(b'EC-Lab'):
+        return True
+    for line in lines:
+        fields = line.split()
+        if fields == IMAGE_START or 'Ewe/V' in fields or '<I>/mA' in fields:
+            return True
+    return False
+
+
+def read(filepath, start=None):
+    """Returns the numeric lines of the file as a 2D float array. If start (list of fields) is given, only the lines
+    following the line equal to start are read."""
+    data = []
+    datastart = start is None  # toggle for determining if reading point cloud
+    with open(filepath, 'r') as fh:
+        for curline in fh:
+            try:
+                curline = curline.split()
+                if curline == start:
+                    datastart = True
+                if datastart:
+                    float(curline[0])  # check if line contains strings or numbers
+                    data.append(curline)  # if number, add to dataframe
+            except:
+                pass  # if string, skip to next line
+    return pd.DataFrame(data, dtype=float).values
+
+
+# Data sets from the numeric rows, shared by the readers below and Readers/Follow.py (complete is False while the file
+# is still being written). The header is not used.
+
+def image_from_rows(header, data, complete=True):
+    if not complete:
+        data = data[:ImageDataset.complete_points(data[:, 0])]
+        if len(data) == 0:
+            return None
+    xpos = np.unique(data[:, 0])
+    ypos = np.unique(data[:, 1])
+    currents = data[:, 2] * 1E9  # A --> nA
+    return ImageDataset(xpos - np.amin(xpos), ypos - np.amin(ypos), currents.reshape(len(ypos), len(xpos)))
+
+
+def approach_curve_from_rows(header, data, complete=True):
+    distances = data[:, 0] - np.amin(data[:, 0])
+    return ApproachCurveDataset(distances, data[:, 1] * 1E9, metadata={'zero_method': 'No calibration'})
+
+
+def voltammogram_from_rows(header, data, complete=True):
+    # The scan rate is not present in this file format
+    return VoltammogramDataset.from_sweeps(data[:, 0], data[:, 1] * 1E9, complete=complete)
+
+
+def chronoamperometry_from_rows(header, data, complete=True):
+    # The potential is not present in this file format
+    return ChronoamperometryDataset(data[:, 0], data[:, 1] * 1E9)
+
+
+# Readers of the apps (see Readers/Formats.py)
+
+def load_image(filepath):
+    return image_from_rows(None, read(filepath, start=IMAGE_START))
+
+
+def load_approach_curve(filepath):
+    return approach_curve_from_rows(None, read(filepath))
+
+
+def load_voltammogram(filepath):
+    return voltammogram_from_rows(None, read(filepath))
+
+
+def load_chronoamperometry(filepath):
+    return chronoamperometry_from_rows(None, read(filepath))
@@ -0,0 +1,208 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from Readers.Datasets import ImageDataset, ApproachCurveDataset, VoltammogramDataset, ChronoamperometryDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the reader for CH Instruments text exports, shared by all
+apps. These files consist of a header section, a line with the column labels
+(e.g. 'Potential/V, Current/A') and a comma separated numeric block:
+
+    Oct. 18, 2019   10:21:33
+    Cyclic Voltammetry
+    File:  cv.bin
+    ...
+    Init E (V) = 0.5
+    Scan Rate (V/s) = 0.02
+    Segment = 4
+    ...
+    Potential/V, Current/A
+
+    0.500, 1.234e-10
+    ...
+
+The file is read once: the header lines are kept and the 'key = value' lines
+are parsed into a metadata dictionary, then the numeric block is parsed in
+bulk into a float array.
+"""
+
+
+def sniff(lines):
+    """True if the first lines of a file (see Readers/Formats.py) contain a line of 'name/unit' column labels
+    followed by comma separated numbers"""
+    for index, line in enumerate(lines[:-1]):
+        if ',' in line and _is_labels(line.split(','), None):
+            for following in lines[index + 1:]:
+                if following.strip():
+                    try:
+                        [float(field) for field in following.split(',')]
+                        return True
+                    except ValueError:
+                        return False
+    return False
+
+
+def _is_labels(fields, columns):
+    fields = [field.strip() for field in fields]
+    if columns is not None:
+        return fields == list(columns)
+    # Without expected labels, the first line of 'name/unit' fields marks the start of the data
+    return len(fields) > 1 and all('/' in field and '=' not in field for field in fields)
+
+
+def parse_metadata(header):
+    """Parses the header lines into a dictionary. 'key = value' lines are converted to float where possible; the
+    first two lines are the date and the technique."""
+    metadata = {}
+    if len(header) > 0:
+        metadata['Date'] = header[0].strip()
+    if len(header) > 1:
+        metadata['Technique'] = header[1].strip()
+    for line in header[2:]:
+        if '=' in line:
+            key, value = line.split('=', 1)
+        elif ':' in line:
+            key, value = line.split(':', 1)
+        else:
+            continue
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+        metadata[key.strip()] = value
+    return metadata
+
+
+def _parse_block(text, ncols):
+    # Fast path: the whole block is numeric
+    try:
+        data = pd.read_csv(io.StringIO(text), header=None, sep=',', skipinitialspace=True, dtype=float,
+                           skip_blank_lines=True).values
+        if data.shape[1] == ncols:
+            return data
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError):
+        pass
+
+    # Slow path: skip non numeric lines (e.g. segment separators)
+    rows = []
+    for line in text.splitlines():
+        fields = line.split(',')
+        try:
+            rows.append([float(field) for field in fields[:ncols]])
+        except ValueError:
+            pass
+    return np.array(rows, dtype=float).reshape(-1, ncols)
+
+
+def read(filepath, columns=None):
+    """Reads a CH Instruments text file.
+        columns are the expected column labels, e.g. ['Potential/V', 'Current/A']; if None the first line of
+        'name/unit' labels is used
+        returns metadata (dict), header (list of the lines before the column labels) and data (2D float array)
+    """
+    header = []
+    with open(filepath, 'r') as fh:
+        line = fh.readline()
+        while line:
+            fields = line.split(',')
+            if _is_labels(fields, columns):
+                ncols = len(fields)
+                break
+            header.append(line)
+            line = fh.readline()
+        else:
+            raise ValueError("No data found in {}".format(filepath))
+        text = fh.read()
+
+    return parse_metadata(header), header, _parse_block(text, ncols)
+
+
+def header_value(header, line):
+    """Numeric value of a 'key = value' header line, by line number (1-based)"""
+    return float(header[line - 1].split('=')[1].strip('\n'))
+
+
+def scan_rate(metadata, header):
+    """Scan rate in mV/s"""
+    if 'Scan Rate (V/s)' in metadata:
+        return 1000 * float(metadata['Scan Rate (V/s)'])
+    return 1000 * header_value(header, 13)  # position of the scan rate in CV exports
+
+
+# Data sets from the header lines and the numeric rows, shared by the readers below and Readers/Follow.py (complete is
+# False while the file is still being written). Currents are converted to nA and from the polarographic to the IUPAC
+# sign convention.
+
+def image_from_rows(header, data, complete=True):
+    if not complete:
+        data = data[:ImageDataset.complete_points(data[:, 0])]
+        if len(data) == 0:
+            return None
+    xpos = np.unique(data[:, 0])
+    ypos = np.unique(data[:, 1])
+    currents = data[:, 2] * 1E9  # A --> nA
+    currents = currents.reshape(len(ypos), len(xpos)) * (-1)  # polarographic --> IUPAC convention
+    return ImageDataset(xpos - np.amin(xpos), ypos - np.amin(ypos), currents, parse_metadata(header))
+
+
+def approach_curve_from_rows(header, data, complete=True):
+    metadata = parse_metadata(header)
+    metadata['Potential'] = header_value(header, 9)  # constant potential
+    distances = np.amax(data[:, 0]) - data[:, 0]
+    currents = data[:, 1] * 1E9 * (-1)  # A --> nA, polarographic --> IUPAC convention
+    return ApproachCurveDataset(distances, currents, metadata)
+
+
+def voltammogram_from_rows(header, data, complete=True):
+    metadata = parse_metadata(header)
+    currents = data[:, 1] * 1E9 * (-1)  # A --> nA, polarographic --> IUPAC convention
+    return VoltammogramDataset.from_sweeps(data[:, 0], currents, scan_rate(metadata, header), metadata, complete)
+
+
+def chronoamperometry_from_rows(header, data, complete=True):
+    conpot = header_value(header, 10)  # constant potential
+    currents = data[:, 1] * 1E9 * (-1)  # A --> nA, polarographic --> IUPAC convention
+    return ChronoamperometryDataset(data[:, 0], currents, conpot, parse_metadata(header))
+
+
+# Readers of the apps (see Readers/Formats.py)
+
+def load_image(filepath):
+    metadata, header, df = read(filepath, columns=['X/um', 'Y/um', 'Current/A'])
+    return image_from_rows(header, df)
+
+
+def load_approach_curve(filepath):
+    metadata, header, df = read(filepath, columns=['Distance/um', 'Current/A'])
+    return approach_curve_from_rows(header, df)
+
+
+def load_voltammogram(filepath):
+    metadata, header, df = read(filepath, columns=['Potential/V', 'Current/A'])
+    return voltammogram_from_rows(header, df)
+
+
+def load_chronoamperometry(filepath):
+    metadata, header, df = read(filepath, columns=['Time/sec', 'Current/A'])
+    return chronoamperometry_from_rows(header, df)
@@ -0,0 +1,286 @@
+import os
+
+import numpy as np
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the data sets returned by the readers. Every reader
+(see Readers/Formats.py) converts a file to one of the following types, in
+the units used by the apps:
+1. ImageDataset : x/y positions (µm) and a 2D current map (nA).
+2. ApproachCurveDataset : distances (µm) and currents (nA).
+3. VoltammogramDataset : potential (V) of one sweep and currents (nA), one
+   row per cycle.
+4. ChronoamperometryDataset : sampling times (s) and currents (nA).
+5. ImageStackDataset : repeated images of the same area (time-lapse), one
+   frame per file, see Readers/Stack.py.
+6. ApproachGridDataset : an approach curve at every point of an image, see
+   Readers/ApproachGrid.py.
+7. ScatteredImageDataset : currents at scattered x/y positions (hopping or
+   intermittent contact scans), see Readers/Scattered.py.
+
+The apps copy a data set into their window with load_dataset(); readers do
+not depend on Tk and can be used on their own.
+"""
+
+
+class ReadError(Exception):
+    """A file could not be read. The message is shown in the import label of the apps."""
+
+
+class ScatteredError(ReadError):
+    """The points of an image file do not form a grid; the file can be read as scattered points
+    (ScatteredImageDataset) if its format has a reader for them."""
+
+
+class Dataset:
+    """Base class of the data sets.
+        kind is the name used to look up the reader of a format (e.g. 'image')
+        filepath and fileformat (name of the format, see Readers/Formats.py) are set by Formats.read
+        metadata holds reader specific information (e.g. the header of the file)
+    """
+    kind = None
+
+    def __init__(self, metadata=None):
+        self.filepath = None
+        self.fileformat = None
+        self.metadata = metadata if metadata is not None else {}
+
+    @property
+    def name(self):
+        if self.filepath is None:
+            return ''
+        return os.path.basename(self.filepath)
+
+
+class ImageDataset(Dataset):
+    """SECM image.
+        xpos, ypos = 1D arrays of the unique x and y positions (µm)
+        currents = 2D array (nptsy, nptsx) of the currents (nA)
+    """
+    kind = 'image'
+
+    def __init__(self, xpos, ypos, currents, metadata=None):
+        Dataset.__init__(self, metadata)
+        self.xpos = xpos
+        self.ypos = ypos
+        self.currents = currents
+
+    @property
+    def nptsx(self):
+        return self.currents.shape[1]
+
+    @property
+    def nptsy(self):
+        return self.currents.shape[0]
+
+    @staticmethod
+    def complete_points(x):
+        """Number of points of the complete lines of an image recorded line by line, x increasing along a line (e.g.
+        a file still being written, see Readers/Follow.py); 0 before the second line is complete."""
+        resets = np.flatnonzero(np.diff(x) < 0)
+        if len(resets) == 0:
+            return 0
+        nptsx = resets[0] + 1  # length of the first line
+        nptsy = len(x) // nptsx
+        return nptsy * nptsx if nptsy >= 2 else 0
+
+
+class ImageStackDataset(ImageDataset):
+    """Time-lapse SECM images: repeated scans of the same area.
+        xpos, ypos = 1D arrays of the unique x and y positions of the first frame (µm)
+        currents = 3D array (nframes, nptsy, nptsx) of the currents (nA), usually memory-mapped
+        metadata['frames'] = names of the files of the frames
+    """
+    kind = 'image_stack'
+
+    @property
+    def name(self):
+        return "{} [{} frames]".format(ImageDataset.name.fget(self), self.nframes)
+
+    @property
+    def nframes(self):
+        return self.currents.shape[0]
+
+    @property
+    def nptsx(self):
+        return self.currents.shape[2]
+
+    @property
+    def nptsy(self):
+        return self.currents.shape[1]
+
+    def frame(self, index):
+        """Image data set of one frame; its currents are a view of the stack"""
+        return ImageDataset(self.xpos, self.ypos, self.currents[index], metadata={'frame': index})
+
+
+class ApproachGridDataset(ImageDataset):
+    """Approach curves recorded at every point of an image grid.
+        xpos, ypos = 1D arrays of the unique x and y positions (µm)
+        distances = 1D array of the tip-substrate distances of the curves (µm), in increasing order
+        currents = 3D array (nptsy, nptsx, nptsz) of the currents (nA); currents[iy, ix] is the curve of one point
+    """
+    kind = 'approach_grid'
+
+    def __init__(self, xpos, ypos, distances, currents, metadata=None):
+        ImageDataset.__init__(self, xpos, ypos, currents, metadata)
+        self.distances = distances
+
+    @property
+    def name(self):
+        return "{} [{} pts/curve]".format(ImageDataset.name.fget(self), self.nptsz)
+
+    @property
+    def nptsz(self):
+        return self.currents.shape[2]
+
+    def closest(self):
+        """Image data set of the currents at the smallest distance; its currents are a view of the grid"""
+        return ImageDataset(self.xpos, self.ypos, self.currents[:, :, 0])
+
+
+class ScatteredImageDataset(Dataset):
+    """SECM image sampled at scattered points, not on a grid; the image app reconstructs a grid from the points (see
+    Processing/PScatter.py).
+        xpoints, ypoints = 1D arrays of the x and y positions of every point (µm)
+        currents = 1D array of the currents (nA)
+    """
+    kind = 'scattered_image'
+
+    def __init__(self, xpoints, ypoints, currents, metadata=None):
+        Dataset.__init__(self, metadata)
+        self.xpoints = xpoints
+        self.ypoints = ypoints
+        self.currents = currents
+
+    @property
+    def name(self):
+        return "{} [{} scattered pts]".format(Dataset.name.fget(self), self.npts)
+
+    @property
+    def npts(self):
+        return len(self.currents)
+
+
+class ApproachCurveDataset(Dataset):
+    """Approach curve.
+        distances = 1D array of the tip-substrate distances (µm), positive values in order of increasing distance
+        currents = 1D array of the currents (nA)
+        metadata['zero_method'], if present, is the calibration suggested for the format
+    """
+    kind = 'approach_curve'
+
+    def __init__(self, distances, currents, metadata=None):
+        Dataset.__init__(self, metadata)
+        self.distances = distances
+        self.currents = currents
+
+    @property
+    def npts(self):
+        return len(self.distances)
+
+
+class VoltammogramDataset(Dataset):
+    """Cyclic voltammogram.
+        potential = 1D array of the potentials (V) of one cycle
+        currents = 2D array (ncycles, nptscycle) of the currents (nA); each row is one cycle
+        scan_rate = scan rate (mV/s), None if not available
+    """
+    kind = 'voltammogram'
+
+    def __init__(self, potential, currents, scan_rate=None, metadata=None):
+        Dataset.__init__(self, metadata)
+        self.potential = potential
+        self.currents = currents
+        self.scan_rate = scan_rate
+
+    @property
+    def ncycles(self):
+        return self.currents.shape[0]
+
+    @property
+    def nptscycle(self):
+        return self.currents.shape[1]
+
+    @classmethod
+    def from_sweeps(cls, potential, currents, scan_rate=None, metadata=None, complete=True):
+        """Splits consecutive cycles (1D potential/currents) into rows. The number of cycles is the number of times
+        the maximum potential is reached; a single extra point at the end (start/end on the same potential) is
+        omitted. If complete is False (a file still being written), see cycle_rows."""
+        if not complete:
+            potential, currents = cls.cycle_rows(potential, currents)
+            return cls(potential, currents, scan_rate, metadata)
+        ncycles = len(potential[potential == np.amax(potential)])
+        nptscycle = int(len(potential) / ncycles)
+        extrapoint = len(currents) - ncycles * nptscycle
+        if extrapoint == 1:
+            currents = currents[:-1]
+        elif extrapoint != 0:
+            raise ReadError("Error processing cycles.")
+        return cls(potential[0:nptscycle], currents.reshape(ncycles, nptscycle), scan_rate, metadata)
+
+    @staticmethod
+    def cycle_rows(potential, currents, nptscycle=None):
+        """Potential of one cycle and the currents, one row per cycle, of cycles that may not be complete yet. By
+        default the cycle length is the index at which the potential first returns to its two starting values. The
+        last (incomplete) cycle is padded with NaN; a single point after the last cycle is omitted, as in
+        from_sweeps."""
+        npts = len(potential)
+        if nptscycle is None:
+            nptscycle = npts
+            if npts > 2:
+                restart = np.flatnonzero((potential[1:-1] == potential[0]) & (potential[2:] == potential[1]))
+                if len(restart):
+                    nptscycle = restart[0] + 1
+        if nptscycle < npts and npts % nptscycle == 1:
+            npts = npts - 1
+            currents = currents[:npts]
+        ncycles = -(-npts // nptscycle)
+        rows = np.full(ncycles * nptscycle, np.nan)
+        rows[:npts] = currents
+        return potential[:nptscycle], rows.reshape(ncycles, nptscycle)
+
+    @staticmethod
+    def scan_rate_from_time(time, potential, nptscycle):
+        """Scan rate in mV/s from the first quarter of a cycle, None if it cannot be computed"""
+        critpt = int(np.floor(nptscycle / 4))
+        if critpt == 0 or time[critpt] == time[0]:
+            return None
+        return 1000 * ((potential[critpt] - potential[0]) / (time[critpt] - time[0]))
+
+
+class ChronoamperometryDataset(Dataset):
+    """Chronoamperogram.
+        time = 1D array of the sampling times (s)
+        currents = 1D array of the currents (nA)
+        potential = constant potential (V), a description (e.g. 'Pulse sequence.') or None if not available
+    """
+    kind = 'chronoamperometry'
+
+    def __init__(self, time, currents, potential=None, metadata=None):
+        Dataset.__init__(self, metadata)
+        self.time = time
+        self.currents = currents
+        self.potential = potential
+
+    @property
+    def npts(self):
+        return len(self.time)
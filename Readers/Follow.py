@@ -0,0 +1,276 @@
+import os
+
+import numpy as np
+
+from Readers import Biologic
+from Readers import CHInstruments
+from Readers import Formats
+from Readers import HEKA
+from Readers import PAR
+from Readers import SECMx
+from Readers import Sensolytics
+from Readers.Datasets import ReadError
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the incremental reader used to follow a file while the
+instrument software is still writing it (follow mode of the apps).
+
+The file is never read twice: FileTail keeps the offset of the last complete
+line and returns only the lines appended since the previous call. Lines whose
+first field is a number are data, all other lines are header lines (kept in
+order, as the header of the readers); a single first data line followed by
+longer ones (the x positions of PAR images) is a header line too. The data
+lines of every call are parsed in bulk and appended to a GrowableArray, whose
+capacity doubles when it is full.
+
+The format of a new file is detected once DETECT_ROWS data lines have been
+written, as its header may still be empty or partial before.
+
+dataset() converts the rows read so far into a data set with the function of
+the reader of the format (see FOLLOWERS), the one used for the finished file,
+with complete=False:
+1. Images : only complete lines of the scan are returned, at least two.
+2. Voltammograms : the cycle length is known once the second cycle starts;
+   the cycle being recorded is padded with NaN.
+3. Approach curves and chronoamperograms : all points read so far.
+
+All text formats of Readers/Formats.py can be followed; MATLAB files (HEKA
+.mat) are written at the end of the experiment and cannot. Units of SECMx
+files are taken from the first unit lines of the header.
+"""
+
+
+class GrowableArray:
+    """2D float array to which rows are appended; the capacity doubles when it is full, so appending n rows in
+    small chunks costs O(n) copies."""
+    def __init__(self, ncols, capacity=1024):
+        self.data = np.empty((capacity, ncols), dtype=float)
+        self.size = 0
+
+    @property
+    def ncols(self):
+        return self.data.shape[1]
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.ncols)
+        if self.size + len(rows) > len(self.data):
+            capacity = max(2 * len(self.data), self.size + len(rows))
+            data = np.empty((capacity, self.ncols), dtype=float)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:self.size + len(rows)] = rows
+        self.size = self.size + len(rows)
+
+    def view(self):
+        """The rows appended so far (a view, valid until the next append)"""
+        return self.data[:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+class FileTail:
+    """Returns the complete lines appended to a file since the previous call. A file that became shorter (e.g.
+    overwritten by a new experiment) is read again from the start; reset is then True."""
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.offset = 0
+        self.reset = False
+
+    def read_lines(self):
+        self.reset = False
+        size = os.path.getsize(self.filepath)
+        if size < self.offset:
+            self.offset = 0
+            self.reset = True
+        if size == self.offset:
+            return []
+        with open(self.filepath, 'rb') as fh:
+            fh.seek(self.offset)
+            chunk = fh.read(size - self.offset)
+        end = chunk.rfind(b'\n') + 1  # a line being written is read on the next call
+        self.offset = self.offset + end
+        return chunk[:end].decode('latin-1').splitlines()
+
+
+def _is_number(field):
+    try:
+        float(field)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_rows(lines, sep=None):
+    """Parses lines with the same number of fields into a 2D float array"""
+    if sep is not None:
+        lines = [line.replace(sep, ' ') for line in lines]
+    ncols = len(lines[0].split())
+    values = np.array(' '.join(lines).split(), dtype=float)
+    if len(values) != ncols * len(lines):
+        raise ValueError("Lines with different numbers of fields")
+    return values.reshape(len(lines), ncols)
+
+
+# Format name --> (separator of the data lines, first line of the data or None, kind --> data set function). The
+# functions of the readers are called as function(header, rows, complete=False).
+FOLLOWERS = {
+    'heka_asc': (None, None, {'image': HEKA.image_from_rows,
+                              'approach_curve': HEKA.approach_curve_from_rows,
+                              'voltammogram': HEKA.voltammogram_from_rows,
+                              'chronoamperometry': HEKA.chronoamperometry_from_rows}),
+    'ch_instruments': (',', None, {'image': CHInstruments.image_from_rows,
+                                   'approach_curve': CHInstruments.approach_curve_from_rows,
+                                   'voltammogram': CHInstruments.voltammogram_from_rows,
+                                   'chronoamperometry': CHInstruments.chronoamperometry_from_rows}),
+    'biologic': (None, None, {'image': Biologic.image_from_rows,
+                              'approach_curve': Biologic.approach_curve_from_rows,
+                              'voltammogram': Biologic.voltammogram_from_rows,
+                              'chronoamperometry': Biologic.chronoamperometry_from_rows}),
+    'sensolytics': (',', None, {'image': Sensolytics.image_from_rows,
+                                'approach_curve': Sensolytics.approach_curve_from_rows,
+                                'voltammogram': Sensolytics.voltammogram_from_rows,
+                                'chronoamperometry': Sensolytics.chronoamperometry_from_rows}),
+    'par': (',', None, {'image': PAR.image_from_rows,
+                        'approach_curve': PAR.approach_curve_from_rows}),
+    'secmx': (None, None, {'image': SECMx.image_from_rows,
+                           'approach_curve': SECMx.approach_curve_from_rows}),
+}
+# Biologic images: numeric lines before the 'X Y Z' line are not data
+START = {('biologic', 'image'): Biologic.IMAGE_START}
+DETECT_ROWS = 2  # data lines written before the format of a new file is detected
+
+
+def followable(fileformat, kind):
+    return fileformat.name in FOLLOWERS and kind in FOLLOWERS[fileformat.name][2]
+
+
+class Follower:
+    """Incremental reader of a file being written.
+        poll() reads the lines appended since the previous call; returns the number of new data rows
+        dataset() returns the data set read so far, None if there is not enough data yet
+    The header of a new file may be empty or partial: unless given, the format is detected once DETECT_ROWS data
+    lines have been written. Raises a ReadError (on creation or from poll()) if the format cannot be followed.
+    """
+    def __init__(self, filepath, kind, manufacturer=None, fileformat=None):
+        self.filepath = filepath
+        self.kind = kind
+        self.manufacturer = manufacturer
+        self.fileformat = None
+        self.tail = FileTail(filepath)
+        self.pending = []  # lines read before the format is known
+        if fileformat is not None:
+            self._set_format(fileformat)
+        else:
+            self._detect()
+        self.clear()
+
+    def _set_format(self, fileformat):
+        if fileformat is None or not followable(fileformat, self.kind):
+            raise ReadError("File type cannot be followed.")
+        self.fileformat = fileformat
+        self.sep, start, builders = FOLLOWERS[fileformat.name]
+        self.start = START.get((fileformat.name, self.kind), start)
+        self.builder = builders[self.kind]
+
+    def _detect(self):
+        """Sets the format once DETECT_ROWS data lines have been read; returns False until then"""
+        fileformat = Formats.detect(self.filepath, self.manufacturer)
+        if fileformat is not None and not followable(fileformat, self.kind):
+            raise ReadError("File type cannot be followed.")
+        fields = [line.replace(',', ' ').split() for line in self.pending]
+        if sum(1 for field in fields if len(field) > 0 and _is_number(field[0])) < DETECT_ROWS:
+            return False
+        self._set_format(fileformat)
+        return True
+
+    def clear(self):
+        self.header = []
+        self.rows = None
+        self.first = None  # first data line, a header line if the next ones are longer (x positions of PAR images)
+        self.started = self.fileformat is not None and self.start is None
+
+    def poll(self):
+        lines = self.tail.read_lines()
+        if self.tail.reset:
+            self.pending = []
+            self.clear()
+        if self.fileformat is None:
+            self.pending.extend(lines)
+            if not self._detect():
+                return 0
+            lines = self.pending
+            self.pending = []
+            self.clear()
+        nrows = 0
+        block = []  # consecutive data lines with the same number of fields
+        for line in lines:
+            fields = line.replace(self.sep, ' ').split() if self.sep is not None else line.split()
+            if self.started and len(fields) > 0 and _is_number(fields[0]):
+                if block and len(fields) != width:
+                    nrows = nrows + self._append(block)
+                    block = []
+                block.append(line)
+                width = len(fields)
+            else:
+                nrows = nrows + self._append(block)
+                block = []
+                if not self.started and fields == self.start:
+                    self.started = True
+                self.header.append(line)
+        return nrows + self._append(block)
+
+    def _append(self, block):
+        if not block:
+            return 0
+        try:
+            rows = parse_rows(block, self.sep)
+        except ValueError:
+            return 0  # malformed lines are skipped, as by the readers
+        if self.rows is None:
+            self.rows = GrowableArray(rows.shape[1])
+            self.first = block[0]
+        elif rows.shape[1] != self.rows.ncols:
+            if len(self.rows) == 1 and self.first is not None:
+                # e.g. the x positions of a PAR image, followed by the lines of the image
+                self.header.append(self.first)
+                self.first = None
+                self.rows = GrowableArray(rows.shape[1])
+            else:
+                return 0
+        self.rows.append(rows)
+        return len(rows)
+
+    @property
+    def npts(self):
+        return 0 if self.rows is None else len(self.rows)
+
+    def dataset(self):
+        if self.rows is None or len(self.rows) < 2:
+            return None
+        try:
+            dataset = self.builder(self.header, self.rows.view().copy(), complete=False)
+        except (IndexError, ValueError):
+            return None  # not enough of the header or data written yet
+        if dataset is not None:
+            dataset.filepath = self.filepath
+            dataset.fileformat = self.fileformat.name
+        return dataset
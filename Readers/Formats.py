@@ -0,0 +1,252 @@
+import os
+
+from Readers import ApproachGrid
+from Readers import Biologic
+from Readers import CHInstruments
+from Readers import HEKA
+from Readers import PAR
+from Readers import Scattered
+from Readers import SECMx
+from Readers import Sensolytics
+from Readers.Datasets import ReadError
+from Processing import Timing
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the registry of file formats used to detect the format of
+a file from its content, so that .txt files (and batches of files from
+different manufacturers) no longer need a manual choice of manufacturer.
+
+Every format declares a sniff function over the first lines of the file. Only
+the first SNIFF_BYTES of a file are read. Formats are tried in the order they
+are registered, most specific signature first; if no signature matches, the
+file extension decides.
+
+Every format also declares its readers: functions of the file path returning
+a data set (see Readers/Datasets.py), one per kind of data set ('image',
+'approach_curve', 'voltammogram', 'chronoamperometry', 'approach_grid',
+'scattered_image'). read() detects the format of a file and calls the reader
+for the kind requested by the app.
+
+Additional formats can be installed as plugins, without changes to Flux. A
+plugin package declares an entry point in the group 'flux.readers' pointing
+to a FileFormat, a list of FileFormats or a function returning either, e.g.
+in its pyproject.toml:
+
+    [project.entry-points."flux.readers"]
+    inhouse = "flux_inhouse:FORMAT"
+
+with
+
+    FORMAT = FileFormat('inhouse_bin', 'In-house', sniff, ['bin'],
+                        readers={'image': load_image})
+
+Plugins are loaded on the first detection and tried before the built-in
+formats, so that they can take over files with a known extension.
+"""
+
+SNIFF_BYTES = 8192
+ENTRY_POINT_GROUP = 'flux.readers'
+
+
+class FileFormat:
+    """A registered file format.
+        name identifies the format (e.g. 'ch_instruments'), manufacturer is the matching entry of the
+        manufacturer dropdown of the apps
+        sniff(lines, raw) returns True if the first lines (str) / bytes (raw) of a file belong to the format
+        extensions are the (lower case) extensions used when no signature matches
+        readers maps the kind of data set (e.g. 'image') to a function reader(filepath) returning the data set
+        text is True if parsing the file is CPU bound (text formats); Readers/Batch.py then reads it in a worker
+        process
+    """
+    def __init__(self, name, manufacturer, sniff, extensions=(), readers=None, text=True):
+        self.name = name
+        self.manufacturer = manufacturer
+        self.sniff = sniff
+        self.extensions = tuple(extensions)
+        self.readers = dict(readers) if readers is not None else {}
+        self.text = text
+
+
+FORMATS = []
+_plugins = {'loaded': False, 'errors': []}
+
+
+def register(name, manufacturer, sniff, extensions=(), readers=None, text=True):
+    fileformat = FileFormat(name, manufacturer, sniff, extensions, readers, text)
+    FORMATS.append(fileformat)
+    return fileformat
+
+
+def _entry_points(group):
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    try:
+        return list(entry_points(group=group))
+    except TypeError:
+        return list(entry_points().get(group, []))  # Python < 3.10
+
+
+def load_plugins(force=False):
+    """Loads the formats declared in the 'flux.readers' entry point group (once, unless force). A plugin that fails
+    to load is skipped; the error is kept in plugin_errors()."""
+    if _plugins['loaded'] and not force:
+        return
+    _plugins['loaded'] = True
+
+    plugins = []
+    for entry_point in _entry_points(ENTRY_POINT_GROUP):
+        try:
+            plugin = entry_point.load()
+            if callable(plugin) and not isinstance(plugin, FileFormat):
+                plugin = plugin()
+            if isinstance(plugin, FileFormat):
+                plugin = [plugin]
+            for fileformat in plugin:
+                if not isinstance(fileformat, FileFormat):
+                    raise TypeError("{} is not a FileFormat".format(fileformat))
+                if all(entry.name != fileformat.name for entry in FORMATS + plugins):
+                    plugins.append(fileformat)
+        except Exception as e:
+            _plugins['errors'].append((entry_point.name, e))
+            print("Could not load reader plugin '{}': {}".format(entry_point.name, e))
+    FORMATS[0:0] = plugins
+
+
+def plugin_errors():
+    return list(_plugins['errors'])
+
+
+def read_prefix(filepath, nbytes=SNIFF_BYTES):
+    """Returns the first nbytes of a file and the complete lines they contain"""
+    with open(filepath, 'rb') as fh:
+        raw = fh.read(nbytes)
+    lines = raw.decode('latin-1').splitlines()
+    if len(raw) == nbytes and len(lines) > 1:
+        lines = lines[:-1]  # last line may be cut off
+    return raw, lines
+
+
+def extension(filepath):
+    return os.path.splitext(filepath)[1][1:].lower()
+
+
+register('heka_mat', 'HEKA', lambda lines, raw: HEKA.sniff_mat(raw), ['mat'],
+         readers={'image': HEKA.load_image_mat,
+                  'approach_curve': HEKA.load_approach_curve_mat,
+                  'voltammogram': HEKA.load_voltammogram_mat},
+         text=False)
+register('secmx', 'SECMx', lambda lines, raw: SECMx.sniff(lines), ['img', 'zsc'],
+         readers={'image': SECMx.load_image,
+                  'scattered_image': SECMx.load_scattered_image,
+                  'approach_curve': SECMx.load_approach_curve})
+# Generic tables may start with '#' comment lines, like Sensolytics files
+register('approach_grid_text', 'Generic', lambda lines, raw: ApproachGrid.sniff(lines),
+         readers={'approach_grid': ApproachGrid.load_approach_grid})
+register('scattered_text', 'Generic', lambda lines, raw: Scattered.sniff(lines),
+         readers={'scattered_image': Scattered.load_scattered_image})
+register('sensolytics', 'Sensolytics', lambda lines, raw: Sensolytics.sniff(lines), ['dat'],
+         readers={'image': Sensolytics.load_image,
+                  'approach_curve': Sensolytics.load_approach_curve,
+                  'voltammogram': Sensolytics.load_voltammogram,
+                  'chronoamperometry': Sensolytics.load_chronoamperometry})
+register('ch_instruments', 'CH Instruments', lambda lines, raw: CHInstruments.sniff(lines),
+         readers={'image': CHInstruments.load_image,
+                  'approach_curve': CHInstruments.load_approach_curve,
+                  'voltammogram': CHInstruments.load_voltammogram,
+                  'chronoamperometry': CHInstruments.load_chronoamperometry})
+register('par', 'PAR', lambda lines, raw: PAR.sniff(lines), ['csv'],
+         readers={'image': PAR.load_image,
+                  'approach_curve': PAR.load_approach_curve})
+register('heka_asc', 'HEKA', lambda lines, raw: HEKA.sniff_asc(lines), ['asc'],
+         readers={'image': HEKA.load_image_asc,
+                  'approach_curve': HEKA.load_approach_curve_asc,
+                  'voltammogram': HEKA.load_voltammogram_asc,
+                  'chronoamperometry': HEKA.load_chronoamperometry_asc})
+register('biologic', 'Biologic', Biologic.sniff,
+         readers={'image': Biologic.load_image,
+                  'approach_curve': Biologic.load_approach_curve,
+                  'voltammogram': Biologic.load_voltammogram,
+                  'chronoamperometry': Biologic.load_chronoamperometry})
+
+
+def sniff(filepath):
+    """Format whose signature matches the start of the file, else the format registered for its extension, else
+    None"""
+    load_plugins()
+    try:
+        raw, lines = read_prefix(filepath)
+        for fileformat in FORMATS:
+            try:
+                if fileformat.sniff(lines, raw):
+                    return fileformat
+            except:
+                pass  # a faulty sniffer must not prevent detection of the other formats
+    except:
+        pass
+
+    for fileformat in FORMATS:
+        if extension(filepath) in fileformat.extensions:
+            return fileformat
+    return None
+
+
+def detect(filepath, manufacturer=None):
+    """Format of a file. If a manufacturer is given (e.g. chosen by the user) and differs from the detected one, the
+    format of that manufacturer is used, preferring the one registered for the file extension."""
+    fileformat = sniff(filepath)
+    if manufacturer in (None, 'None') or (fileformat is not None and fileformat.manufacturer == manufacturer):
+        return fileformat
+
+    candidates = [entry for entry in FORMATS if entry.manufacturer == manufacturer]
+    for entry in candidates:
+        if extension(filepath) in entry.extensions:
+            return entry
+    if candidates:
+        return candidates[0]
+    return fileformat
+
+
+def get(name):
+    """Registered format of the given name, None if unknown"""
+    load_plugins()
+    for fileformat in FORMATS:
+        if fileformat.name == name:
+            return fileformat
+    return None
+
+
+def read(filepath, kind, manufacturer=None, fileformat=None):
+    """Reads a file into a data set of the given kind (e.g. 'image'). The format is detected unless given. Raises a
+    ReadError if the format is unknown or has no reader for this kind; errors of the reader itself are passed on."""
+    if fileformat is None:
+        fileformat = detect(filepath, manufacturer)
+    if fileformat is None and extension(filepath) == 'txt':
+        raise ReadError("Specify a manufacturer.")
+    if fileformat is None or kind not in fileformat.readers:
+        raise ReadError("File type not supported.")
+
+    with Timing.span('read ' + fileformat.name, 'import', file=os.path.basename(filepath), kind=kind):
+        dataset = fileformat.readers[kind](filepath)
+    dataset.filepath = filepath
+    dataset.fileformat = fileformat.name
+    return dataset
@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+import scipy.io # support for matlab workspaces
+
+from Readers.Datasets import ImageDataset, ApproachCurveDataset, VoltammogramDataset, ChronoamperometryDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the readers for HEKA (PATCHMASTER/PotMaster) exports:
+1. ASCII (.asc) : tab separated columns, index first (e.g. index, distance (m),
+   current (A)), possibly preceded by 'Series'/'Sweep' lines.
+2. MATLAB (.mat) : one variable per trace, columns (x, y).
+
+Values are in SI units in the files and are returned in µm/nA.
+"""
+
+
+def sniff_asc(lines):
+    """True if one of the first lines is a tab separated header starting with 'Index', or the file starts with a
+    'Series_' line; see Readers/Formats.py"""
+    for line in lines[:5]:
+        fields = line.split('\t')
+        if len(fields) > 1 and fields[0].strip().strip('"') == 'Index':
+            return True
+    return len(lines) > 0 and lines[0].startswith('Series_')
+
+
+def sniff_mat(raw):
+    return raw.startswith(b'MATLAB')
+
+
+def read_asc(filepath):
+    """Returns the numeric lines of an ASCII export as a 2D float array; lines starting with text are skipped"""
+    data = []
+    with open(filepath, 'r') as fh:
+        for curline in fh:
+            try:
+                curline = curline.split()  # split line into segments
+                float(curline[0])  # check if line contains strings or numbers
+                data.append(curline)  # if number, add to dataframe
+            except:
+                pass  # if string, skip to next line
+    return pd.DataFrame(data, dtype='float').values
+
+
+def read_mat(filepath):
+    """Returns the traces of a MATLAB export (2D arrays), in the order they are stored"""
+    matdata = scipy.io.loadmat(filepath)
+    # Delete non-data containing variables
+    del matdata['__header__']
+    del matdata['__globals__']
+    del matdata['__version__']
+    return [matdata[entry] for entry in matdata]
+
+
+# Data sets from the numeric rows of an ASCII export, shared by the readers below and Readers/Follow.py (complete is
+# False while the file is still being written). The header is not used.
+
+def image_from_rows(header, data, complete=True):
+    """Columns index, x (m), current (A); the lines of the image follow each other, each starting at x = 0"""
+    if not complete:
+        data = data[:ImageDataset.complete_points(data[:, 1])]
+        if len(data) == 0:
+            return None
+    xpos = data[:, 1] * 1E6  # m --> um
+    currents = data[:, 2] * 1E9  # A --> nA
+
+    nptsy = len(data[xpos == 0])
+    nptsx = int(len(data) / nptsy)
+
+    xpos = np.unique(xpos)
+    # y spans the x range; while the file is written, the lines scanned so far of a square image
+    ypos = np.linspace(np.amin(xpos), np.amax(xpos), nptsy if complete else nptsx)[:nptsy]
+    return ImageDataset(xpos, ypos, currents.reshape(nptsy, nptsx))
+
+
+def approach_curve_from_rows(header, data, complete=True):
+    """Columns index, distance (m), current (A) and optionally a second distance/current pair"""
+    if data.shape[1] not in (3, 5):
+        raise ValueError("Unexpected number of columns: {}".format(data.shape[1]))
+    return ApproachCurveDataset(data[:, 1] * 1E6, data[:, 2] * 1E9)  # m --> um, A --> nA
+
+
+def voltammogram_from_rows(header, data, complete=True):
+    """Columns index, time (s), current (A), time (s), potential (V); every cycle starts at t = 0"""
+    if data.shape[1] != 5:
+        raise ValueError("Unexpected number of columns: {}".format(data.shape[1]))
+    currents = data[:, 2] * 1E9  # A --> nA
+
+    # Determine the number of points per cycle, known once the second cycle starts
+    starts = np.flatnonzero(data[:, 1] == 0)
+    nptscycle = starts[1] if len(starts) > 1 else len(data)
+
+    potential, currents = VoltammogramDataset.cycle_rows(data[:, 4], currents, nptscycle)
+    scanrate = VoltammogramDataset.scan_rate_from_time(data[:, 1], data[:, 4], nptscycle)
+    return VoltammogramDataset(potential, currents, scanrate)
+
+
+def chronoamperometry_from_rows(header, data, complete=True):
+    """Columns index, time (s), current (A), time (s), potential (V)"""
+    if data.shape[1] != 5:
+        raise ValueError("Unexpected number of columns: {}".format(data.shape[1]))
+    conpot = np.mean(data[-20:-1, 4])
+    return ChronoamperometryDataset(data[:, 1], data[:, 2] * 1E9, conpot)  # A --> nA
+
+
+# Readers of the apps (see Readers/Formats.py)
+
+def load_image_asc(filepath):
+    return image_from_rows(None, read_asc(filepath))
+
+
+def load_image_mat(filepath):
+    """One trace (x (m), current (A)) per line of the image"""
+    traces = read_mat(filepath)
+    nptsy = len(traces)
+    xpos = traces[-1][:, 0]
+
+    data = np.empty((nptsy, len(xpos)), dtype=float)
+    for count, trace in enumerate(traces):
+        data[count, :] = trace[:, 1]
+
+    xpos = xpos * 1E6
+    ypos = np.linspace(np.amin(xpos), np.amax(xpos), nptsy)
+    return ImageDataset(xpos, ypos, data * 1E9)
+
+
+def load_approach_curve_asc(filepath):
+    return approach_curve_from_rows(None, read_asc(filepath))
+
+
+def load_approach_curve_mat(filepath):
+    """Last trace (distance (m), current (A)) of the file"""
+    trace = read_mat(filepath)[-1]
+    return ApproachCurveDataset(trace[:, 0] * 1E6, trace[:, 1] * 1E9,
+                                metadata={'zero_method': 'First point with data'})
+
+
+def load_voltammogram_asc(filepath):
+    return voltammogram_from_rows(None, read_asc(filepath))
+
+
+def load_voltammogram_mat(filepath):
+    """Two traces per cycle: (time (s), current (A)) followed by (time (s), potential (V))"""
+    traces = read_mat(filepath)
+    ncycles = int(np.divide(len(traces), 2))
+    trace = traces[-1]
+    potential = trace[:, 1]
+    nptscycle = len(potential)
+
+    data = np.empty((ncycles, nptscycle), dtype=float)
+    for count in range(ncycles):
+        data[count, :] = traces[2 * count][:, 1]
+
+    # Calculate scan rate in mV/s from the last potential trace
+    critpt = int(np.floor(nptscycle / 4))
+    scanrate = 1000 * ((trace[critpt, 1] - trace[0, 1]) / (trace[critpt, 0] - trace[0, 0]))
+    return VoltammogramDataset(potential, data * 1E9, scanrate)
+
+
+def load_chronoamperometry_asc(filepath):
+    return chronoamperometry_from_rows(None, read_asc(filepath))
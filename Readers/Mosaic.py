@@ -0,0 +1,269 @@
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+
+from Readers import Batch
+from Readers.Datasets import ReadError, ImageDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the stitching of overlapping image tiles into a mosaic
+(Import Mosaic button of the image app).
+
+The position of every tile is given by the stage offsets file, one line per
+tile with the name of the file and the x and y offsets (µm) of its first
+point, separated by commas, semicolons or spaces (lines starting with # are
+ignored):
+
+    # file, x, y
+    tile_00.txt, 0, 0
+    tile_01.txt, 450, 0
+
+Without offsets file, the positions recorded in the tile files are used.
+
+The mosaic is a grid with the spacing of the first tile, stored in
+memory-mapped .npy files. Tiles are placed as soon as they are read (see
+Readers/Batch.py), in any order: every point of the mosaic holds the mean of
+the tiles covering it, weighted by the distance to the border of each tile
+(feathering), and the sum of the weights. Placing a tile updates only the
+points it covers, so the mosaic is complete after every tile and building it
+costs one pass over the tiles. Tiles whose points do not fall on the grid are
+resampled by linear interpolation. Points covered by no tile are NaN.
+
+With an offsets file the extent of the mosaic is set by the offsets and the
+size of the first tile read; parts of larger tiles beyond it are cut off.
+Without it, all tiles are read before the first one is placed.
+
+The image app assumes square images; the shorter side of the mosaic is
+extended (with NaN) to the length of the longer one.
+"""
+
+STORE_FILE = 'mosaic.npy'
+WEIGHT_FILE = 'mosaic_weight.npy'
+
+
+def read_offsets(filepath):
+    """Offsets (x, y in µm) of the tiles, by file name, from a stage offsets file"""
+    offsets = {}
+    with open(filepath, 'r') as fh:
+        for number, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = [field for field in re.split(r'[,;\s]+', line) if field]
+            try:
+                offsets[os.path.basename(fields[0])] = (float(fields[1]), float(fields[2]))
+            except (IndexError, ValueError):
+                # A header line without #
+                if number == 1:
+                    continue
+                raise ReadError("Line {} of the offsets file is not 'file, x, y'.".format(number))
+    return offsets
+
+
+def step(positions):
+    """Spacing of evenly spaced positions"""
+    if len(positions) < 2:
+        raise ReadError("Tiles need at least two points per side.")
+    return float(np.median(np.abs(np.diff(positions))))
+
+
+def ascending(dataset):
+    """x, y positions in increasing order and the currents in the same order"""
+    xpos, ypos, currents = np.asarray(dataset.xpos, dtype=float), np.asarray(dataset.ypos, dtype=float), \
+        np.asarray(dataset.currents, dtype=float)
+    if xpos[-1] < xpos[0]:
+        xpos, currents = xpos[::-1], currents[:, ::-1]
+    if ypos[-1] < ypos[0]:
+        ypos, currents = ypos[::-1], currents[::-1, :]
+    return xpos, ypos, currents
+
+
+def feather(nptsy, nptsx):
+    """Weights of the points of a tile: distance (points) to the nearest border, plus one"""
+    wy = np.minimum(np.arange(nptsy), np.arange(nptsy)[::-1]) + 1.0
+    wx = np.minimum(np.arange(nptsx), np.arange(nptsx)[::-1]) + 1.0
+    return np.minimum.outer(wy, wx)
+
+
+def interpolation(positions, grid):
+    """Lower index and weight of the linear interpolation of positions (increasing) at the grid positions"""
+    index = np.clip(np.searchsorted(positions, grid, side='right') - 1, 0, len(positions) - 2)
+    weight = (grid - positions[index]) / (positions[index + 1] - positions[index])
+    return index, np.clip(weight, 0.0, 1.0)
+
+
+class Mosaic:
+    """Mosaic of tiles on a grid of spacing step (µm) covering [xmin, xmax] x [ymin, ymax] (µm).
+        place(xpos, ypos, currents) adds a tile (positions in µm, increasing); points outside the mosaic are ignored
+        dataset() is the image data set of the mosaic so far
+        directory is where the mosaic and its weights are stored (default: a new temporary directory)
+    """
+    def __init__(self, xmin, xmax, ymin, ymax, step, directory=None):
+        npts = int(round(max(xmax - xmin, ymax - ymin) / step)) + 1
+        self.xpos = xmin + step * np.arange(npts)
+        self.ypos = ymin + step * np.arange(npts)
+        self.step = step
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='flux_mosaic_')
+        self.store = os.path.join(directory, STORE_FILE)
+        self.currents = np.lib.format.open_memmap(self.store, mode='w+', dtype=float, shape=(npts, npts))
+        self.currents[...] = np.nan
+        self.weight = np.lib.format.open_memmap(os.path.join(directory, WEIGHT_FILE), mode='w+', dtype=np.float32,
+                                                shape=(npts, npts))
+        self.lock = threading.Lock()
+        self.tiles = []  # names of the tiles placed
+
+    def region(self, positions, grid):
+        """Slice of the grid covered by the positions"""
+        start = int(np.ceil((positions[0] - grid[0]) / self.step - 1E-6))
+        end = int(np.floor((positions[-1] - grid[0]) / self.step + 1E-6)) + 1
+        return slice(max(start, 0), min(end, len(grid)))
+
+    def resample(self, xpos, ypos, currents, rows, columns):
+        """Tile and its weights on the points of the grid it covers"""
+        weights = feather(*currents.shape)
+        gridx, gridy = self.xpos[columns], self.ypos[rows]
+        # Tiles on the grid are copied, the others interpolated along x then y
+        if len(gridx) == len(xpos) and len(gridy) == len(ypos) and np.allclose(gridx, xpos, atol=1E-3 * self.step) \
+                and np.allclose(gridy, ypos, atol=1E-3 * self.step):
+            return currents, weights
+        ix, wx = interpolation(xpos, gridx)
+        iy, wy = interpolation(ypos, gridy)
+        resampled = []
+        for values in (currents, weights):
+            values = values[:, ix] * (1 - wx) + values[:, ix + 1] * wx
+            resampled.append(values[iy, :] * (1 - wy)[:, np.newaxis] + values[iy + 1, :] * wy[:, np.newaxis])
+        return resampled
+
+    def place(self, xpos, ypos, currents, name=''):
+        rows, columns = self.region(ypos, self.ypos), self.region(xpos, self.xpos)
+        if rows.start >= rows.stop or columns.start >= columns.stop:
+            return False
+        tile, weights = self.resample(xpos, ypos, currents, rows, columns)
+        weights = np.where(np.isnan(tile), 0.0, weights)
+        with self.lock:
+            # Weighted mean of the tiles placed so far and this one
+            weight = self.weight[rows, columns].astype(float)
+            total = weight + weights
+            mean = np.nan_to_num(self.currents[rows, columns]) * weight + np.nan_to_num(tile) * weights
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.currents[rows, columns] = np.where(total > 0, mean / total, np.nan)
+            self.weight[rows, columns] = total
+            self.tiles.append(name)
+        return True
+
+    def dataset(self):
+        """Image data set of the mosaic; its currents are a new view of the stored mosaic on every call"""
+        with self.lock:
+            dataset = ImageDataset(self.xpos, self.ypos, self.currents[:],
+                                   metadata={'tiles': list(self.tiles), 'store': self.store})
+        dataset.filepath = self.store
+        dataset.fileformat = 'mosaic'
+        return dataset
+
+    def flush(self):
+        self.currents.flush()
+        self.weight.flush()
+
+
+def tile_positions(dataset, offset):
+    """Positions of a tile in the mosaic: its own positions, or relative to its first point plus the offset"""
+    xpos, ypos, currents = ascending(dataset)
+    if offset is not None:
+        xpos = xpos - xpos[0] + offset[0]
+        ypos = ypos - ypos[0] + offset[1]
+    return xpos, ypos, currents
+
+
+def build_mosaic(filepaths, offsets=None, manufacturer=None, directory=None, on_tile=None, processes=None):
+    """Imports the tiles concurrently and stitches them into a Mosaic. offsets maps the file names to the offsets of
+    the tiles (see read_offsets); without offsets the positions of the files are used. on_tile(mosaic, name), if
+    given, is called after every tile is placed."""
+    filepaths = list(filepaths)
+    if len(filepaths) == 0:
+        raise ReadError("No files selected.")
+    if offsets is not None:
+        missing = [os.path.basename(filepath) for filepath in filepaths if os.path.basename(filepath) not in offsets]
+        if missing:
+            raise ReadError("No offsets for {}.".format(", ".join(missing[:3])))
+
+    def tiles():
+        for filepath, dataset, error in Batch.read_files(filepaths, 'image', manufacturer, processes):
+            name = os.path.basename(filepath)
+            if error is not None:
+                raise ReadError("{}: {}".format(name, Batch.message(error)))
+            yield (name,) + tile_positions(dataset, None if offsets is None else offsets[name])
+
+    mosaic = None
+    try:
+        if offsets is not None:
+            # The extent is known from the offsets and the size of the first tile: tiles are placed as they are read
+            for name, xpos, ypos, currents in tiles():
+                if mosaic is None:
+                    width, height = xpos[-1] - xpos[0], ypos[-1] - ypos[0]
+                    xs, ys = [offset[0] for offset in offsets.values()], [offset[1] for offset in offsets.values()]
+                    mosaic = Mosaic(min(xs), max(xs) + width, min(ys), max(ys) + height,
+                                    min(step(xpos), step(ypos)), directory)
+                mosaic.place(xpos, ypos, currents, name)
+                if on_tile is not None:
+                    on_tile(mosaic, name)
+        else:
+            # The extent is known once all tiles are read
+            read = list(tiles())
+            mosaic = Mosaic(min(tile[1][0] for tile in read), max(tile[1][-1] for tile in read),
+                            min(tile[2][0] for tile in read), max(tile[2][-1] for tile in read),
+                            min(step(read[0][1]), step(read[0][2])), directory)
+            for name, xpos, ypos, currents in read:
+                mosaic.place(xpos, ypos, currents, name)
+                if on_tile is not None:
+                    on_tile(mosaic, name)
+        mosaic.flush()
+    except:
+        if mosaic is not None:
+            store = mosaic.store
+            del mosaic
+            remove_store(store)
+        raise
+    return mosaic
+
+
+def remove(dataset):
+    """Removes the files of a mosaic stored in a temporary directory"""
+    store = dataset.metadata.get('store')
+    dataset.currents = None
+    if store is not None:
+        remove_store(store)
+
+
+def remove_store(store):
+    directory = os.path.dirname(store)
+    for filename in (STORE_FILE, WEIGHT_FILE):
+        try:
+            os.remove(os.path.join(directory, filename))
+        except OSError:
+            pass
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass  # e.g. still mapped by another array on Windows, or a directory holding other files
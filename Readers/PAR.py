@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from Readers.Datasets import ImageDataset, ApproachCurveDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the reader for PAR (Princeton Applied Research) .txt
+exports. Image files have six lines of header, a line with the x positions
+(mm) and then one row per line of the scan: the currents (uA) at every x
+position followed by the y position (mm) of the line, which has no label.
+Approach curves have three lines of header, a line of labels and the
+columns index, distance (mm), current (uA).
+
+Units are returned as found in the file.
+"""
+
+IMAGE_HEADER_LINES = 6
+CURVE_HEADER_LINES = 3
+
+
+def sniff(lines):
+    """True if line 7 of the file is a comma separated list of x positions and line 8 holds one more value (the
+    y position) than line 7; see Readers/Formats.py"""
+    if len(lines) < IMAGE_HEADER_LINES + 2:
+        return False
+    try:
+        xpos = [float(field) for field in lines[IMAGE_HEADER_LINES].split(',')]
+        row = [float(field) for field in lines[IMAGE_HEADER_LINES + 1].split(',')]
+    except ValueError:
+        return False
+    return len(xpos) > 1 and len(row) == len(xpos) + 1
+
+
+def _read_header(fh):
+    # Header lines of an image, up to the x positions (line 7)
+    return [fh.readline() for i in range(IMAGE_HEADER_LINES + 1)]
+
+
+def x_positions(header):
+    """x positions of an image from its header lines"""
+    return np.array(header[IMAGE_HEADER_LINES].split(','), dtype=float)
+
+
+def _split_rows(xpos, block):
+    # The last column holds the y position of each line
+    return np.unique(xpos), block[:, -1], block[:, :len(xpos)]
+
+
+def read_image(filepath, chunksize=None):
+    """Reads a PAR image in a single pass.
+        returns xpos (1D, sorted), ypos (1D) and currents (2D, one row per y position)
+        chunksize, if given, parses the numeric block that many lines at a time (see iter_image)
+    """
+    if chunksize is not None:
+        xpos = None
+        ypos = []
+        currents = []
+        for xpos, ypos_chunk, currents_chunk in iter_image(filepath, chunksize):
+            ypos.append(ypos_chunk)
+            currents.append(currents_chunk)
+        return xpos, np.concatenate(ypos), np.concatenate(currents)
+
+    with open(filepath) as fh:
+        xpos = x_positions(_read_header(fh))
+        block = pd.read_csv(fh, header=None, dtype=float).values
+    return _split_rows(xpos, block)
+
+
+def iter_image(filepath, chunksize=1000):
+    """Streams a PAR image; yields xpos and the ypos/currents of up to chunksize lines at a time, so large maps
+    can be copied into a preallocated (e.g. memory-mapped) array without holding the parsed text in memory."""
+    with open(filepath) as fh:
+        xpos = x_positions(_read_header(fh))
+        for chunk in pd.read_csv(fh, header=None, dtype=float, chunksize=chunksize):
+            yield _split_rows(xpos, chunk.values)
+
+
+def read_curve(filepath):
+    """Reads a PAR approach curve; returns the numeric block (index, distance, current, ...)"""
+    return pd.read_csv(filepath, header=CURVE_HEADER_LINES).values
+
+
+# Data sets from the header lines and the numeric rows, shared by the readers below and Readers/Follow.py (complete is
+# False while the file is still being written), in µm/nA
+
+def image_from_rows(header, data, complete=True):
+    xpos, ypos, currents = _split_rows(x_positions(header), data)
+    return ImageDataset(xpos * 1E3, ypos * 1E3, currents * 1E3)  # mm --> um, uA --> nA
+
+
+def approach_curve_from_rows(header, data, complete=True):
+    distances = data[:, 1] * 1E3  # mm --> um
+    return ApproachCurveDataset(np.amax(distances) - distances, data[:, 2] * 1E3)  # uA --> nA
+
+
+# Readers of the apps (see Readers/Formats.py)
+
+def load_image(filepath):
+    with open(filepath) as fh:
+        header = _read_header(fh)
+        block = pd.read_csv(fh, header=None, dtype=float).values
+    return image_from_rows(header, block)
+
+
+def load_approach_curve(filepath):
+    return approach_curve_from_rows(None, read_curve(filepath))
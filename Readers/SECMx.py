@@ -0,0 +1,238 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from Readers.Datasets import ReadError, ScatteredError, ImageDataset, ApproachCurveDataset
+from Readers.Scattered import scattered_points
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the reader for files of the SECMx control software
+(https://uol.de/pc2/forschung/secm-tools/secmx): images (.img) and approach
+curves (.zsc).
+
+SECMx can save these files ASCII or binary encoded. Only the ASCII encoding is
+read; the layout of the binary encoding is not published. Binary files are
+detected so that the apps can ask for an ASCII export instead of failing on
+the parse.
+
+ASCII files consist of header lines (starting with '|', '[', ...) and
+whitespace separated data lines. The units of the following data are given
+by 'Unit=' header lines. The file is read once: header lines update the unit
+table, consecutive data lines are collected into blocks that are parsed in
+bulk and scaled to µm/nA with one array multiply per block.
+"""
+
+BINARY_MESSAGE = "Binary SECMx file, export as ASCII."
+SCATTERED_MESSAGE = "Points are scattered, not on a grid; import as scattered points."
+
+
+def sniff(lines):
+    """True if the file starts with a SECMx '[section]' line followed by '|' header lines; see
+    Readers/Formats.py"""
+    lines = [line for line in lines if line.strip()]
+    return len(lines) > 1 and lines[0].startswith('[') and any(line.startswith('|') for line in lines)
+
+
+def is_binary(filepath, nbytes=4096):
+    """True if the start of the file does not look like ASCII/Latin-1 text (NUL or other control bytes)"""
+    with open(filepath, 'rb') as fh:
+        chunk = fh.read(nbytes)
+    if b'\x00' in chunk:
+        return True
+    control = sum(1 for byte in chunk if byte < 32 and byte not in (9, 10, 13))
+    return len(chunk) > 0 and control > 0.01 * len(chunk)
+
+
+# Unit prefixes in the order they are checked, with the quantity they apply to and the factor to µm/nA
+UNITS = [('µm', 'position', 1.0),
+         ('nm', 'position', 1E-3),
+         ('mm', 'position', 1E3),
+         ('nA', 'current', 1.0),
+         ('µA', 'current', 1E3),
+         ('mA', 'current', 1E6),
+         ('pA', 'current', 1E-3),
+         ('A', 'current', 1E9),
+         ('cm', 'position', 1E4)]
+
+IMAGE_HEADER_PREFIXES = ('|', '[', 'p', 'F', 'R', '\n')
+IMAGE_POSITIONS = [1, 3]  # columns of the x and y positions of images
+IMAGE_CURRENT = -1  # column of the current of images
+CURVE_HEADER_PREFIXES = ('|', '[', 'p', '\n')
+
+
+def parse_unit(line, factors):
+    """Updates factors ({'position': ..., 'current': ...}) from a header line containing 'Unit='; raises a ReadError
+    if the unit is not known"""
+    start = line.rfind('Unit=')
+    if start < 0:
+        return
+    unit = line[start + 5:]
+    for prefix, quantity, factor in UNITS:
+        if unit.startswith(prefix):
+            factors[quantity] = factor
+            return
+    raise ReadError("Unknown unit '{}'.".format(unit.strip()))
+
+
+def _parse_lines(lines):
+    # Bulk parse of whitespace separated data lines
+    return pd.read_csv(io.StringIO(''.join(lines)), sep=r'\s+', header=None, dtype=float).values
+
+
+def _read_blocks(filepath, header_prefixes, columns):
+    """Reads the file once. columns(line, state) returns the indices of the (position, current) columns for the
+    data following a header line. Returns a list of (position, current) arrays, scaled to µm/nA."""
+    factors = {'position': 1.0, 'current': 1.0}
+    state = {}
+    blocks = []
+    lines = []
+
+    def flush():
+        if lines:
+            data = _parse_lines(lines)
+            ipos, icur = columns(None, state)
+            blocks.append((data[:, ipos] * factors['position'], data[:, icur] * factors['current']))
+            del lines[:]
+
+    with open(filepath, 'r') as fh:
+        for curline in fh:
+            if curline.startswith(header_prefixes):
+                # units/columns may change between blocks of data
+                flush()
+                parse_unit(curline, factors)
+                columns(curline, state)
+            else:
+                lines.append(curline)
+        flush()
+    return blocks
+
+
+def header_factors(header):
+    """Factors to µm/nA of the data following a list of header lines: the first 'Unit=' line of each quantity is
+    used (see parse_unit)"""
+    factors = {}
+    for line in header:
+        unit = {}
+        parse_unit(line, unit)
+        for quantity in unit:
+            factors.setdefault(quantity, unit[quantity])
+    return dict({'position': 1.0, 'current': 1.0}, **factors)
+
+
+def current_column(line):
+    """Column of the current of an approach curve, from the table header line ('p...') preceding the data: the 4th
+    if the file has an ADC column (4 columns), else the 3rd"""
+    return 3 if len(line.split('\t')) == 4 else 2
+
+
+def sort_points(xpos, ypos, currents):
+    """Points of an image sorted by y, then x"""
+    order = np.lexsort((xpos, ypos))
+    return xpos[order], ypos[order], currents[order]
+
+
+def sort_distances(distances, currents):
+    """Points of an approach curve sorted by distance"""
+    order = np.argsort(distances, kind='stable')
+    return distances[order], currents[order]
+
+
+def read_image(filepath):
+    """Reads an ASCII SECMx image (.img). Returns x (µm), y (µm) and current (nA) of every point, sorted by y, then
+    x."""
+    def columns(line, state):
+        return IMAGE_POSITIONS, IMAGE_CURRENT
+
+    xpos = []
+    ypos = []
+    currents = []
+    for position, current in _read_blocks(filepath, IMAGE_HEADER_PREFIXES, columns):
+        xpos.append(position[:, 0])
+        ypos.append(position[:, 1])
+        currents.append(current)
+    return sort_points(np.concatenate(xpos), np.concatenate(ypos), np.concatenate(currents))
+
+
+def read_approach_curve(filepath):
+    """Reads an ASCII SECMx approach curve (.zsc). Returns distance (µm) and current (nA), sorted by distance."""
+    def columns(line, state):
+        if line is not None and line.startswith('p'):
+            state['current'] = current_column(line)
+        return 1, state.get('current', 2)
+
+    blocks = _read_blocks(filepath, CURVE_HEADER_PREFIXES, columns)
+    distances = np.concatenate([position for position, current in blocks])
+    currents = np.concatenate([current for position, current in blocks])
+    return sort_distances(distances, currents)
+
+
+def image_from_points(xpos, ypos, currents):
+    """Image of points sorted by y, then x; raises a ScatteredError if they are not on a grid"""
+    xpos = np.unique(xpos)  # find the unique x values
+    ypos = np.unique(ypos)  # find the unique y values
+    if len(xpos) * len(ypos) != len(currents):
+        raise ScatteredError(SCATTERED_MESSAGE)
+    return ImageDataset(xpos, ypos, np.reshape(currents, (len(ypos), len(xpos))))
+
+
+# Data sets from the header lines and the numeric rows of a file still being written, see Readers/Follow.py. The units
+# of all rows are those of the first unit lines of the header.
+
+def image_from_rows(header, data, complete=True):
+    if not complete:
+        data = data[:ImageDataset.complete_points(data[:, IMAGE_POSITIONS[0]])]
+        if len(data) == 0:
+            return None
+    factors = header_factors(header)
+    positions = data[:, IMAGE_POSITIONS] * factors['position']
+    currents = data[:, IMAGE_CURRENT] * factors['current']
+    return image_from_points(*sort_points(positions[:, 0], positions[:, 1], currents))
+
+
+def approach_curve_from_rows(header, data, complete=True):
+    factors = header_factors(header)
+    tables = [line for line in header if line.startswith('p')]
+    current = current_column(tables[0]) if tables else 2
+    distances, currents = sort_distances(data[:, 1] * factors['position'], data[:, current] * factors['current'])
+    return ApproachCurveDataset(distances, currents)
+
+
+# Readers of the apps (see Readers/Formats.py); binary files raise a ReadError asking for an ASCII export
+
+def load_image(filepath):
+    if is_binary(filepath):
+        raise ReadError(BINARY_MESSAGE)
+    return image_from_points(*read_image(filepath))
+
+
+def load_scattered_image(filepath):
+    """Points of an image not scanned on a grid (e.g. hopping mode), see Processing/PScatter.py"""
+    if is_binary(filepath):
+        raise ReadError(BINARY_MESSAGE)
+    return scattered_points(*read_image(filepath))
+
+
+def load_approach_curve(filepath):
+    if is_binary(filepath):
+        raise ReadError(BINARY_MESSAGE)
+    distances, currents = read_approach_curve(filepath)
+    return ApproachCurveDataset(distances, currents)
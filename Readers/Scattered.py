@@ -0,0 +1,61 @@
+import re
+
+import numpy as np
+
+from Readers.Datasets import ReadError, ScatteredImageDataset
+from Readers.ApproachGrid import header_line, read_table
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the reader of images sampled at scattered points
+(hopping or intermittent contact scans, where the tip does not follow a
+grid), exported as a text table with one row per point and the columns X, Y
+and I, e.g.
+
+    # comment lines
+    X (µm)	Y (µm)	I (nA)
+    12.31	0.47	0.1234
+    ...
+
+Units and separators are those of the approach curve grid tables (see
+Readers/ApproachGrid.py). Rows may come in any order. The image app
+reconstructs a grid from the points, see Processing/PScatter.py.
+"""
+
+HEADER = re.compile(r'^\s*X\b(?!.*\bZ\b).*\bY\b.*\bI\b', re.IGNORECASE)
+
+
+def sniff(lines):
+    """True if the first line that is not a comment is the X, Y, I column header; see Readers/Formats.py"""
+    return header_line(lines, HEADER) is not None
+
+
+def scattered_points(xpos, ypos, currents):
+    """Scattered image data set of the points with a finite position and current"""
+    keep = np.isfinite(xpos) & np.isfinite(ypos) & np.isfinite(currents)
+    if np.count_nonzero(keep) < 3:
+        raise ReadError("Fewer than 3 points.")
+    if np.ptp(xpos[keep]) == 0 and np.ptp(ypos[keep]) == 0:
+        raise ReadError("All points are at the same position.")
+    return ScatteredImageDataset(xpos[keep], ypos[keep], currents[keep])
+
+
+def load_scattered_image(filepath):
+    return scattered_points(*read_table(filepath, HEADER, 'XYI'))
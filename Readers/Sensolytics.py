@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from Readers.Datasets import ImageDataset, ApproachCurveDataset, VoltammogramDataset, ChronoamperometryDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the readers for Sensolytics (.dat) exports. The files
+start with '#' header lines followed by comma separated data; the length of
+the header and the columns depend on the experiment:
+1. Images : 23 header lines, 'key: value'; columns x, x (rel.), y, y (rel.),
+   z, z (rel.), channel 1, channel 2.
+2. Approach curves : 15 header lines; columns distance (µm), index,
+   current (nA).
+3. Cyclic voltammograms : 20 header lines, tab separated; columns
+   potential (V), current (A).
+4. Chronoamperograms : '#' header lines; the columns depend on the number of
+   channels and the method given in the header.
+"""
+
+IMAGE_HEADER_LINES = 23
+CURVE_HEADER_LINES = 15
+CV_HEADER_LINES = 20
+
+
+def sniff(lines):
+    """True if the file starts with a '#' header line; see Readers/Formats.py"""
+    return len(lines) > 0 and lines[0].startswith('#')
+
+
+def read(filepath, nheader):
+    """Returns the first nheader lines and the following numeric lines (comma separated, split)"""
+    data = []
+    header = []
+    index = 0
+    with open(filepath, 'r') as fh:
+        for curline in fh:
+            index = index + 1
+            if index <= nheader:
+                header.append(curline)
+            else:
+                try:
+                    curline = curline.split(',')
+                    float(curline[0])
+                    data.append(curline)
+                except:
+                    pass
+    return header, data
+
+
+def header_value(header, line, sep):
+    """Field after sep of a header line, by line number (0-based)"""
+    return header[line].split(sep)[1].strip(' \n')
+
+
+# Data sets from the header lines and the numeric rows, shared by the readers below and Readers/Follow.py (complete is
+# False while the file is still being written)
+
+def image_from_rows(header, data, complete=True):
+    nptsx = int(header_value(header, 5, ':')) + 1
+    nptsy = int(header_value(header, 6, ':')) + 1
+    if not complete:
+        nptsy = len(data) // nptsx  # lines scanned so far
+        if nptsy < 2:
+            return None
+        data = data[:nptsy * nptsx]
+    return ImageDataset(np.unique(data[:, 1]), np.unique(data[:, 3]), data[:, 6].reshape(nptsy, nptsx))
+
+
+def approach_curve_from_rows(header, data, complete=True):
+    return ApproachCurveDataset(data[:, 0], data[:, 2])
+
+
+def voltammogram_from_rows(header, data, complete=True):
+    scanrate = 1000 * (float(header_value(header, 18, '\t')))
+    return VoltammogramDataset.from_sweeps(data[:, 0], data[:, 1] * 1E9, scanrate, complete=complete)  # A --> nA
+
+
+def chronoamperometry_from_rows(header, data, complete=True):
+    # Determine number of channels from header line 3, use to determine number of cols needed
+    nchannels = int(header_value(header, 2, ':'))
+
+    # Determine experimental type from header line 2 (determines whether col 2 is a potential or a current)
+    method = header[1].split(': ')
+
+    if nchannels == 2:
+        # Columns time, current; replace commas with periods so the potential is interpreted correctly
+        current = 1
+        conpot = float(header_value(header, 17, '\t').replace(",", "."))
+
+    elif nchannels == 3:
+        # Case 1 : Pulsed amperometry (1 WE), columns time, potential, current
+        if method[1][0:3] == 'Pul':
+            current = 2
+            conpot = 'Pulse sequence.'
+        # Case 2: Amperometry (2 WE), columns time, current 1, current 2
+        else:
+            current = 1
+            conpot = float(header_value(header, 19, '\t').replace(",", "."))
+
+    elif nchannels == 4:
+        # Columns time, potential, current 1, current 2
+        current = 2
+        conpot = 'Pulse sequence.'
+
+    else:
+        raise ValueError("Unsupported number of channels: {}".format(nchannels))
+
+    return ChronoamperometryDataset(data[:, 0], data[:, current] * 1E9, conpot)  # A --> nA
+
+
+# Readers of the apps (see Readers/Formats.py)
+
+def load_image(filepath):
+    header, data = read(filepath, IMAGE_HEADER_LINES)
+    df = pd.DataFrame(data, columns=['X', 'Xrel', 'Y', 'Yrel', 'Z', 'Zrel', 'Ch1', 'Ch2'], dtype=float)
+    del df['Ch2']
+    return image_from_rows(header, df.values)
+
+
+def load_approach_curve(filepath):
+    header, data = read(filepath, CURVE_HEADER_LINES)
+    df = pd.DataFrame(data, columns=['Distance (um)', 'Index', 'Current (nA)', 'NA'], dtype=float)
+    del df['NA']
+    return approach_curve_from_rows(header, df.values)
+
+
+def load_voltammogram(filepath):
+    header, data = read(filepath, CV_HEADER_LINES)
+    df = pd.DataFrame(data, columns=['Potential (V)', 'Current (A)', 'NA'], dtype=float)
+    del df['NA']
+    return voltammogram_from_rows(header, df.values)
+
+
+def load_chronoamperometry(filepath):
+    data = []
+    header = []
+    with open(filepath, 'r') as fh:
+        for curline in fh:
+            if curline[0] == '#':
+                header.append(curline)
+            else:
+                data.append(curline.split(','))
+    return chronoamperometry_from_rows(header, pd.DataFrame(data, dtype=float).values)
@@ -0,0 +1,97 @@
+import os
+import tempfile
+
+import numpy as np
+
+from Readers import Batch
+from Readers.Datasets import ReadError, ImageStackDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the import of time-lapse images: repeated scans of the
+same area, one image file per frame (Import Stack button of the image app).
+
+The files are read concurrently (see Readers/Batch.py) and every frame is
+written into a memory-mapped .npy file as soon as it is read, so only a few
+frames are held in memory whatever the length of the stack. The frames are
+the chunks of the file: a frame is contiguous on disk and reading it touches
+only its own pages. All frames must have the size of the first one; the
+positions of the first frame are used for the whole stack.
+"""
+
+STACK_FILE = 'frames.npy'
+
+
+def read_stack(filepaths, manufacturer=None, directory=None, processes=None):
+    """Imports the image files (one frame per file, in the order given) into an ImageStackDataset. The frames are
+    stored in STACK_FILE in directory (default: a new temporary directory, see remove()); manufacturer and
+    processes are passed to Batch.read_files."""
+    filepaths = list(filepaths)
+    if len(filepaths) == 0:
+        raise ReadError("No files selected.")
+    index = dict((filepath, i) for i, filepath in enumerate(filepaths))
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix='flux_stack_')
+    store = os.path.join(directory, STACK_FILE)
+
+    frames = None
+    positions = None
+    try:
+        for filepath, dataset, error in Batch.read_files(filepaths, 'image', manufacturer, processes):
+            name = os.path.basename(filepath)
+            if error is not None:
+                raise ReadError("{}: {}".format(name, Batch.message(error)))
+            if frames is None:
+                frames = np.lib.format.open_memmap(store, mode='w+', dtype=float,
+                                                   shape=(len(filepaths),) + dataset.currents.shape)
+            elif dataset.currents.shape != frames.shape[1:]:
+                raise ReadError("{}: {} x {} points, the other frames have {} x {}.".format(
+                    name, dataset.nptsx, dataset.nptsy, frames.shape[2], frames.shape[1]))
+            frames[index[filepath]] = dataset.currents
+            if index[filepath] == 0:
+                positions = (dataset.xpos, dataset.ypos)
+        frames.flush()
+    except:
+        del frames
+        remove_store(store)
+        raise
+
+    stack = ImageStackDataset(positions[0], positions[1], frames,
+                              metadata={'frames': [os.path.basename(filepath) for filepath in filepaths],
+                                        'store': store})
+    stack.filepath = filepaths[0]
+    stack.fileformat = 'stack'
+    return stack
+
+
+def remove(stack):
+    """Removes the file of the frames of a stack read into a temporary directory. The stack can no longer be used."""
+    store = stack.metadata.get('store')
+    stack.currents = None
+    if store is not None:
+        remove_store(store)
+
+
+def remove_store(store):
+    try:
+        os.remove(store)
+        os.rmdir(os.path.dirname(store))
+    except OSError:
+        pass  # e.g. still mapped by another array on Windows, or a directory holding other files
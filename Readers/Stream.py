@@ -0,0 +1,248 @@
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from Processing import OnlineCV
+from Readers.Datasets import ChronoamperometryDataset, VoltammogramDataset
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script contains the client of a live data stream (Connect Stream button
+of the chronoamperometry and cyclic voltammetry apps). The acquisition
+software, or benchmarks/stream_simulator.py, serves the samples on a local
+TCP (tcp://host:port) or Unix (unix:/path) socket as frames:
+
+    HEADER: magic b'FLX1', number of samples (uint32), number of channels
+            (uint32), little endian
+    DATA  : samples x channels float64, little endian, sample by sample
+
+The channels are those of CHANNELS: time (s) and current (nA) for
+chronoamperometry; time (s), potential (V) and current (nA) for cyclic
+voltammetry.
+
+Frames are received by a background thread directly into a reusable buffer
+and appended to a RingBuffer holding the last `capacity` samples; older
+samples are overwritten. The apps convert the content of the ring buffer
+into a data set at a throttled rate (dataset()), so the cost of a refresh
+depends on the size of the buffer, not on the length of the stream:
+1. Chronoamperograms are averaged over blocks of samples down to at most
+   DISPLAY_POINTS points; the block means keep the mean used for the
+   experimental iss.
+2. Voltammograms are returned at full rate, one row per cycle as in
+   Readers/Follow.py (see VoltammogramDataset.cycle_rows), from the first
+   complete cycle held by the buffer (the stream starts with a cycle). The
+   metrics of every cycle since the start are computed as the samples arrive
+   (see Processing/OnlineCV.py) and passed in metadata['cycles'].
+"""
+
+MAGIC = b'FLX1'
+HEADER = struct.Struct('<4sII')
+CHANNELS = {'chronoamperometry': ('time', 'current'),
+            'voltammogram': ('time', 'potential', 'current')}
+CAPACITY = {'chronoamperometry': 2 ** 21, 'voltammogram': 2 ** 18}  # samples kept in the ring buffer
+DISPLAY_POINTS = 20000  # maximum number of points of a chronoamperogram
+
+
+def encode(samples):
+    """Frame of a 2D array of samples (samples x channels)"""
+    samples = np.ascontiguousarray(samples, dtype='<f8')
+    return HEADER.pack(MAGIC, samples.shape[0], samples.shape[1]) + samples.tobytes()
+
+
+def parse_address(address):
+    """(family, address) of tcp://host:port, host:port or unix:/path"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+    host, port = address.rsplit(':', 1)
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+class RingBuffer:
+    """Last `capacity` rows appended to a 2D float array. total is the number of rows appended since the start."""
+    def __init__(self, capacity, ncols):
+        self.data = np.empty((capacity, ncols), dtype=float)
+        self.capacity = capacity
+        self.total = 0
+
+    def extend(self, rows):
+        nrows = len(rows)
+        if nrows >= self.capacity:
+            rows = rows[-self.capacity:]
+            self.total = self.total + nrows - self.capacity
+            nrows = self.capacity
+        start = self.total % self.capacity
+        end = min(start + nrows, self.capacity)
+        self.data[start:end] = rows[:end - start]
+        self.data[:nrows - (end - start)] = rows[end - start:]
+        self.total = self.total + nrows
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def latest(self, n=None):
+        """Copy of the last n rows (all rows held by default), oldest first"""
+        n = len(self) if n is None else min(n, len(self))
+        end = self.total % self.capacity
+        if n <= end:
+            return self.data[end - n:end].copy()
+        return np.concatenate([self.data[self.capacity - (n - end):], self.data[:end]])
+
+
+class StreamClient:
+    """Receives the frames of a stream in a background thread.
+        kind selects the channels (see CHANNELS) and the ring buffer capacity
+        rate() is the number of samples received per second over the last second
+        error is the reason the stream stopped, None while it runs
+    """
+    def __init__(self, address, kind, capacity=None):
+        self.address = address
+        self.kind = kind
+        self.nchannels = len(CHANNELS[kind])
+        self.ring = RingBuffer(capacity or CAPACITY[kind], self.nchannels)
+        self.lock = threading.Lock()
+        self.error = None
+        self.running = False
+        self.rates = []  # (time, total) of the last second
+        self.socket = None
+        self.thread = None
+        # Voltammograms: per-cycle metrics of all the samples received, not only those held by the ring buffer
+        self.analyzer = OnlineCV.CycleAnalyzer() if kind == 'voltammogram' else None
+
+    def start(self):
+        """Connects (raises OSError if there is no stream at the address) and starts receiving"""
+        family, address = parse_address(self.address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(5)
+        self.socket.connect(address)
+        self.socket.settimeout(None)
+        self.running = True
+        self.rates = [(time.perf_counter(), self.ring.total)]
+        self.thread = threading.Thread(target=self._receive, daemon=True)
+        self.thread.start()
+
+    def _read_exactly(self, view):
+        received = 0
+        while received < len(view):
+            nbytes = self.socket.recv_into(view[received:])
+            if nbytes == 0:
+                raise ConnectionError("Stream closed.")
+            received = received + nbytes
+
+    def _receive(self):
+        header = bytearray(HEADER.size)
+        payload = bytearray(2 ** 20)
+        try:
+            while self.running:
+                self._read_exactly(memoryview(header))
+                magic, nsamples, nchannels = HEADER.unpack(header)
+                if magic != MAGIC or nchannels != self.nchannels:
+                    raise ValueError("Not a {} stream.".format(self.kind))
+                nbytes = nsamples * nchannels * 8
+                if nbytes > len(payload):
+                    payload = bytearray(nbytes)
+                self._read_exactly(memoryview(payload)[:nbytes])
+                samples = np.frombuffer(payload, dtype='<f8', count=nsamples * nchannels).reshape(nsamples, nchannels)
+                with self.lock:
+                    self.ring.extend(samples)
+                if self.analyzer is not None:
+                    self.analyzer.feed(samples[:, 1], samples[:, 2])
+        except Exception as e:
+            if self.running:
+                self.error = str(e) or type(e).__name__
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
+        if self.socket is not None:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.socket.close()
+            self.socket = None
+
+    @property
+    def total(self):
+        return self.ring.total
+
+    def rate(self):
+        now = time.perf_counter()
+        self.rates.append((now, self.ring.total))
+        while len(self.rates) > 2 and now - self.rates[1][0] >= 1.0:
+            self.rates.pop(0)
+        (start, first), (end, last) = self.rates[0], self.rates[-1]
+        return (last - first) / (end - start) if end > start else 0.0
+
+    def samples(self):
+        """Copy of the samples held by the ring buffer and the index of the first one since the start"""
+        with self.lock:
+            return self.ring.latest(), self.ring.total - len(self.ring)
+
+    def dataset(self):
+        """Data set of the samples held by the ring buffer, None if there are not enough yet"""
+        samples, first = self.samples()
+        if len(samples) < 3:
+            return None
+        if self.kind == 'chronoamperometry':
+            dataset = chronoamperogram(samples)
+        else:
+            dataset = voltammogram(samples, first)
+            dataset.metadata['cycles'] = self.analyzer.table()
+        dataset.filepath = self.address
+        dataset.fileformat = 'stream'
+        return dataset
+
+
+def block_means(values, nblocks):
+    """Means of at most nblocks blocks of consecutive values, from the first value; the last block may be shorter"""
+    size = -(-len(values) // nblocks)
+    if size <= 1:
+        return values
+    nfull = len(values) // size
+    means = values[:nfull * size].reshape(nfull, size).mean(axis=1)
+    if nfull * size < len(values):
+        means = np.append(means, values[nfull * size:].mean())
+    return means
+
+
+def chronoamperogram(samples):
+    time = block_means(samples[:, 0], DISPLAY_POINTS)
+    currents = block_means(samples[:, 1], DISPLAY_POINTS)
+    return ChronoamperometryDataset(time, currents, metadata={'samples': len(samples)})
+
+
+def voltammogram(samples, first=0):
+    """first is the index of the first sample since the start of the stream, which starts with a cycle"""
+    time, potential, currents = samples[:, 0], samples[:, 1], samples[:, 2]
+    potential_cycle, rows = VoltammogramDataset.cycle_rows(potential, currents)
+    nptscycle = rows.shape[1]
+    start = (nptscycle - first % nptscycle) % nptscycle
+    if 0 < start < len(potential) - 2:
+        # Drop the samples before the first complete cycle held by the buffer
+        time, potential, currents = time[start:], potential[start:], currents[start:]
+        potential_cycle, rows = VoltammogramDataset.cycle_rows(potential, currents)
+    scan_rate = VoltammogramDataset.scan_rate_from_time(time, potential_cycle, rows.shape[1])
+    return VoltammogramDataset(potential_cycle, rows, scan_rate, metadata={'samples': len(samples)})
@@ -0,0 +1,115 @@
+import sys
+import os
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Readers import CHInstruments
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+CH Instruments import benchmark: writes a synthetic multi-segment cyclic
+voltammogram and compares the previous line-by-line import (two passes over
+the file, per-line split/compare/float) with Readers/CHInstruments.py.
+
+Usage: python benchmarks/bench_ch_instruments.py [nsegments] [npts per segment]
+"""
+
+HEADER = """Oct. 18, 2019   10:21:33
+Cyclic Voltammetry
+File:  benchmark.bin
+Data Source:  Experiment
+Instrument Model:  CHI920D
+Header:
+Note:
+
+Init E (V) = -0.1
+High E (V) = 0.5
+Low E (V) = -0.1
+Init P/N = P
+Scan Rate (V/s) = 0.02
+Segment = {0}
+Sample Interval (V) = 0.001
+Quiet Time (sec) = 2
+Sensitivity (A/V) = 1.e-9
+
+Potential/V, Current/A
+
+"""
+
+
+def write_cv(filepath, nsegments, npts):
+    up = np.linspace(-0.1, 0.5, npts)
+    segments = [up if i % 2 == 0 else up[::-1] for i in range(nsegments)]
+    potential = np.concatenate(segments)
+    currents = -1E-9 / (1 + np.exp((potential - 0.2) / 0.025))
+    with open(filepath, 'w') as fh:
+        fh.write(HEADER.format(nsegments))
+        np.savetxt(fh, np.c_[potential, currents], fmt='%.3e', delimiter=', ')
+
+
+def legacy_import(filepath):
+    # Import as done by CVApp.import_ch_instruments before the shared reader
+    data = []
+    datastart = 0
+    index = 0
+    with open(filepath, 'r') as fh:
+        for curline in fh:
+            try:
+                curline = curline.split(',')
+                if curline == ['Potential/V', ' Current/A\n']:
+                    datastart = 1
+                if datastart == 1:
+                    float(curline[0])
+                    data.append(curline)
+            except:
+                pass
+    with open(filepath, 'r') as fh2:
+        for curline2 in fh2:
+            index = index + 1
+            if index == 13:
+                nu = curline2.split('=')
+                nu = 1000 * (float(nu[1].strip('\n')))
+    return nu, pd.DataFrame(data, dtype='float').values
+
+
+if __name__ == '__main__':
+    nsegments = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    npts = int(sys.argv[2]) if len(sys.argv) > 2 else 25000
+    filepath = os.path.join(tempfile.mkdtemp(), 'cv.txt')
+    write_cv(filepath, nsegments, npts)
+    print("{0} segments x {1} points ({2:.1f} MB)".format(nsegments, npts, os.path.getsize(filepath) / 2 ** 20))
+
+    start = time.perf_counter()
+    nu_legacy, data_legacy = legacy_import(filepath)
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metadata, header, data = CHInstruments.read(filepath, columns=['Potential/V', 'Current/A'])
+    nu = CHInstruments.scan_rate(metadata, header)
+    t_reader = time.perf_counter() - start
+
+    print("legacy import : {0:.3f} s".format(t_legacy))
+    print("single pass   : {0:.3f} s ({1:.1f}x)".format(t_reader, t_legacy / t_reader))
+    print("identical     : {0}".format(nu == nu_legacy and np.array_equal(data, data_legacy)))
+    os.remove(filepath)
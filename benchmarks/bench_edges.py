@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+
+import numpy as np
+from skimage import feature
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Processing import Edges
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Edge detection scaling benchmark: runs skimage.feature.canny on a synthetic
+image, then the tiled version of Processing/Edges.py with thread and process
+pools of increasing size, checking that the output is identical.
+
+Usage: python benchmarks/bench_edges.py [npts]
+"""
+
+
+def synthetic_image(npts):
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[:npts, :npts]
+    image = np.sin(xx / 40) * np.cos(yy / 60) + 0.05 * rng.random((npts, npts))
+    return (image - np.amin(image)) / (np.amax(image) - np.amin(image))
+
+
+if __name__ == '__main__':
+    npts = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    image = synthetic_image(npts)
+
+    start = time.perf_counter()
+    reference = feature.canny(image)
+    t_ref = time.perf_counter() - start
+    print("{0} x {0} image, feature.canny: {1:.3f} s".format(npts, t_ref))
+
+    ncores = os.cpu_count() or 1
+    workers = sorted(set([1, 2, 4, 8, ncores]))
+    workers = [n for n in workers if n <= ncores]
+    print("{0:>8} {1:>8} {2:>10} {3:>8} {4:>10}".format('executor', 'workers', 'time (s)', 'speedup', 'identical'))
+    for executor in ['thread', 'process']:
+        for n in workers:
+            start = time.perf_counter()
+            edges = Edges.tiled_canny(image, workers=n, executor=executor)
+            t_tiled = time.perf_counter() - start
+            print("{0:>8} {1:>8} {2:>10.3f} {3:>8.2f} {4:>10}".format(executor, n, t_tiled, t_ref / t_tiled,
+                                                                     str(np.array_equal(edges, reference))))
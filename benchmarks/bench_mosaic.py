@@ -0,0 +1,88 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import generators
+from Readers import Batch
+from Readers import Mosaic
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Mosaic stitching benchmark (see Readers/Mosaic.py): a synthetic feedback map
+is cut into ntiles x ntiles overlapping tiles of npts x npts points, written
+as SECMx files with a stage offsets file, then stitched back with and without
+the offsets file. Reports the time of the import and the largest difference
+between the mosaic and the map.
+
+Usage: python benchmarks/bench_mosaic.py [ntiles] [npts]
+"""
+
+OVERLAP = 0.125  # fraction of a tile shared with its neighbour
+
+
+def write_tiles(directory, ntiles, npts):
+    """Writes the tiles and the offsets file; returns the file paths, the offsets file and the map"""
+    stride = int(round(npts * (1 - OVERLAP)))
+    size = stride * (ntiles - 1) + npts
+    xpos, ypos, currents = generators.feedback_map(size)
+    filepaths = []
+    with open(os.path.join(directory, 'offsets.txt'), 'w') as offsets:
+        offsets.write('# file, x (µm), y (µm)\n')
+        for row in range(ntiles):
+            for column in range(ntiles):
+                rows, columns = slice(row * stride, row * stride + npts), slice(column * stride, column * stride + npts)
+                xx, yy = np.meshgrid(xpos[columns], ypos[rows])
+                filepath = os.path.join(directory, 'tile_{:02d}_{:02d}.txt'.format(row, column))
+                index = np.arange(npts * npts)
+                with open(filepath, 'w') as fh:
+                    fh.write('[Scan]\n|X Unit=nm\n|Y Unit=nm\n|I Unit=pA\npos\tX\tpos\tY\tI\n')
+                    generators._lines(fh, np.c_[index, xx.ravel() * 1E3, index, yy.ravel() * 1E3,
+                                                currents[rows, columns].ravel() * 1E3], '%.9g', '\t')
+                offsets.write('{}, {}, {}\n'.format(os.path.basename(filepath), xpos[columns][0], ypos[rows][0]))
+                filepaths.append(filepath)
+    return filepaths, os.path.join(directory, 'offsets.txt'), currents
+
+
+if __name__ == '__main__':
+    ntiles = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    npts = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    directory = tempfile.mkdtemp(prefix='flux_bench_mosaic_')
+    try:
+        filepaths, offsets_file, reference = write_tiles(directory, ntiles, npts)
+        print("{0} tiles of {1} x {1} points, map of {2} x {2} points".format(len(filepaths), npts, len(reference)))
+        Batch.process_pool()  # workers started before the timing
+        for offsets in (Mosaic.read_offsets(offsets_file), None):
+            start = time.perf_counter()
+            mosaic = Mosaic.build_mosaic(filepaths, offsets, manufacturer='SECMx',
+                                         directory=tempfile.mkdtemp(dir=directory))
+            seconds = time.perf_counter() - start
+            currents = mosaic.currents[:len(reference), :len(reference)]
+            print("{0:<16} {1:>8.2f} s {2:>8} x {2:<8} largest difference {3:.2E} nA".format(
+                'offsets file' if offsets is not None else 'file positions', seconds, len(mosaic.xpos),
+                np.nanmax(np.abs(currents - reference))))
+            del mosaic, currents
+    finally:
+        Batch.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,79 @@
+import sys
+import os
+import time
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Processing import Rendering
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Rendering benchmark: draws synthetic SECM images of increasing size with
+pcolormesh and with the imshow path of Processing/Rendering.py, then redraws
+them at a different figure size (as happens when the window is resized).
+
+Usage: python benchmarks/bench_rendering.py [size1 size2 ...]
+"""
+
+
+def synthetic_image(npts):
+    xpos = np.linspace(0, 500, npts)
+    ypos = np.linspace(0, 500, npts)
+    xx, yy = np.meshgrid(xpos, ypos)
+    currents = 1 + 0.5 * np.exp(-((xx - 250) ** 2 + (yy - 250) ** 2) / 5000) + 0.1 * np.sin(xx / 20)
+    return xpos, ypos, currents
+
+
+def time_draw(method, xpos, ypos, currents):
+    fig = Figure(figsize=(5, 4))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_aspect(1)
+
+    start = time.perf_counter()
+    if method == 'pcolormesh':
+        ax.pcolormesh(xpos, ypos, currents, cmap='RdYlBu_r')
+    else:
+        Rendering.draw_map(ax, xpos, ypos, currents, 'RdYlBu_r')
+    canvas.draw()
+    t_draw = time.perf_counter() - start
+
+    # Resize
+    start = time.perf_counter()
+    fig.set_size_inches(8, 6)
+    canvas.draw()
+    t_resize = time.perf_counter() - start
+
+    return t_draw, t_resize
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 2000]
+    print("{0:>6} {1:>12} {2:>10} {3:>10}".format('npts', 'method', 'draw (s)', 'resize (s)'))
+    for npts in sizes:
+        xpos, ypos, currents = synthetic_image(npts)
+        for method in ['pcolormesh', 'imshow']:
+            t_draw, t_resize = time_draw(method, xpos, ypos, currents)
+            print("{0:>6} {1:>12} {2:>10.3f} {3:>10.3f}".format(npts, method, t_draw, t_resize))
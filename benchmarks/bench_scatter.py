@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+
+import numpy as np
+from scipy.interpolate import griddata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import generators
+from Processing import PScatter
+from Processing.PApproachCurve import mixedfb
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Reconstruction of scattered points benchmark (see Processing/PScatter.py):
+npts x npts points at random positions of the feedback image of the
+generators are reconstructed on a grid with every method, and with griddata
+(linear) unless --no-griddata is given. Reports the time and the median and
+99th percentile of the difference to the noise-free image.
+
+Usage: python benchmarks/bench_scatter.py [npts] [--no-griddata]
+"""
+
+
+def report(name, seconds, image, reference):
+    difference = np.abs(image - reference)
+    print("{0:<20} {1:>8.2f} s   median {2:.2E} nA   99% {3:.2E} nA   NaN {4}".format(
+        name, seconds, np.nanmedian(difference), np.nanpercentile(difference, 99), np.count_nonzero(np.isnan(image))))
+
+
+if __name__ == '__main__':
+    npts = int(sys.argv[1]) if len(sys.argv) > 1 and not sys.argv[1].startswith('-') else 1000
+    scatter = generators.scattered_points(npts)
+    print("{} points".format(len(scatter[0])))
+
+    start = time.perf_counter()
+    tree = PScatter.build_tree(scatter)
+    print("{0:<20} {1:>8.2f} s".format('k-d tree', time.perf_counter() - start))
+    for method in PScatter.METHODS:
+        start = time.perf_counter()
+        xpos, ypos, image = PScatter.reconstruct(tree, scatter, scatter_method=method)
+        seconds = time.perf_counter() - start
+        xx, yy = np.meshgrid(xpos, ypos)
+        reference = generators.ISS * mixedfb(generators.HEIGHT, generators.RG, generators.kappa_map(xx, yy))
+        report(method, seconds, image, reference)
+
+    if '--no-griddata' not in sys.argv:
+        start = time.perf_counter()
+        image = griddata(scatter[:2], scatter[2], (xx, yy), method='linear')
+        report('griddata (linear)', time.perf_counter() - start, image, reference)
@@ -0,0 +1,206 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from Processing import Export
+from Processing import PApproachCurve
+from Processing import PChronoAmperometry
+from Processing import PCyclicVoltammetry
+from Processing import PImage
+from Processing import Rendering
+from Processing import Timing
+from Readers import Formats
+from Readers.Datasets import ImageDataset
+import generators
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Benchmark suite: writes synthetic data sets of several sizes in every file
+format (see benchmarks/generators.py) to a temporary directory and times, with
+the Tk-free modules used by the apps (Agg backend, no display needed):
+1. import : Formats.read of every (format, kind), format detection included
+2. processing : every stage of the image, CV and CA pipelines (as timed by
+   the spans of Processing/Timing.py)
+3. fitting : Rg and kappa fits of the approach curve pipeline
+4. rendering : drawing of images (Rendering.draw_map) and voltammograms
+5. export : figures (png, 400 dpi as the apps) and text files of images
+   (Processing/Export.py, as Export Data of the image app)
+
+The best of --repeat runs is reported. The size is the number of points per
+side of an image; approach curves, voltammograms (per cycle) and
+chronoamperograms have size**2 points.
+
+Usage: python benchmarks/bench_suite.py [size1 size2 ...] [--repeat n]
+                                        [--only import,processing,...]
+"""
+
+SECTIONS = ['import', 'processing', 'fitting', 'rendering', 'export']
+
+
+def best_of(function, repeat):
+    """Minimum run time (s) of function() over repeat runs"""
+    times = []
+    for count in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def stage_times(build_pipeline, raw, params, targets, repeat):
+    """Minimum run time (s) of every stage executed to compute the targets, on a new pipeline every run"""
+    times = {}
+    for count in range(repeat):
+        pipeline = build_pipeline()
+        pipeline.set_source('raw', raw)
+        Timing.RECORDER.clear()
+        for target in targets:
+            pipeline.run(target, params)
+        for stat in Timing.RECORDER.summary():
+            times[stat['name']] = min(times.get(stat['name'], np.inf), stat['total'])
+    return times
+
+
+def report(section, name, size, seconds):
+    print("{0:<12} {1:<36} {2:>8} {3:>10.4f}".format(section, name, size, seconds))
+
+
+def bench_import(directory, size, repeat):
+    for fileformat, kind, filepath in generators.generate(directory, size, kinds=['image']):
+        report('import', '{} {}'.format(fileformat, kind), size,
+               best_of(lambda: Formats.read(filepath, kind), repeat))
+    for fileformat, kind, filepath in generators.generate(directory, size ** 2,
+                                                          kinds=['approach_curve', 'chronoamperometry']):
+        report('import', '{} {}'.format(fileformat, kind), size ** 2,
+               best_of(lambda: Formats.read(filepath, kind), repeat))
+    for fileformat, kind, filepath in generators.generate(directory, size ** 2 // generators.NCYCLES,
+                                                          kinds=['voltammogram']):
+        report('import', '{} {}'.format(fileformat, kind), size ** 2,
+               best_of(lambda: Formats.read(filepath, kind), repeat))
+
+
+def bench_processing(size, repeat):
+    xpos, ypos, currents = generators.feedback_map(size)
+    raw = (xpos, ypos, currents, size, size)
+    params = {'slope_x': 'Y = 0', 'slope_y': 'None', 'iss': generators.ISS, 'normalized': 1, 'current_unit': 'nA'}
+    for name, seconds in stage_times(PImage.build_pipeline, raw, params, ['edges', 'pyramid'], repeat).items():
+        report('processing', 'image ' + name, size, seconds)
+
+    time, potential, currents = generators.voltammogram(size ** 2 // generators.NCYCLES)
+    nptscycle = len(potential) // generators.NCYCLES
+    raw = (potential[:nptscycle], currents[:-1].reshape(generators.NCYCLES, nptscycle))
+    params = {'potential_unit': 'mV', 'current_unit': 'pA', 'exp_iss': 1}
+    for name, seconds in stage_times(PCyclicVoltammetry.build_pipeline, raw, params, ['analysis'], repeat).items():
+        report('processing', 'voltammogram ' + name, size ** 2, seconds)
+
+    time, currents = generators.chronoamperogram(size ** 2)
+    raw = (time, currents, np.mean(currents[-size ** 2 // 20:-1]))
+    params = {'time_unit': 'ms', 'current_unit': 'pA'}
+    for name, seconds in stage_times(PChronoAmperometry.build_pipeline, raw, params, ['units'], repeat).items():
+        report('processing', 'chronoamperometry ' + name, size ** 2, seconds)
+
+
+def bench_fitting(size, repeat):
+    distances, currents = generators.approach_curve(size ** 2)
+    params = {'zero_method': 'First point with data', 'radius': generators.RADIUS, 'iss': generators.ISS,
+              'rg': generators.RG, 'fit_rg': 1, 'fit_kappa': 1}
+    times = stage_times(PApproachCurve.build_pipeline, (distances, currents), params, ['feedback', 'kappa_curve'],
+                        repeat)
+    for name, seconds in times.items():
+        report('fitting', 'approach curve ' + name, size ** 2, seconds)
+
+
+def image_figure(size):
+    xpos, ypos, currents = generators.feedback_map(size)
+    fig = Figure(figsize=(5, 4))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_aspect(1)
+    Rendering.draw_map(ax, xpos, ypos, currents, 'RdYlBu_r')
+    return fig, canvas
+
+
+def voltammogram_figure(size):
+    time, potential, currents = generators.voltammogram(size ** 2 // generators.NCYCLES)
+    fig = Figure(figsize=(5, 4))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    nptscycle = len(potential) // generators.NCYCLES
+    for count in range(generators.NCYCLES):
+        ax.plot(potential[count * nptscycle:(count + 1) * nptscycle],
+                currents[count * nptscycle:(count + 1) * nptscycle])
+    return fig, canvas
+
+
+def bench_rendering(size, repeat):
+    report('rendering', 'image draw', size, best_of(lambda: image_figure(size)[1].draw(), repeat))
+    report('rendering', 'voltammogram draw', size ** 2, best_of(lambda: voltammogram_figure(size)[1].draw(), repeat))
+
+
+def bench_export(directory, size, repeat):
+    fig, canvas = image_figure(size)
+    filepath = os.path.join(directory, 'figure.png')
+    report('export', 'image figure (png)', size, best_of(lambda: fig.savefig(fname=filepath, dpi=400), repeat))
+
+    dataset = ImageDataset(*generators.feedback_map(size))
+    filepath = os.path.join(directory, 'export.txt')
+    report('export', 'image text', size, best_of(lambda: Export.export(dataset, filepath), repeat))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    repeat = 3
+    sections = SECTIONS
+    if '--repeat' in args:
+        index = args.index('--repeat')
+        repeat = int(args[index + 1])
+        del args[index:index + 2]
+    if '--only' in args:
+        index = args.index('--only')
+        sections = args[index + 1].split(',')
+        del args[index:index + 2]
+    sizes = [int(arg) for arg in args] or [50, 100, 200]
+
+    directory = tempfile.mkdtemp(prefix='flux_bench_')
+    try:
+        print("{0:<12} {1:<36} {2:>8} {3:>10}".format('section', 'benchmark', 'npts', 'time (s)'))
+        for size in sizes:
+            if 'import' in sections:
+                bench_import(directory, size, repeat)
+            if 'processing' in sections:
+                bench_processing(size, repeat)
+            if 'fitting' in sections:
+                bench_fitting(size, repeat)
+            if 'rendering' in sections:
+                bench_rendering(size, repeat)
+            if 'export' in sections:
+                bench_export(directory, size, repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,446 @@
+import sys
+import os
+
+import numpy as np
+import scipy.io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Processing import PApproachCurve
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Synthetic SECM data sets for the benchmarks, written in every file format
+supported by Readers/Formats.py. The data follow the models used by Flux:
+1. Images : feedback map of a tip at constant height over an insulating
+   substrate with active disks, from the mixed feedback approximation
+   (PApproachCurve.mixedfb) with a spatially varying kappa, a tilt and noise.
+2. Approach curves : the mixed feedback curve fitted by PACApp.kappa().
+3. Cyclic voltammograms : sigmoidal steady state voltammograms (triangular
+   sweeps) with a small capacitive current.
+4. Chronoamperograms : Shoup-Szabo transient of a disk electrode.
+5. Approach curve grids : an approach curve at every point of the image, with
+   the kappa of the feedback image.
+6. Scattered points : the feedback image sampled at npts x npts random
+   positions (hopping mode).
+
+The size npts is the number of points per side of an image, the number of
+points of an approach curve or chronoamperogram and the number of points per
+cycle of a voltammogram. Images are square since several readers assume it.
+
+Usage: python benchmarks/generators.py directory [npts]
+"""
+
+RADIUS = 5.0  # tip radius (µm)
+RG = 10.0
+ISS = 1.0  # steady state current (nA)
+SCAN = 500.0  # side of an image (µm)
+HEIGHT = 1.0  # normalized tip-substrate distance of an image
+NCYCLES = 3  # cycles of a voltammogram
+SCAN_RATE = 0.02  # V/s
+E_START, E_END, E0 = -0.1, 0.5, 0.2  # potential window and formal potential (V)
+POTENTIAL = 0.5  # potential of a chronoamperogram (V)
+NPTSZ = 40  # points per approach curve of a grid
+
+
+def feedback_map(npts, seed=0, drift=(0.0, 0.0)):
+    """x (µm), y (µm) and currents (nA, shape (npts, npts)) of a feedback image; the features are displaced by drift
+    (dx, dy in µm), as in repeated scans of the same area"""
+    rng = np.random.default_rng(seed)
+    xpos = np.linspace(0, SCAN, npts)
+    ypos = np.linspace(0, SCAN, npts)
+    xx, yy = np.meshgrid(xpos, ypos)
+
+    kappa = kappa_map(xx, yy, drift)
+    currents = ISS * PApproachCurve.mixedfb(HEIGHT, RG, kappa)
+    currents = currents * (1 + 2E-4 * xx + 1E-4 * yy) + 0.005 * ISS * rng.standard_normal(xx.shape)
+    return xpos, ypos, currents
+
+
+def kappa_map(xx, yy, drift=(0.0, 0.0)):
+    """kappa at the positions xx, yy (µm): insulating substrate with active disks"""
+    kappa = np.full(np.shape(xx), 0.01)
+    for x0, y0, r0, k0 in [(150, 180, 60, 10.0), (340, 320, 90, 1.0), (380, 100, 30, 100.0)]:
+        kappa = kappa + k0 / (1 + np.exp((np.hypot(xx - x0 - drift[0], yy - y0 - drift[1]) - r0) / 5))
+    return kappa
+
+
+def scattered_points(npts, seed=0):
+    """x (µm), y (µm) and currents (nA) of npts x npts points at random positions, as in a hopping mode scan of the
+    feedback image"""
+    rng = np.random.default_rng(seed)
+    xx = rng.uniform(0, SCAN, npts * npts)
+    yy = rng.uniform(0, SCAN, npts * npts)
+    currents = ISS * PApproachCurve.mixedfb(HEIGHT, RG, kappa_map(xx, yy))
+    return xx, yy, currents + 0.005 * ISS * rng.standard_normal(xx.shape)
+
+
+def approach_grid(npts, seed=0):
+    """x (µm), y (µm), distances (µm) and currents (nA, shape (npts, npts, NPTSZ)) of an approach curve grid"""
+    rng = np.random.default_rng(seed)
+    xpos = np.linspace(0, SCAN, npts)
+    ypos = np.linspace(0, SCAN, npts)
+    distances = np.linspace(0.5, 10 * RADIUS, NPTSZ)
+    xx, yy = np.meshgrid(xpos, ypos)
+    currents = ISS * PApproachCurve.mixedfb((distances / RADIUS)[np.newaxis, np.newaxis, :], RG,
+                                            kappa_map(xx, yy)[:, :, np.newaxis])
+    return xpos, ypos, distances, currents + 0.002 * ISS * rng.standard_normal(currents.shape)
+
+
+def approach_curve(npts, kappa=1.0, seed=0):
+    """Distances from the substrate (µm, increasing) and currents (nA)"""
+    rng = np.random.default_rng(seed)
+    distances = np.linspace(0, 10 * RADIUS, npts)
+    currents = ISS * PApproachCurve.mixedfb(0.1 + distances / RADIUS, RG, kappa)
+    return distances, currents + 0.002 * ISS * rng.standard_normal(npts)
+
+
+def voltammogram(npts, ncycles=NCYCLES, seed=0):
+    """Time (s), potential (V) and currents (nA) of ncycles triangular sweeps of npts points each, followed by the
+    starting point"""
+    rng = np.random.default_rng(seed)
+    up = np.linspace(E_START, E_END, npts // 2 + 1)[:-1]
+    down = np.linspace(E_END, E_START, npts - npts // 2 + 1)[:-1]
+    potential = np.concatenate([up, down] * ncycles + [[E_START]])
+    direction = np.concatenate([np.ones(len(up)), -np.ones(len(down))] * ncycles + [[1]])
+    step = (E_END - E_START) / (npts / 2)
+    time = np.arange(len(potential)) * step / SCAN_RATE
+
+    currents = ISS / (1 + np.exp(-(potential - E0) / 0.0257)) + 0.02 * ISS * direction
+    return time, potential, currents + 0.002 * ISS * rng.standard_normal(len(potential))
+
+
+def chronoamperogram(npts, duration=10.0, seed=0):
+    """Time (s) and currents (nA) of a potential step"""
+    rng = np.random.default_rng(seed)
+    time = np.linspace(0, duration, npts)
+    tau = 4 * 7E-10 * np.maximum(time, duration / npts) / (RADIUS * 1E-6) ** 2
+    currents = ISS * (0.7854 + 0.8862 / np.sqrt(tau) + 0.2146 * np.exp(-0.7823 / np.sqrt(tau)))
+    return time, currents + 0.002 * ISS * rng.standard_normal(npts)
+
+
+def _lines(fh, rows, fmt, sep):
+    fh.write('\n'.join(sep.join(fmt % value for value in row) for row in rows))
+    fh.write('\n')
+
+
+def _grid(npts):
+    # One row (x, y, current) per point, lines of the image one after the other
+    xpos, ypos, currents = feedback_map(npts)
+    xx, yy = np.meshgrid(xpos, ypos)
+    return xpos, ypos, currents, np.c_[xx.ravel(), yy.ravel(), currents.ravel()]
+
+
+# HEKA: values in m/A/s/V
+
+def heka_asc_image(filepath, npts):
+    xpos, ypos, currents, rows = _grid(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('Index\tX (m)\tCurrent (A)\n')
+        _lines(fh, np.c_[np.arange(len(rows)), rows[:, 0] * 1E-6, rows[:, 2] * 1E-9], '%.6E', '\t')
+
+
+def heka_asc_approach_curve(filepath, npts):
+    distances, currents = approach_curve(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('Index\tDistance (m)\tCurrent (A)\tDistance (m)\tN/A\n')
+        _lines(fh, np.c_[np.arange(npts) + 1, distances * 1E-6, currents * 1E-9, distances * 1E-6, np.arange(npts) + 1],
+               '%.6E', '\t')
+
+
+def heka_asc_voltammogram(filepath, npts):
+    time, potential, currents = voltammogram(npts)
+    time, potential, currents = time[:-1], potential[:-1], currents[:-1]
+    time = time - np.repeat(time[::npts], npts)  # every cycle starts at t = 0
+    with open(filepath, 'w') as fh:
+        fh.write('Index\tTime (s)\tCurrent (A)\tTime (s)\tEapp (V)\n')
+        _lines(fh, np.c_[np.arange(len(time)) + 1, time, currents * 1E-9, time, potential], '%.6E', '\t')
+
+
+def heka_asc_chronoamperometry(filepath, npts):
+    time, currents = chronoamperogram(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('Series_1_1\n')
+        fh.write('"Index"\t"Time[s]"\t"Imon-1[A]"\t"Time[s]"\t"Emon-1[V]"\n')
+        _lines(fh, np.c_[np.arange(npts), time, currents * 1E-9, time, np.full(npts, POTENTIAL)], '%.9E', '\t')
+
+
+def heka_mat_image(filepath, npts):
+    xpos, ypos, currents = feedback_map(npts)
+    traces = {}
+    for count in range(npts):
+        traces['Trace_1_1_{}_1'.format(count + 1)] = np.c_[xpos * 1E-6, currents[count] * 1E-9]
+    scipy.io.savemat(filepath, traces)
+
+
+def heka_mat_approach_curve(filepath, npts):
+    distances, currents = approach_curve(npts)
+    scipy.io.savemat(filepath, {'Trace_1_1_1_1': np.c_[distances * 1E-6, currents * 1E-9]})
+
+
+def heka_mat_voltammogram(filepath, npts):
+    time, potential, currents = voltammogram(npts)
+    traces = {}
+    for count in range(NCYCLES):
+        cycle = slice(count * npts, (count + 1) * npts)
+        t = time[cycle] - time[count * npts]
+        traces['Trace_1_1_{}_1'.format(count + 1)] = np.c_[t, currents[cycle] * 1E-9]
+        traces['Trace_1_1_{}_2'.format(count + 1)] = np.c_[t, potential[cycle]]
+    scipy.io.savemat(filepath, traces)
+
+
+# SECMx: tab separated ASCII export, units given in the header
+
+def secmx_image(filepath, npts):
+    xpos, ypos, currents, rows = _grid(npts)
+    index = np.arange(len(rows))
+    with open(filepath, 'w') as fh:
+        fh.write('[Scan]\n|X Unit=nm\n|Y Unit=nm\n|I Unit=pA\npos\tX\tpos\tY\tI\n')
+        _lines(fh, np.c_[index, rows[:, 0] * 1E3, index, rows[:, 1] * 1E3, rows[:, 2] * 1E3], '%.6g', '\t')
+
+
+def secmx_scattered_image(filepath, npts):
+    xx, yy, currents = scattered_points(npts)
+    index = np.arange(len(xx))
+    with open(filepath, 'w') as fh:
+        fh.write('[Scan]\n|X Unit=nm\n|Y Unit=nm\n|I Unit=pA\npos\tX\tpos\tY\tI\n')
+        _lines(fh, np.c_[index, xx * 1E3, index, yy * 1E3, currents * 1E3], '%.6g', '\t')
+
+
+def secmx_approach_curve(filepath, npts):
+    distances, currents = approach_curve(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('[Curve]\n|Z Unit=nm\n|I Unit=pA\np\tZ\tI\n')
+        _lines(fh, np.c_[np.arange(npts), distances * 1E3, currents * 1E3], '%.6g', '\t')
+
+
+# Biologic: EC-Lab exports (A), SECM images (µm, A)
+
+def biologic_image(filepath, npts):
+    xpos, ypos, currents, rows = _grid(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('Biologic SECM image\n\nX Y Z\n')
+        _lines(fh, np.c_[rows[:, 0], rows[:, 1], rows[:, 2] * 1E-9], '%.6E', ' ')
+
+
+def biologic_approach_curve(filepath, npts):
+    distances, currents = approach_curve(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('EC-Lab ASCII FILE\n\nd/um\t<I>/A\n')
+        _lines(fh, np.c_[distances, currents * 1E-9], '%.6E', '\t')
+
+
+def biologic_voltammogram(filepath, npts):
+    time, potential, currents = voltammogram(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('EC-Lab ASCII FILE\n\nEwe/V\t<I>/A\n')
+        _lines(fh, np.c_[potential, currents * 1E-9], '%.6E', '\t')
+
+
+def biologic_chronoamperometry(filepath, npts):
+    time, currents = chronoamperogram(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('EC-Lab ASCII FILE\n\ntime/s\t<I>/A\n')
+        _lines(fh, np.c_[time, currents * 1E-9], '%.6E', '\t')
+
+
+# CH Instruments: µm, A in the polarographic sign convention
+
+CHI_HEADER = """Oct. 18, 2019   10:21:33
+{0}
+File:  benchmark.bin
+Data Source:  Experiment
+Instrument Model:  CHI920D
+Header:
+Note:
+
+Init E (V) = {1}
+High E (V) = {1}
+Low E (V) = {2}
+Scan Rate (V/s) = {3}
+Segment = {4}
+Sample Interval (s) = 0.01
+Quiet Time (sec) = 2
+Sensitivity (A/V) = 1.e-9
+
+{5}
+
+"""
+
+
+def _chi(filepath, technique, labels, rows, init=POTENTIAL, low=E_START, segments=1):
+    with open(filepath, 'w') as fh:
+        fh.write(CHI_HEADER.format(technique, init, low, SCAN_RATE, segments, labels))
+        _lines(fh, rows, '%.4e', ', ')
+
+
+def ch_instruments_image(filepath, npts):
+    xpos, ypos, currents, rows = _grid(npts)
+    _chi(filepath, 'Scanning Electrochemical Microscope', 'X/um, Y/um, Current/A',
+         np.c_[rows[:, 0], rows[:, 1], -rows[:, 2] * 1E-9])
+
+
+def ch_instruments_approach_curve(filepath, npts):
+    distances, currents = approach_curve(npts)
+    _chi(filepath, 'Probe Approach Curve', 'Distance/um, Current/A',
+         np.c_[np.amax(distances) - distances, -currents * 1E-9])
+
+
+def ch_instruments_voltammogram(filepath, npts):
+    time, potential, currents = voltammogram(npts)
+    _chi(filepath, 'Cyclic Voltammetry', 'Potential/V, Current/A', np.c_[potential, -currents * 1E-9],
+         init=E_START, segments=2 * NCYCLES)
+
+
+def ch_instruments_chronoamperometry(filepath, npts):
+    time, currents = chronoamperogram(npts)
+    _chi(filepath, 'Chronoamperometry', 'Time/sec, Current/A', np.c_[time, -currents * 1E-9])
+
+
+# Sensolytics: '#' header lines, comma separated data
+
+def sensolytics_image(filepath, npts):
+    xpos, ypos, currents, rows = _grid(npts)
+    header = ['# Sensolytics SECM', '# Method: Scan', '# Channels: 2', '# Unit: um', '# Step: {}'.format(xpos[1]),
+              '# Points X: {}'.format(npts - 1), '# Points Y: {}'.format(npts - 1)]
+    header = header + ['# Parameter {}: 0'.format(count) for count in range(len(header), 23)]
+    xrel, yrel = rows[:, 0] - SCAN / 2, rows[:, 1] - SCAN / 2
+    with open(filepath, 'w') as fh:
+        fh.write('\n'.join(header) + '\n')
+        _lines(fh, np.c_[xrel, rows[:, 0], yrel, rows[:, 1], np.zeros(len(rows)), np.zeros(len(rows)), rows[:, 2],
+                         np.zeros(len(rows))], '%.6g', ',')
+
+
+def sensolytics_approach_curve(filepath, npts):
+    distances, currents = approach_curve(npts)
+    header = ['# Sensolytics approach curve'] + ['# Parameter {}: 0'.format(count) for count in range(1, 15)]
+    with open(filepath, 'w') as fh:
+        fh.write('\n'.join(header) + '\n')
+        _lines(fh, np.c_[distances, np.arange(npts), currents, np.zeros(npts)], '%.6g', ',')
+
+
+def sensolytics_voltammogram(filepath, npts):
+    time, potential, currents = voltammogram(npts)
+    header = ['# Sensolytics cyclic voltammogram'] + ['# Parameter {}\t0'.format(count) for count in range(1, 20)]
+    header[18] = '# Scan rate [V/s]\t{}'.format(SCAN_RATE)
+    with open(filepath, 'w') as fh:
+        fh.write('\n'.join(header) + '\n')
+        _lines(fh, np.c_[potential, currents * 1E-9, np.zeros(len(potential))], '%.6E', ',')
+
+
+def sensolytics_chronoamperometry(filepath, npts):
+    time, currents = chronoamperogram(npts)
+    header = ['# Sensolytics chronoamperometry', '# Method: Amperometry', '# Channels: 2'] + \
+             ['# Parameter {}\t0'.format(count) for count in range(3, 20)]
+    header[17] = '# Potential [V]\t{}'.format(str(POTENTIAL).replace('.', ','))
+    with open(filepath, 'w') as fh:
+        fh.write('\n'.join(header) + '\n')
+        _lines(fh, np.c_[time, currents * 1E-9, np.zeros(npts)], '%.6E', ',')
+
+
+# PAR: mm, µA; images as a matrix with the y position in the last column
+
+def par_image(filepath, npts):
+    xpos, ypos, currents = feedback_map(npts)
+    with open(filepath, 'w') as fh:
+        fh.write(''.join('Header line {}\n'.format(count) for count in range(6)))
+        _lines(fh, [xpos * 1E-3], '%.6g', ',')
+        _lines(fh, np.c_[currents * 1E-3, ypos * 1E-3], '%.6E', ',')
+
+
+def par_approach_curve(filepath, npts):
+    distances, currents = approach_curve(npts)
+    with open(filepath, 'w') as fh:
+        fh.write('PAR approach curve\nHeader line 1\nHeader line 2\nPoint,Distance,Current\n')
+        _lines(fh, np.c_[np.arange(npts), (np.amax(distances) - distances) * 1E-3, currents * 1E-3], '%.6g', ',')
+
+
+# Generic: X, Y, Z, I table of approach curve grids (nm, pA)
+
+def grid_text_approach_grid(filepath, npts):
+    xpos, ypos, distances, currents = approach_grid(npts)
+    yy, xx, zz = np.meshgrid(ypos, xpos, distances, indexing='ij')
+    with open(filepath, 'w', encoding='utf-8') as fh:
+        fh.write('X (nm)\tY (nm)\tZ (nm)\tI (pA)\n')
+        _lines(fh, np.c_[xx.ravel() * 1E3, yy.ravel() * 1E3, zz.ravel() * 1E3, currents.ravel() * 1E3], '%.6g', '\t')
+
+
+def scattered_text_scattered_image(filepath, npts):
+    xx, yy, currents = scattered_points(npts)
+    with open(filepath, 'w', encoding='utf-8') as fh:
+        fh.write('# hopping mode scan\nX (µm),Y (µm),I (nA)\n')
+        _lines(fh, np.c_[xx, yy, currents], '%.6g', ',')
+
+
+# Format name (see Readers/Formats.py) --> kind of data set --> (file extension, writer)
+WRITERS = {
+    'heka_asc': {'image': ('asc', heka_asc_image),
+                 'approach_curve': ('asc', heka_asc_approach_curve),
+                 'voltammogram': ('asc', heka_asc_voltammogram),
+                 'chronoamperometry': ('asc', heka_asc_chronoamperometry)},
+    'heka_mat': {'image': ('mat', heka_mat_image),
+                 'approach_curve': ('mat', heka_mat_approach_curve),
+                 'voltammogram': ('mat', heka_mat_voltammogram)},
+    'secmx': {'image': ('img', secmx_image),
+              'scattered_image': ('img', secmx_scattered_image),
+              'approach_curve': ('zsc', secmx_approach_curve)},
+    'biologic': {'image': ('txt', biologic_image),
+                 'approach_curve': ('txt', biologic_approach_curve),
+                 'voltammogram': ('txt', biologic_voltammogram),
+                 'chronoamperometry': ('txt', biologic_chronoamperometry)},
+    'ch_instruments': {'image': ('txt', ch_instruments_image),
+                       'approach_curve': ('txt', ch_instruments_approach_curve),
+                       'voltammogram': ('txt', ch_instruments_voltammogram),
+                       'chronoamperometry': ('txt', ch_instruments_chronoamperometry)},
+    'sensolytics': {'image': ('dat', sensolytics_image),
+                    'approach_curve': ('dat', sensolytics_approach_curve),
+                    'voltammogram': ('dat', sensolytics_voltammogram),
+                    'chronoamperometry': ('dat', sensolytics_chronoamperometry)},
+    'par': {'image': ('csv', par_image),
+            'approach_curve': ('csv', par_approach_curve)},
+    'approach_grid_text': {'approach_grid': ('txt', grid_text_approach_grid)},
+    'scattered_text': {'scattered_image': ('txt', scattered_text_scattered_image)},
+}
+
+
+def write(fileformat, kind, directory, npts):
+    """Writes a data set of the given kind in the given format; returns the file path"""
+    extension, writer = WRITERS[fileformat][kind]
+    filepath = os.path.join(directory, '{}_{}_{}.{}'.format(fileformat, kind, npts, extension))
+    writer(filepath, npts)
+    return filepath
+
+
+def generate(directory, npts, kinds=None):
+    """Writes every supported (format, kind) of size npts; returns a list of (format, kind, filepath)"""
+    files = []
+    for fileformat in WRITERS:
+        for kind in WRITERS[fileformat]:
+            if kinds is None or kind in kinds:
+                files.append((fileformat, kind, write(fileformat, kind, directory, npts)))
+    return files
+
+
+if __name__ == '__main__':
+    directory = sys.argv[1]
+    npts = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for fileformat, kind, filepath in generate(directory, npts):
+        print(filepath)
@@ -0,0 +1,162 @@
+import sys
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from Readers import Stream
+import generators
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Simulator of a live data stream (see Readers/Stream.py): serves synthetic
+chronoamperograms or voltammograms (models of benchmarks/generators.py) at a
+given number of samples per second, in frames of CHUNK_S seconds, to one
+client at a time. Connect to it with Connect Stream in the apps.
+
+With --check, a client is started in the same process and the sustained rate
+at which samples are received is reported, with the time taken to convert
+the ring buffer into a data set once per second, as the apps do.
+
+Usage: python benchmarks/stream_simulator.py [--kind chronoamperometry|voltammogram]
+           [--rate 100000] [--address tcp://127.0.0.1:5555] [--cycle 20000]
+           [--duration seconds] [--check]
+"""
+
+CHUNK_S = 0.01  # time covered by a frame
+
+
+def chronoamperometry_samples(first, nsamples, rate, rng):
+    time = (first + np.arange(nsamples)) / rate
+    tau = 4 * 7E-10 * np.maximum(time, 1.0 / rate) / (generators.RADIUS * 1E-6) ** 2
+    currents = generators.ISS * (0.7854 + 0.8862 / np.sqrt(tau) + 0.2146 * np.exp(-0.7823 / np.sqrt(tau)))
+    return np.column_stack([time, currents + 0.002 * generators.ISS * rng.standard_normal(nsamples)])
+
+
+class VoltammogramSamples:
+    # Repeats one cycle of nptscycle points (the potentials of every cycle are identical)
+    def __init__(self, nptscycle):
+        time, self.potential, self.currents = generators.voltammogram(nptscycle, ncycles=1)
+        self.potential = self.potential[:-1]
+        self.currents = self.currents[:-1]
+
+    def __call__(self, first, nsamples, rate, rng):
+        index = (first + np.arange(nsamples)) % len(self.potential)
+        return np.column_stack([(first + np.arange(nsamples)) / rate, self.potential[index],
+                                self.currents[index] + 0.002 * generators.ISS * rng.standard_normal(nsamples)])
+
+
+def listen(address):
+    family, address = Stream.parse_address(address)
+    if family == socket.AF_UNIX and os.path.exists(address):
+        os.remove(address)
+    server = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_INET:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(address)
+    server.listen(1)
+    return server
+
+
+def serve(server, samples, rate, duration=None, stop=None):
+    """Sends samples(first, n, rate, rng) to every client that connects, in real time, for duration seconds per
+    client (until it disconnects by default). stop is an optional threading.Event."""
+    rng = np.random.default_rng(0)
+    chunk = max(1, int(round(rate * CHUNK_S)))
+    while stop is None or not stop.is_set():
+        connection, peer = server.accept()
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2 ** 22)
+        print("Client connected, sending {} samples/s".format(rate))
+        start = time.perf_counter()
+        sent = 0
+        try:
+            while (duration is None or sent < duration * rate) and (stop is None or not stop.is_set()):
+                connection.sendall(Stream.encode(samples(sent, chunk, rate, rng)))
+                sent = sent + chunk
+                # Paced on the start time, so that the rate does not drift
+                delay = start + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        except OSError:
+            pass
+        connection.close()
+        print("Client disconnected after {} samples ({:.0f} samples/s)".format(
+            sent, sent / max(time.perf_counter() - start, 1E-9)))
+
+
+def check(address, kind, samples, rate, duration):
+    server = listen(address)
+    stop = threading.Event()
+    thread = threading.Thread(target=serve, args=(server, samples, rate, duration, stop), daemon=True)
+    thread.start()
+
+    client = Stream.StreamClient(address, kind)
+    client.start()
+    start = time.perf_counter()
+    refresh = []
+    while time.perf_counter() - start < duration and client.running:
+        time.sleep(1.0)
+        begin = time.perf_counter()
+        dataset = client.dataset()
+        refresh.append(time.perf_counter() - begin)
+        print("{0:6.1f} s: {1:9d} samples, {2:9.0f} samples/s, data set of {3} points in {4:.3f} s".format(
+            time.perf_counter() - start, client.total, client.rate(),
+            0 if dataset is None else dataset.currents.size, refresh[-1]))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    client.stop()
+    server.close()
+    print("Sustained: {:.0f} samples/s (target {}), mean refresh {:.3f} s".format(client.total / elapsed, rate,
+                                                                              np.mean(refresh) if refresh else 0))
+    if client.error:
+        print("Stream error: {}".format(client.error))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {'--kind': 'chronoamperometry', '--rate': '100000', '--address': 'tcp://127.0.0.1:5555',
+               '--cycle': '20000', '--duration': None}
+    for option in list(options):
+        if option in args:
+            index = args.index(option)
+            options[option] = args[index + 1]
+            del args[index:index + 2]
+    rate = int(float(options['--rate']))
+    kind = options['--kind']
+    duration = float(options['--duration']) if options['--duration'] else None
+    if kind == 'chronoamperometry':
+        samples = chronoamperometry_samples
+    else:
+        samples = VoltammogramSamples(int(options['--cycle']))
+
+    if '--check' in args:
+        check(options['--address'], kind, samples, rate, duration or 10.0)
+    else:
+        print("Serving {} on {}".format(kind, options['--address']))
+        server = listen(options['--address'])
+        try:
+            serve(server, samples, rate, duration)
+        except KeyboardInterrupt:
+            pass
+        server.close()
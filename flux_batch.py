@@ -0,0 +1,90 @@
+import argparse
+import multiprocessing
+import os
+# Import of several files
+from Readers import Batch
+from Readers import Formats
+# Profiling mode
+from Processing import Profiling
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script imports several files without the GUI and reports the format and
+dimensions of every data set, e.g.
+
+    python flux_batch.py --kind image scan1.txt scan2.txt
+    python flux_batch.py --kind image --profile slow_case scan1.txt
+
+The files are read concurrently (see Readers/Batch.py). With --profile, they
+are read one after the other in the main process, each under cProfile, and a
+profile bundle is written (see Processing/Profiling.py).
+"""
+
+KINDS = ['image', 'approach_curve', 'voltammogram', 'chronoamperometry']
+
+
+def describe(dataset):
+    dimensions = Profiling.dataset_dimensions(dataset)
+    return ", ".join("{}={}".format(key, dimensions[key]) for key in dimensions if key not in ('kind', 'file'))
+
+
+def read_profiled(filepaths, kind, manufacturer):
+    """Reads the files one by one, each profiled; yields (filepath, dataset, error) as Batch.read_files"""
+    profiler = Profiling.PROFILER['profiler']
+    for filepath in filepaths:
+        result = {'dataset': None}
+        try:
+            with profiler.profile('read_' + os.path.basename(filepath), lambda: result['dataset']):
+                result['dataset'] = Formats.read(filepath, kind, manufacturer)
+            yield filepath, result['dataset'], None
+        except Exception as e:
+            yield filepath, None, e
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Imports SECM data files without the Flux GUI.")
+    parser.add_argument('files', nargs='+', help="files to import")
+    parser.add_argument('--kind', choices=KINDS, default='image', help="kind of data set (default: image)")
+    parser.add_argument('--manufacturer', default=None,
+                        help="manufacturer as in the dropdown of the apps (default: detect the format)")
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='DIRECTORY',
+                        help="profile the import of every file; the profile bundle is written to DIRECTORY "
+                             "(default: flux_profile_<date>_<time>)")
+    arguments = parser.parse_args()
+
+    failed = 0
+    try:
+        if arguments.profile is not None:
+            Profiling.start(arguments.profile or None)
+            results = read_profiled(arguments.files, arguments.kind, arguments.manufacturer)
+        else:
+            results = Batch.read_files(arguments.files, arguments.kind, arguments.manufacturer)
+        for filepath, dataset, error in results:
+            if error is None:
+                print("{}: {}".format(filepath, describe(dataset)))
+            else:
+                failed = failed + 1
+                print("{}: {} ({})".format(filepath, Batch.message(error), error))
+    finally:
+        Batch.shutdown()
+        Profiling.stop()
+    print("{} of {} files imported.".format(len(arguments.files) - failed, len(arguments.files)))
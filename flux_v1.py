@@ -1,3 +1,5 @@
+import argparse
+import multiprocessing
 import tkinter as tk
 # Import apps
 from Apps.Image import ImageApp
@@ -10,6 +12,10 @@ from Menus.MApproachCurve import MenuPagesPAC
 from Menus.MChronoAmperometry import MenuPagesCA
 from Menus.MCyclicVoltammetry import MenuPagesCV
 from Menus.MImage import MenuPagesImage
+# Import of several files
+from Readers import Batch
+# Profiling mode
+from Processing import Profiling
 
 # -*- coding: utf-8 -*-
 """  
@@ -103,6 +109,7 @@ def start_image():
     helpmenu.add_command(label="Theory", command=(lambda: MenuPagesImage.theory_page(Imageroot)))
     helpmenu.add_command(label="About", command=(lambda: MenuPagesImage.about_page(Imageroot, FLUXVERSION)))
     helpmenu.add_command(label="Report bug / request feature", command=(lambda: MenuPagesImage.github_page(Imageroot)))
+    helpmenu.add_command(label="Performance", command=(lambda: MenuPagesImage.performance_page(Imageroot)))
     menubar.add_cascade(label="Help", menu=helpmenu)
     Imageroot.config(menu=menubar)
 
@@ -125,6 +132,7 @@ def start_cyclicvoltammetry():
     helpmenu.add_command(label="Theory", command=(lambda: MenuPagesCV.theory_page(CVroot)))
     helpmenu.add_command(label="About", command=(lambda: MenuPagesCV.about_page(CVroot, FLUXVERSION)))
     helpmenu.add_command(label="Report bug / request feature", command=(lambda: MenuPagesCV.github_page(CVroot)))
+    helpmenu.add_command(label="Performance", command=(lambda: MenuPagesCV.performance_page(CVroot)))
     menubar.add_cascade(label="Help", menu=helpmenu)
     CVroot.config(menu=menubar)
 
@@ -147,6 +155,7 @@ def start_chronoamperometry():
     helpmenu.add_command(label="Theory", command=(lambda: MenuPagesCA.theory_page(CAroot)))
     helpmenu.add_command(label="About", command=(lambda: MenuPagesCA.about_page(CAroot, FLUXVERSION)))
     helpmenu.add_command(label="Report bug / request feature", command=(lambda: MenuPagesCA.github_page(CAroot)))
+    helpmenu.add_command(label="Performance", command=(lambda: MenuPagesCA.performance_page(CAroot)))
     menubar.add_cascade(label="Help", menu=helpmenu)
     CAroot.config(menu=menubar)
 
@@ -169,6 +178,7 @@ def start_approach_curve():
     helpmenu.add_command(label="Theory", command=(lambda: MenuPagesPAC.theory_page(PACroot)))
     helpmenu.add_command(label="About", command=(lambda: MenuPagesPAC.about_page(PACroot, FLUXVERSION)))
     helpmenu.add_command(label="Report bug / request feature", command=(lambda: MenuPagesPAC.github_page(PACroot)))
+    helpmenu.add_command(label="Performance", command=(lambda: MenuPagesPAC.performance_page(PACroot)))
     menubar.add_cascade(label="Help", menu=helpmenu)
     PACroot.config(menu=menubar)
 
@@ -178,61 +188,77 @@ def start_approach_curve():
 """
 Main Window
 """
-main = tk.Tk()
-main.title("Flux")
-main.wm_iconbitmap('supporting/flux_logo.ico')
-main.resizable(False, False)
-
-# Set up menubar
-menubar = tk.Menu(main)
-helpmenu = tk.Menu(menubar, tearoff=0)
-helpmenu.add_command(label="About", command=(lambda: MenuPagesTop.about_page(main, FLUXVERSION)))
-helpmenu.add_command(label="Report bug / request feature", command=(lambda: MenuPagesTop.github_page(main)))
-menubar.add_cascade(label="Help", menu=helpmenu)
-main.config(menu=menubar)
-
-# Create the basic frames
-frameLogo = tk.Frame(main)
-frameLogo.pack(side="left")
-frameDropdown = tk.Frame(main)
-frameDropdown.pack(side="right")
-
-# Left hand frame: logo
-# Display flux logo
-imageLogo = tk.PhotoImage(file="supporting/flux_logo_large.gif")
-labelLogo = tk.Label(frameLogo, image=imageLogo)
-labelLogo.grid(row=0, column=0, padx=30, pady=30)
-
-# Right hand frame: dropdown menu and info"
-labelWelcome = tk.Label(frameDropdown, text="Welcome to Flux!", font='Arial 16')
-labelWelcome.grid(row=1, column=0, padx=10, sticky="W")
-labelDescription = tk.Label(frameDropdown, text="GUI for treating SECM data.")
-labelDescription.grid(row=2, column=0, padx=10, sticky="W")
-labelSpace = tk.Label(frameDropdown, text="")
-labelSpace.grid(row=3, column=0, pady=10)
-
-# Actual menu
-labelSelect = tk.Label(frameDropdown, text="Select experiment type to start.")
-labelSelect.grid(row=4, column=0, sticky="W", padx=10)
-
-# Create a stringvar which will contain the eventual choice
-tkvar = tk.StringVar(main)
-tkvar.set('   ')  # set the default option
-# Dictionary with options
-choices = {'Cyclic Voltammogram', 'Chronoamperogram', 'Approach curve', 'Image'}
-popupMenu = tk.OptionMenu(frameDropdown, tkvar, *choices)
-popupMenu.configure(width=20)
-popupMenu.grid(row=5, column=0, sticky="W", padx=10)
-
-# Go button
-buttonGo = tk.Button(frameDropdown, text="Go!", state="disabled", command=(lambda: open_window()))
-buttonGo.grid(row=5, column=1, sticky="W", padx=10)
-
-# Temporary label for indicating whether analysis is supported
-labelSupport = tk.Label(frameDropdown, text="")
-labelSupport.grid(row=6, column=0, sticky="W", padx=10)
-
-# link function to change dropdown
-tkvar.trace('w', change_dropdown)
-
-main.mainloop()  # Run the main window's main loop
+if __name__ == '__main__':
+    # Worker processes of the file import (Readers/Batch.py) re-import this script; only the main process
+    # opens the GUI
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Flux: GUI for treating SECM data.")
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='DIRECTORY',
+                        help="profile every import, plot and export; the profile bundle is written to DIRECTORY "
+                             "(default: flux_profile_<date>_<time>) and zipped when Flux is closed")
+    arguments = parser.parse_args()
+    if arguments.profile is not None:
+        Profiling.start(arguments.profile or None)
+
+    main = tk.Tk()
+    main.title("Flux")
+    main.wm_iconbitmap('supporting/flux_logo.ico')
+    main.resizable(False, False)
+
+    # Set up menubar
+    menubar = tk.Menu(main)
+    helpmenu = tk.Menu(menubar, tearoff=0)
+    helpmenu.add_command(label="About", command=(lambda: MenuPagesTop.about_page(main, FLUXVERSION)))
+    helpmenu.add_command(label="Report bug / request feature", command=(lambda: MenuPagesTop.github_page(main)))
+    helpmenu.add_command(label="Performance", command=(lambda: MenuPagesTop.performance_page(main)))
+    menubar.add_cascade(label="Help", menu=helpmenu)
+    main.config(menu=menubar)
+
+    # Create the basic frames
+    frameLogo = tk.Frame(main)
+    frameLogo.pack(side="left")
+    frameDropdown = tk.Frame(main)
+    frameDropdown.pack(side="right")
+
+    # Left hand frame: logo
+    # Display flux logo
+    imageLogo = tk.PhotoImage(file="supporting/flux_logo_large.gif")
+    labelLogo = tk.Label(frameLogo, image=imageLogo)
+    labelLogo.grid(row=0, column=0, padx=30, pady=30)
+
+    # Right hand frame: dropdown menu and info"
+    labelWelcome = tk.Label(frameDropdown, text="Welcome to Flux!", font='Arial 16')
+    labelWelcome.grid(row=1, column=0, padx=10, sticky="W")
+    labelDescription = tk.Label(frameDropdown, text="GUI for treating SECM data.")
+    labelDescription.grid(row=2, column=0, padx=10, sticky="W")
+    labelSpace = tk.Label(frameDropdown, text="")
+    labelSpace.grid(row=3, column=0, pady=10)
+
+    # Actual menu
+    labelSelect = tk.Label(frameDropdown, text="Select experiment type to start.")
+    labelSelect.grid(row=4, column=0, sticky="W", padx=10)
+
+    # Create a stringvar which will contain the eventual choice
+    tkvar = tk.StringVar(main)
+    tkvar.set('   ')  # set the default option
+    # Dictionary with options
+    choices = {'Cyclic Voltammogram', 'Chronoamperogram', 'Approach curve', 'Image'}
+    popupMenu = tk.OptionMenu(frameDropdown, tkvar, *choices)
+    popupMenu.configure(width=20)
+    popupMenu.grid(row=5, column=0, sticky="W", padx=10)
+
+    # Go button
+    buttonGo = tk.Button(frameDropdown, text="Go!", state="disabled", command=(lambda: open_window()))
+    buttonGo.grid(row=5, column=1, sticky="W", padx=10)
+
+    # Temporary label for indicating whether analysis is supported
+    labelSupport = tk.Label(frameDropdown, text="")
+    labelSupport.grid(row=6, column=0, sticky="W", padx=10)
+
+    # link function to change dropdown
+    tkvar.trace('w', change_dropdown)
+
+    main.mainloop()  # Run the main window's main loop
+    Batch.shutdown()
+    Profiling.stop()
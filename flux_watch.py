@@ -0,0 +1,73 @@
+import argparse
+import multiprocessing
+# Watch folder service
+from Processing import Watch
+
+# -*- coding: utf-8 -*-
+"""
+Flux: Source Code Vers. 1.0.2
+Copyright (c) 2019 Lisa Stephens
+With minor changes by Nathaniel Leslie (2020)
+
+ This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script watches a directory without the GUI: every file dropped into it
+is imported, processed with the default settings of the app and exported as
+a text file (see Processing/Watch.py and Processing/Export.py), e.g.
+
+    python flux_watch.py --kind image //share/secm
+    python flux_watch.py --kind voltammogram --output results --workers 2 data
+
+Stop it with Ctrl+C; files being processed are finished first. Processed
+files are recorded in flux_watch.sqlite in the output directory and are not
+processed again when the service is restarted.
+"""
+
+KINDS = ['image', 'approach_curve', 'voltammogram', 'chronoamperometry']
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Imports, processes and exports the SECM data files dropped into "
+                                                 "a directory.")
+    parser.add_argument('directory', help="directory to watch")
+    parser.add_argument('--kind', choices=KINDS, default='image', help="kind of data set (default: image)")
+    parser.add_argument('--manufacturer', default=None,
+                        help="manufacturer as in the dropdown of the apps (default: detect the format)")
+    parser.add_argument('--output', default=None,
+                        help="directory of the exported files, the index and metrics.json "
+                             "(default: DIRECTORY/flux_output)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="maximum number of files processed at a time (default: number of cores; 0 = no "
+                             "worker processes)")
+    parser.add_argument('--poll', type=float, default=Watch.POLL_S,
+                        help="interval between two scans of the directory in s (default: {})".format(Watch.POLL_S))
+    parser.add_argument('--settle', type=float, default=Watch.SETTLE_S,
+                        help="time in s during which a file must not change before it is processed "
+                             "(default: {})".format(Watch.SETTLE_S))
+    arguments = parser.parse_args()
+
+    watcher = Watch.Watcher(arguments.directory, arguments.kind, arguments.output, arguments.manufacturer,
+                            arguments.workers, arguments.poll, arguments.settle)
+    print("Watching {} ({}), exporting to {}".format(watcher.directory,
+                                                     "notifications" if Watch.Observer is not None else "polling",
+                                                     watcher.output))
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("Stopping, waiting for the files being processed...")
+    totals = watcher.totals
+    print("{} files exported, {} failed, {} not supported.".format(totals['exported'], totals['failed'],
+                                                                   totals['unsupported']))
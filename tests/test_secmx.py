@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the detection of binary SECMx files (Readers/SECMx.py), which gates
+every SECMx import. Run with python -m pytest from the root of the repository.
+"""
+
+from Readers import SECMx
+
+HEADER = '[Scan]\n|X Unit=µm\n|Y Unit=µm\n|I Unit=nA\npos\tX\tpos\tY\tI\n'
+ROWS = ''.join('{}\t{}\t0\t0\t{}\n'.format(i, i * 10, 0.1 * i) for i in range(100))
+
+
+def test_binary_file_with_nul_byte(tmp_path):
+    # Text apart from a single NUL byte, e.g. a binary field following a text header
+    filepath = tmp_path / 'binary.img'
+    filepath.write_bytes(HEADER.encode('latin-1') + b'\x00' + ROWS.encode('latin-1'))
+    assert SECMx.is_binary(str(filepath))
+
+
+def test_ascii_file_with_latin1_units(tmp_path):
+    filepath = tmp_path / 'ascii.img'
+    filepath.write_bytes((HEADER + ROWS).encode('latin-1'))
+    assert b'\xb5' in filepath.read_bytes()
+    assert not SECMx.is_binary(str(filepath))